@@ -0,0 +1,141 @@
+"""
+Compare SQLite default settings with tuned profile (WAL, pragmas and pool of opened connections)
+on topic, topic list and execute log workloads.
+
+Every profile runs on new database file in temp folder, so file system cache is the same for both.
+
+Usage: python benchmarks/db_benchmark.py [--topics 200] [--lists 200] [--logs 2000] [--readers 4]
+"""
+from __future__ import print_function
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from monitorrent.db import init_db_engine, create_db, close_db, DBSession, SQLITE_TUNED_PRAGMAS
+from monitorrent.engine import ExecuteLogManager
+from monitorrent.plugins import Topic
+from monitorrent.plugins.trackers.rutor import RutorOrgTopic
+from monitorrent.utils.pubsub import EventChannel
+
+PROFILES = [
+    ('default', {}),
+    ('tuned', {'sqlite_pragmas': SQLITE_TUNED_PRAGMAS, 'pool_size': 5}),
+]
+
+
+def add_topics(count):
+    for i in range(count):
+        with DBSession() as db:
+            db.add(RutorOrgTopic(display_name=u'Topic {0}'.format(i), url=u'http://rutor.info/torrent/{0}'.format(i),
+                                 hash=u'{0:040x}'.format(i)))
+
+
+def update_topics(count):
+    for i in range(count):
+        with DBSession() as db:
+            topic = db.query(RutorOrgTopic).filter(RutorOrgTopic.url == u'http://rutor.info/torrent/{0}'.format(i))\
+                .first()
+            topic.last_update = datetime.now(pytz.utc)
+            topic.hash = u'{0:040x}'.format(i + count)
+
+
+def list_topics(count):
+    for _ in range(count):
+        with DBSession() as db:
+            [t.display_name for t in db.query(Topic).all()]
+
+
+def write_logs(count, topics=10):
+    log_manager = ExecuteLogManager(events=EventChannel())
+    log_manager.started(datetime.now(pytz.utc))
+    for i in range(count):
+        log_manager.log_entry(u'Check for changes <b>Topic {0}</b>'.format(i), 'info')
+        if (i + 1) % (count // topics) == 0:
+            log_manager.topic_finished(i)
+    log_manager.finished(datetime.now(pytz.utc), None)
+
+
+def read_logs(count):
+    log_manager = ExecuteLogManager(events=EventChannel())
+    for _ in range(count):
+        executes, _ = log_manager.get_log_entries(0, 10)
+        for execute in executes:
+            log_manager.get_execute_log_details(execute['id'])
+
+
+def write_logs_with_readers(count, readers):
+    """Engine writes execute log while web threads show topic list"""
+    stop = threading.Event()
+    reads = [0] * readers
+
+    def read(index):
+        while not stop.is_set():
+            list_topics(1)
+            reads[index] += 1
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    try:
+        write_logs(count)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return sum(reads)
+
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def run_profile(name, engine_kwargs, args):
+    db_dir = tempfile.mkdtemp(prefix='monitorrent-benchmark-')
+    try:
+        init_db_engine('sqlite:///' + os.path.join(db_dir, 'monitorrent.db'), False, **engine_kwargs)
+        create_db()
+        results = [
+            ('add {0} topics'.format(args.topics), measure(add_topics, args.topics)[0]),
+            ('update {0} topics'.format(args.topics), measure(update_topics, args.topics)[0]),
+            ('list topics {0} times'.format(args.lists), measure(list_topics, args.lists)[0]),
+            ('write {0} log entries'.format(args.logs), measure(write_logs, args.logs)[0]),
+            ('read log pages {0} times'.format(args.lists), measure(read_logs, args.lists)[0]),
+        ]
+        elapsed, reads = measure(write_logs_with_readers, args.logs, args.readers)
+        results.append(('write {0} log entries with {1} readers'.format(args.logs, args.readers), elapsed))
+        results.append(('  topic lists read meanwhile, per second', reads / elapsed))
+        close_db()
+        return results
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monitorrent SQLite benchmark')
+    parser.add_argument('--topics', type=int, default=200)
+    parser.add_argument('--lists', type=int, default=200)
+    parser.add_argument('--logs', type=int, default=2000)
+    parser.add_argument('--readers', type=int, default=4)
+    args = parser.parse_args()
+
+    results = [(name, run_profile(name, kwargs, args)) for name, kwargs in PROFILES]
+
+    print('{0:<45}{1:>12}{2:>12}'.format('workload', *[name for name, _ in results]))
+    for i, (workload, _) in enumerate(results[0][1]):
+        print('{0:<45}{1:>12.3f}{2:>12.3f}'.format(workload, *[r[i][1] for _, r in results]))
+
+
+if __name__ == '__main__':
+    main()
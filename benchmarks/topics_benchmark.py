@@ -0,0 +1,144 @@
+"""
+Measure number of queries and latency of topic operations on database with thousands of topics
+of all tracker plugins.
+
+Base topic operations are compared with the same queries through with_polymorphic '*',
+which Topic mapper used before and which joins all tracker topic tables.
+
+Usage: python benchmarks/topics_benchmark.py [--topics 3000] [--repeat 20]
+"""
+from __future__ import print_function
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from mock import Mock
+from sqlalchemy import event, Integer, Boolean, Float
+from sqlalchemy.orm import with_polymorphic
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from monitorrent.db import init_db_engine, create_db, close_db, DBSession, get_engine, row2dict
+from monitorrent.plugins import Topic
+from monitorrent.plugins.status import Status
+from monitorrent.plugin_managers import load_plugins, get_plugins, TrackersManager
+
+
+def _column_value(column, index):
+    if isinstance(column.type, Boolean):
+        return False
+    if isinstance(column.type, (Integer, Float)):
+        return index % 10 + 1
+    return u'{0}-{1}'.format(column.name, index)
+
+
+def add_topics(trackers, count):
+    names = sorted(trackers.keys())
+    with DBSession() as db:
+        for i in range(count):
+            name = names[i % len(names)]
+            topic_class = trackers[name].topic_class
+            values = {c.name: _column_value(c, i) for c in topic_class.__table__.columns
+                      if not c.nullable and not c.primary_key and not c.foreign_keys and c.server_default is None}
+            topic = topic_class(**values)
+            topic.display_name = u'Topic {0}'.format(i)
+            topic.url = u'https://{0}/topic/{1}'.format(name, i)
+            topic.type = name
+            db.add(topic)
+
+
+def get_watching_topics_polymorphic(trackers_manager):
+    """get_watching_topics before it was split by tracker type: base query and typed topic query per topic"""
+    watching_topics = []
+    with DBSession() as db:
+        polymorphic_topic = with_polymorphic(Topic, '*')
+        dbtopics = db.query(polymorphic_topic).all()
+        db.expunge_all()
+        for dbtopic in dbtopics:
+            tracker = trackers_manager.trackers[dbtopic.type]
+            if hasattr(tracker, 'prepare_topic') or hasattr(tracker, 'get_thumbnail_url'):
+                dbtopic = db.query(tracker.topic_class).filter(Topic.id == dbtopic.id).first()
+                db.expunge(dbtopic)
+            topic = row2dict(dbtopic, None, ['id', 'url', 'display_name', 'last_update', 'paused'])
+            topic['info'] = tracker.get_topic_info(dbtopic)
+            watching_topics.append(topic)
+    return watching_topics
+
+
+def set_topic_paused_polymorphic(topic_id, paused):
+    with DBSession() as db:
+        topic = db.query(with_polymorphic(Topic, '*')).filter(Topic.id == topic_id).first()
+        topic.paused = paused
+
+
+def get_status_topics_ids_polymorphic(statuses):
+    with DBSession() as db:
+        return [t.id for t in db.query(with_polymorphic(Topic, '*')).filter(Topic.status.in_(statuses))]
+
+
+def measure(repeat, func, *args):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *a):
+        statements.append(statement)
+
+    event.listen(get_engine(), 'before_cursor_execute', before_cursor_execute)
+    start = time.perf_counter()
+    try:
+        for _ in range(repeat):
+            func(*args)
+    finally:
+        elapsed = time.perf_counter() - start
+        event.remove(get_engine(), 'before_cursor_execute', before_cursor_execute)
+    queries = len([s for s in statements if s != 'BEGIN'])
+    return queries / float(repeat), elapsed * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monitorrent topics benchmark')
+    parser.add_argument('--topics', type=int, default=3000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix='monitorrent-benchmark-')
+    try:
+        init_db_engine('sqlite:///' + os.path.join(db_dir, 'monitorrent.db'), False)
+        load_plugins()
+        create_db()
+        trackers = get_plugins('tracker')
+        trackers_manager = TrackersManager(Mock(), trackers)
+        add_topics(trackers, args.topics)
+        topic_id = args.topics // 2
+
+        workloads = [
+            ('topics list', [
+                ('with_polymorphic *', get_watching_topics_polymorphic, trackers_manager),
+                ('query per tracker', trackers_manager.get_watching_topics),
+            ]),
+            ('set topic paused', [
+                ('with_polymorphic *', set_topic_paused_polymorphic, topic_id, True),
+                ('topics table only', trackers_manager.set_topic_paused, topic_id, True),
+            ]),
+            ('status topic ids', [
+                ('with_polymorphic *', get_status_topics_ids_polymorphic, [Status.Ok]),
+                ('topics table only', trackers_manager.get_status_topics_ids, [Status.Ok]),
+            ]),
+        ]
+
+        print('{0} topics of {1} trackers, average of {2} runs'.format(args.topics, len(trackers), args.repeat))
+        print('{0:<20}{1:<22}{2:>10}{3:>12}'.format('workload', 'variant', 'queries', 'ms'))
+        for workload, variants in workloads:
+            for variant in variants:
+                queries, ms = measure(args.repeat, *variant[1:])
+                print('{0:<20}{1:<22}{2:>10.1f}{3:>12.2f}'.format(workload, variant[0], queries, ms))
+        close_db()
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,10 @@
 from __future__ import absolute_import
 from builtins import range
+import os
+import threading
 from sqlalchemy import create_engine, event, Column, String, Integer, Table, types
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
 import sqlalchemy.orm
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.ext.declarative import declarative_base
@@ -8,6 +12,7 @@ from alembic.runtime.migration import MigrationContext
 from alembic.operations import Operations
 from datetime import datetime
 import pytz
+from monitorrent.utils.metrics import db_sessions, db_sessions_active
 
 
 class ContextSession(sqlalchemy.orm.Session):
@@ -17,6 +22,8 @@ class ContextSession(sqlalchemy.orm.Session):
         return self.bind.dialect
 
     def __enter__(self):
+        db_sessions.inc()
+        db_sessions_active.inc()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -27,6 +34,7 @@ class ContextSession(sqlalchemy.orm.Session):
                 self.rollback()
         finally:
             self.close()
+            db_sessions_active.dec()
 
 
 class UTCDateTime(types.TypeDecorator):
@@ -44,7 +52,9 @@ class UTCDateTime(types.TypeDecorator):
                             value.microsecond, tzinfo=pytz.utc)
 
 Base = declarative_base()
+_session_factory = None
 _DBSession = None
+_db_writer = None
 engine = None
 
 
@@ -53,11 +63,52 @@ def get_engine():
 
 
 def DBSession():
+    if getattr(threading.current_thread(), 'is_db_writer', False):
+        # scoped session of writer thread would commit and close group transaction of writer
+        raise RuntimeError("DBSession can't be used in DB writer thread, unit of work has to use its session")
     return _DBSession()
 
 
-def init_db_engine(connection_string, echo=False, **kwargs):
-    global engine, _DBSession
+def new_session():
+    """
+    :return: session which isn't shared with other code of calling thread, unlike DBSession
+    :rtype: ContextSession
+    """
+    return _session_factory()
+
+
+# pragmas of tuned SQLite profile, they are applied to every new connection
+SQLITE_TUNED_PRAGMAS = {
+    # readers don't block writer and writer doesn't block readers
+    'journal_mode': 'WAL',
+    # in WAL mode database can't be corrupted with NORMAL, only last transactions can be lost on power loss
+    'synchronous': 'NORMAL',
+    # negative value is size in KiB
+    'cache_size': -16000,
+    'mmap_size': 64 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    # wait for lock instead of failing with 'database is locked' at once
+    'busy_timeout': 5000,
+}
+
+
+def init_db_engine(connection_string, echo=False, sqlite_pragmas=None, pool_size=None, **kwargs):
+    """
+    :param sqlite_pragmas: pragmas for every new connection to SQLite database, e.g. SQLITE_TUNED_PRAGMAS
+    :type sqlite_pragmas: dict | None
+    :param pool_size: keep this number of opened connections to SQLite file database,
+                      by default connection is opened for every session
+    :type pool_size: int | None
+    """
+    global engine, _session_factory, _DBSession
+    url = make_url(connection_string)
+    if pool_size and url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:') \
+            and 'poolclass' not in kwargs:
+        # pooled connection is used by one thread at a time, but not always by the thread which opened it
+        connect_args = dict(kwargs.pop('connect_args', {}))
+        connect_args.setdefault('check_same_thread', False)
+        kwargs.update(poolclass=QueuePool, pool_size=pool_size, max_overflow=pool_size * 2,
+                      connect_args=connect_args)
     engine = create_engine(connection_string, echo=echo, **kwargs)
 
     # workaround for migrations on sqlite:
@@ -67,14 +118,165 @@ def init_db_engine(connection_string, echo=False, **kwargs):
         # disable pysqlite's emitting of the BEGIN statement entirely.
         # also stops it from emitting COMMIT before any DDL.
         dbapi_connection.isolation_level = None
+        if sqlite_pragmas and engine.dialect.name == 'sqlite':
+            cursor = dbapi_connection.cursor()
+            for name, value in sqlite_pragmas.items():
+                if value is not None:
+                    cursor.execute("PRAGMA {0}={1}".format(name, value))
+            cursor.close()
 
     @event.listens_for(engine, "begin")
     def do_begin(conn):
         # emit our own BEGIN
         conn.execute("BEGIN")
 
-    session_factory = sessionmaker(class_=ContextSession, bind=engine)
-    _DBSession = scoped_session(session_factory)
+    _session_factory = sessionmaker(class_=ContextSession, bind=engine)
+    _DBSession = scoped_session(_session_factory)
+
+
+def set_db_writer(db_writer):
+    """
+    :param db_writer: thread which executes all writes of db_write, or None to write from calling thread
+    :type db_writer: db_writer.DbWriter | None
+    """
+    global _db_writer
+    _db_writer = db_writer
+
+
+def db_write(func):
+    """
+    Execute write unit of work in DB transaction.
+    When DB writer is set, unit of work is executed in writer thread and calling thread waits for its result,
+    so calling thread must not hold opened DBSession which has written something: writer would wait for its lock.
+    Unit of work must use only the passed session, DBSession can't be opened in writer thread.
+
+    :param func: function which accepts session, it must not commit session
+    :return: result of func
+    """
+    db_writer = _db_writer
+    if db_writer is not None:
+        return db_writer.execute(func)
+    with DBSession() as db:
+        return func(db)
+
+
+def is_wal_enabled():
+    """
+    :return: True if SQLite database uses write-ahead log
+    :rtype: bool
+    """
+    if engine.dialect.name != 'sqlite':
+        return False
+    with engine.connect() as connection:
+        return connection.execute("PRAGMA journal_mode").scalar().lower() == 'wal'
+
+
+def enable_wal():
+    """
+    Switch SQLite database to write-ahead log, so readers from other processes don't block writer
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.connect() as connection:
+        connection.execute("PRAGMA journal_mode=WAL")
+
+
+# WAL requires shared memory of all processes which open database, it doesn't work over network
+NETWORK_FILESYSTEMS = {'nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', '9p', 'afs', 'ceph', 'glusterfs', 'lustre',
+                       'fuse.sshfs', 'fuse.glusterfs', 'fuse.cephfs'}
+
+
+def is_network_filesystem(path, mounts_path='/proc/mounts'):
+    """
+    :param path: path to database file, file may not exist yet
+    :param mounts_path: list of mounted file systems, only on Linux
+    :return: True if path is known to be on network file system
+    :rtype: bool
+    """
+    path = os.path.realpath(path)
+    if os.name == 'nt':
+        drive = os.path.splitdrive(path)[0]
+        if drive.startswith('\\\\'):
+            return True
+        import ctypes
+        drive_remote = 4
+        return ctypes.windll.kernel32.GetDriveTypeW(drive + '\\') == drive_remote
+    try:
+        with open(mounts_path) as mounts:
+            lines = mounts.readlines()
+    except (IOError, OSError):
+        return False
+    filesystem = None
+    mount_point_length = -1
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 3:
+            continue
+        mount_point = fields[1].replace('\\040', ' ')
+        if path != mount_point and not path.startswith(mount_point.rstrip('/') + '/'):
+            continue
+        # the most nested mount point contains the path
+        if len(mount_point) > mount_point_length:
+            filesystem = fields[2]
+            mount_point_length = len(mount_point)
+    return filesystem in NETWORK_FILESYSTEMS
+
+
+# value of PRAGMA auto_vacuum
+_AUTO_VACUUM_INCREMENTAL = 2
+
+
+def enable_incremental_vacuum():
+    """
+    Switch SQLite database to incremental auto vacuum, so compact_db can give free pages back to file system.
+    Switching requires full VACUUM, which locks whole database until it is rebuilt,
+    so it is done only on demand, when engine isn't running (see --enable-incremental-vacuum of server.py).
+
+    :return: number of reclaimed bytes
+    :rtype: int
+    """
+    if engine.dialect.name != 'sqlite':
+        return 0
+    with engine.connect() as connection:
+        page_size = connection.execute("PRAGMA page_size").scalar()
+        page_count = connection.execute("PRAGMA page_count").scalar()
+        if connection.execute("PRAGMA auto_vacuum").scalar() != _AUTO_VACUUM_INCREMENTAL:
+            connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        connection.execute("VACUUM")
+        reclaimed_pages = page_count - connection.execute("PRAGMA page_count").scalar()
+    return max(reclaimed_pages, 0) * page_size
+
+
+def compact_db():
+    """
+    Give free pages of SQLite database back to file system and update query planner statistics.
+    Free pages are given back only in incremental auto vacuum mode, it is never switched on here,
+    because it requires full VACUUM (see enable_incremental_vacuum).
+
+    :return: number of reclaimed bytes
+    :rtype: int
+    """
+    if engine.dialect.name != 'sqlite':
+        return 0
+    with engine.connect() as connection:
+        page_size = connection.execute("PRAGMA page_size").scalar()
+        page_count = connection.execute("PRAGMA page_count").scalar()
+        if connection.execute("PRAGMA auto_vacuum").scalar() == _AUTO_VACUUM_INCREMENTAL:
+            connection.execute("PRAGMA incremental_vacuum")
+        connection.execute("PRAGMA optimize")
+        reclaimed_pages = page_count - connection.execute("PRAGMA page_count").scalar()
+    return max(reclaimed_pages, 0) * page_size
+
+
+def get_db_free_pages():
+    """
+    :return: number of unused pages in SQLite database file
+    :rtype: int
+    """
+    if engine.dialect.name != 'sqlite':
+        return 0
+    with engine.connect() as connection:
+        return connection.execute("PRAGMA freelist_count").scalar()
 
 
 def create_db():
@@ -0,0 +1,137 @@
+import threading
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+import structlog
+
+from monitorrent.db import DBSession, new_session
+from monitorrent.utils import metrics
+
+log = structlog.get_logger()
+
+
+class DbWriter(threading.Thread):
+    """
+    The only thread which writes to DB.
+
+    SQLite allows one writer at a time, so engine and web threads put write units of work to the queue
+    instead of competing for the database lock. Writer takes all queued units (up to max_batch) and executes
+    them in one transaction, every unit in its own savepoint: failed unit is rolled back alone,
+    other units of the group are committed together.
+    Readers don't use writer and still read concurrently.
+
+    Writer requires WAL journal: in rollback journal commit waits until all readers release their locks,
+    and reader which waits for its write to be committed never releases its lock.
+    """
+    DEFAULT_MAX_BATCH = 100
+    # DBSession refuses to open scoped session in writer thread
+    is_db_writer = True
+
+    def __init__(self, max_batch=DEFAULT_MAX_BATCH):
+        super(DbWriter, self).__init__(name='db-writer')
+        self.daemon = True
+        self.max_batch = max_batch
+        self._queue = Queue()
+        self._session = None
+        self._stopped = False
+        # units are never queued after stop, so all queued units are executed before writer exits
+        self._lock = threading.Lock()
+
+    def submit(self, func):
+        """
+        :param func: function which accepts session, it must not commit session
+        :return: future with result of func, it is set after group transaction is committed
+        :rtype: Future
+        """
+        future = Future()
+        if threading.current_thread() is self:
+            # unit of work submitted another one, it is already in the writer transaction
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(func(self._session))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        with self._lock:
+            if not self._stopped and self.is_alive():
+                self._queue.put((func, future))
+                return future
+        # writer isn't running, write from calling thread
+        future.set_running_or_notify_cancel()
+        try:
+            with DBSession() as db:
+                future.set_result(func(db))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def execute(self, func):
+        """
+        Submit unit of work and wait until it is committed
+
+        :return: result of func
+        :raise: exception raised by func or by commit
+        """
+        return self.submit(func).result()
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            self._queue.put(None)
+
+    def run(self):
+        while True:
+            units = [self._queue.get()]
+            while len(units) < self.max_batch:
+                try:
+                    units.append(self._queue.get_nowait())
+                except Empty:
+                    break
+            stop = None in units
+            self._write([unit for unit in units if unit is not None])
+            if stop:
+                break
+        # units which were submitted together with stop
+        self._write(self._drain())
+
+    def _drain(self):
+        units = []
+        while True:
+            try:
+                unit = self._queue.get_nowait()
+            except Empty:
+                return units
+            if unit is not None:
+                units.append(unit)
+
+    # noinspection PyBroadException
+    def _write(self, units):
+        if len(units) == 0:
+            return
+        metrics.db_writer_batch_size.observe(len(units))
+        completed = []
+        try:
+            with new_session() as db:
+                self._session = db
+                for func, future in units:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    savepoint = db.begin_nested()
+                    try:
+                        result = func(db)
+                        savepoint.commit()
+                    except Exception as e:
+                        savepoint.rollback()
+                        future.set_exception(e)
+                        continue
+                    completed.append((future, result))
+        except Exception as e:
+            log.error("DB writer failed to commit units of work", count=len(completed), exception=str(e))
+            for future, _ in completed:
+                future.set_exception(e)
+            return
+        finally:
+            self._session = None
+
+        for future, result in completed:
+            future.set_result(result)
@@ -3,26 +3,46 @@ import sys
 import logging
 import six
 import threading
+import time
 import traceback
 
-from queue import PriorityQueue
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 import pytz
 import html
+import requests
 
+import json
 import structlog
-from sqlalchemy import Column, Integer, ForeignKey, Unicode, Enum, func
-from monitorrent.db import Base, DBSession, row2dict, UTCDateTime
+from sqlalchemy import Column, Integer, ForeignKey, Unicode, UnicodeText, Enum, Boolean, MetaData, Table, func, \
+    and_, or_
+from monitorrent.db import Base, DBSession, row2dict, UTCDateTime, db_write
+from monitorrent.upgrade_manager import add_upgrade
 from monitorrent.utils.timers import timer
+from monitorrent.utils.circuit_breaker import circuit_breakers, CircuitBreakerOpen
+from monitorrent.utils.tracing import tracer
+from monitorrent.utils.pubsub import execute_events
+from monitorrent.execute_log_archive import ExecuteLogArchive, ExecuteLogTraceback, ExecuteLogArchiveTraceback, \
+    pack_log_entries, unpack_log_entries
+from monitorrent.utils.deadline import Deadline, DeadlineExceeded, Cancelled, deadline_scope, set_current_deadline
+from monitorrent.utils import metrics
 from monitorrent.plugins.status import Status
 
 log = structlog.get_logger()
 
 
 class Logger(object):
-    def started(self, start_time):
+    def started(self, start_time, resumed_from_id=None):
+        """
+        """
+
+    def topics_planned(self, topic_ids):
+        """
+        """
+
+    def topic_finished(self, topic_id):
         """
         """
 
@@ -42,6 +62,10 @@ class Logger(object):
         """
         """
 
+    def progress(self, value):
+        """
+        """
+
 
 def _clamp(value, min_value=0, max_value=100):
     return max(min_value, min(value, max_value))
@@ -61,18 +85,33 @@ class Engine(object):
         self.trackers_manager = trackers_manager
         self.clients_manager = clients_manager
         self.notifier_manager = notifier_manager
+        # torrent clients don't like concurrent adds, so find/add/remove sequence is serialized
+        self._add_torrent_lock = threading.Lock()
+        # what this execute is going to check, used to merge execute requests received while it runs
+        self.execute_ids = None
+        self.scheduled = False
+        self._planned_ids = None
+        self._started_ids = set()
+        # started topics which check failed, they are rechecked on the next execute
+        self._failed_ids = set()
+        self._planned_lock = threading.Lock()
+        # execute deadline is created on execute start, cancel can be requested before it
+        self.deadline = Deadline(u'Execute')
+        self.topic_timeout = None
 
     def info(self, message):
         self.log.info(message)
 
     def failed(self, message, exc_type=None, exc_value=None, exc_tb=None):
+        metrics.failures.inc()
         self.log.failed(message, exc_type, exc_value, exc_tb)
 
     def downloaded(self, message, torrent):
+        metrics.downloads.inc()
         self.log.downloaded(message, torrent)
 
     def update_progress(self, progress):
-        pass
+        self.log.progress(progress)
 
     def start(self, trackers_count, notifier_manager_execute):
         return EngineTrackers(trackers_count, notifier_manager_execute, self)
@@ -85,6 +124,10 @@ class Engine(object):
         :type topic_settings: clients.TopicSettings | None
         :rtype: datetime
         """
+        with self._add_torrent_lock:
+            return self._add_torrent(filename, torrent, old_hash, topic_settings)
+
+    def _add_torrent(self, filename, torrent, old_hash, topic_settings):
         existing_torrent = self.clients_manager.find_torrent(torrent.info_hash)
         if existing_torrent:
             self.info(u"Torrent <b>{0}</b> already added".format(filename))
@@ -106,29 +149,148 @@ class Engine(object):
             raise Exception(u'Torrent {0} wasn\'t added'.format(filename))
         return existing_torrent['date_added']
 
-    def execute(self, ids):
-        tracker_settings = self.settings_manager.tracker_settings
+    def execute(self, ids, scheduled=False, base_interval=None):
+        """
+        :param ids: topic ids to execute, all active topics if None and execute is not scheduled
+        :param scheduled: execute topics which next check time is come and topics from ids
+        :param base_interval: engine execute interval in seconds,
+                              if set check schedule of executed topics will be updated
+        """
+        with tracer.span('execute', ids=ids, scheduled=scheduled):
+            self._execute(ids, scheduled, base_interval)
+
+    def _execute(self, ids, scheduled, base_interval):
+        self.execute_ids = ids
+        self.scheduled = scheduled
+        # all settings of one execute are read from the same snapshot
+        settings = self.settings_manager.get_snapshot_settings()
+        with self._planned_lock:
+            cancelled = self.deadline.cancelled
+            self.deadline = Deadline(u'Execute', settings.execute_timeout)
+            self.deadline.cancelled = cancelled
+        self.topic_timeout = settings.topic_timeout
+        tracker_settings = settings.tracker_settings
         trackers = list(self.trackers_manager.trackers.items())
+        checked_at = datetime.now(pytz.utc)
 
         execute_trackers = dict()
         tracker_topics = list()
-        for name, tracker in trackers:
-            topics = tracker.get_topics(ids)
-            if len(topics) > 0:
-                execute_trackers[name] = len(topics)
-                tracker_topics.append((name, tracker, topics))
+        with tracer.span('get_topics'):
+            for name, tracker in trackers:
+                topics = self._get_topics(tracker, ids, scheduled)
+                if len(topics) > 0:
+                    execute_trackers[name] = len(topics)
+                    tracker_topics.append((name, tracker, topics))
+
+        with self._planned_lock:
+            self._planned_ids = set(topic.id for _, _, topics in tracker_topics for topic in topics)
 
         if len(tracker_topics) == 0:
             return
 
+        self.log.topics_planned(sorted(self._planned_ids))
+
+        trackers_concurrency = 1
+        if len(tracker_topics) > 1:
+            trackers_concurrency = min(settings.trackers_concurrency, len(tracker_topics))
+
         log.info("Tracker topics mapping constructed", mapping=tracker_topics)
         with self.notifier_manager.execute() as notifier_manager_execute:
             with self.start(execute_trackers, notifier_manager_execute) as engine_trackers:
+                if trackers_concurrency <= 1:
+                    for name, tracker, topics in tracker_topics:
+                        self._execute_tracker(engine_trackers, tracker_settings, name, tracker, topics)
+                else:
+                    with ThreadPoolExecutor(max_workers=trackers_concurrency,
+                                            thread_name_prefix='trackers') as executor:
+                        futures = [executor.submit(self._execute_tracker, engine_trackers, tracker_settings,
+                                                   name, tracker, topics)
+                                   for name, tracker, topics in tracker_topics]
+                        for future in futures:
+                            future.result()
+
+        if base_interval is not None:
+            with tracer.span('update_check_schedule'):
+                with self._planned_lock:
+                    failed_ids = frozenset(self._failed_ids)
                 for name, tracker, topics in tracker_topics:
-                    tracker.init(tracker_settings)
-                    with engine_trackers.start(name) as engine_tracker:
-                        log.info("Executing tracker", name=name, topics=topics)
-                        tracker.execute(topics, engine_tracker)
+                    if self.is_stopped():
+                        # topics skipped because of cancel or deadline will be checked on the next execute
+                        topics = [topic for topic in topics if topic.id in self._started_ids]
+                    tracker.update_check_schedule(topics, checked_at, base_interval, failed_ids)
+
+    def cancel(self):
+        """
+        Stop execute cooperatively: topics, which are already checking, will be finished, all others skipped
+        """
+        with self._planned_lock:
+            self.deadline.cancel()
+        self.info(u"Execute cancel requested")
+
+    def is_stopped(self):
+        """
+        :return: True if execute was cancelled or its deadline is exceeded
+        :rtype: bool
+        """
+        try:
+            self.deadline.check()
+            return False
+        except (Cancelled, DeadlineExceeded):
+            return True
+
+    def create_topic_deadline(self):
+        """
+        :rtype: Deadline
+        """
+        return Deadline(u'Topic', self.topic_timeout, parent=self.deadline)
+
+    def topic_started(self, topic_id):
+        with self._planned_lock:
+            self._started_ids.add(topic_id)
+
+    def topic_failed(self, topic_id):
+        with self._planned_lock:
+            self._failed_ids.add(topic_id)
+
+    def topic_finished(self, topic_id):
+        self.log.topic_finished(topic_id)
+
+    def get_remaining_ids(self):
+        """
+        :return: ids of topics which this execute is going to check, but didn't start yet,
+                 None if topics weren't selected yet
+        :rtype: set | None
+        """
+        with self._planned_lock:
+            if self._planned_ids is None:
+                return None
+            return self._planned_ids - self._started_ids
+
+    def get_started_ids(self):
+        """
+        :return: ids of topics which this execute already started to check
+        :rtype: set
+        """
+        with self._planned_lock:
+            return set(self._started_ids)
+
+    @staticmethod
+    def _get_topics(tracker, ids, scheduled):
+        if not scheduled:
+            return tracker.get_topics(ids)
+        topics = tracker.get_topics(None, due_only=True)
+        if ids:
+            due_ids = set(topic.id for topic in topics)
+            topics = topics + [topic for topic in tracker.get_topics(ids) if topic.id not in due_ids]
+        return topics
+
+    @staticmethod
+    def _execute_tracker(engine_trackers, tracker_settings, name, tracker, topics):
+        tracker.init(tracker_settings)
+        with engine_trackers.start(name, topics) as engine_tracker, \
+                deadline_scope(engine_trackers.engine.deadline):
+            log.info("Executing tracker", name=name, topics=topics)
+            tracker.execute(topics, engine_tracker)
 
 
 class EngineExecute(object):
@@ -173,22 +335,28 @@ class EngineTrackers(EngineExecute):
         super(EngineTrackers, self).__init__(engine, notifier_manager_execute)
 
         self.trackers_count = trackers_count
-        self.done_topics = 0
         self.count_topics = sum(trackers_count.values())
 
-        self.tracker_topics_count = 0
+        # trackers can be executed in parallel, so progress is tracked per tracker
+        self.trackers_progress = dict()
+        self._progress_lock = threading.Lock()
 
-    def start(self, tracker):
-        self.tracker_topics_count = self.trackers_count.pop(tracker)
-        self.update_progress(0)
-        engine_tracker = EngineTracker(tracker, self, self.notifier_manager_execute, self.engine)
+    def start(self, tracker, topics=None):
+        engine_tracker = EngineTracker(tracker, self, self.notifier_manager_execute, self.engine, topics)
+        self.update_tracker_progress(tracker, 0)
         return engine_tracker
 
+    def update_tracker_progress(self, tracker, progress):
+        with self._progress_lock:
+            self.trackers_progress[tracker] = _clamp(progress)
+            if self.count_topics == 0:
+                return
+            done_progress = sum(progress * self.trackers_count.get(name, 0)
+                                for name, progress in self.trackers_progress.items())
+            self.engine.update_progress(done_progress / self.count_topics)
+
     def update_progress(self, progress):
-        progress = _clamp(progress)
-        done_progress = 100 * self.done_topics / self.count_topics
-        current_progress = progress * self.tracker_topics_count / self.count_topics
-        self.engine.update_progress(done_progress + current_progress)
+        self.engine.update_progress(_clamp(progress))
 
     def __enter__(self):
         self.info(u"Begin execute")
@@ -200,33 +368,37 @@ class EngineTrackers(EngineExecute):
         else:
             self.info(u"End execute")
 
-        self.done_topics += self.tracker_topics_count
         self.update_progress(100)
         return True
 
 
 class EngineTracker(EngineExecute):
-    def __init__(self, tracker, engine_trackers, notifier_manager_execute, engine):
+    def __init__(self, tracker, engine_trackers, notifier_manager_execute, engine, topics=None):
         """
         :type tracker: str
         :type engine_trackers: EngineTrackers
         :type notifier_manager_execute: plugin_managers.NotifierManagerExecute
         :type engine: Engine
+        :param topics: topics passed to tracker execute
+        :type topics: list | None
         """
         super(EngineTracker, self).__init__(engine, notifier_manager_execute)
 
         self.tracker = tracker
         self.engine_trackers = engine_trackers
+        self.topics = topics
         self.count = 0
+        self.span = None
 
     def start(self, count):
-        return EngineTopics(count, self, self.notifier_manager_execute, self.engine)
+        return EngineTopics(count, self, self.notifier_manager_execute, self.engine, self.topics)
 
     def update_progress(self, progress):
-        progress = _clamp(progress)
-        self.engine_trackers.update_progress(progress)
+        self.engine_trackers.update_tracker_progress(self.tracker, _clamp(progress))
 
     def __enter__(self):
+        self.span = tracer.span('tracker', 'tracker', tracker=self.tracker,
+                                topics=len(self.topics) if self.topics is not None else None)
         self.info(u"Start checking for <b>{0}</b>".format(self.tracker))
         return self
 
@@ -236,25 +408,59 @@ class EngineTracker(EngineExecute):
                         exc_type, exc_val, exc_tb)
         else:
             self.info(u"End checking for <b>{0}</b>".format(self.tracker))
+        if self.span is not None:
+            self.span.end(exc_val)
         return True
 
 
 class EngineTopics(EngineExecute):
-    def __init__(self, count, engine_tracker, notifier_manager_execute, engine):
+    def __init__(self, count, engine_tracker, notifier_manager_execute, engine, topics=None):
         """
         :type count: int
         :type engine_tracker: EngineTracker
         :type notifier_manager_execute: plugin_managers.NotifierManagerExecute
         :type engine: Engine
+        :param topics: topics passed to tracker execute, index of started topic is index in this list
+        :type topics: list | None
         """
         super(EngineTopics, self).__init__(engine, notifier_manager_execute)
         self.count = count
         self.engine_tracker = engine_tracker
+        self.topics = topics
+        # topics can be started from several threads, so progress is counted by started topics
+        self.started_count = 0
+        self._started_lock = threading.Lock()
+        self.circuit_breaker = circuit_breakers.get(engine_tracker.tracker)
+        self.circuit_breaker_open = False
+        # Cancelled or DeadlineExceeded exception which stopped execute
+        self.stopped_by = None
 
     def start(self, index, topic_name):
-        progress = index * 100 / self.count
+        """
+        :raises CircuitBreakerOpen: if tracker is unavailable, all remaining topics have to be skipped
+        :raises Cancelled: if execute was cancelled, all remaining topics have to be skipped
+        :raises DeadlineExceeded: if execute deadline is exceeded, all remaining topics have to be skipped
+        """
+        try:
+            self.engine.deadline.check()
+        except (Cancelled, DeadlineExceeded) as e:
+            self.stopped_by = e
+            raise
+        try:
+            self.circuit_breaker.check()
+        except CircuitBreakerOpen:
+            self.circuit_breaker_open = True
+            raise
+        with self._started_lock:
+            progress = self.started_count * 100 / self.count
+            self.started_count += 1
+        topic_id = None
+        if self.topics is not None and 0 <= index < len(self.topics):
+            topic_id = self.topics[index].id
+            self.engine.topic_started(topic_id)
         self.update_progress(progress)
-        return EngineTopic(topic_name, self, self.notifier_manager_execute, self.engine)
+        return EngineTopic(topic_name, self, self.notifier_manager_execute, self.engine, topic_id,
+                           self.engine.create_topic_deadline())
 
     def update_progress(self, progress):
         self.engine_tracker.update_progress(_clamp(progress))
@@ -263,43 +469,95 @@ class EngineTopics(EngineExecute):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_val is not None:
+        if self.circuit_breaker_open:
+            self.engine_tracker.failed(u"<b>{0}</b> is unavailable, skipped {1} topic(s)"
+                                       .format(self.engine_tracker.tracker, self.count - self.started_count))
+        if self.stopped_by is not None:
+            log = self.engine_tracker.info if isinstance(self.stopped_by, Cancelled) else self.engine_tracker.failed
+            log(u"{0}, skipped {1} topic(s) of <b>{2}</b>"
+                .format(self.stopped_by, self.count - self.started_count, self.engine_tracker.tracker))
+        if exc_val is not None and not isinstance(exc_val, (CircuitBreakerOpen, Cancelled, DeadlineExceeded)):
             self.failed(u"Failed while checking topics", exc_type, exc_val, exc_tb)
         return True
 
 
 class EngineTopic(EngineExecute):
-    def __init__(self, topic_name, engine_topics, notifier_manager_execute, engine):
+    def __init__(self, topic_name, engine_topics, notifier_manager_execute, engine, topic_id=None, deadline=None):
         """
         :type topic_name: str
         :type engine_topics: EngineTopics
         :type notifier_manager_execute: plugin_managers.NotifierManagerExecute
         :type engine: Engine
+        :type topic_id: int | None
+        :type deadline: Deadline | None
         """
         super(EngineTopic, self).__init__(engine, notifier_manager_execute)
         self.topic_name = topic_name
         self.engine_topics = engine_topics
+        self.topic_id = topic_id
+        self.deadline = deadline
+        self.span = None
+        self._deadline_scope = None
+        self._failed = False
 
     def start(self, count):
         return EngineDownloads(count, self, self.notifier_manager_execute, self.engine)
 
+    def failed(self, message, exc_type=None, exc_value=None, exc_tb=None):
+        self._failed = True
+        super(EngineTopic, self).failed(message, exc_type, exc_value, exc_tb)
+
     def status_changed(self, old_status, new_status):
         message = u"{0} status changed: {1}".format(self.topic_name, new_status)
         self.notify(message, self.notifier_manager_execute.notify_status_changed)
+        if new_status != Status.Ok:
+            self._failed = True
         log = self.engine.failed if new_status != Status.Ok else self.engine.info
         log(message)
 
     def update_progress(self, progress):
         self.engine_topics.update_progress(_clamp(progress))
 
-    def __enter__(self):
+    def begin(self):
+        """
+        Start topic check without setting deadline of the current thread,
+        used when topic is checked by several threads
+        """
+        self.span = tracer.span('topic', 'tracker', topic=self.topic_name, topic_id=self.topic_id)
         self.info(u"Check for changes <b>{0}</b>".format(self.topic_name))
         self.update_progress(0)
         return self
 
+    def __enter__(self):
+        self.begin()
+        self._deadline_scope = (threading.get_ident(), set_current_deadline(self.deadline))
+        return self
+
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_val is not None:
+        if self._deadline_scope is not None:
+            thread_id, previous_deadline = self._deadline_scope
+            if thread_id == threading.get_ident():
+                set_current_deadline(previous_deadline)
+        if isinstance(exc_val, DeadlineExceeded):
+            self.failed(u"Check for <b>{0}</b> was abandoned: {1}".format(self.topic_name, exc_val))
+        elif isinstance(exc_val, Cancelled):
+            self.info(u"Check for <b>{0}</b> was cancelled".format(self.topic_name))
+        elif exc_val is not None:
             self.failed(u"Exception while execute topic", exc_type, exc_val, exc_tb)
+        if isinstance(exc_val, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            self.engine_topics.circuit_breaker.record_failure()
+        elif exc_val is None:
+            self.engine_topics.circuit_breaker.record_success()
+        else:
+            # cancelled, abandoned or failed check doesn't tell that tracker is available again
+            self.engine_topics.circuit_breaker.record_ignored()
+        metrics.topics_checked.inc(tracker=self.engine_topics.engine_tracker.tracker)
+        if self.topic_id is not None:
+            if self._failed or exc_val is not None:
+                self.engine.topic_failed(self.topic_id)
+            self.engine.topic_finished(self.topic_id)
+        if self.span is not None:
+            self.span.end(exc_val)
         self.update_progress(100)
         return True
 
@@ -319,7 +577,8 @@ class EngineDownloads(EngineExecute):
     def add_torrent(self, index, filename, torrent, old_hash, topic_settings):
         progress = index * 100 // self.count
         self.engine_topic.update_progress(progress)
-        return self.engine.add_torrent(filename, torrent, old_hash, topic_settings)
+        with tracer.span('add_torrent', filename=filename):
+            return self.engine.add_torrent(filename, torrent, old_hash, topic_settings)
 
     def __enter__(self):
         return self
@@ -343,36 +602,115 @@ class Execute(Base):
 
     id = Column(Integer, primary_key=True)
     start_time = Column(UTCDateTime, nullable=False)
-    finish_time = Column(UTCDateTime, nullable=False)
+    finish_time = Column(UTCDateTime, nullable=False, index=True)
     status = Column(Enum('finished', 'failed'), nullable=False)
     failed_message = Column(Unicode, nullable=True)
+    resumed_from_id = Column(ForeignKey('execute.id'), nullable=True)
+    # counters of execute_log entries, updated when entries are written
+    log_count = Column(Integer, nullable=False, default=0, server_default='0')
+    downloaded_count = Column(Integer, nullable=False, default=0, server_default='0')
+    failed_count = Column(Integer, nullable=False, default=0, server_default='0')
 
 
 class ExecuteLog(Base):
     __tablename__ = 'execute_log'
 
     id = Column(Integer, primary_key=True)
-    execute_id = Column(ForeignKey('execute.id'))
+    execute_id = Column(ForeignKey('execute.id'), index=True)
     time = Column(UTCDateTime, nullable=False)
     message = Column(Unicode, nullable=False)
-    level = Column(Enum('info', 'warning', 'failed', 'downloaded'), nullable=False)
+    level = Column(Enum('info', 'warning', 'failed', 'downloaded'), nullable=False, index=True)
+
+
+class ExecuteTrace(Base):
+    __tablename__ = 'execute_trace'
+
+    execute_id = Column(ForeignKey('execute.id'), primary_key=True)
+    trace = Column(UnicodeText, nullable=False)
+
+
+class ExecuteTopic(Base):
+    """
+    Checkpoint of topic planned to be checked by execute, removed when execute is finished.
+    Checkpoints left after restart belong to interrupted execute.
+    """
+    __tablename__ = 'execute_topic'
+
+    id = Column(Integer, primary_key=True)
+    execute_id = Column(ForeignKey('execute.id'), nullable=False, index=True)
+    topic_id = Column(Integer, nullable=False)
+    done = Column(Boolean, nullable=False, default=False)
+
+
+# noinspection PyUnusedLocal
+def upgrade(engine, operations_factory):
+    if not engine.dialect.has_table(engine.connect(), Execute.__tablename__):
+        return
+    version = get_current_version(engine)
+    if version == 0:
+        with operations_factory() as operations:
+            resumed_from_id_column = Column('resumed_from_id', Integer, nullable=True)
+            operations.add_column(Execute.__tablename__, resumed_from_id_column)
+        version = 1
+    if version == 1:
+        with operations_factory() as operations:
+            for name in ['log_count', 'downloaded_count', 'failed_count']:
+                operations.add_column(Execute.__tablename__,
+                                      Column(name, Integer, nullable=False, server_default='0'))
+            operations.execute(u"""
+                UPDATE execute SET
+                  log_count = (SELECT count(*) FROM execute_log l WHERE l.execute_id = execute.id),
+                  downloaded_count = (SELECT count(*) FROM execute_log l
+                                      WHERE l.execute_id = execute.id AND l.level = 'downloaded'),
+                  failed_count = (SELECT count(*) FROM execute_log l
+                                  WHERE l.execute_id = execute.id AND l.level = 'failed')
+            """)
+            operations.create_index('ix_execute_finish_time', Execute.__tablename__, ['finish_time'])
+            operations.create_index('ix_execute_log_execute_id', ExecuteLog.__tablename__, ['execute_id'])
+            operations.create_index('ix_execute_log_level', ExecuteLog.__tablename__, ['level'])
+        version = 2
+
+
+def get_current_version(engine):
+    m = MetaData(engine)
+    execute = Table(Execute.__tablename__, m, autoload=True)
+    if 'resumed_from_id' not in execute.columns:
+        return 0
+    if 'log_count' not in execute.columns:
+        return 1
+    return 2
+
+
+add_upgrade(upgrade)
 
 
 class DbLoggerWrapper(Logger):
-    def __init__(self, log_manager, settings_manager=None):
+    def __init__(self, log_manager, settings_manager=None, log_maintenance=None):
         """
         :type log_manager: ExecuteLogManager
         :type settings_manager: settings_manager.SettingsManager | None
+        :param log_maintenance: removes old logs in background, otherwise they are removed after every execute
+        :type log_maintenance: log_maintenance.LogMaintenance | None
         """
         self._log_manager = log_manager
         self._settings_manager = settings_manager
+        self._log_maintenance = log_maintenance
+
+    def started(self, start_time, resumed_from_id=None):
+        trace = self._settings_manager is not None and self._settings_manager.execute_trace_enabled
+        self._log_manager.started(start_time, resumed_from_id, trace)
+
+    def topics_planned(self, topic_ids):
+        self._log_manager.topics_planned(topic_ids)
 
-    def started(self, start_time):
-        self._log_manager.started(start_time)
+    def topic_finished(self, topic_id):
+        self._log_manager.topic_finished(topic_id)
 
     def finished(self, finish_time, exception):
         self._log_manager.finished(finish_time, exception)
-        if self._settings_manager:
+        if self._log_maintenance:
+            self._log_maintenance.wake()
+        elif self._settings_manager:
             self._log_manager.remove_old_entries(self._settings_manager.remove_logs_interval)
 
     def info(self, message):
@@ -390,35 +728,118 @@ class DbLoggerWrapper(Logger):
     def downloaded(self, message, torrent):
         self._log_manager.log_entry(message, 'downloaded')
 
+    def progress(self, value):
+        self._log_manager.progress(value)
+
 
 # noinspection PyMethodMayBeStatic
 class ExecuteLogManager(object):
+    """
+    Log entries and finished topics of running execute are kept in memory and written to DB in batches:
+    when buffer is full, when flush_interval passed since first buffered entry and when execute is finished.
+    Timer flushes buffer every flush_interval too, so entries of quiet topic don't stay in memory.
+    Topic is marked as done in the same transaction as its log entries, so resumed execute never skips
+    topic which log entries are lost.
+    Buffered entries already have ids and are returned by readers together with stored ones.
+    Ids are reserved on execute start, running engine has to be the only writer of execute log.
+    If other process wrote entries since then, buffered entries are renumbered after them on flush.
+
+    Execute start and finish, log entries and progress are published to events channel as they happen.
+    """
     _execute_id = None
+    DEFAULT_FLUSH_SIZE = 50
+    DEFAULT_FLUSH_INTERVAL = 2
 
-    def started(self, start_time):
+    def __init__(self, flush_size=DEFAULT_FLUSH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL, clock=time.monotonic,
+                 events=None):
+        """
+        :param flush_size: max number of buffered log entries
+        :param flush_interval: max seconds log entry can stay in buffer
+        :type events: pubsub.EventChannel | None
+        """
+        self.events = events if events is not None else execute_events
+        self._progress = None
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._clock = clock
+        self._buffer = []
+        self._done_topics = []
+        # entries which are being written by flush, readers return them until they are committed
+        self._flushing = []
+        self._buffered_at = None
+        self._next_log_id = None
+        self._stop_flush_timer = None
+        self._buffer_lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+
+    def started(self, start_time, resumed_from_id=None, trace=False):
+        """
+        :param trace: collect timeline trace of execute, it is stored when execute is finished
+        """
         if self._execute_id is not None:
             raise Exception('Execute already in progress')
 
-        with DBSession() as db:
+        def start(db):
             # default values for not finished execute is failed and finish_time equal to start_time
-            execute = Execute(start_time=start_time, finish_time=start_time, status='failed')
+            execute = Execute(start_time=start_time, finish_time=start_time, status='failed',
+                              resumed_from_id=resumed_from_id)
             db.add(execute)
-            db.commit()
-            self._execute_id = execute.id
+            db.flush()
+            # engine is the only writer of execute log, so ids can be assigned before entries are written
+            return execute.id, (db.query(func.max(ExecuteLog.id)).scalar() or 0) + 1
+        self._execute_id, self._next_log_id = db_write(start)
+        self._stop_flush_timer = timer(self.flush_interval, self._flush_by_timer)
+
+        if trace:
+            tracer.start()
+        self._progress = None
+        self.events.publish('started', {'execute_id': self._execute_id, 'start_time': start_time})
 
     def finished(self, finish_time, exception):
         if self._execute_id is None:
             raise Exception('Execute is not started')
 
-        with DBSession() as db:
+        self._stop_flush_timer()
+        self._stop_flush_timer = None
+        self.flush()
+        trace = tracer.stop()
+        execute_id = self._execute_id
+
+        def finish(db):
+            if trace is not None:
+                db.add(ExecuteTrace(execute_id=execute_id, trace=json.dumps(trace, default=str)))
             # noinspection PyArgumentList
-            execute = db.query(Execute).filter(Execute.id == self._execute_id).first()
+            execute = db.query(Execute).filter(Execute.id == execute_id).first()
             execute.status = 'finished' if exception is None else 'failed'
             execute.finish_time = finish_time
             if exception is not None:
                 execute.failed_message = html.escape(str(exception))
+            # execute is completed, there is nothing to resume
+            db.query(ExecuteTopic).filter(ExecuteTopic.execute_id == execute_id) \
+                .delete(synchronize_session=False)
+        db_write(finish)
 
         self._execute_id = None
+        self.events.publish('finished', {'execute_id': execute_id, 'finish_time': finish_time,
+                                         'status': 'finished' if exception is None else 'failed'})
+
+    def topics_planned(self, topic_ids):
+        if self._execute_id is None:
+            raise Exception('Execute is not started')
+
+        mappings = [{'execute_id': self._execute_id, 'topic_id': topic_id, 'done': False} for topic_id in topic_ids]
+        db_write(lambda db: db.bulk_insert_mappings(ExecuteTopic, mappings))
+
+    def topic_finished(self, topic_id):
+        if self._execute_id is None:
+            raise Exception('Execute is not started')
+
+        # topic is marked as done with the next batch of log entries
+        with self._buffer_lock:
+            self._done_topics.append({'execute_id': self._execute_id, 'topic_id': topic_id})
+            flush = self._is_flush_required()
+        if flush:
+            self.flush()
 
     def log_entry(self, message, level):
         if self._execute_id is None:
@@ -427,34 +848,155 @@ class ExecuteLogManager(object):
         self._log_entry(message, level)
 
     def _log_entry(self, message, level):
-        with DBSession() as db:
-            execute_log = ExecuteLog(execute_id=self._execute_id, time=datetime.now(pytz.utc),
-                                     message=message, level=level)
-            db.add(execute_log)
+        with self._buffer_lock:
+            entry = {'id': self._next_log_id, 'execute_id': self._execute_id,
+                     'time': datetime.now(pytz.utc), 'message': message, 'level': level}
+            self._buffer.append(entry)
+            self._next_log_id += 1
+            self.events.publish('log', dict(entry))
+            flush = self._is_flush_required()
+        if flush:
+            self.flush()
+
+    def _is_flush_required(self):
+        buffered = len(self._buffer) + len(self._done_topics)
+        if self._buffered_at is None:
+            self._buffered_at = self._clock()
+        return buffered >= self.flush_size or self._clock() - self._buffered_at >= self.flush_interval
 
-    def get_log_entries(self, skip, take):
+    # noinspection PyBroadException
+    def _flush_by_timer(self):
+        try:
+            self.flush()
+        except Exception as e:
+            # entries are kept in buffer and written by the next flush
+            log.error("Failed to flush execute log", exception=str(e))
+
+    def _renumber_buffer(self, flushing, max_id):
+        """
+        Move ids of entries which are being written and still buffered after max_id
+        """
+        with self._buffer_lock:
+            shift = max_id + 1 - flushing[0]['id']
+            for entry in flushing + self._buffer:
+                entry['id'] += shift
+            self._next_log_id += shift
+        log.error("Execute log was written by other process, buffered entries are renumbered", shift=shift)
+
+    def progress(self, value):
+        """
+        :param value: execute progress in percents
+        """
+        execute_id = self._execute_id
+        if execute_id is None or value == self._progress:
+            return
+        self._progress = value
+        self.events.publish('progress', {'execute_id': execute_id, 'progress': value})
+
+    def flush(self):
+        """
+        Write buffered log entries and finished topics to DB
+        """
+        with self._flush_lock:
+            with self._buffer_lock:
+                buffer = self._buffer
+                done_topics = self._done_topics
+                if len(buffer) == 0 and len(done_topics) == 0:
+                    return
+                self._buffer = []
+                self._done_topics = []
+                self._buffered_at = None
+                self._flushing = buffer
+
+            def write(db):
+                if len(buffer) > 0:
+                    max_id = db.query(func.max(ExecuteLog.id)).scalar() or 0
+                    if buffer[0]['id'] <= max_id:
+                        self._renumber_buffer(buffer, max_id)
+                    db.bulk_insert_mappings(ExecuteLog, buffer)
+                for execute_id in set(e['execute_id'] for e in buffer):
+                    entries = [e for e in buffer if e['execute_id'] == execute_id]
+                    db.query(Execute).filter(Execute.id == execute_id).update({
+                        Execute.log_count: Execute.log_count + len(entries),
+                        Execute.downloaded_count: Execute.downloaded_count + self._count(entries, 'downloaded'),
+                        Execute.failed_count: Execute.failed_count + self._count(entries, 'failed'),
+                    }, synchronize_session=False)
+                for execute_id in set(t['execute_id'] for t in done_topics):
+                    topic_ids = [t['topic_id'] for t in done_topics if t['execute_id'] == execute_id]
+                    db.query(ExecuteTopic) \
+                        .filter(ExecuteTopic.execute_id == execute_id, ExecuteTopic.topic_id.in_(topic_ids)) \
+                        .update({ExecuteTopic.done: True}, synchronize_session=False)
+
+            try:
+                db_write(write)
+            except Exception:
+                # keep not stored entries for the next flush
+                with self._buffer_lock:
+                    self._buffer = buffer + self._buffer
+                    self._done_topics = done_topics + self._done_topics
+                    self._buffered_at = self._clock()
+                    # readers mustn't see entries both in buffer and in flushing
+                    self._flushing = []
+                raise
+            finally:
+                with self._buffer_lock:
+                    self._flushing = []
+
+    @staticmethod
+    def _count(entries, level):
+        return sum(1 for e in entries if e['level'] == level)
+
+    def _copy_buffered_entries(self):
+        """
+        :return: entries which aren't committed yet, DB is queried after buffer lock is released
+        :rtype: list[dict]
+        """
+        with self._buffer_lock:
+            return self._flushing + self._buffer
+
+    @staticmethod
+    def _get_buffered_entries(buffered, execute_id, last_stored_id, after=None):
+        """
+        :param buffered: entries copied by _copy_buffered_entries
+        :param last_stored_id: max id of entries read from DB, copied entries can be committed by flush since
+                               then and they are already read from DB, log ids are sequential and flush keeps order
+        """
+        min_id = max(last_stored_id or 0, after or 0)
+        return [dict(e) for e in buffered if e['execute_id'] == execute_id and e['id'] > min_id]
+
+    def get_log_entries(self, skip, take, before=None):
+        """
+        :param skip: number of executes to skip, prefer before for next pages
+        :param take: max number of executes to return
+        :param before: id of the last execute on previous page, only older executes are returned
+        :return: executes ordered from newest to oldest and total count of executes
+        """
+        buffered = self._copy_buffered_entries()
         with DBSession() as db:
-            downloaded_sub_query = db.query(ExecuteLog.execute_id, func.count(ExecuteLog.id).label('count')) \
-                .group_by(ExecuteLog.execute_id, ExecuteLog.level) \
-                .having(ExecuteLog.level == 'downloaded') \
-                .subquery()
-            failed_sub_query = db.query(ExecuteLog.execute_id, func.count(ExecuteLog.id).label('count')) \
-                .group_by(ExecuteLog.execute_id, ExecuteLog.level) \
-                .having(ExecuteLog.level == 'failed') \
-                .subquery()
-
-            result_query = db.query(Execute, downloaded_sub_query.c.count, failed_sub_query.c.count) \
-                .outerjoin(failed_sub_query, Execute.id == failed_sub_query.c.execute_id) \
-                .outerjoin(downloaded_sub_query, Execute.id == downloaded_sub_query.c.execute_id) \
-                .order_by(Execute.finish_time.desc()) \
+            result_query = db.query(Execute)
+            if before is not None:
+                before_finish_time = db.query(Execute.finish_time).filter(Execute.id == before).scalar()
+                if before_finish_time is not None:
+                    result_query = result_query.filter(or_(Execute.finish_time < before_finish_time,
+                                                           and_(Execute.finish_time == before_finish_time,
+                                                                Execute.id < before)))
+                else:
+                    result_query = result_query.filter(Execute.id < before)
+            result_query = result_query \
+                .order_by(Execute.finish_time.desc(), Execute.id.desc()) \
                 .offset(skip) \
                 .limit(take)
 
+            executes = result_query.all()
+            # counters of executes already include entries stored before this
+            last_stored_id = db.query(func.max(ExecuteLog.id)).scalar()
+
             result = []
-            for execute, downloads, fails in result_query.all():
+            for execute in executes:
                 execute_result = row2dict(execute)
-                execute_result['downloaded'] = downloads or 0
-                execute_result['failed'] = fails or 0
+                execute_buffered = self._get_buffered_entries(buffered, execute.id, last_stored_id)
+                execute_result['downloaded'] = execute.downloaded_count + self._count(execute_buffered, 'downloaded')
+                execute_result['failed'] = execute.failed_count + self._count(execute_buffered, 'failed')
                 execute_result['is_running'] = execute.id == self._execute_id
                 result.append(execute_result)
 
@@ -463,8 +1005,19 @@ class ExecuteLogManager(object):
         return result, execute_count
 
     def remove_old_entries(self, prune_days):
+        return self.remove_old_entries_chunk(prune_days)
+
+    def remove_old_entries_chunk(self, prune_days, chunk_size=None):
+        """
+        Remove executes started more than prune_days ago with their logs.
+        Log entries are removed first, executes are removed when all their log entries are gone.
+
+        :param chunk_size: max number of rows removed from every table, None to remove everything at once
+        :return: number of removed log entries and executes
+        :rtype: tuple[int, int]
+        """
         # SELECT id FROM execute WHERE start_time <= datetime('now', '-10 days') ORDER BY id DESC LIMIT 1
-        with DBSession() as db:
+        def remove(db):
             prune_date = datetime.now(pytz.utc) - timedelta(days=prune_days)
             execute_id = db.query(Execute.id) \
                 .filter(Execute.start_time <= prune_date) \
@@ -472,14 +1025,102 @@ class ExecuteLogManager(object):
                 .limit(1) \
                 .scalar()
 
-            if execute_id is not None:
+            if execute_id is None:
+                return 0, 0
+
+            log_ids = db.query(ExecuteLog.id).filter(ExecuteLog.execute_id <= execute_id)
+            if chunk_size is not None:
+                log_ids = log_ids.order_by(ExecuteLog.id).limit(chunk_size)
+            removed_logs = db.query(ExecuteLog) \
+                .filter(ExecuteLog.id.in_(log_ids.subquery())) \
+                .delete(synchronize_session=False)
+            if chunk_size is not None and removed_logs >= chunk_size:
+                return removed_logs, 0
+
+            execute_ids = db.query(Execute.id).filter(Execute.id <= execute_id)
+            if chunk_size is not None:
+                execute_ids = execute_ids.order_by(Execute.id).limit(chunk_size)
+            execute_ids = [row[0] for row in execute_ids.all()]
+            last_execute_id = max(execute_ids) if len(execute_ids) > 0 else 0
+
+            db.query(ExecuteTopic) \
+                .filter(ExecuteTopic.execute_id <= last_execute_id) \
+                .delete(synchronize_session=False)
+
+            db.query(ExecuteTrace) \
+                .filter(ExecuteTrace.execute_id <= last_execute_id) \
+                .delete(synchronize_session=False)
+
+            db.query(ExecuteLogArchive) \
+                .filter(ExecuteLogArchive.execute_id <= last_execute_id) \
+                .delete(synchronize_session=False)
+
+            db.query(ExecuteLogArchiveTraceback) \
+                .filter(ExecuteLogArchiveTraceback.execute_id <= last_execute_id) \
+                .delete(synchronize_session=False)
+
+            db.query(ExecuteLogTraceback) \
+                .filter(~ExecuteLogTraceback.hash.in_(db.query(ExecuteLogArchiveTraceback.hash).subquery())) \
+                .delete(synchronize_session=False)
+
+            db.query(Execute) \
+                .filter(Execute.resumed_from_id <= last_execute_id) \
+                .update({Execute.resumed_from_id: None}, synchronize_session=False)
+
+            removed_executes = db.query(Execute) \
+                .filter(Execute.id <= last_execute_id) \
+                .delete(synchronize_session=False)
+
+            return removed_logs, removed_executes
+        return db_write(remove)
+
+    def archive_old_entries_chunk(self, archive_days, chunk_size=None):
+        """
+        Move log entries of executes started more than archive_days ago into compressed archive,
+        one archive row per execute, tracebacks are stored once for all executes.
+
+        :param chunk_size: max number of archived executes, None to archive everything at once
+        :return: number of archived executes
+        :rtype: int
+        """
+        def archive(db):
+            archive_date = datetime.now(pytz.utc) - timedelta(days=archive_days)
+            execute_ids = db.query(ExecuteLog.execute_id) \
+                .join(Execute, Execute.id == ExecuteLog.execute_id) \
+                .filter(Execute.start_time <= archive_date)
+            if self._execute_id is not None:
+                execute_ids = execute_ids.filter(Execute.id != self._execute_id)
+            execute_ids = execute_ids.distinct().order_by(ExecuteLog.execute_id)
+            if chunk_size is not None:
+                execute_ids = execute_ids.limit(chunk_size)
+            execute_ids = [row[0] for row in execute_ids.all()]
+
+            for execute_id in execute_ids:
+                entries = [row2dict(e) for e in db.query(ExecuteLog)
+                           .filter(ExecuteLog.execute_id == execute_id)
+                           .order_by(ExecuteLog.id)]
+                data, tracebacks = pack_log_entries(entries)
+                if len(tracebacks) > 0:
+                    existing = {row[0] for row in db.query(ExecuteLogTraceback.hash)
+                                .filter(ExecuteLogTraceback.hash.in_(list(tracebacks.keys())))}
+                    db.bulk_insert_mappings(ExecuteLogTraceback, [{'hash': h, 'text': t}
+                                                                  for h, t in tracebacks.items()
+                                                                  if h not in existing])
+                    db.bulk_insert_mappings(ExecuteLogArchiveTraceback, [{'execute_id': execute_id, 'hash': h}
+                                                                         for h in tracebacks.keys()])
+                db.add(ExecuteLogArchive(execute_id=execute_id, data=data))
                 db.query(ExecuteLog) \
-                    .filter(ExecuteLog.execute_id <= execute_id) \
+                    .filter(ExecuteLog.execute_id == execute_id) \
                     .delete(synchronize_session=False)
 
-                db.query(Execute) \
-                    .filter(Execute.id <= execute_id) \
-                    .delete(synchronize_session=False)
+            return len(execute_ids)
+        return db_write(archive)
+
+    def get_current_execute_id(self):
+        """
+        :rtype: int | None
+        """
+        return self._execute_id
 
     def is_running(self, execute_id=None):
         if execute_id is not None:
@@ -487,12 +1128,39 @@ class ExecuteLogManager(object):
         return self._execute_id is not None
 
     def get_execute_log_details(self, execute_id, after=None):
+        buffered = self._copy_buffered_entries()
         with DBSession() as db:
             filters = [ExecuteLog.execute_id == execute_id]
             if after is not None:
                 filters.append(ExecuteLog.id > after)
             log_entries = db.query(ExecuteLog).filter(*filters).all()
-            return [row2dict(e) for e in log_entries]
+            if len(log_entries) == 0 and execute_id != self._execute_id:
+                archived = self._get_archived_log_entries(db, execute_id)
+                if archived is not None:
+                    return [e for e in archived if after is None or e['id'] > after]
+            last_stored_id = max(e.id for e in log_entries) if len(log_entries) > 0 else None
+            return [row2dict(e) for e in log_entries] + \
+                self._get_buffered_entries(buffered, execute_id, last_stored_id, after)
+
+    @staticmethod
+    def _get_archived_log_entries(db, execute_id):
+        data = db.query(ExecuteLogArchive.data).filter(ExecuteLogArchive.execute_id == execute_id).scalar()
+        if data is None:
+            return None
+        tracebacks = dict(db.query(ExecuteLogTraceback.hash, ExecuteLogTraceback.text)
+                          .join(ExecuteLogArchiveTraceback,
+                                ExecuteLogArchiveTraceback.hash == ExecuteLogTraceback.hash)
+                          .filter(ExecuteLogArchiveTraceback.execute_id == execute_id))
+        return unpack_log_entries(execute_id, data, tracebacks)
+
+    def get_execute_trace(self, execute_id):
+        """
+        :return: trace of finished execute in Chrome trace event format, None if there is no trace
+        :rtype: dict | None
+        """
+        with DBSession() as db:
+            trace = db.query(ExecuteTrace.trace).filter(ExecuteTrace.execute_id == execute_id).scalar()
+        return json.loads(trace) if trace is not None else None
 
     def get_current_execute_log_details(self, after=None):
         if self._execute_id is None:
@@ -502,8 +1170,20 @@ class ExecuteLogManager(object):
 
 
 class EngineRunner(threading.Thread):
-    RunMessage = namedtuple('RunMessage', ['priority', 'ids'])
-    StopMessage = namedtuple('StopMessage', ['priority'])
+    """
+    Executes engine in background thread by timer and by manual requests.
+
+    Execute requests are never lost and never queued twice: all requests received
+    while engine is running are merged into one pending request, which is executed right after current one.
+    Requested topics, which current execute is going to check anyway, are removed from pending request.
+    Manual request for all topics received during full execute is reduced to topics which were already checked.
+    Scheduled request merged with manual request for some topics stays scheduled.
+    """
+    # ids is frozenset of topic ids or None for all topics,
+    # scheduled requests topics which next check time is come in addition to ids,
+    # resumed_from_id is id of interrupted execute which topics are checked by this request
+    ExecuteRequest = namedtuple('ExecuteRequest', ['ids', 'scheduled', 'resumed_from_id'])
+    ExecuteRequest.__new__.__defaults__ = (None,)
 
     def __init__(self, logger, settings_manager, trackers_manager, clients_manager, notifier_manager, **kwargs):
         """
@@ -526,7 +1206,9 @@ class EngineRunner(threading.Thread):
         self.is_stoped = False
         self._interval = float(interval_param) if interval_param else 7200
         self._last_execute = last_execute_param
-        self.message_box = PriorityQueue()
+        self._pending = None
+        self._engine = None
+        self._condition = threading.Condition()
 
         self.timer_cancel = None
         self._create_timer()
@@ -550,77 +1232,148 @@ class EngineRunner(threading.Thread):
     def last_execute(self, value):
         self._last_execute = value
 
+    @property
+    def pending(self):
+        """
+        :rtype: EngineRunner.ExecuteRequest | None
+        """
+        with self._condition:
+            return self._pending
+
     # noinspection PyBroadException
     def run(self):
-        while not self.is_stoped:
-            msg = self._receive()
-
-            if isinstance(msg, EngineRunner.StopMessage):
-                self.is_stoped = True
-                self.timer_cancel()
-                return
-
-            ids = msg.ids \
-                if isinstance(msg, EngineRunner.RunMessage) \
-                else None
-
+        while True:
+            with self._condition:
+                while self._pending is None and not self.is_stoped:
+                    self._condition.wait()
+                if self.is_stoped:
+                    self.timer_cancel()
+                    return
+                request = self._pending
+                self._pending = None
+                self.is_executing = True
+
+            ids = sorted(request.ids) if request.ids else None
             try:
-                self._execute(ids=ids)
+                self._execute(ids=ids, scheduled=request.scheduled, resumed_from_id=request.resumed_from_id)
             except:
                 pass
 
     def stop(self):
-        self.message_box.put(EngineRunner._stop_message())
+        with self._condition:
+            self.is_stoped = True
+            self._condition.notify_all()
 
     def execute(self, ids):
-        if not self.is_executing:
-            msg = EngineRunner._run_message(ids=ids)
-            self.message_box.put_nowait(msg)
+        self._request(EngineRunner.ExecuteRequest(frozenset(ids) if ids else None, False))
+
+    def cancel(self):
+        """
+        Cancel current execute, pending execute requests are kept
+
+        :return: True if there was execute to cancel
+        :rtype: bool
+        """
+        with self._condition:
+            engine = self._engine
+        if engine is None:
+            return False
+        engine.cancel()
+        return True
+
+    def _request(self, request):
+        with self._condition:
+            if self._engine is not None:
+                request = self._exclude_planned(self._engine, request)
+                if request is None:
+                    return
+            self._pending = self._merge(self._pending, request)
+            self._condition.notify_all()
+
+    @staticmethod
+    def _exclude_planned(engine, request):
+        """
+        :type engine: Engine
+        :type request: EngineRunner.ExecuteRequest
+        :return: part of request which will not be checked by running engine, None if nothing left
+        :rtype: EngineRunner.ExecuteRequest | None
+        """
+        if request.ids is None:
+            if engine.execute_ids is None and not engine.scheduled:
+                # topics checked before manual request have to be checked again
+                ids = frozenset(engine.get_started_ids())
+                return request._replace(ids=ids) if len(ids) > 0 else None
+            return request
+        # full or scheduled execute covers scheduled one, but not vice versa
+        scheduled = request.scheduled and engine.execute_ids is not None and not engine.scheduled
+        ids = request.ids
+        remaining_ids = engine.get_remaining_ids()
+        if remaining_ids is not None:
+            ids = ids - remaining_ids
+        if len(ids) == 0 and not scheduled:
+            return None
+        return request._replace(ids=ids, scheduled=scheduled)
+
+    @staticmethod
+    def _merge(pending, request):
+        """
+        :type pending: EngineRunner.ExecuteRequest | None
+        :type request: EngineRunner.ExecuteRequest
+        :rtype: EngineRunner.ExecuteRequest
+        """
+        if pending is None:
+            return request
+        resumed_from_id = pending.resumed_from_id or request.resumed_from_id
+        if pending.ids is None or request.ids is None:
+            # full execute checks due topics too
+            return EngineRunner.ExecuteRequest(None, False, resumed_from_id)
+        return EngineRunner.ExecuteRequest(pending.ids | request.ids, pending.scheduled or request.scheduled,
+                                           resumed_from_id)
 
     def _create_timer(self):
         def timer_fn():
-            msg = EngineRunner._run_message()
-            self.message_box.put_nowait(msg)
+            self._request(EngineRunner.ExecuteRequest(frozenset(), True))
 
         if self.timer_cancel is not None:
             self.timer_cancel()
 
         self.timer_cancel = timer(self.interval, timer_fn)
 
-    def _receive(self):
-        return self.message_box.get(block=True)
-
     # noinspection PyBroadException
-    def _execute(self, ids=None):
+    def _execute(self, ids=None, scheduled=False, resumed_from_id=None):
         caught_exception = None
         self.is_executing = True
+        started = time.perf_counter()
         try:
-            log.info("Starting execute", time=str(datetime.now()))
-            self.logger.started(datetime.now(pytz.utc))
+            log.info("Starting execute", time=str(datetime.now()), resumed_from_id=resumed_from_id)
+            self.logger.started(datetime.now(pytz.utc), resumed_from_id)
             engine = Engine(self.logger, self.settings_manager, self.trackers_manager,
                             self.clients_manager, self.notifier_manager)
-            engine.execute(ids)
+            with self._condition:
+                self._engine = engine
+            engine.execute(ids, scheduled=scheduled, base_interval=self.interval)
         except:
             caught_exception = sys.exc_info()[0]
             log.error("An error has occurred during execute", exception=str(caught_exception))
         finally:
-            self.is_executing = False
+            with self._condition:
+                self._engine = None
+                self.is_executing = False
             self.last_execute = datetime.now(pytz.utc)
+            metrics.execute_duration.observe(time.perf_counter() - started,
+                                             status='finished' if caught_exception is None else 'failed')
             self.logger.finished(self.last_execute, caught_exception)
             log.info("Ending execute", time=str(datetime.now()))
         return True
 
-    @staticmethod
-    def _run_message(ids=None):
-        return EngineRunner.RunMessage(priority=1, ids=ids)
-
-    @staticmethod
-    def _stop_message():
-        return EngineRunner.StopMessage(priority=0)
-
 
 class DBEngineRunner(EngineRunner):
+    """
+    Persists execute settings and resumes execute interrupted by restart:
+    topics, which interrupted execute didn't finish, are checked right after start.
+    """
     DEFAULT_INTERVAL = 7200
+    INTERRUPTED_MESSAGE = u'Execute was interrupted'
 
     def __init__(self, logger, settings_manager, trackers_manager, clients_manager, notifier_manager, **kwargs):
         """
@@ -639,6 +1392,11 @@ class DBEngineRunner(EngineRunner):
                                              interval=execute_settings.interval,
                                              last_execute=execute_settings.last_execute,
                                              **kwargs)
+        resume_request = self._get_resume_request()
+        if resume_request is not None:
+            log.info("Resuming interrupted execute", execute_id=resume_request.resumed_from_id,
+                     ids=sorted(resume_request.ids))
+            self._request(resume_request)
 
     @property
     def interval(self):
@@ -660,13 +1418,17 @@ class DBEngineRunner(EngineRunner):
         self._update_execute_settings()
 
     def _update_execute_settings(self):
-        with DBSession() as db:
+        interval = self._interval
+        last_execute = self._last_execute
+
+        def update(db):
             settings_execute = db.query(ExecuteSettings).first()
             if not settings_execute:
                 settings_execute = ExecuteSettings()
                 db.add(settings_execute)
-            settings_execute.interval = self._interval
-            settings_execute.last_execute = self._last_execute
+            settings_execute.interval = interval
+            settings_execute.last_execute = last_execute
+        db_write(update)
 
     def _get_execute_settings(self):
         with DBSession() as db:
@@ -676,3 +1438,31 @@ class DBEngineRunner(EngineRunner):
             else:
                 db.expunge(settings_execute)
         return settings_execute
+
+    def _get_resume_request(self):
+        """
+        Mark all interrupted executes and remove their checkpoints
+
+        :return: request for topics which weren't finished by the last interrupted execute
+        :rtype: EngineRunner.ExecuteRequest | None
+        """
+        def resume(db):
+            execute_ids = [execute_id for execute_id, in db.query(ExecuteTopic.execute_id).distinct().all()]
+            if len(execute_ids) == 0:
+                return None
+            resumed_from_id = max(execute_ids)
+            ids = frozenset(topic_id for topic_id, in db.query(ExecuteTopic.topic_id)
+                            .filter(ExecuteTopic.execute_id == resumed_from_id, ExecuteTopic.done.is_(False))
+                            .all())
+
+            db.query(Execute) \
+                .filter(Execute.id.in_(execute_ids), Execute.failed_message.is_(None)) \
+                .update({Execute.failed_message: self.INTERRUPTED_MESSAGE}, synchronize_session=False)
+            db.query(ExecuteTopic) \
+                .filter(ExecuteTopic.execute_id.in_(execute_ids)) \
+                .delete(synchronize_session=False)
+
+            if len(ids) == 0:
+                return None
+            return EngineRunner.ExecuteRequest(ids, False, resumed_from_id)
+        return db_write(resume)
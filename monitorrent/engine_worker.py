@@ -0,0 +1,375 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytz
+import structlog
+from sqlalchemy import Column, Integer, String, Unicode, or_, func
+
+from monitorrent.db import Base, DBSession, UTCDateTime, db_write
+from monitorrent.engine import ExecuteLogManager, ExecuteSettings, ExecuteTopic, DBEngineRunner
+
+log = structlog.get_logger()
+
+
+class EngineWorkerLock(Base):
+    """Single row which tells what worker process runs engine, it is owned while heartbeat is fresh"""
+    __tablename__ = 'engine_worker_lock'
+
+    id = Column(Integer, primary_key=True)
+    owner = Column(String, nullable=False)
+    heartbeat = Column(UTCDateTime, nullable=False)
+    execute_id = Column(Integer, nullable=True)
+
+
+class EngineCommand(Base):
+    __tablename__ = 'engine_command'
+
+    id = Column(Integer, primary_key=True)
+    command = Column(String, nullable=False)
+    params = Column(Unicode, nullable=True)
+    created = Column(UTCDateTime, nullable=False)
+
+
+class EngineCommandQueue(object):
+    """Commands for engine worker sent by web processes through DB"""
+    EXECUTE = 'execute'
+    CANCEL = 'cancel'
+    SET_INTERVAL = 'set_interval'
+
+    def put(self, command, **params):
+        def add(db):
+            db.add(EngineCommand(command=command, params=json.dumps(params), created=datetime.now(pytz.utc)))
+        db_write(add)
+
+    def pop_all(self):
+        """
+        :return: list of (command, params) in order they were sent
+        :rtype: list[tuple]
+        """
+        # queue is polled every second and it is empty most of the time, so it is checked without write transaction
+        with DBSession() as db:
+            last_id = db.query(func.max(EngineCommand.id)).scalar()
+        if last_id is None:
+            return []
+
+        def pop(db):
+            commands = db.query(EngineCommand).filter(EngineCommand.id <= last_id).order_by(EngineCommand.id).all()
+            db.query(EngineCommand) \
+                .filter(EngineCommand.id <= last_id) \
+                .delete(synchronize_session=False)
+            return [(c.command, json.loads(c.params) if c.params else {}) for c in commands]
+        return db_write(pop)
+
+
+class EngineLeaderLock(object):
+    """
+    Lease stored in DB, only one worker process owns it and runs engine.
+    Worker has to renew lease before ttl expires, otherwise other worker can take it.
+    """
+    LOCK_ID = 1
+    DEFAULT_TTL = 60
+
+    def __init__(self, owner=None, ttl=DEFAULT_TTL):
+        """
+        :param owner: unique name of worker process
+        :param ttl: seconds after last heartbeat when lease can be taken by other worker
+        """
+        self.owner = owner or u'{0}:{1}:{2}'.format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+        self.ttl = ttl
+        # owner of expired lease taken by last acquire, its engine can still finish execute
+        self.taken_over_from = None
+
+    def acquire(self, execute_id=None):
+        """
+        Take or renew lease
+
+        :param execute_id: id of currently running execute, visible for web processes
+        :return: True if this worker owns the lease
+        :rtype: bool
+        """
+        now = datetime.now(pytz.utc)
+
+        def take(db):
+            """:return: (is lease owned, previous owner)"""
+            previous_owner = db.query(EngineWorkerLock.owner).filter(EngineWorkerLock.id == self.LOCK_ID).scalar()
+            updated = db.query(EngineWorkerLock) \
+                .filter(EngineWorkerLock.id == self.LOCK_ID,
+                        or_(EngineWorkerLock.owner == self.owner,
+                            EngineWorkerLock.heartbeat < now - timedelta(seconds=self.ttl))) \
+                .update({EngineWorkerLock.owner: self.owner, EngineWorkerLock.heartbeat: now,
+                         EngineWorkerLock.execute_id: execute_id}, synchronize_session=False)
+            if updated > 0:
+                return True, previous_owner
+            if db.query(EngineWorkerLock).filter(EngineWorkerLock.id == self.LOCK_ID).count() > 0:
+                return False, previous_owner
+            db.add(EngineWorkerLock(id=self.LOCK_ID, owner=self.owner, heartbeat=now, execute_id=execute_id))
+            return True, None
+
+        owned, previous_owner = db_write(take)
+        if owned and previous_owner is not None and previous_owner != self.owner:
+            self.taken_over_from = previous_owner
+        return owned
+
+    def release(self):
+        def delete(db):
+            db.query(EngineWorkerLock) \
+                .filter(EngineWorkerLock.id == self.LOCK_ID, EngineWorkerLock.owner == self.owner) \
+                .delete(synchronize_session=False)
+        db_write(delete)
+
+    @classmethod
+    def get_state(cls, ttl=DEFAULT_TTL):
+        """
+        :return: owner, heartbeat and running execute id or None if there is no alive worker
+        :rtype: dict | None
+        """
+        with DBSession() as db:
+            lock = db.query(EngineWorkerLock).filter(EngineWorkerLock.id == cls.LOCK_ID).first()
+            if lock is None or lock.heartbeat < datetime.now(pytz.utc) - timedelta(seconds=ttl):
+                return None
+            return {'owner': lock.owner, 'heartbeat': lock.heartbeat, 'execute_id': lock.execute_id}
+
+
+class EngineWorker(object):
+    """
+    Main loop of worker process: compete for leader lock, run engine while lock is owned
+    and pass commands received from web processes to engine runner.
+    """
+
+    def __init__(self, runner_factory, log_manager, leader_lock=None, commands=None, poll_interval=1,
+                 clock=time.monotonic, maintenance_factory=None, renew_interval=None):
+        """
+        :param runner_factory: runner_factory(log_maintenance) -> DBEngineRunner, called when worker is elected
+        :type log_manager: ExecuteLogManager
+        :type leader_lock: EngineLeaderLock | None
+        :type commands: EngineCommandQueue | None
+        :param poll_interval: seconds between command polls
+        :param renew_interval: seconds between lease renewals, a third of lease ttl by default.
+                               Lease is renewed earlier when running execute changes, so web processes see it
+        :param maintenance_factory: maintenance_factory() -> LogMaintenance, it runs only while worker is elected,
+                                    so executes aren't archived and pruned by several workers at once
+        """
+        self.runner_factory = runner_factory
+        self.maintenance_factory = maintenance_factory
+        self.log_maintenance = None
+        self.log_manager = log_manager
+        self.leader_lock = leader_lock or EngineLeaderLock()
+        self.commands = commands or EngineCommandQueue()
+        self.poll_interval = poll_interval
+        self.renew_interval = renew_interval if renew_interval is not None else self.leader_lock.ttl / 3.0
+        self.engine_runner = None
+        self._clock = clock
+        # time of the last lease renewal and execute id written by it
+        self._renewed_at = None
+        self._renewed_execute_id = None
+        # lease is valid until this time even if it can't be renewed
+        self._lease_expires_at = None
+        # runner of lost lease, which is still finishing its execute
+        self._stopping_runner = None
+        # time when lease of other worker was taken, its execute can still be finishing
+        self._taken_over_at = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                self.tick()
+                self._stop_event.wait(self.poll_interval)
+        finally:
+            self._stop_runner()
+            self.leader_lock.release()
+
+    def stop(self):
+        self._stop_event.set()
+
+    # noinspection PyBroadException
+    def tick(self):
+        renew_started_at = self._clock()
+        execute_id = self.log_manager.get_current_execute_id()
+        if self._is_renew_due(renew_started_at, execute_id):
+            try:
+                is_leader = self.leader_lock.acquire(execute_id)
+            except Exception as e:
+                # e.g. database is locked, lease is still owned until it expires and it is renewed on next tick
+                log.error("Can't renew engine worker lock", exception=str(e))
+                if self._lease_expires_at is not None and renew_started_at < self._lease_expires_at:
+                    return
+                is_leader = False
+            self._renewed_at = renew_started_at
+            self._renewed_execute_id = execute_id
+
+            if not is_leader:
+                self._lease_expires_at = None
+                if self.engine_runner is not None:
+                    log.warning("Engine worker lock lost, stopping engine", owner=self.leader_lock.owner)
+                    self._stop_runner(wait=False)
+                return
+            # heartbeat is written after renew started, so lease can't expire earlier than this
+            self._lease_expires_at = renew_started_at + self.leader_lock.ttl
+        elif self._lease_expires_at is None:
+            # lease is owned by other worker, it is checked again on next renew
+            return
+
+        if self.engine_runner is None:
+            if self._stopping_runner is not None:
+                if self._stopping_runner.is_alive():
+                    # engine of lost lease is still finishing, only one engine can run in worker
+                    return
+                self._stopping_runner = None
+            if not self._is_previous_execute_finished():
+                return
+            log.info("Elected as engine worker", owner=self.leader_lock.owner)
+            if self.maintenance_factory is not None:
+                self.log_maintenance = self.maintenance_factory()
+                self.log_maintenance.start()
+            self.engine_runner = self.runner_factory(self.log_maintenance)
+
+        for command, params in self.commands.pop_all():
+            try:
+                self._process(command, params)
+            except Exception as e:
+                log.error("Engine command failed", command=command, exception=str(e))
+
+    def _is_renew_due(self, now, execute_id):
+        if self._renewed_at is None:
+            return True
+        if self._lease_expires_at is not None and execute_id != self._renewed_execute_id:
+            return True
+        return now - self._renewed_at >= self.renew_interval
+
+    def _is_previous_execute_finished(self):
+        """
+        Lease of other worker expires when its heartbeat can't be written, but its engine can still finish
+        cancelled execute. New engine marks all executes with checkpoints as interrupted,
+        so it waits until checkpoints are removed or previous owner had one more ttl to finish.
+        """
+        previous_owner = self.leader_lock.taken_over_from
+        if previous_owner is None:
+            return True
+        now = self._clock()
+        if self._taken_over_at is None:
+            self._taken_over_at = now
+        if now - self._taken_over_at < self.leader_lock.ttl:
+            with DBSession() as db:
+                running = db.query(ExecuteTopic).count() > 0
+            if running:
+                log.info("Waiting for execute of previous engine worker", owner=previous_owner)
+                return False
+        self.leader_lock.taken_over_from = None
+        self._taken_over_at = None
+        return True
+
+    def _process(self, command, params):
+        if command == EngineCommandQueue.EXECUTE:
+            self.engine_runner.execute(params.get('ids'))
+        elif command == EngineCommandQueue.CANCEL:
+            self.engine_runner.cancel()
+        elif command == EngineCommandQueue.SET_INTERVAL:
+            self.engine_runner.interval = params['interval']
+        else:
+            log.warning("Unknown engine command", command=command)
+
+    def _stop_runner(self, wait=True):
+        """
+        :param wait: wait until current execute is finished, otherwise it is cancelled
+                     and runner finishes in background
+        """
+        log_maintenance = self.log_maintenance
+        if log_maintenance is not None:
+            self.log_maintenance = None
+            log_maintenance.stop()
+        engine_runner = self.engine_runner
+        if engine_runner is None:
+            return
+        self.engine_runner = None
+        if not wait:
+            engine_runner.cancel()
+        engine_runner.stop()
+        if wait:
+            engine_runner.join()
+        else:
+            self._stopping_runner = engine_runner
+
+
+class EngineRunnerClient(object):
+    """
+    Engine runner interface for web processes, engine itself runs in worker process.
+    Settings are read from DB and requests are sent to worker as commands.
+    """
+
+    def __init__(self, trackers_manager, commands=None):
+        """
+        :type trackers_manager: plugin_managers.TrackersManager
+        :type commands: EngineCommandQueue | None
+        """
+        self.trackers_manager = trackers_manager
+        self.commands = commands or EngineCommandQueue()
+
+    @property
+    def interval(self):
+        settings = self._get_execute_settings()
+        return settings.interval if settings is not None else DBEngineRunner.DEFAULT_INTERVAL
+
+    @interval.setter
+    def interval(self, value):
+        def update(db):
+            settings = db.query(ExecuteSettings).first()
+            if settings is None:
+                settings = ExecuteSettings(last_execute=None)
+                db.add(settings)
+            settings.interval = value
+        db_write(update)
+        # worker has to restart its timer
+        self.commands.put(EngineCommandQueue.SET_INTERVAL, interval=value)
+
+    @property
+    def last_execute(self):
+        settings = self._get_execute_settings()
+        return settings.last_execute if settings is not None else None
+
+    def execute(self, ids):
+        self.commands.put(EngineCommandQueue.EXECUTE, ids=ids)
+
+    def cancel(self):
+        """
+        :return: True if there was execute to cancel
+        :rtype: bool
+        """
+        state = EngineLeaderLock.get_state()
+        if state is None or state['execute_id'] is None:
+            return False
+        self.commands.put(EngineCommandQueue.CANCEL)
+        return True
+
+    @staticmethod
+    def _get_execute_settings():
+        with DBSession() as db:
+            settings = db.query(ExecuteSettings).first()
+            if settings is not None:
+                db.expunge(settings)
+            return settings
+
+
+class EngineWorkerLogManager(ExecuteLogManager):
+    """
+    Execute log of web process, running execute is taken from engine worker lock.
+    It is read on every long poll check, so it is kept for EXECUTE_ID_TTL seconds
+    """
+    EXECUTE_ID_TTL = 1
+    # (read time, execute id)
+    _execute_id_cache = None
+
+    @property
+    def _execute_id(self):
+        now = self._clock()
+        cache = self._execute_id_cache
+        if cache is None or now - cache[0] >= self.EXECUTE_ID_TTL:
+            state = EngineLeaderLock.get_state()
+            cache = (now, state['execute_id'] if state is not None else None)
+            self._execute_id_cache = cache
+        return cache[1]
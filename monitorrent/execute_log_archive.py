@@ -0,0 +1,93 @@
+import hashlib
+import json
+import zlib
+from datetime import datetime, timedelta
+
+import pytz
+from sqlalchemy import Column, ForeignKey, String, UnicodeText, LargeBinary
+
+from monitorrent.db import Base
+
+TRACEBACK_BEGIN = u'<br/><pre>'
+TRACEBACK_END = u'</pre>'
+_EPOCH = datetime(1970, 1, 1, tzinfo=pytz.utc)
+
+
+class ExecuteLogArchive(Base):
+    """All log entries of old execute packed into one compressed blob"""
+    __tablename__ = 'execute_log_archive'
+
+    execute_id = Column(ForeignKey('execute.id'), primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+
+
+class ExecuteLogTraceback(Base):
+    """Traceback of failed log entries, shared by all archived executes where it was logged"""
+    __tablename__ = 'execute_log_traceback'
+
+    hash = Column(String, primary_key=True)
+    text = Column(UnicodeText, nullable=False)
+
+
+class ExecuteLogArchiveTraceback(Base):
+    """Tracebacks used by archived execute, traceback without references can be removed"""
+    __tablename__ = 'execute_log_archive_traceback'
+
+    execute_id = Column(ForeignKey('execute.id'), primary_key=True)
+    hash = Column(String, primary_key=True, index=True)
+
+
+def split_traceback(message):
+    """
+    Split message of failed log entry into text and formatted traceback
+
+    :type message: str
+    :return: message without traceback and traceback or None
+    :rtype: tuple
+    """
+    index = message.find(TRACEBACK_BEGIN)
+    if index < 0 or not message.endswith(TRACEBACK_END):
+        return message, None
+    return message[:index], message[index + len(TRACEBACK_BEGIN):-len(TRACEBACK_END)]
+
+
+def get_traceback_hash(traceback):
+    return hashlib.sha256(traceback.encode('utf-8')).hexdigest()
+
+
+def pack_log_entries(entries):
+    """
+    :param entries: log entries of one execute as returned by ExecuteLogManager.get_execute_log_details
+    :type entries: list[dict]
+    :return: compressed entries and tracebacks removed from them by hash
+    :rtype: tuple[bytes, dict]
+    """
+    tracebacks = dict()
+    packed = []
+    for entry in entries:
+        message, traceback = split_traceback(entry['message'])
+        traceback_hash = None
+        if traceback is not None:
+            traceback_hash = get_traceback_hash(traceback)
+            tracebacks[traceback_hash] = traceback
+        time = (entry['time'] - _EPOCH) // timedelta(microseconds=1)
+        packed.append([entry['id'], time, entry['level'], message, traceback_hash])
+    data = zlib.compress(json.dumps(packed, ensure_ascii=False).encode('utf-8'), 9)
+    return data, tracebacks
+
+
+def unpack_log_entries(execute_id, data, tracebacks):
+    """
+    :param data: compressed entries created by pack_log_entries
+    :param tracebacks: traceback text by hash
+    :type tracebacks: dict
+    :return: log entries in the same format as they were before packing
+    :rtype: list[dict]
+    """
+    entries = []
+    for entry_id, time, level, message, traceback_hash in json.loads(zlib.decompress(data).decode('utf-8')):
+        if traceback_hash is not None:
+            message = message + TRACEBACK_BEGIN + tracebacks[traceback_hash] + TRACEBACK_END
+        entries.append({'id': entry_id, 'execute_id': execute_id, 'time': _EPOCH + timedelta(microseconds=time),
+                        'message': message, 'level': level})
+    return entries
@@ -0,0 +1,109 @@
+import threading
+from datetime import datetime
+
+import pytz
+import structlog
+
+from monitorrent.db import compact_db, get_db_free_pages
+from monitorrent.utils import metrics
+
+log = structlog.get_logger()
+
+
+class LogMaintenance(threading.Thread):
+    """
+    Removes old execute logs and archives not so old ones in background.
+
+    Logs are removed and archived in small chunks with pauses between them, so engine and web requests
+    aren't blocked by one long transaction. When there is nothing left to do and engine is idle,
+    free space is given back to file system.
+    Maintenance runs every interval seconds and when it is woken after execute is finished.
+    """
+    DEFAULT_INTERVAL = 3600
+    DEFAULT_CHUNK_SIZE = 1000
+    DEFAULT_PAUSE = 0.1
+    # executes per chunk, every execute can have many log entries
+    ARCHIVE_CHUNK_SIZE = 10
+
+    def __init__(self, settings_manager, log_manager, interval=DEFAULT_INTERVAL, chunk_size=DEFAULT_CHUNK_SIZE,
+                 pause=DEFAULT_PAUSE):
+        """
+        :type settings_manager: settings_manager.SettingsManager
+        :type log_manager: engine.ExecuteLogManager
+        :param interval: seconds between maintenance runs
+        :param chunk_size: max number of rows removed in one transaction
+        :param pause: seconds to wait between chunks
+        """
+        super(LogMaintenance, self).__init__(name='log-maintenance')
+        self.daemon = True
+        self.settings_manager = settings_manager
+        self.log_manager = log_manager
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.last_result = None
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+
+    def wake(self):
+        self._wake_event.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    # noinspection PyBroadException
+    def run(self):
+        while not self._stop_event.is_set():
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+            try:
+                self.execute()
+            except Exception as e:
+                log.error("Log maintenance failed", exception=str(e))
+
+    def execute(self):
+        """
+        :return: number of removed log entries and executes, archived executes and reclaimed bytes
+        :rtype: dict
+        """
+        prune_days = self.settings_manager.remove_logs_interval
+        removed_logs = removed_executes = 0
+        while not self._stop_event.is_set():
+            logs, executes = self.log_manager.remove_old_entries_chunk(prune_days, self.chunk_size)
+            if logs == 0 and executes == 0:
+                break
+            removed_logs += logs
+            removed_executes += executes
+            metrics.maintenance_removed_rows.inc(logs, table='execute_log')
+            metrics.maintenance_removed_rows.inc(executes, table='execute')
+            self._stop_event.wait(self.pause)
+
+        archive_days = self.settings_manager.archive_logs_interval
+        archived_executes = 0
+        while archive_days > 0 and not self._stop_event.is_set():
+            executes = self.log_manager.archive_old_entries_chunk(archive_days, self.ARCHIVE_CHUNK_SIZE)
+            if executes == 0:
+                break
+            archived_executes += executes
+            self._stop_event.wait(self.pause)
+
+        reclaimed_bytes = 0
+        # compaction writes to the whole database file, so it waits until engine is idle
+        if not self._stop_event.is_set() and self.log_manager.get_current_execute_id() is None \
+                and get_db_free_pages() > 0:
+            reclaimed_bytes = compact_db()
+            metrics.maintenance_reclaimed_bytes.inc(reclaimed_bytes)
+
+        self.last_result = {
+            'removed_logs': removed_logs,
+            'removed_executes': removed_executes,
+            'archived_executes': archived_executes,
+            'reclaimed_bytes': reclaimed_bytes,
+            'finish_time': datetime.now(pytz.utc)
+        }
+        log.info("Log maintenance finished", removed_logs=removed_logs, removed_executes=removed_executes,
+                 archived_executes=archived_executes, reclaimed_bytes=reclaimed_bytes)
+        return self.last_result
@@ -1,13 +1,16 @@
 import os
+import threading
 
 import structlog
 
-from monitorrent.db import DBSession, row2dict
+from monitorrent.db import DBSession, row2dict, db_write
 from monitorrent.plugins import Topic
 from monitorrent.plugins.status import Status
 from monitorrent.plugins.notifiers import Notifier, NotifierType
 from monitorrent.plugins.trackers import TrackerPluginBase, WithCredentialsMixin
 from monitorrent.upgrade_manager import add_upgrade
+from monitorrent.utils.tracing import tracer
+from monitorrent.utils.metrics import client_request_duration, notifier_send_duration
 
 
 log = structlog.get_logger()
@@ -125,11 +128,12 @@ class TrackersManager(object):
         return False
 
     def remove_topic(self, id):
-        with DBSession() as db:
+        def remove(db):
             topic = db.query(Topic).filter(Topic.id == id).first()
             if topic is None:
                 raise KeyError('Topic {} not found'.format(id))
             db.delete(topic)
+        db_write(remove)
         return True
 
     def get_topic(self, id):
@@ -143,62 +147,60 @@ class TrackersManager(object):
         return tracker.update_topic(id, settings)
 
     def reset_topic_status(self, id):
-        with DBSession() as db:
-            topic = db.query(Topic).filter(Topic.id == id).first()
-            if topic is None:
-                raise KeyError('Topic {} not found'.format(id))
-            topic.status = Status.Ok
+        self._update_topic_fields(id, {Topic.status: Status.Ok})
         return True
 
     def set_topic_paused(self, id, paused):
-        with DBSession() as db:
-            topic = db.query(Topic).filter(Topic.id == id).first()
-            if topic is None:
-                raise KeyError('Topic {} not found'.format(id))
-            topic.paused = paused
+        self._update_topic_fields(id, {Topic.paused: paused})
         return True
 
+    @staticmethod
+    def _update_topic_fields(id, values):
+        def update(db):
+            if db.query(Topic).filter(Topic.id == id).update(values, synchronize_session=False) == 0:
+                raise KeyError('Topic {} not found'.format(id))
+        db_write(update)
+
     def get_watching_topics(self):
-        watching_topics = []
+        """
+        Topics of all known trackers ordered by id.
+        Topics are loaded with one query per tracker type, together with columns of concrete topic class.
+        """
+        typed_topics = []
         with DBSession() as db:
-            dbtopics = db.query(Topic).all()
-            db.expunge_all()
-            for dbtopic in dbtopics:
+            topic_types = [topic_type for topic_type, in db.query(Topic.type).distinct()]
+            for topic_type in topic_types:
                 try:
-                    tracker = self.get_tracker(dbtopic.type)
+                    tracker = self.get_tracker(topic_type)
                 except KeyError:
                     # TODO: Log warning of not existing topic
                     #       Need to think, should we return not existing plugin
                     #       as just default topic, and show it disabled on UI to
                     #       let user ability for delete such topics
                     continue
+                topics = db.query(tracker.topic_class).filter(Topic.type == topic_type).all()
+                typed_topics.append((tracker, topics))
+            db.expunge_all()
 
-                typed_topic = None
-
-                def get_typed_topic(dbtopic):
-                    if typed_topic is not None:
-                        return typed_topic
-                    topic = db.query(tracker.topic_class).filter(Topic.id == dbtopic.id).first()
-                    db.expunge(topic)
-                    return topic
-
-                if hasattr(tracker, 'prepare_topic'):
-                    typed_topic = get_typed_topic(dbtopic)
-                    tracker.prepare_topic(typed_topic)
-
-                if typed_topic is not None:
-                    dbtopic = typed_topic
-
+        watching_topics = []
+        for tracker, topics in typed_topics:
+            if hasattr(tracker, 'prepare_topics'):
+                tracker.prepare_topics(topics)
+            elif hasattr(tracker, 'prepare_topic'):
+                for dbtopic in topics:
+                    tracker.prepare_topic(dbtopic)
+
+            for dbtopic in topics:
                 topic = row2dict(dbtopic, None, ['id', 'url', 'display_name', 'last_update', 'paused'])
                 topic['info'] = tracker.get_topic_info(dbtopic)
                 topic['tracker'] = dbtopic.type
                 topic['status'] = dbtopic.status.__str__()
 
                 if hasattr(tracker, 'get_thumbnail_url'):
-                    typed_topic = get_typed_topic(dbtopic)
-                    topic['thumbnail_url'] = tracker.get_thumbnail_url(typed_topic)
+                    topic['thumbnail_url'] = tracker.get_thumbnail_url(dbtopic)
 
                 watching_topics.append(topic)
+        watching_topics.sort(key=lambda t: t['id'])
         return watching_topics
 
 
@@ -237,7 +239,10 @@ class ClientsManager(object):
     def find_torrent(self, torrent_hash):
         if self.default_client is None:
             return False
-        result = self.default_client.find_torrent(torrent_hash)
+        client = getattr(self.default_client, 'name', None)
+        with tracer.span('find_torrent', 'client', client=client), \
+                client_request_duration.time(client=client, method='find_torrent'):
+            result = self.default_client.find_torrent(torrent_hash)
         return result or False
 
     def add_torrent(self, torrent, topic_settings):
@@ -247,12 +252,18 @@ class ClientsManager(object):
         """
         if self.default_client is None:
             return False
-        return self.default_client.add_torrent(torrent, topic_settings)
+        client = getattr(self.default_client, 'name', None)
+        with tracer.span('add_torrent', 'client', client=client), \
+                client_request_duration.time(client=client, method='add_torrent'):
+            return self.default_client.add_torrent(torrent, topic_settings)
 
     def remove_torrent(self, torrent_hash):
         if self.default_client is None:
             return False
-        return self.default_client.remove_torrent(torrent_hash)
+        client = getattr(self.default_client, 'name', None)
+        with tracer.span('remove_torrent', 'client', client=client), \
+                client_request_duration.time(client=client, method='remove_torrent'):
+            return self.default_client.remove_torrent(torrent_hash)
 
     def __get_default_client(self, name=None, default=None):
         if name is not None:
@@ -317,6 +328,7 @@ class NotifierManagerExecute(object):
         self.notify_levels = notify_levels
         self.notifier_manager = notifier_manager
         self.ongoing_process_message = ""
+        self._lock = threading.Lock()
 
     @property
     def notify_on_failed(self):
@@ -347,14 +359,16 @@ class NotifierManagerExecute(object):
         for plugin in enabled:
             if plugin.get_type == NotifierType.short_text:
                 try:
-                    plugin.notify("Monitorrent Update", message)
+                    with notifier_send_duration.time(notifier=getattr(plugin, 'name', None)):
+                        plugin.notify("Monitorrent Update", message)
                 except:
                     # TODO: Log particular notifier error
                     pass
-        if self.ongoing_process_message == "":
-            self.ongoing_process_message = message
-        else:
-            self.ongoing_process_message += "\n" + message
+        with self._lock:
+            if self.ongoing_process_message == "":
+                self.ongoing_process_message = message
+            else:
+                self.ongoing_process_message += "\n" + message
 
     def __enter__(self):
         self.ongoing_process_message = ""
@@ -368,7 +382,8 @@ class NotifierManagerExecute(object):
         for plugin in enabled:
             if plugin.get_type == NotifierType.full_text:
                 try:
-                    plugin.notify("Monitorrent Update", target_message)
+                    with notifier_send_duration.time(notifier=getattr(plugin, 'name', None)):
+                        plugin.notify("Monitorrent Update", target_message)
                 except:
                     # TODO: Log particular notifier error
                     pass
@@ -31,11 +31,15 @@ class Topic(Base):
     status = Column(EnumType(Status, by_name=True), nullable=False, server_default=Status.Ok.__str__())
     paused = Column(Boolean(create_constraint=False), nullable=False, server_default='0')
     download_dir = Column(String, nullable=True)
+    check_interval = Column(Integer, nullable=True)
+    next_check_at = Column(UTCDateTime, nullable=True)
+    content_digest = Column(String, nullable=True)
 
+    # query of base topics selects only topics table,
+    # columns of tracker topic are loaded by query of its topic_class
     __mapper_args__ = {
         'polymorphic_identity': 'topic',
         'polymorphic_on': type,
-        'with_polymorphic': '*',
         '_polymorphic_map': TopicPolymorphicMap()
     }
 
@@ -60,6 +64,18 @@ def upgrade(engine, operations_factory):
             download_dir_column = Column('download_dir', String, nullable=True, server_default=None)
             operations.add_column(Topic.__tablename__, download_dir_column)
         version = 3
+    if version == 3:
+        with operations_factory() as operations:
+            check_interval_column = Column('check_interval', Integer, nullable=True)
+            next_check_at_column = Column('next_check_at', UTCDateTime, nullable=True)
+            operations.add_column(Topic.__tablename__, check_interval_column)
+            operations.add_column(Topic.__tablename__, next_check_at_column)
+        version = 4
+    if version == 4:
+        with operations_factory() as operations:
+            content_digest_column = Column('content_digest', String, nullable=True)
+            operations.add_column(Topic.__tablename__, content_digest_column)
+        version = 5
 
 
 def get_current_version(engine):
@@ -71,7 +87,11 @@ def get_current_version(engine):
         return 1
     if 'download_dir' not in topics.columns:
         return 2
-    return 3
+    if 'next_check_at' not in topics.columns:
+        return 3
+    if 'content_digest' not in topics.columns:
+        return 4
+    return 5
 
 
 add_upgrade(upgrade)
@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+DAY = timedelta(days=1).total_seconds()
+WEEK = timedelta(weeks=1).total_seconds()
+# topics older than this are treated as finished series
+WEEKLY_MAX_AGE = timedelta(weeks=5).total_seconds()
+MAX_CHECK_INTERVAL = DAY
+# check topic a little bit earlier, so it will be due on the next tick of the engine timer
+CHECK_TOLERANCE = 0.1
+
+
+def get_check_interval(last_update, now, base_interval):
+    """
+    Calculate how often topic should be checked by its last update time.
+
+    Recently updated topics are checked with base_interval.
+    Topics updated in last weeks are treated as weekly shows and are checked with base_interval
+    around the same weekday as their last update and less often between.
+    All other topics are checked less often the longer they wasn't updated, but at least once a day.
+
+    :type last_update: datetime.datetime | None
+    :type now: datetime.datetime
+    :param base_interval: engine execute interval in seconds
+    :rtype: int
+    """
+    if last_update is None:
+        return int(base_interval)
+
+    age = (now - last_update).total_seconds()
+    if age <= DAY:
+        return int(base_interval)
+
+    interval = age / 4
+    if age < WEEKLY_MAX_AGE:
+        offset = age % WEEK
+        if offset <= DAY or offset >= WEEK - DAY:
+            return int(base_interval)
+        interval = min(interval, WEEK - DAY - offset)
+
+    return int(max(base_interval, min(interval, MAX_CHECK_INTERVAL)))
+
+
+def get_next_check_at(checked_at, check_interval):
+    """
+    :type checked_at: datetime.datetime
+    :type check_interval: int
+    :rtype: datetime.datetime
+    """
+    return checked_at + timedelta(seconds=check_interval * (1 - CHECK_TOLERANCE))
@@ -5,8 +5,13 @@ import html
 import os
 import shutil
 import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from os import path
+from types import MappingProxyType
+
+import pytz
 
 import cloudscraper
 import requests
@@ -19,25 +24,28 @@ from cloudscraper.exceptions import CloudflareException
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from urllib3.util import Url
 
-from monitorrent.db import DBSession, row2dict, dict2row
+from monitorrent.db import DBSession, row2dict, dict2row, db_write
 from monitorrent.plugins import Topic
 from monitorrent.plugins.status import Status
+from monitorrent.plugins.check_schedule import get_check_interval, get_next_check_at
 from monitorrent.plugins.clients import TopicSettings
 from monitorrent.utils.bittorrent_ex import Torrent, is_torrent_content
 from monitorrent.utils.downloader import download
+from monitorrent.utils.http_cache import http_cache, get_request_url, get_content_digest
+from monitorrent.utils.pipeline import Pipeline, Stage
+from monitorrent.utils.circuit_breaker import CircuitBreakerOpen
+from monitorrent.utils.tracing import tracer
+from monitorrent.utils.deadline import Cancelled, DeadlineExceeded, deadline_scope, get_current_deadline
 from monitorrent.engine import Engine
 from future.utils import with_metaclass
 
 log = structlog.get_logger()
 
 
-class CloudflareChallengeSolverSettings(object):
-    def __init__(self, debug, timeout, record_video, record_har, keep_records):
-        self.debug = debug
-        self.timeout = timeout
-        self.record_video = record_video
-        self.record_har = record_har
-        self.keep_records = keep_records
+class CloudflareChallengeSolverSettings(namedtuple('CloudflareChallengeSolverSettings',
+                                                    ['debug', 'timeout', 'record_video', 'record_har',
+                                                     'keep_records'])):
+    __slots__ = ()
 
     def get_new_context_kwargs(self, video_folder):
         if not self.debug or video_folder is None:
@@ -53,14 +61,24 @@ class CloudflareChallengeSolverSettings(object):
         return kwargs
 
 
-class TrackerSettings(object):
-    def __init__(self, requests_timeout, proxies, cloudflare_challenge_solver_settings):
-        self.requests_timeout = requests_timeout
-        self.proxies = proxies
-        self.cloudflare_challenge_solver_settings = cloudflare_challenge_solver_settings
+class TrackerSettings(namedtuple('TrackerSettings',
+                                  ['requests_timeout', 'proxies', 'cloudflare_challenge_solver_settings',
+                                   'host_concurrency'])):
+    """
+    Immutable, the same instance is shared by all tracker threads of execute
+    """
+    __slots__ = ()
+
+    def __new__(cls, requests_timeout, proxies, cloudflare_challenge_solver_settings, host_concurrency=1):
+        if proxies is not None:
+            proxies = MappingProxyType(dict(proxies))
+        return super(TrackerSettings, cls).__new__(cls, requests_timeout, proxies,
+                                                   cloudflare_challenge_solver_settings, host_concurrency)
 
     def get_requests_kwargs(self):
-        return {'timeout': self.requests_timeout, 'proxies': self.proxies}
+        # requests adds environment proxies to passed dict, so every request gets own copy
+        proxies = dict(self.proxies) if self.proxies is not None else None
+        return {'timeout': self.requests_timeout, 'proxies': proxies}
 
 
 class TrackerPluginBase(with_metaclass(abc.ABCMeta, object)):
@@ -125,18 +143,26 @@ class TrackerPluginBase(with_metaclass(abc.ABCMeta, object)):
         if parsed_url is None:
             # TODO: Throw exception, because we shouldn't call add topic if we can't parse URL
             return False
-        with DBSession() as db:
+        def add(db):
             topic = self.topic_class(url=url)
             self._set_topic_params(url, parsed_url, topic, params)
             db.add(topic)
+        db_write(add)
         return True
 
-    def get_topics(self, ids):
+    def get_topics(self, ids, due_only=False):
+        """
+        :param ids: topic ids to return, all active topics if None or empty
+        :param due_only: return only active topics, which next check time is come
+        """
         with DBSession() as db:
             if ids is not None and len(ids) > 0:
                 filter_query = self.topic_class.id.in_(ids)
             else:
                 filter_query = self.topic_class.status.in_((Status.Ok, Status.Error))
+                if due_only:
+                    filter_query &= (self.topic_class.next_check_at == None) | \
+                                    (self.topic_class.next_check_at <= datetime.now(pytz.utc))
             filter_query &= self.topic_class.paused == False
             topics = db.query(self.topic_class)\
                 .filter(filter_query)\
@@ -144,12 +170,35 @@ class TrackerPluginBase(with_metaclass(abc.ABCMeta, object)):
             db.expunge_all()
         return topics
 
+    def update_check_schedule(self, topics, checked_at, base_interval, failed_ids=frozenset()):
+        """
+        Calculate check interval and next check time for checked topics from their last update
+
+        :type checked_at: datetime
+        :param base_interval: engine execute interval in seconds
+        :param failed_ids: ids of topics which check failed, they are checked again after base_interval,
+                           so transient error doesn't postpone slow topic for up to a day
+        """
+        ids = [topic.id for topic in topics]
+
+        def update_schedule(db):
+            for topic_id, last_update in db.query(Topic.id, Topic.last_update).filter(Topic.id.in_(ids)).all():
+                if topic_id in failed_ids:
+                    check_interval = base_interval
+                else:
+                    check_interval = get_check_interval(last_update, checked_at, base_interval)
+                db.query(Topic).filter(Topic.id == topic_id).update({
+                    Topic.check_interval: check_interval,
+                    Topic.next_check_at: get_next_check_at(checked_at, check_interval)
+                }, synchronize_session=False)
+        db_write(update_schedule)
+
     def save_topic(self, topic, last_update, status=Status.Ok):
         if not isinstance(topic, self.topic_class):
             raise Exception(u"Can't update topic of wrong class. Expected {0}, but was {1}"
                             .format(self.topic_class, topic.__class__))
 
-        with DBSession() as db:
+        def save(db):
             new_topic = topic
             if last_update is not None:
                 new_topic.last_update = last_update
@@ -157,11 +206,13 @@ class TrackerPluginBase(with_metaclass(abc.ABCMeta, object)):
             db.add(new_topic)
             db.flush()
             db.expunge(new_topic)
+        db_write(save)
 
     def save_status(self, topic_id, status):
-        with DBSession() as db:
+        def save(db):
             topic = db.query(self.topic_class).filter(Topic.id == topic_id).first()
             topic.status = status
+        db_write(save)
 
     def get_topic(self, id):
         with DBSession() as db:
@@ -174,12 +225,13 @@ class TrackerPluginBase(with_metaclass(abc.ABCMeta, object)):
             return data
 
     def update_topic(self, id, params):
-        with DBSession() as db:
+        def update(db):
             topic = db.query(self.topic_class).filter(Topic.id == id).first()
             if topic is None:
                 return False
             self._set_topic_params(None, None, topic, params)
-        return True
+            return True
+        return db_write(update)
 
     def get_topic_info(self, topic):
         """
@@ -202,6 +254,26 @@ class TrackerPluginBase(with_metaclass(abc.ABCMeta, object)):
         """
         """
 
+    def _execute_topics(self, topics, execute_topic):
+        """
+        Call execute_topic(index, topic) for every topic.
+        Topics are checked in parallel up to tracker_settings.host_concurrency at the same time.
+
+        :type topics: list
+        :type execute_topic: callable
+        """
+        host_concurrency = getattr(self.tracker_settings, 'host_concurrency', 1) or 1
+        if host_concurrency <= 1 or len(topics) <= 1:
+            for i in range(0, len(topics)):
+                execute_topic(i, topics[i])
+            return
+
+        with ThreadPoolExecutor(max_workers=min(host_concurrency, len(topics)),
+                                thread_name_prefix='topics') as executor:
+            futures = [executor.submit(execute_topic, i, topics[i]) for i in range(0, len(topics))]
+            for future in futures:
+                future.result()
+
     def _get_display_name(self, parsed_url):
         """
         :type parsed_url: dict
@@ -244,60 +316,217 @@ class ExecuteWithHashChangeMixin(TrackerPluginMixinBase):
         :return: None
         """
         with engine.start(len(topics)) as engine_topics:
-            for i in range(0, len(topics)):
-                topic = topics[i]
-                topic_name = topic.display_name
-                with engine_topics.start(i, topic_name) as engine_topic:
-                    changed = False
-                    if hasattr(self, 'check_changes'):
-                        changed = self.check_changes(topic)
-                        if not changed:
-                            continue
-
-                    prepared_request = self._prepare_request(topic)
-                    download_kwargs = dict(self.tracker_settings.get_requests_kwargs())
-                    if isinstance(prepared_request, tuple) and len(prepared_request) >= 2:
-                        if prepared_request[1] is not None:
-                            download_kwargs.update(prepared_request[1])
-                        prepared_request = prepared_request[0]
-                    response, filename = download(prepared_request, **download_kwargs)
-                    if hasattr(self, 'check_download'):
-                        status = self.check_download(response)
-                        if topic.status != status:
-                            self.save_status(topic.id, status)
-                            engine_topic.status_changed(topic.status, status)
-                        if status != Status.Ok:
-                            continue
-                    elif response.status_code != 200:
-                        raise Exception(u"Can't download url. Status: {}".format(response.status_code))
-                    if not filename:
-                        filename = topic_name
-                    torrent_content = response.content
-                    if not is_torrent_content(torrent_content):
-                        headers = ['{0}: {1}'.format(k, v) for k, v in six.iteritems(response.headers)]
-                        engine.failed(u'Downloaded content is not a torrent file.<br>\r\n'
-                                      u'Headers:<br>\r\n{0}'.format(u'<br>\r\n'.join(headers)))
-                        continue
-                    torrent = Torrent(torrent_content)
-                    old_hash = topic.hash
-                    if torrent.info_hash != old_hash:
-                        with engine_topic.start(1) as engine_downloads:
-                            try:
-                                last_update = engine_downloads.add_torrent(0, filename, torrent, old_hash,
-                                                                           TopicSettings.from_topic(topic))
-                                engine.downloaded(u"Torrent <b>{0}</b> was changed".format(topic_name), torrent_content)
-                                topic.hash = torrent.info_hash
-                                topic.last_update = last_update
-                                self.save_topic(topic, last_update, Status.Ok)
-                            except Exception as e:
-                                log.error("Error while add downloading torrent to client", topic_name=topic_name,
-                                          exception=str(e))
-                                engine.failed(u"Torrent <b>{0}</b> was changed, but can't be added, error: {1}"
-                                              .format(topic_name, str(e)))
-                    elif changed:
-                        engine.info(u"Torrent <b>{0}</b> was determined as changed, but torrent hash wasn't"
-                                    .format(topic_name))
-                        self.save_topic(topic, None, Status.Ok)
+            host_concurrency = getattr(self.tracker_settings, 'host_concurrency', 1) or 1
+            if host_concurrency <= 1 or len(topics) <= 1:
+                for i in range(0, len(topics)):
+                    self._execute_topic(i, topics[i], engine, engine_topics)
+            else:
+                self._execute_topics_pipeline(topics, engine, engine_topics, host_concurrency)
+        http_cache.flush()
+        log.info("HTTP cache stats", stats=http_cache.get_stats())
+
+    def _execute_topic(self, index, topic, engine, engine_topics):
+        """
+        :type index: int
+        :type engine: engine.EngineTracker
+        :type engine_topics: engine.EngineTopics
+        """
+        with engine_topics.start(index, topic.display_name) as engine_topic:
+            job = TopicExecuteJob(index, topic, engine, engine_topic)
+            if self._fetch_torrent(job) and self._decode_torrent(job):
+                self._add_torrent(job)
+
+    def _execute_topics_pipeline(self, topics, engine, engine_topics, host_concurrency):
+        """
+        Check topics in fetch -> decode -> add stages joined by bounded queues.
+        Page and torrent fetches run on host_concurrency network workers,
+        torrent decoding on one CPU worker and adds to torrent client are serialized on one worker.
+        """
+        def start(job):
+            job.engine_topic = engine_topics.start(job.index, job.topic.display_name).begin()
+            return job
+
+        def stage(func, finish_on_success=False):
+            def execute_stage(job):
+                if job.engine_topic is None:
+                    start(job)
+                # topic over its deadline is abandoned between stages
+                with deadline_scope(job.engine_topic.deadline) as deadline:
+                    if deadline is not None:
+                        deadline.check()
+                    if not func(job) or finish_on_success:
+                        job.finish()
+                        return None
+                return job
+            return execute_stage
+
+        def on_error(job, exc_type, exc_value, exc_tb):
+            if job.engine_topic is None:
+                # skipped topics are reported by engine_topics
+                if not isinstance(exc_value, (CircuitBreakerOpen, Cancelled, DeadlineExceeded)):
+                    engine_topics.failed(u"Failed while checking topics", exc_type, exc_value, exc_tb)
+                return
+            job.finish(exc_type, exc_value, exc_tb)
+
+        pipeline = Pipeline([Stage('fetch', stage(self._fetch_torrent), workers=host_concurrency),
+                             Stage('decode', stage(self._decode_torrent), workers=1),
+                             Stage('add', stage(self._add_torrent, True), workers=1)],
+                            on_error)
+        pipeline.run(TopicExecuteJob(i, topics[i], engine) for i in range(0, len(topics)))
+        for stats in pipeline.get_stats():
+            engine_topics.info(u"Stage <b>{name}</b>: {processed} topic(s) on {workers} worker(s), "
+                               u"queue depth max {max_queue_depth}/{queue_size}, average {avg_queue_depth:.1f}"
+                               .format(**stats))
+
+    def _fetch_torrent(self, job):
+        """
+        Check changes and download torrent file for topic
+
+        :type job: TopicExecuteJob
+        :return: True if torrent was downloaded and should be decoded
+        :rtype: bool
+        """
+        topic = job.topic
+        if hasattr(self, 'check_changes'):
+            with tracer.span('check_changes', 'tracker') as span:
+                job.changed = self.check_changes(topic)
+                span.set(changed=job.changed)
+            if not job.changed:
+                return False
+
+        with tracer.span('prepare_request', 'tracker'):
+            prepared_request = self._prepare_request(topic)
+        download_kwargs = dict(self.tracker_settings.get_requests_kwargs())
+        if isinstance(prepared_request, tuple) and len(prepared_request) >= 2:
+            if prepared_request[1] is not None:
+                download_kwargs.update(prepared_request[1])
+            prepared_request = prepared_request[0]
+        # torrent wasn't added yet, so it have to be downloaded even if it wasn't changed
+        job.url = get_request_url(prepared_request) if topic.hash is not None else None
+        if job.url is not None:
+            conditional_headers = http_cache.get_conditional_headers(job.url)
+            if isinstance(prepared_request, requests.PreparedRequest):
+                prepared_request.headers.update(conditional_headers)
+            elif len(conditional_headers) > 0:
+                download_kwargs['headers'] = dict(download_kwargs.get('headers') or {}, **conditional_headers)
+        job.request = prepared_request
+        with tracer.span('download', 'tracker') as span:
+            response, filename = download(prepared_request, **download_kwargs)
+            span.set(status=response.status_code)
+        if job.url is not None and http_cache.is_not_modified(job.url, response):
+            # stored validators are still valid, but changes found by check_changes have to be saved
+            self._torrent_not_changed(job)
+            return False
+        if hasattr(self, 'check_download'):
+            status = self.check_download(response)
+            if topic.status != status:
+                self.save_status(topic.id, status)
+                job.engine_topic.status_changed(topic.status, status)
+            if status != Status.Ok:
+                return False
+        elif response.status_code != 200:
+            raise Exception(u"Can't download url. Status: {}".format(response.status_code))
+        job.response = response
+        job.filename = filename or topic.display_name
+        return True
+
+    def _decode_torrent(self, job):
+        """
+        :type job: TopicExecuteJob
+        :return: True if torrent was changed and should be added to torrent client
+        :rtype: bool
+        """
+        topic = job.topic
+        response = job.response
+        torrent_content = response.content
+        job.content_digest = get_content_digest(torrent_content)
+        # the same bytes as already added torrent, there is no need to decode it again
+        if topic.hash is not None and topic.content_digest == job.content_digest:
+            self._torrent_not_changed(job)
+            return False
+        if not is_torrent_content(torrent_content):
+            headers = ['{0}: {1}'.format(k, v) for k, v in six.iteritems(response.headers)]
+            job.engine.failed(u'Downloaded content is not a torrent file.<br>\r\n'
+                              u'Headers:<br>\r\n{0}'.format(u'<br>\r\n'.join(headers)))
+            return False
+        with tracer.span('decode', 'tracker', size=len(torrent_content)):
+            job.torrent = Torrent(torrent_content)
+        if job.torrent.info_hash != topic.hash:
+            return True
+        if topic.content_digest != job.content_digest:
+            topic.content_digest = job.content_digest
+            self._save_content_digest(topic.id, job.content_digest)
+        self._torrent_not_changed(job)
+        return False
+
+    def _torrent_not_changed(self, job):
+        """
+        :type job: TopicExecuteJob
+        """
+        topic = job.topic
+        if job.url is not None and job.response is not None:
+            http_cache.store(job.url, job.response)
+        if job.changed:
+            job.engine.info(u"Torrent <b>{0}</b> was determined as changed, but torrent hash wasn't"
+                            .format(topic.display_name))
+            self.save_topic(topic, None, Status.Ok)
+
+    def _save_content_digest(self, topic_id, content_digest):
+        def save(db):
+            db.query(Topic).filter(Topic.id == topic_id).update({Topic.content_digest: content_digest},
+                                                                synchronize_session=False)
+        db_write(save)
+
+    def _add_torrent(self, job):
+        """
+        :type job: TopicExecuteJob
+        :rtype: bool
+        """
+        topic = job.topic
+        topic_name = topic.display_name
+        torrent = job.torrent
+        with job.engine_topic.start(1) as engine_downloads:
+            try:
+                last_update = engine_downloads.add_torrent(0, job.filename, torrent, topic.hash,
+                                                           TopicSettings.from_topic(topic))
+                job.engine.downloaded(u"Torrent <b>{0}</b> was changed".format(topic_name), torrent.raw_content)
+                topic.hash = torrent.info_hash
+                topic.content_digest = job.content_digest
+                topic.last_update = last_update
+                self.save_topic(topic, last_update, Status.Ok)
+                url = get_request_url(job.request)
+                if url is not None:
+                    http_cache.store(url, job.response)
+            except Exception as e:
+                log.error("Error while add downloading torrent to client", topic_name=topic_name,
+                          exception=str(e))
+                job.engine.failed(u"Torrent <b>{0}</b> was changed, but can't be added, error: {1}"
+                                  .format(topic_name, str(e)))
+        return True
+
+
+class TopicExecuteJob(object):
+    """State of one topic passed between ExecuteWithHashChangeMixin stages"""
+    def __init__(self, index, topic, engine, engine_topic=None):
+        """
+        :type index: int
+        :type engine: engine.EngineTracker
+        :type engine_topic: engine.EngineTopic | None
+        """
+        self.index = index
+        self.topic = topic
+        self.engine = engine
+        self.engine_topic = engine_topic
+        self.changed = False
+        self.request = None
+        self.url = None
+        self.response = None
+        self.content_digest = None
+        self.filename = None
+        self.torrent = None
+
+    def finish(self, exc_type=None, exc_value=None, exc_tb=None):
+        self.engine_topic.__exit__(exc_type, exc_value, exc_tb)
 
 
 class LoginResult(Enum):
@@ -377,9 +606,14 @@ class WithCredentialsMixin(with_metaclass(abc.ABCMeta, TrackerPluginMixinBase)):
         super(WithCredentialsMixin, self).execute(ids, engine)
 
     def _execute_login(self, engine):
-        if not self.verify():
+        with tracer.span('verify', 'tracker') as span:
+            verified = self.verify()
+            span.set(verified=verified)
+        if not verified:
             engine.info(u"Credentials/Settings are not valid\nTry login.")
-            login_result = self.login()
+            with tracer.span('login', 'tracker') as span:
+                login_result = self.login()
+                span.set(result=str(login_result))
             if login_result == LoginResult.CredentialsNotSpecified:
                 engine.info(u"Credentials not specified\nSkip plugin")
                 return False
@@ -418,7 +652,15 @@ def extract_cloudflare_credentials_and_headers(url: str, headers: dict, cookies:
         # If page doesn't have cloudflare, don't send new cookies and headers
         return headers, cookies
     except CloudflareException:
-        return asyncio.run(solve_challenge(url, settings))
+        # challenge solving can take minutes, so it is limited by deadline of checked topic
+        deadline = get_current_deadline()
+        timeout = deadline.limit_timeout(None) if deadline is not None else None
+        try:
+            return asyncio.run(asyncio.wait_for(solve_challenge(url, settings), timeout))
+        except asyncio.TimeoutError:
+            if deadline is not None:
+                deadline.check()
+            raise
 
 
 async def solve_challenge(url, settings: CloudflareChallengeSolverSettings):
@@ -10,6 +10,7 @@ from monitorrent.plugins import Topic
 from monitorrent.plugins.trackers import WithCredentialsMixin, ExecuteWithHashChangeMixin, TrackerPluginBase, \
     LoginResult
 from monitorrent.utils.soup import get_soup
+from monitorrent.utils.transport import transport
 
 PLUGIN_NAME = 'anidub.com'
 
@@ -63,7 +64,7 @@ class AnidubTracker(object):
         if match is None:
             return None
 
-        r = requests.get(url, allow_redirects=False, **self.tracker_settings.get_requests_kwargs())
+        r = transport.get(url, allow_redirects=False, settings=self.tracker_settings)
         soup = get_soup(r.text)
         title = soup.find('span', id='news-title')
         if title is None:
@@ -79,7 +80,7 @@ class AnidubTracker(object):
         return result
 
     def login(self, username, password):
-        s = Session()
+        s = transport.mount(Session(), self.root_url)
         data = {"login_name": username, "login_password": password, "login": "submit"}
         login_result = s.post(self.root_url, data, **self.tracker_settings.get_requests_kwargs())
         if not self._is_logged_in(login_result.text):
@@ -101,12 +102,12 @@ class AnidubTracker(object):
         cookies = self.get_cookies()
         if not cookies:
             return False
-        r = requests.get(self.root_url, cookies=cookies, **self.tracker_settings.get_requests_kwargs())
+        r = transport.get(self.root_url, cookies=cookies, settings=self.tracker_settings)
         return self._is_logged_in(r.text)
 
     def get_download_url(self, url, vformat):
         cookies = self.get_cookies()
-        page = requests.get(url, cookies=cookies, **self.tracker_settings.get_requests_kwargs())
+        page = transport.get(url, cookies=cookies, settings=self.tracker_settings)
         page_soup = get_soup(page.text)
         flist = self._find_format_list(page_soup)
         for f in flist:
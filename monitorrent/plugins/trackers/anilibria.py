@@ -11,6 +11,7 @@ from monitorrent.plugin_managers import register_plugin
 from monitorrent.plugins import Topic, Status
 from monitorrent.plugins.trackers import TrackerPluginBase, ExecuteWithHashChangeMixin
 from monitorrent.utils.soup import get_soup
+from monitorrent.utils.transport import transport
 
 PLUGIN_NAME = 'anilibria.tv'
 
@@ -70,7 +71,7 @@ def upgrade_0_to_1(operations_factory):
             try:
                 if tracker_settings is None:
                     tracker_settings = settings_manager.tracker_settings
-                response = requests.get(raw_topic['url'], **tracker_settings.get_requests_kwargs())
+                response = transport.get(raw_topic['url'], settings=tracker_settings)
                 soup = get_soup(response.text)
                 format_list = AnilibriaTvTracker._find_format_list(soup)
                 format_list.sort()
@@ -108,7 +109,7 @@ class AnilibriaTvTracker(object):
         if match is None:
             return None
 
-        r = requests.get(url, allow_redirects=True, **self.tracker_settings.get_requests_kwargs())
+        r = transport.get(url, allow_redirects=True, settings=self.tracker_settings)
         soup = get_soup(r.text)
 
         title = soup.title.string
@@ -130,7 +131,7 @@ class AnilibriaTvTracker(object):
         if match is None:
             return None
 
-        r = requests.get(url, allow_redirects=True, **self.tracker_settings.get_requests_kwargs())
+        r = transport.get(url, allow_redirects=True, settings=self.tracker_settings)
         soup = get_soup(r.text)
 
         flist = self._find_format_list(soup)
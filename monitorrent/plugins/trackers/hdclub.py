@@ -2,12 +2,12 @@
 # -*- coding: utf-8 -*-
 import re
 import six
-import requests
 from sqlalchemy import Column, Integer, String, ForeignKey
 from monitorrent.db import Base, DBSession, row2dict, dict2row
 from monitorrent.plugins import Topic
 from monitorrent.plugin_managers import register_plugin
 from monitorrent.utils.soup import get_soup
+from monitorrent.utils.transport import transport
 from monitorrent.plugins.trackers import TrackerPluginBase, ExecuteWithHashChangeMixin
 
 PLUGIN_NAME = 'hdclub.org'
@@ -48,7 +48,7 @@ class HdclubTracker(object):
         if match is None:
             return None
 
-        r = requests.get(url, allow_redirects=False, **self.tracker_settings.get_requests_kwargs())
+        r = transport.get(url, allow_redirects=False, settings=self.tracker_settings)
 
         soup = get_soup(r.text)
         if soup.h1 is None:
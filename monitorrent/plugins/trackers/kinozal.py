@@ -12,6 +12,7 @@ from monitorrent.db import Base, DBSession, UTCDateTime
 from monitorrent.plugins import Topic
 from monitorrent.plugin_managers import register_plugin
 from monitorrent.utils.soup import get_soup
+from monitorrent.utils.transport import transport
 from monitorrent.plugins.trackers import TrackerPluginBase, WithCredentialsMixin, ExecuteWithHashChangeMixin, LoginResult
 
 PLUGIN_NAME = 'kinozal.tv'
@@ -145,7 +146,7 @@ class KinozalTracker(object):
         if match is None:
             return None
 
-        r = requests.get(url, allow_redirects=False, **self.tracker_settings.get_requests_kwargs())
+        r = transport.get(url, allow_redirects=False, settings=self.tracker_settings)
 
         soup = get_soup(r.text)
         if soup.h1 is None:
@@ -158,7 +159,7 @@ class KinozalTracker(object):
         return {'original_name': title}
 
     def login(self, username, password):
-        s = Session()
+        s = transport.mount(Session(), self.login_url)
         data = {"username": username, "password": password, 'returnto': ''}
         login_result = s.post(self.login_url, data, **self.tracker_settings.get_requests_kwargs())
         if login_result.url.startswith(self.login_url):
@@ -180,8 +181,7 @@ class KinozalTracker(object):
         cookies = self.get_cookies()
         if not cookies:
             return False
-        profile_page_result = requests.get(self.profile_page, cookies=cookies,
-                                           **self.tracker_settings.get_requests_kwargs())
+        profile_page_result = transport.get(self.profile_page, cookies=cookies, settings=self.tracker_settings)
         return profile_page_result.url == self.profile_page
 
     def get_cookies(self):
@@ -197,7 +197,7 @@ class KinozalTracker(object):
         return match.group(1)
 
     def get_last_torrent_update(self, url):
-        response = requests.get(url, **self.tracker_settings.get_requests_kwargs())
+        response = transport.get(url, settings=self.tracker_settings)
         response.raise_for_status()
 
         soup = get_soup(response.text)
@@ -2,9 +2,9 @@
 import json
 import sys
 import re
+import threading
 from urllib.parse import urlparse
 
-import requests
 import cloudscraper
 import traceback
 import six
@@ -16,6 +16,7 @@ from monitorrent.plugin_managers import register_plugin
 from monitorrent.utils.soup import get_soup
 from monitorrent.utils.bittorrent_ex import Torrent, is_torrent_content
 from monitorrent.utils.downloader import download
+from monitorrent.utils.transport import transport
 from monitorrent.plugins import Topic
 from monitorrent.plugins.status import Status
 from monitorrent.plugins.trackers import TrackerPluginBase, WithCredentialsMixin, LoginResult, TrackerSettings, \
@@ -479,40 +480,57 @@ class LostFilmTVTracker(object):
         self.cookies = cookies or {}
         self.domain = domain or "www.lostfilm.tv"
         self.headers_cookies_updater = headers_cookies_updater
+        # topics are checked in parallel, they share session, headers and cookies updated by login and cloudflare
+        self._headers_lock = threading.RLock()
 
     def setup(self, session=None, headers=None, cookies=None, domain=None):
-        self.session = session
-        self.headers = headers or {}
-        self.cookies = cookies or {}
-        self.domain = domain or "www.lostfilm.tv"
+        with self._headers_lock:
+            self.session = session
+            self.headers = headers or {}
+            self.cookies = cookies or {}
+            self.domain = domain or "www.lostfilm.tv"
 
     def login(self, email, password, headers=None, cookies=None, domain=None):
-        self.headers = headers or {}
-        self.cookies = cookies or {}
-        self.domain = domain or "www.lostfilm.tv"
-        headers, cookies = update_headers_and_cookies_mixin(self, "https://" + self.domain)
+        with self._headers_lock:
+            self.headers = headers or {}
+            self.cookies = cookies or {}
+            self.domain = domain or "www.lostfilm.tv"
+            headers, cookies = update_headers_and_cookies_mixin(self, "https://" + self.domain)
 
-        params = {"act": "users", "type": "login", "mail": email, "pass": password, "rem": 1, "need_captcha": "", "captcha": ""}
-        response = requests.post("https://{domain}/ajaxik.users.php".format(domain=self.domain), params, headers=headers, cookies=cookies)
+            params = {"act": "users", "type": "login", "mail": email, "pass": password, "rem": 1,
+                      "need_captcha": "", "captcha": ""}
+            response = transport.post("https://{domain}/ajaxik.users.php".format(domain=self.domain), params,
+                                      headers=headers, cookies=cookies)
 
-        result = response.json()
-        if 'error' in result:
-            raise LostFilmTVLoginFailedException(result['error'])
-        if 'need_captcha' in result:
-            raise LostFilmTVLoginFailedException('Captcha requested. Nothing can do about it for now, sorry :(')
+            result = response.json()
+            if 'error' in result:
+                raise LostFilmTVLoginFailedException(result['error'])
+            if 'need_captcha' in result:
+                raise LostFilmTVLoginFailedException('Captcha requested. Nothing can do about it for now, sorry :(')
 
-        self.setup(response.cookies['lf_session'], headers, cookies, domain)
+            self.setup(response.cookies['lf_session'], headers, cookies, domain)
 
     def verify(self):
         cookies = self.get_cookies()
         if not cookies:
             return False
         my_settings_url = 'https://{domain}/my_settings'.format(domain=self.domain)
-        update_headers_and_cookies_mixin(self, my_settings_url)
-        r1 = requests.get(my_settings_url, headers=self.headers, cookies=self.get_cookies(),
-                          **self.tracker_settings.get_requests_kwargs())
+        headers, cookies = self._get_headers_and_cookies(my_settings_url)
+        r1 = transport.get(my_settings_url, headers=headers, cookies=cookies, settings=self.tracker_settings)
         return r1.url == my_settings_url and '<meta http-equiv="refresh" content="0; url=/">' not in r1.text
 
+    def _get_headers_and_cookies(self, url):
+        """
+        Update headers and cookies if url is protected by cloudflare,
+        only one topic solves challenge and others wait for its result
+
+        :return: copy of headers and cookies for request to url
+        :rtype: tuple[dict, dict]
+        """
+        with self._headers_lock:
+            update_headers_and_cookies_mixin(self, url)
+            return dict(self.headers), self.get_cookies()
+
     def get_cookies(self):
         new_cookies = dict(**self.cookies)
         if self.session:
@@ -532,10 +550,10 @@ class LostFilmTVTracker(object):
         if url is None:
             return None
 
-        update_headers_and_cookies_mixin(self, url)
+        headers, cookies = self._get_headers_and_cookies(url)
 
-        response = requests.get(url, headers=self.headers, cookies=self.get_cookies(), allow_redirects=False,
-                                **self.tracker_settings.get_requests_kwargs())
+        response = transport.get(url, headers=headers, cookies=cookies, allow_redirects=False,
+                                 settings=self.tracker_settings)
         if response.status_code != 200 or response.url != url \
                 or '<meta http-equiv="refresh" content="0; url=/">' in response.text:
             return response
@@ -609,20 +627,19 @@ class LostFilmTVTracker(object):
 
             return LostFileDownloadInfo(LostFilmQuality.parse(quality), download_url)
 
-        update_headers_and_cookies_mixin(self, url)
+        headers, cookies = self._get_headers_and_cookies(url)
 
         download_url_pattern = 'https://{domain}/v_search.php?a={cat}{season:03d}{episode:03d}'
         download_redirect_url = download_url_pattern.format(cat=cat, season=season, episode=episode, domain=self.domain)
-        session = requests.session()
-        download_redirect = requests.get(download_redirect_url, headers=self.headers, cookies=self.get_cookies(),
-                                         **self.tracker_settings.get_requests_kwargs())
+        download_redirect = transport.get(download_redirect_url, headers=headers, cookies=cookies,
+                                          settings=self.tracker_settings)
 
         soup = get_soup(download_redirect.text)
         meta_content = soup.find('meta').attrs['content']
         download_page_url = meta_content.split(';')[1].strip()[4:]
 
-        download_page = session.get(download_page_url, headers=self.headers, cookies=self.get_cookies(),
-                                    **self.tracker_settings.get_requests_kwargs())
+        download_page = transport.get(download_page_url, headers=headers, cookies=cookies,
+                                      settings=self.tracker_settings)
 
         soup = get_soup(download_page.text)
         return list(map(parse_download, soup.find_all('div', class_='inner-box--item')))
@@ -769,11 +786,18 @@ class LostFilmPlugin(WithCredentialsMixin, TrackerPluginBase):
         return settings
 
     def prepare_topic(self, topic: LostFilmTVSeries):
+        self.prepare_topics([topic])
+
+    def prepare_topics(self, topics):
+        """
+        :type topics: list[LostFilmTVSeries]
+        """
         with DBSession() as db:
             cred = db.query(self.credentials_class).first()
             if cred is None:
                 return
             self.tracker.domain = cred.domain or 'www.lostfilm.tv'
+        for topic in topics:
             topic.url = self.tracker.replace_domain(topic.url)
 
     def get_thumbnail_url(self, topic: LostFilmTVSeries):
@@ -838,64 +862,70 @@ class LostFilmPlugin(WithCredentialsMixin, TrackerPluginBase):
             return
 
         with engine.start(len(topics)) as engine_topics:
-            for i in range(0, len(topics)):
-                topic = topics[i]
-                display_name = topic.display_name
-                with engine_topics.start(i, display_name) as engine_topic:
-                    episodes = self._prepare_request(topic)
-                    status = Status.Ok
-                    if isinstance(episodes, Response):
-                        status = self.check_download(episodes)
-
-                    if topic.status != status:
-                        self.save_topic(topic, None, status)
-                        engine_topic.status_changed(topic.status, status)
-
-                    if status != Status.Ok:
-                        continue
+            self._execute_topics(topics, lambda i, topic: self._execute_topic(i, topic, engine, engine_topics))
 
-                    if episodes is None or len(episodes) == 0:
-                        engine_topic.info(u"Series <b>{0}</b> not changed".format(display_name))
-                        continue
+    def _execute_topic(self, index, topic, engine, engine_topics):
+        """
+        :type index: int
+        :type engine: engine.EngineTracker
+        :type engine_topics: engine.EngineTopics
+        """
+        display_name = topic.display_name
+        with engine_topics.start(index, display_name) as engine_topic:
+            episodes = self._prepare_request(topic)
+            status = Status.Ok
+            if isinstance(episodes, Response):
+                status = self.check_download(episodes)
+
+            if topic.status != status:
+                self.save_topic(topic, None, status)
+                engine_topic.status_changed(topic.status, status)
+
+            if status != Status.Ok:
+                return
 
-                    with engine_topic.start(len(episodes)) as engine_downloads:
-                        for e in range(0, len(episodes)):
-                            info, download_info = episodes[e]
-
-                            if download_info is None:
-                                engine_downloads.failed(u'Failed get quality "{0}" for series: {1}'
-                                                        .format(topic.quality, html.escape(display_name)))
-                                # Should fail to get quality be treated as NotFound?
-                                self.save_topic(topic, None, Status.Error)
-                                break
-
-                            try:
-                                response, filename = download(download_info.download_url,
-                                                              **self.tracker_settings.get_requests_kwargs())
-                                if response.status_code != 200:
-                                    raise Exception(u"Can't download url. Status: {}".format(response.status_code))
-                            except Exception as e:
-                                engine_downloads.failed(u"Failed to download from <b>{0}</b>.\nReason: {1}"
-                                                        .format(download_info.download_url, html.escape(str(e))))
-                                self.save_topic(topic, None, Status.Error)
-                                continue
-                            if not filename:
-                                filename = display_name
-                            torrent_content = response.content
-                            if not is_torrent_content(torrent_content):
-                                headers = ['{0}: {1}'.format(k, v) for k, v in six.iteritems(response.headers)]
-                                engine.failed(u'Downloaded content is not a torrent file.<br>\r\n'
-                                              u'Headers:<br>\r\n{0}'.format(u'<br>\r\n'.join(headers)))
-                                continue
-                            torrent = Torrent(torrent_content)
-                            topic.season = info.season
-                            topic.episode = info.number
-                            last_update = engine_downloads.add_torrent(e, filename, torrent, None,
-                                                                       TopicSettings.from_topic(topic))
-                            engine_downloads.downloaded(u'Download new series: {0} ({1}, {2})'
-                                                        .format(display_name, info.season, info.number),
-                                                        torrent_content)
-                            self.save_topic(topic, last_update, Status.Ok)
+            if episodes is None or len(episodes) == 0:
+                engine_topic.info(u"Series <b>{0}</b> not changed".format(display_name))
+                return
+
+            with engine_topic.start(len(episodes)) as engine_downloads:
+                for e in range(0, len(episodes)):
+                    info, download_info = episodes[e]
+
+                    if download_info is None:
+                        engine_downloads.failed(u'Failed get quality "{0}" for series: {1}'
+                                                .format(topic.quality, html.escape(display_name)))
+                        # Should fail to get quality be treated as NotFound?
+                        self.save_topic(topic, None, Status.Error)
+                        break
+
+                    try:
+                        response, filename = download(download_info.download_url,
+                                                      **self.tracker_settings.get_requests_kwargs())
+                        if response.status_code != 200:
+                            raise Exception(u"Can't download url. Status: {}".format(response.status_code))
+                    except Exception as e:
+                        engine_downloads.failed(u"Failed to download from <b>{0}</b>.\nReason: {1}"
+                                                .format(download_info.download_url, html.escape(str(e))))
+                        self.save_topic(topic, None, Status.Error)
+                        continue
+                    if not filename:
+                        filename = display_name
+                    torrent_content = response.content
+                    if not is_torrent_content(torrent_content):
+                        headers = ['{0}: {1}'.format(k, v) for k, v in six.iteritems(response.headers)]
+                        engine.failed(u'Downloaded content is not a torrent file.<br>\r\n'
+                                      u'Headers:<br>\r\n{0}'.format(u'<br>\r\n'.join(headers)))
+                        continue
+                    torrent = Torrent(torrent_content)
+                    topic.season = info.season
+                    topic.episode = info.number
+                    last_update = engine_downloads.add_torrent(e, filename, torrent, None,
+                                                               TopicSettings.from_topic(topic))
+                    engine_downloads.downloaded(u'Download new series: {0} ({1}, {2})'
+                                                .format(display_name, info.season, info.number),
+                                                torrent_content)
+                    self.save_topic(topic, last_update, Status.Ok)
 
     def get_topic_info(self, topic):
         if topic.season and topic.episode:
@@ -12,6 +12,7 @@ from monitorrent.plugins import Topic
 from monitorrent.plugin_managers import register_plugin
 from monitorrent.utils.soup import get_soup
 from monitorrent.utils.bittorrent_ex import Torrent
+from monitorrent.utils.transport import transport
 from monitorrent.plugins.trackers import TrackerPluginBase, WithCredentialsMixin, ExecuteWithHashChangeMixin, LoginResult
 from urllib.parse import urlparse, unquote
 from phpserialize import loads
@@ -72,7 +73,7 @@ class NnmClubTracker(object):
         if not parsed_url.path == '/forum/viewtopic.php':
             return None
 
-        r = requests.get(url, allow_redirects=False, **self.tracker_settings.get_requests_kwargs())
+        r = transport.get(url, allow_redirects=False, settings=self.tracker_settings)
         if r.status_code != 200:
             return None
         soup = get_soup(r.text)
@@ -85,7 +86,7 @@ class NnmClubTracker(object):
         return self._get_title(title)
 
     def login(self, username, password):
-        s = Session()
+        s = transport.mount(Session(), self._login_url)
         data = {"username": username, "password": password, "autologin": "on", "login": "%C2%F5%EE%E4"}
         login_result = s.post(self._login_url, data, **self.tracker_settings.get_requests_kwargs())
         if login_result.url.startswith(self._login_url):
@@ -103,8 +104,7 @@ class NnmClubTracker(object):
         if not cookies:
             return False
         profile_page_url = self._profile_page.format(self.user_id)
-        profile_page_result = requests.get(profile_page_url, cookies=cookies,
-                                           **self.tracker_settings.get_requests_kwargs())
+        profile_page_result = transport.get(profile_page_url, cookies=cookies, settings=self.tracker_settings)
         return profile_page_result.url == profile_page_url
 
     def get_cookies(self):
@@ -114,7 +114,7 @@ class NnmClubTracker(object):
 
     def get_download_url(self, url):
         cookies = self.get_cookies()
-        page = requests.get(url, cookies=cookies, **self.tracker_settings.get_requests_kwargs())
+        page = transport.get(url, cookies=cookies, settings=self.tracker_settings)
         page_soup = get_soup(page.text, 'html5lib' if sys.platform == 'win32' else None)
         anchors = page_soup.find_all("a")
         da = list(filter(lambda tag: tag.has_attr('href') and tag.attrs['href'].startswith("download.php?id="),
@@ -4,11 +4,11 @@ from future import standard_library
 standard_library.install_aliases()
 from builtins import object
 import re
-import requests
 from sqlalchemy import Column, Integer, String, MetaData, Table, ForeignKey
 from monitorrent.db import row2dict, UTCDateTime
 from monitorrent.utils.soup import get_soup
 from monitorrent.utils.bittorrent_ex import Torrent
+from monitorrent.utils.transport import transport
 from monitorrent.plugin_managers import register_plugin
 from monitorrent.plugins import Topic
 from monitorrent.plugins.status import Status
@@ -117,7 +117,7 @@ class RutorOrgTracker(object):
         if not self.can_parse_url(url):
             return None
 
-        r = requests.get(url, **self.tracker_settings.get_requests_kwargs())
+        r = transport.get(url, settings=self.tracker_settings)
         if r.status_code != 200 or (r.url != url and not self.can_parse_url(r.url)):
             return None
         r.encoding = 'utf-8'
@@ -10,6 +10,7 @@ from monitorrent.db import Base, DBSession
 from monitorrent.plugins import Topic
 from monitorrent.plugin_managers import register_plugin
 from monitorrent.utils.soup import get_soup
+from monitorrent.utils.transport import transport
 from monitorrent.plugins.trackers import TrackerPluginBase, WithCredentialsMixin, ExecuteWithHashChangeMixin, \
     LoginResult, TrackerSettings, update_headers_and_cookies_mixin
 
@@ -94,7 +95,7 @@ class RutrackerTracker(object):
         if match is None:
             return None
 
-        r = requests.get(url, allow_redirects=False, **self.tracker_settings.get_requests_kwargs())
+        r = transport.get(url, allow_redirects=False, settings=self.tracker_settings)
 
         soup = get_soup(r.text)
         if soup.h1 is None:
@@ -115,7 +116,7 @@ class RutrackerTracker(object):
         password_q = password.encode('windows-1251')
         data = {"login_username": username_q, "login_password": password_q, 'login': u'%E2%F5%EE%E4'}
 
-        s = Session()
+        s = transport.mount(Session(), self.login_url)
         kwargs = {}
         if self.tracker_settings:
             kwargs = self.tracker_settings.get_requests_kwargs()
@@ -140,8 +141,7 @@ class RutrackerTracker(object):
         cookies = self.get_cookies()
         if not cookies:
             return False
-        profile_page_result = requests.get(self.profile_page, cookies=cookies,
-                                           **self.tracker_settings.get_requests_kwargs())
+        profile_page_result = transport.get(self.profile_page, cookies=cookies, settings=self.tracker_settings)
         return profile_page_result.url == self.profile_page
 
     def get_cookies(self):
@@ -12,6 +12,7 @@ from monitorrent.plugins import Topic
 from monitorrent.plugin_managers import register_plugin
 from monitorrent.utils.soup import get_soup
 from monitorrent.utils.bittorrent_ex import Torrent
+from monitorrent.utils.transport import transport
 from monitorrent.plugins.trackers import TrackerPluginBase, WithCredentialsMixin, ExecuteWithHashChangeMixin, LoginResult
 
 PLUGIN_NAME = 'tapochek.net'
@@ -70,7 +71,7 @@ class TapochekNetTracker(object):
         # without slash response gets fucked up
         if not url.endswith("/"):
             url += "/"
-        r = requests.get(url, allow_redirects=False, **self.tracker_settings.get_requests_kwargs())
+        r = transport.get(url, allow_redirects=False, settings=self.tracker_settings)
 
         soup = get_soup(r.content)
         if soup.h1 is None:
@@ -85,7 +86,7 @@ class TapochekNetTracker(object):
         return {'original_name': title}
 
     def login(self, username, password):
-        s = Session()
+        s = transport.mount(Session(), self.login_url)
         data = {"login_username": username, "login_password": password, 'login': u'Âõîä'.encode("cp1252")}
         login_result = s.post(self.login_url, data, **self.tracker_settings.get_requests_kwargs())
         if login_result.url.startswith(self.login_url):
@@ -107,8 +108,7 @@ class TapochekNetTracker(object):
         if not cookies:
             return False
         profile_page_url = self.profile_page.format(self.uid)
-        profile_page_result = requests.get(profile_page_url, cookies=cookies,
-                                           **self.tracker_settings.get_requests_kwargs())
+        profile_page_result = transport.get(profile_page_url, cookies=cookies, settings=self.tracker_settings)
         return profile_page_result.url == profile_page_url
 
     def get_cookies(self):
@@ -125,7 +125,7 @@ class TapochekNetTracker(object):
 
     def get_download_url(self, url):
         cookies = self.get_cookies()
-        page = requests.get(url, cookies=cookies, **self.tracker_settings.get_requests_kwargs())
+        page = transport.get(url, cookies=cookies, settings=self.tracker_settings)
         page_soup = get_soup(page.content)
         download = page_soup.find("a", href=re.compile("download"))
         return "http://tapochek.net/"+download.attrs['href']
@@ -4,7 +4,6 @@ standard_library.install_aliases()
 from builtins import object
 import re
 from urllib.parse import urlparse
-import requests
 from sqlalchemy import Column, Integer, String, MetaData, Table, ForeignKey
 from monitorrent.db import row2dict
 from monitorrent.plugin_managers import register_plugin
@@ -12,6 +11,7 @@ from monitorrent.plugins import Topic
 from monitorrent.plugins.trackers import TrackerPluginBase, ExecuteWithHashChangeMixin
 from monitorrent.utils.soup import get_soup
 from monitorrent.utils.bittorrent_ex import Torrent
+from monitorrent.utils.transport import transport
 
 PLUGIN_NAME = 'unionpeer.org'
 
@@ -85,7 +85,7 @@ class UnionpeerOrgTracker(object):
         if match is None:
             return None
 
-        r = requests.get(url, allow_redirects=True, **self.tracker_settings.get_requests_kwargs())
+        r = transport.get(url, allow_redirects=True, settings=self.tracker_settings)
         soup = get_soup(r.content)
         if soup.h2 is None:
             # rutracker doesn't return 404 for not existing topic
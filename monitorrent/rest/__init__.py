@@ -141,6 +141,18 @@ class AuthMiddleware(object):
             cls.auth_enabled = None
 
 
+# noinspection PyUnusedLocal
+class EngineStateNotAvailable(object):
+    """
+    Route of engine state in web process of split mode (role 'web').
+    Metrics, transport stats and execute events are kept in memory of engine worker process,
+    which has no HTTP server, so web process answers 503 instead of its own empty state.
+    """
+    def on_get(self, req, resp):
+        raise falcon.HTTPServiceUnavailable('Not available in web role',
+                                            'Engine runs in worker process, its state is not available here')
+
+
 def no_auth(obj):
     """decorator for disable resource authentication"""
     obj.__no_auth__ = True
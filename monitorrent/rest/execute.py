@@ -1,13 +1,20 @@
 from builtins import object
+import json
 import time
 import falcon
 import structlog
 
 from monitorrent.plugins.status import Status
 from monitorrent.engine import EngineRunner, ExecuteLogManager
+from monitorrent.rest import MonitorrentJSONEncoder
+from monitorrent.utils.metrics import long_poll_waiters
 
 log = structlog.get_logger()
 
+LONG_POLL_TIMEOUT = 30
+# engine can run in other process, its events aren't published here, so logs are rechecked anyway
+RECHECK_INTERVAL = 1
+
 
 # noinspection PyUnusedLocal
 class ExecuteLogCurrent(object):
@@ -23,12 +30,18 @@ class ExecuteLogCurrent(object):
 
             start = time.time()
             result = []
-            while True:
-                result = self.log_manager.get_current_execute_log_details(after) or []
-                if len(result) == 0 and time.time() - start < 30:
-                    time.sleep(0.1)
-                else:
-                    break
+            long_poll_waiters.inc()
+            try:
+                while True:
+                    last_event_id = self.log_manager.events.last_id
+                    result = self.log_manager.get_current_execute_log_details(after) or []
+                    remaining = LONG_POLL_TIMEOUT - (time.time() - start)
+                    if len(result) == 0 and remaining > 0:
+                        self.log_manager.events.wait(last_event_id, min(remaining, RECHECK_INTERVAL))
+                    else:
+                        break
+            finally:
+                long_poll_waiters.dec()
         except Exception as e:
             log.error("An error has occurred", exception=str(e))
             raise falcon.HTTPInternalServerError(title='A server has encountered an error', description=str(e))
@@ -36,6 +49,79 @@ class ExecuteLogCurrent(object):
         resp.json = {'is_running': self.log_manager.is_running(), 'logs': result}
 
 
+# noinspection PyUnusedLocal
+class ExecuteEvents(object):
+    """
+    Stream of execute events in Server-Sent Events format: started, log, progress and finished.
+
+    First event of every stream is state of engine. Stream is closed after STREAM_DURATION seconds
+    and browser reconnects with Last-Event-ID header after RECONNECT_DELAY milliseconds,
+    so no events are lost between streams.
+    Every open stream holds one server thread, so streams are as short as long polls they replace.
+    If events after Last-Event-ID were already dropped or server was restarted since then,
+    reset event is sent and logs have to be reloaded.
+    """
+    HEARTBEAT_INTERVAL = 15
+    STREAM_DURATION = LONG_POLL_TIMEOUT
+    RECONNECT_DELAY = 1000
+
+    def __init__(self, log_manager):
+        """
+        :type log_manager: ExecuteLogManager
+        """
+        self.log_manager = log_manager
+
+    def on_get(self, req, resp):
+        last_event_id = req.get_header('Last-Event-ID')
+        if last_event_id is not None and not last_event_id.isdigit():
+            raise falcon.HTTPBadRequest("wrong Last-Event-ID", "Last-Event-ID should be int")
+
+        resp.content_type = 'text/event-stream'
+        resp.set_header('Cache-Control', 'no-cache')
+        resp.set_header('X-Accel-Buffering', 'no')
+        resp.stream = self._stream(int(last_event_id) if last_event_id is not None else None)
+
+    def _stream(self, last_event_id):
+        events = self.log_manager.events
+        long_poll_waiters.inc()
+        try:
+            if last_event_id is None:
+                last_event_id = events.last_id
+            elif events.is_lost(last_event_id):
+                yield self._format_event(None, 'reset', None)
+                if last_event_id > events.last_id:
+                    # event ids of restarted server start from 1, all its kept events are new for client
+                    last_event_id = 0
+            yield self._format_event(None, 'state', {'is_running': self.log_manager.is_running(),
+                                                     'execute_id': self.log_manager.get_current_execute_id()},
+                                     retry=self.RECONNECT_DELAY)
+
+            start = time.time()
+            while True:
+                remaining = self.STREAM_DURATION - (time.time() - start)
+                if remaining <= 0:
+                    break
+                published = events.wait(last_event_id, min(remaining, self.HEARTBEAT_INTERVAL))
+                if len(published) == 0:
+                    yield b': heartbeat\n\n'
+                for event_id, event_type, data in published:
+                    yield self._format_event(event_id, event_type, data)
+                    last_event_id = event_id
+        finally:
+            long_poll_waiters.dec()
+
+    @staticmethod
+    def _format_event(event_id, event_type, data, retry=None):
+        lines = []
+        if retry is not None:
+            lines.append(u'retry: {0}'.format(retry))
+        if event_id is not None:
+            lines.append(u'id: {0}'.format(event_id))
+        lines.append(u'event: {0}'.format(event_type))
+        lines.append(u'data: {0}'.format(json.dumps(data, cls=MonitorrentJSONEncoder, ensure_ascii=False)))
+        return (u'\n'.join(lines) + u'\n\n').encode('utf-8')
+
+
 # noinspection PyUnusedLocal
 class ExecuteCall(object):
     def __init__(self, engine_runner):
@@ -69,3 +155,16 @@ class ExecuteCall(object):
         except Exception as e:
             log.error("An error has occurred", exception=str(e))
             raise
+
+
+# noinspection PyUnusedLocal
+class ExecuteCancel(object):
+    def __init__(self, engine_runner):
+        """
+        :type engine_runner: EngineRunner
+        """
+        self.engine_runner = engine_runner
+
+    def on_post(self, req, resp):
+        if not self.engine_runner.cancel():
+            raise falcon.HTTPNotFound(title="Execute is not running", description="There is no running execute to cancel")
@@ -13,8 +13,9 @@ class ExecuteLogs(object):
     def on_get(self, req, resp):
         take = req.get_param_as_int('take', required=True, min=1, max=100)
         skip = req.get_param_as_int('skip', required=False, min=0) or 0
+        before = req.get_param_as_int('before', required=False, min=1)
 
-        executes, count = self.log_manager.get_log_entries(skip, take)
+        executes, count = self.log_manager.get_log_entries(skip, take, before)
 
         resp.json = {
             'data': executes,
@@ -2,6 +2,8 @@ from builtins import object
 import falcon
 import time
 from monitorrent.engine import ExecuteLogManager
+from monitorrent.rest.execute import LONG_POLL_TIMEOUT, RECHECK_INTERVAL
+from monitorrent.utils.metrics import long_poll_waiters
 
 
 # noinspection PyUnusedLocal
@@ -23,12 +25,18 @@ class ExecuteLogsDetails(object):
         if after is not None:
             start = time.time()
             result = []
-            while True:
-                result = self.log_manager.get_execute_log_details(execute_id, after) or []
-                if len(result) == 0 and time.time() - start < 30 and self.log_manager.is_running(execute_id):
-                    time.sleep(0.1)
-                else:
-                    break
+            long_poll_waiters.inc()
+            try:
+                while True:
+                    last_event_id = self.log_manager.events.last_id
+                    result = self.log_manager.get_execute_log_details(execute_id, after) or []
+                    remaining = LONG_POLL_TIMEOUT - (time.time() - start)
+                    if len(result) == 0 and remaining > 0 and self.log_manager.is_running(execute_id):
+                        self.log_manager.events.wait(last_event_id, min(remaining, RECHECK_INTERVAL))
+                    else:
+                        break
+            finally:
+                long_poll_waiters.dec()
         else:
             result = self.log_manager.get_execute_log_details(execute_id)
 
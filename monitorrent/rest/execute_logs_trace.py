@@ -0,0 +1,24 @@
+import falcon
+from monitorrent.engine import ExecuteLogManager
+
+
+# noinspection PyUnusedLocal
+class ExecuteLogsTrace(object):
+    def __init__(self, log_manager):
+        """
+        :type log_manager: ExecuteLogManager
+        """
+        self.log_manager = log_manager
+
+    def on_get(self, req, resp, execute_id):
+        if execute_id is None or not execute_id.isdigit():
+            raise falcon.HTTPBadRequest("wrong execute_id", "execute_id schould be specified and schould be int")
+
+        execute_id = int(execute_id)
+
+        trace = self.log_manager.get_execute_trace(execute_id)
+        if trace is None:
+            raise falcon.HTTPNotFound(title='Trace for execute {0} not found'.format(execute_id))
+
+        resp.set_header('Content-Disposition', 'attachment; filename="execute-{0}.trace.json"'.format(execute_id))
+        resp.json = trace
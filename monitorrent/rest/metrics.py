@@ -0,0 +1,16 @@
+from monitorrent.utils.metrics import MetricsRegistry
+
+
+# noinspection PyUnusedLocal
+class Metrics(object):
+    def __init__(self, registry, auth=True):
+        """
+        :type registry: MetricsRegistry
+        :param auth: if False metrics are available without authentication, for Prometheus scraper
+        """
+        self.registry = registry
+        self.__no_auth__ = not auth
+
+    def on_get(self, req, resp):
+        resp.content_type = MetricsRegistry.CONTENT_TYPE
+        resp.body = self.registry.render()
@@ -1,16 +1,27 @@
 from builtins import object
 import falcon
+import six
+from monitorrent.settings_manager import SettingsManager
 
 
 # noinspection PyUnusedLocal
 class SettingsExecute(object):
-    def __init__(self, engine_runner):
+    def __init__(self, engine_runner, settings_manager):
+        """
+        :type settings_manager: SettingsManager
+        """
         self.engine_runner = engine_runner
+        self.settings_manager = settings_manager
 
     def on_get(self, req, resp):
         resp.json = {
             "interval": self.engine_runner.interval,
-            "last_execute": self.engine_runner.last_execute
+            "last_execute": self.engine_runner.last_execute,
+            "trackers_concurrency": self.settings_manager.trackers_concurrency,
+            "host_concurrency": self.settings_manager.host_concurrency,
+            "execute_timeout": self.settings_manager.execute_timeout,
+            "topic_timeout": self.settings_manager.topic_timeout,
+            "trace": self.settings_manager.execute_trace_enabled
         }
 
     def on_put(self, req, resp):
@@ -23,3 +34,64 @@ class SettingsExecute(object):
 
         self.engine_runner.interval = int(settings['interval'])
         resp.status = falcon.HTTP_NO_CONTENT
+
+    def on_patch(self, req, resp):
+        if req.json is None or len(req.json) == 0:
+            raise falcon.HTTPBadRequest('BodyRequired', 'Expecting not empty JSON body')
+
+        interval = req.json.get('interval')
+        if interval is not None and not self._is_positive_int(interval):
+            raise falcon.HTTPBadRequest('WrongValue', '"interval" have to be positive int')
+
+        trackers_concurrency = req.json.get('trackers_concurrency')
+        if trackers_concurrency is not None and not self._is_positive_int(trackers_concurrency):
+            raise falcon.HTTPBadRequest('WrongValue', '"trackers_concurrency" have to be positive int')
+
+        host_concurrency = req.json.get('host_concurrency')
+        if host_concurrency is not None and not self._is_positive_int(host_concurrency):
+            raise falcon.HTTPBadRequest('WrongValue', '"host_concurrency" have to be positive int')
+
+        execute_timeout = req.json.get('execute_timeout')
+        if execute_timeout is not None and not self._is_non_negative_int(execute_timeout):
+            raise falcon.HTTPBadRequest('WrongValue', '"execute_timeout" have to be non negative int')
+
+        topic_timeout = req.json.get('topic_timeout')
+        if topic_timeout is not None and not self._is_non_negative_int(topic_timeout):
+            raise falcon.HTTPBadRequest('WrongValue', '"topic_timeout" have to be non negative int')
+
+        trace = req.json.get('trace')
+        if trace is not None and not isinstance(trace, bool):
+            raise falcon.HTTPBadRequest('WrongValue', '"trace" have to be bool')
+
+        if interval is not None:
+            self.engine_runner.interval = interval
+
+        if trackers_concurrency is not None:
+            if self.settings_manager.trackers_concurrency != trackers_concurrency:
+                self.settings_manager.trackers_concurrency = trackers_concurrency
+
+        if host_concurrency is not None:
+            if self.settings_manager.host_concurrency != host_concurrency:
+                self.settings_manager.host_concurrency = host_concurrency
+
+        if execute_timeout is not None:
+            if self.settings_manager.execute_timeout != execute_timeout:
+                self.settings_manager.execute_timeout = execute_timeout
+
+        if topic_timeout is not None:
+            if self.settings_manager.topic_timeout != topic_timeout:
+                self.settings_manager.topic_timeout = topic_timeout
+
+        if trace is not None:
+            if self.settings_manager.execute_trace_enabled != trace:
+                self.settings_manager.execute_trace_enabled = trace
+
+        resp.status = falcon.HTTP_NO_CONTENT
+
+    @staticmethod
+    def _is_positive_int(value):
+        return isinstance(value, six.integer_types) and not isinstance(value, bool) and value > 0
+
+    @staticmethod
+    def _is_non_negative_int(value):
+        return isinstance(value, six.integer_types) and not isinstance(value, bool) and value >= 0
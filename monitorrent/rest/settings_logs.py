@@ -13,7 +13,8 @@ class SettingsLogs(object):
         self.settings_manager = settings_manager
 
     def on_get(self, req, resp):
-        resp.json = {'interval': self.settings_manager.remove_logs_interval}
+        resp.json = {'interval': self.settings_manager.remove_logs_interval,
+                     'archive_interval': self.settings_manager.archive_logs_interval}
 
     def on_put(self, req, resp):
         if req.json is None:
@@ -23,5 +24,12 @@ class SettingsLogs(object):
         if interval is None or not isinstance(interval, six.integer_types):
             raise falcon.HTTPBadRequest('WrongValue', '"interval" is required and have to be int')
 
+        archive_interval = req.json.get('archive_interval')
+        if archive_interval is not None and (not isinstance(archive_interval, six.integer_types) or
+                                             isinstance(archive_interval, bool) or archive_interval < 0):
+            raise falcon.HTTPBadRequest('WrongValue', '"archive_interval" have to be non negative int')
+
         self.settings_manager.remove_logs_interval = interval
+        if archive_interval is not None:
+            self.settings_manager.archive_logs_interval = archive_interval
         resp.status = falcon.HTTP_NO_CONTENT
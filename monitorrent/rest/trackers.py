@@ -3,18 +3,24 @@ from builtins import object
 import falcon
 from monitorrent.plugin_managers import TrackersManager
 from monitorrent.plugins.trackers import WithCredentialsMixin
+from monitorrent.utils.circuit_breaker import circuit_breakers
 
 
 # noinspection PyUnusedLocal
 class TrackerCollection(object):
-    def __init__(self, tracker_manager):
+    def __init__(self, tracker_manager, engine_in_process=True):
         """
         :type tracker_manager: TrackersManager
+        :param engine_in_process: False in web process of split mode, circuit breakers of engine
+                                  are in worker process, so circuit_breaker is null
         """
         self.tracker_manager = tracker_manager
+        self.engine_in_process = engine_in_process
 
     def on_get(self, req, resp):
-        resp.json = [{'name': name, 'form': tracker.credentials_form if hasattr(tracker, 'credentials_form') else None}
+        resp.json = [{'name': name,
+                      'form': tracker.credentials_form if hasattr(tracker, 'credentials_form') else None,
+                      'circuit_breaker': circuit_breakers.get(name).get_state() if self.engine_in_process else None}
                      for name, tracker in list(self.tracker_manager.trackers.items())]
 
 
@@ -0,0 +1,17 @@
+from monitorrent.utils.transport import Transport
+
+
+# noinspection PyUnusedLocal
+class TransportStats(object):
+    def __init__(self, transport):
+        """
+        :type transport: Transport
+        """
+        self.transport = transport
+
+    def on_get(self, req, resp):
+        resp.json = {
+            'pool_connections': self.transport.pool_connections,
+            'pool_maxsize': self.transport.pool_maxsize,
+            'hosts': self.transport.get_stats()
+        }
@@ -1,9 +1,17 @@
 from builtins import str
+from builtins import range
 from builtins import object
+import binascii
+import os
+import random
+import string
+import threading
+import time
 from enum import Enum
+from types import MappingProxyType
 
 from sqlalchemy import Column, Integer, String
-from monitorrent.db import DBSession, Base
+from monitorrent.db import DBSession, Base, db_write
 from monitorrent.plugins.trackers import TrackerSettings, CloudflareChallengeSolverSettings
 
 
@@ -29,13 +37,28 @@ class NotificationLevel(Enum):
 
 
 
+class SettingsSnapshot(object):
+    """Read-only copy of settings and proxies tables, tracker settings are built once per snapshot"""
+    def __init__(self, values, proxies, loaded_at):
+        self.values = MappingProxyType(values)
+        self.proxies = MappingProxyType(proxies)
+        self.loaded_at = loaded_at
+        self.tracker_settings = None
+
+
 class SettingsManager(object):
+    """
+    Settings are read from in-process snapshot of settings table, it is loaded on first read
+    and invalidated by every write through this manager.
+    Another process can change settings too, so snapshot is reloaded after cache_ttl seconds, if it is set.
+    """
     __password_settings_name = "monitorrent.password"
     __enable_authentication_settings_name = "monitorrent.is_authentication_enabled"
     __default_client_settings_name = "monitorrent.default_client"
     __developer_mode_settings_name = "monitorrent.developer_mode"
     __requests_timeout = "monitorrent.requests_timeout"
     __remove_logs_interval_settings_name = "monitorrent.remove_logs_interval"
+    __archive_logs_interval_settings_name = "monitorrent.archive_logs_interval"
     __proxy_enabled_name = "monitorrent.proxy_enabled"
     __proxy_id_format = "monitorrent.proxy_{0}"
     __new_version_checker_enabled = "monitorrent.new_version_checker_enabled"
@@ -47,6 +70,23 @@ class SettingsManager(object):
     __cloudflare_challenge_solver_record_video = "monitorrent.cloudflare_challenge_solver.record_video"
     __cloudflare_challenge_solver_record_har = "monitorrent.cloudflare_challenge_solver.record_har"
     __cloudflare_challenge_solver_keep_records = "monitorrent.cloudflare_challenge_solver.keep_records"
+    __trackers_concurrency = "monitorrent.execute.trackers_concurrency"
+    __host_concurrency = "monitorrent.execute.host_concurrency"
+    __execute_timeout = "monitorrent.execute.execute_timeout"
+    __topic_timeout = "monitorrent.execute.topic_timeout"
+    __execute_trace_enabled = "monitorrent.execute.trace_enabled"
+    __auth_secret_key = "monitorrent.auth.secret_key"
+    __auth_token = "monitorrent.auth.token"
+
+    def __init__(self, cache_ttl=None, clock=time.monotonic):
+        """
+        :param cache_ttl: max age of settings snapshot in seconds, None to keep it until next write
+        """
+        self.cache_ttl = cache_ttl
+        self._clock = clock
+        self._snapshot = None
+        self._generation = 0
+        self._lock = threading.Lock()
 
     def get_password(self):
         return self._get_settings(self.__password_settings_name, 'monitorrent')
@@ -102,14 +142,10 @@ class SettingsManager(object):
         self._set_settings(self.__proxy_enabled_name, str(value))
 
     def get_proxy(self, key):
-        with DBSession() as db:
-            setting = db.query(ProxySettings).filter(ProxySettings.key == key).first()
-            if setting is None:
-                return None
-            return setting.url
+        return self.get_snapshot().proxies.get(key)
 
     def set_proxy(self, key, url):
-        with DBSession() as db:
+        def set_proxy_url(db):
             setting = db.query(ProxySettings).filter(ProxySettings.key == key).first()
             if url is not None and url != "":
                 if setting is None:
@@ -120,11 +156,13 @@ class SettingsManager(object):
                 if setting is None:
                     return
                 db.delete(setting)
+        try:
+            db_write(set_proxy_url)
+        finally:
+            self.invalidate()
 
     def get_proxies(self):
-        with DBSession() as db:
-            settings = db.query(ProxySettings).all()
-            return {s.key: s.url for s in settings}
+        return dict(self.get_snapshot().proxies)
 
     def get_is_new_version_checker_enabled(self):
         return self._get_settings(self.__new_version_checker_enabled, 'True') == 'True'
@@ -186,14 +224,71 @@ class SettingsManager(object):
     def requests_timeout(self, value):
         self._set_settings(self.__requests_timeout, str(value))
 
+    @property
+    def trackers_concurrency(self):
+        return int(self._get_settings(self.__trackers_concurrency, 1))
+
+    @trackers_concurrency.setter
+    def trackers_concurrency(self, value):
+        self._set_settings(self.__trackers_concurrency, str(value))
+
+    @property
+    def host_concurrency(self):
+        return int(self._get_settings(self.__host_concurrency, 1))
+
+    @host_concurrency.setter
+    def host_concurrency(self, value):
+        self._set_settings(self.__host_concurrency, str(value))
+
+    @property
+    def execute_timeout(self):
+        """
+        Seconds after which execute is stopped and remaining topics are skipped, 0 - unlimited
+        """
+        return int(self._get_settings(self.__execute_timeout, 0))
+
+    @execute_timeout.setter
+    def execute_timeout(self, value):
+        self._set_settings(self.__execute_timeout, str(value))
+
+    @property
+    def topic_timeout(self):
+        """
+        Seconds after which check of one topic is abandoned, 0 - unlimited
+        """
+        return int(self._get_settings(self.__topic_timeout, 0))
+
+    @topic_timeout.setter
+    def topic_timeout(self, value):
+        self._set_settings(self.__topic_timeout, str(value))
+
+    @property
+    def execute_trace_enabled(self):
+        """
+        Collect timeline trace of every execute, trace is stored with execute logs
+        """
+        return self._get_settings(self.__execute_trace_enabled, 'False') == 'True'
+
+    @execute_trace_enabled.setter
+    def execute_trace_enabled(self, value):
+        self._set_settings(self.__execute_trace_enabled, str(value))
+
     @property
     def tracker_settings(self):
-        proxy_enabled = self.get_is_proxy_enabled()
-        cloudflare_challenge_solver_settings = self.cloudflare_challenge_solver_settings
-        return TrackerSettings(
-            self.requests_timeout,
-            self.get_proxies() if proxy_enabled else None,
-            cloudflare_challenge_solver_settings)
+        """
+        :return: tracker settings of current snapshot, the same instance is returned until settings are changed,
+                 so it must not be modified
+        :rtype: TrackerSettings
+        """
+        snapshot = self.get_snapshot()
+        if snapshot.tracker_settings is None:
+            settings = self.get_snapshot_settings(snapshot)
+            snapshot.tracker_settings = TrackerSettings(
+                settings.requests_timeout,
+                settings.get_proxies() if settings.get_is_proxy_enabled() else None,
+                settings.cloudflare_challenge_solver_settings,
+                settings.host_concurrency)
+        return snapshot.tracker_settings
 
     @property
     def cloudflare_challenge_solver_settings(self):
@@ -207,6 +302,54 @@ class SettingsManager(object):
     def tracker_settings(self, value):
         self.requests_timeout = value.requests_timeout
 
+    def get_shared_auth_keys(self):
+        """
+        Secret key and token shared by all web processes, so login cookie is valid in any of them.
+        Keys are generated on first call, processes started together insert them in one transaction
+        and only the first insert is kept, so all of them get the same keys.
+        Keys are stored in settings table as plain text like the password, anyone who can read the database
+        can issue login cookie, use reset_shared_auth_keys to regenerate them.
+
+        :return: secret_key, token
+        :rtype: tuple[str, str]
+        """
+        secret_key = self._get_settings(self.__auth_secret_key)
+        token = self._get_settings(self.__auth_token)
+        if secret_key is not None and token is not None:
+            return secret_key, token
+        try:
+            return db_write(self._insert_auth_keys)
+        finally:
+            self.invalidate()
+
+    def reset_shared_auth_keys(self):
+        """
+        Generate new secret key and token, login cookies issued with old keys become invalid
+        after web processes are restarted
+
+        :return: secret_key, token
+        :rtype: tuple[str, str]
+        """
+        def reset(db):
+            db.query(Settings) \
+                .filter(Settings.name.in_([self.__auth_secret_key, self.__auth_token])) \
+                .delete(synchronize_session=False)
+            return self._insert_auth_keys(db)
+        try:
+            return db_write(reset)
+        finally:
+            self.invalidate()
+
+    def _insert_auth_keys(self, db):
+        secret_key = binascii.hexlify(os.urandom(24)).decode()
+        token = ''.join(random.choice(string.ascii_letters) for _ in range(8))
+        insert = Settings.__table__.insert().prefix_with('OR IGNORE', dialect='sqlite')
+        db.execute(insert, [{'name': self.__auth_secret_key, 'value': secret_key},
+                            {'name': self.__auth_token, 'value': token}])
+        values = dict(db.query(Settings.name, Settings.value)
+                      .filter(Settings.name.in_([self.__auth_secret_key, self.__auth_token])))
+        return values[self.__auth_secret_key], values[self.__auth_token]
+
     @property
     def remove_logs_interval(self):
         return int(self._get_settings(self.__remove_logs_interval_settings_name, 10))
@@ -215,17 +358,68 @@ class SettingsManager(object):
     def remove_logs_interval(self, value):
         self._set_settings(self.__remove_logs_interval_settings_name, str(value))
 
-    @staticmethod
-    def _get_settings(name, default=None):
+    @property
+    def archive_logs_interval(self):
+        """
+        Days after which execute logs are moved to compressed archive, 0 to keep them uncompressed.
+        Archive is disabled by default, the first maintenance after it is enabled rewrites all old logs
+        """
+        return int(self._get_settings(self.__archive_logs_interval_settings_name, 0))
+
+    @archive_logs_interval.setter
+    def archive_logs_interval(self, value):
+        self._set_settings(self.__archive_logs_interval_settings_name, str(value))
+
+    def get_snapshot(self):
+        """
+        :rtype: SettingsSnapshot
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and (self.cache_ttl is None or self._clock() - snapshot.loaded_at < self.cache_ttl):
+            return snapshot
+        with self._lock:
+            generation = self._generation
+        snapshot = self._load_snapshot()
+        with self._lock:
+            # settings were changed while snapshot was loaded, it can be stale, so it isn't kept
+            if generation == self._generation:
+                self._snapshot = snapshot
+        return snapshot
+
+    def get_snapshot_settings(self, snapshot=None):
+        """
+        :return: read-only settings, which read all values from the same snapshot
+        :rtype: SnapshotSettingsManager
+        """
+        return SnapshotSettingsManager(snapshot or self.get_snapshot())
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def _load_snapshot(self):
+        loaded_at = self._clock()
         with DBSession() as db:
-            setting = db.query(Settings).filter(Settings.name == name).first()
-            if not setting:
-                return default
-            return setting.value
+            values = {s.name: s.value for s in db.query(Settings).all()}
+            proxies = {s.key: s.url for s in db.query(ProxySettings).all()}
+        return SettingsSnapshot(values, proxies, loaded_at)
+
+    def _get_settings(self, name, default=None):
+        value = self.get_snapshot().values.get(name)
+        if value is None:
+            return default
+        return value
+
+    def _set_settings(self, name, value):
+        try:
+            self._write_settings(name, value)
+        finally:
+            self.invalidate()
 
     @staticmethod
-    def _set_settings(name, value):
-        with DBSession() as db:
+    def _write_settings(name, value):
+        def set_setting(db):
             setting = db.query(Settings).filter(Settings.name == name).first()
             if not setting:
                 if value is None:
@@ -237,3 +431,32 @@ class SettingsManager(object):
                 db.delete(setting)
             else:
                 setting.value = str(value)
+        db_write(set_setting)
+
+
+class SnapshotSettingsManager(SettingsManager):
+    """
+    Settings of one snapshot, values don't change when settings are changed by another thread or process.
+    Used when several settings have to be consistent with each other, like settings of one execute
+    """
+    def __init__(self, snapshot):
+        """
+        :type snapshot: SettingsSnapshot
+        """
+        super(SnapshotSettingsManager, self).__init__()
+        self._snapshot = snapshot
+
+    def get_snapshot(self):
+        return self._snapshot
+
+    def get_snapshot_settings(self, snapshot=None):
+        return self if snapshot is None or snapshot is self._snapshot else SnapshotSettingsManager(snapshot)
+
+    def invalidate(self):
+        pass
+
+    def set_proxy(self, key, url):
+        raise AttributeError(u"Settings snapshot is read-only")
+
+    def _set_settings(self, name, value):
+        raise AttributeError(u"Settings snapshot is read-only")
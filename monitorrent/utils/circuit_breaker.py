@@ -0,0 +1,119 @@
+import threading
+import time
+from datetime import datetime
+
+import pytz
+
+
+class CircuitBreakerOpen(Exception):
+    def __init__(self, name):
+        super(CircuitBreakerOpen, self).__init__(u"Circuit breaker for {0} is open".format(name))
+        self.name = name
+
+
+class CircuitBreaker(object):
+    """
+    Stop calls to unavailable service after failure_threshold consecutive failures.
+
+    In closed state all calls are allowed.
+    In open state all calls are refused until reset_timeout seconds passed,
+    after that only one probe call is allowed (half open state):
+    its success closes circuit breaker, its failure opens it again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=300, clock=time.monotonic):
+        """
+        :type name: str
+        :type failure_threshold: int
+        :param reset_timeout: seconds before probe call is allowed
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._opened_clock = None
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """
+        :return: True if call is allowed, in half open state only first call is allowed
+        :rtype: bool
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self._clock() - self._opened_clock >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def check(self):
+        """
+        :raises CircuitBreakerOpen: if call isn't allowed
+        """
+        if not self.allow_request():
+            raise CircuitBreakerOpen(self.name)
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._opened_clock = None
+
+    def record_ignored(self):
+        """
+        Call was finished without telling if service is available, e.g. it was cancelled,
+        so probe of half open breaker is allowed again
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = datetime.now(pytz.utc)
+                self._opened_clock = self._clock()
+
+    def get_state(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'opened_at': self.opened_at.isoformat() if self.opened_at else None
+            }
+
+
+class CircuitBreakerRegistry(object):
+    def __init__(self, failure_threshold=3, reset_timeout=300):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = dict()
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """
+        :rtype: CircuitBreaker
+        """
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, self.failure_threshold, self.reset_timeout)
+                self._breakers[name] = breaker
+            return breaker
+
+    def reset(self):
+        with self._lock:
+            self._breakers = dict()
+
+
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,132 @@
+import threading
+import time
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, deadline):
+        """
+        :type deadline: Deadline
+        """
+        super(DeadlineExceeded, self).__init__(u"{0} deadline of {1} seconds exceeded"
+                                               .format(deadline.name, deadline.timeout))
+        self.deadline = deadline
+
+
+class Cancelled(Exception):
+    def __init__(self, deadline):
+        """
+        :type deadline: Deadline
+        """
+        super(Cancelled, self).__init__(u"{0} was cancelled".format(deadline.name))
+        self.deadline = deadline
+
+
+class Deadline(object):
+    """
+    Time budget of execute or topic, which can be cancelled.
+
+    Python threads can't be interrupted, so deadline is cooperative: long operations check it between steps
+    and network timeouts are limited to the remaining time. Deadline with parent expires and is cancelled
+    together with parent, so topic never outlives execute.
+    """
+
+    def __init__(self, name, timeout=None, parent=None, clock=time.monotonic):
+        """
+        :param name: name used in error messages
+        :param timeout: seconds, None or 0 for unlimited
+        :type parent: Deadline | None
+        """
+        self.name = name
+        self.timeout = timeout or None
+        self.parent = parent
+        self.cancelled = False
+        self._clock = clock
+        self._expires_at = clock() + timeout if timeout else None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def is_cancelled(self):
+        return self.cancelled or (self.parent is not None and self.parent.is_cancelled())
+
+    def remaining(self):
+        """
+        :return: seconds left, None if unlimited
+        :rtype: float | None
+        """
+        remaining = self._expires_at - self._clock() if self._expires_at is not None else None
+        parent_remaining = self.parent.remaining() if self.parent is not None else None
+        if remaining is None:
+            return parent_remaining
+        if parent_remaining is None:
+            return remaining
+        return min(remaining, parent_remaining)
+
+    def check(self):
+        """
+        :raises Cancelled: if deadline or its parent was cancelled
+        :raises DeadlineExceeded: if deadline or its parent is expired
+        """
+        deadline = self
+        while deadline is not None:
+            if deadline.cancelled:
+                raise Cancelled(deadline)
+            if deadline._expires_at is not None and deadline._expires_at <= deadline._clock():
+                raise DeadlineExceeded(deadline)
+            deadline = deadline.parent
+
+    def limit_timeout(self, timeout):
+        """
+        Limit network timeout by the remaining time
+
+        :param timeout: seconds, (connect, read) tuple or None
+        :raises Cancelled: if deadline was cancelled
+        :raises DeadlineExceeded: if there is no time left
+        """
+        self.check()
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+        return min(timeout, remaining)
+
+
+_current = threading.local()
+
+
+def get_current_deadline():
+    """
+    :return: deadline of topic or execute running in the current thread
+    :rtype: Deadline | None
+    """
+    return getattr(_current, 'deadline', None)
+
+
+def set_current_deadline(deadline):
+    """
+    :type deadline: Deadline | None
+    :return: previous deadline of the current thread
+    :rtype: Deadline | None
+    """
+    previous = get_current_deadline()
+    _current.deadline = deadline
+    return previous
+
+
+class deadline_scope(object):
+    """Context manager which sets deadline of the current thread and restores the previous one on exit"""
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = set_current_deadline(self.deadline)
+        return self.deadline
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        set_current_deadline(self.previous)
+        return False
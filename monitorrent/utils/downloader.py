@@ -1,12 +1,14 @@
 import cgi
 import requests
 
+from monitorrent.utils.transport import transport
+
 
 def download(request, **kwargs):
     if isinstance(request, requests.PreparedRequest):
-        response = requests.session().send(request, **kwargs)
+        response = transport.send(request, **kwargs)
     else:
-        response = requests.get(request, **kwargs)
+        response = transport.get(request, **kwargs)
     if response.status_code == 200:
         filename = None
         if 'content-disposition' in response.headers:
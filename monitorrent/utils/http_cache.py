@@ -0,0 +1,194 @@
+import hashlib
+import threading
+import time
+from datetime import datetime
+
+import pytz
+import requests
+import six
+from sqlalchemy import Column, Integer, String, func
+from six.moves.urllib.parse import urlparse
+
+from monitorrent.db import Base, DBSession, UTCDateTime, db_write
+
+
+class HttpCacheEntry(Base):
+    __tablename__ = 'http_cache'
+
+    url = Column(String, primary_key=True)
+    host = Column(String, nullable=False)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    size = Column(Integer, nullable=False)
+    last_access = Column(UTCDateTime, nullable=False, index=True)
+
+
+def get_content_digest(content):
+    """
+    :type content: bytes
+    :rtype: str
+    """
+    if isinstance(content, six.text_type):
+        content = content.encode('utf-8')
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def get_request_url(request):
+    if isinstance(request, requests.PreparedRequest):
+        return request.url
+    if isinstance(request, six.string_types):
+        return request
+    return None
+
+
+class HttpCache(object):
+    """
+    Persistent cache of HTTP validators (ETag, Last-Modified) per url.
+
+    Only validators are stored, so cache doesn't grow with response size.
+    Unchanged body of 200 response is detected by topic content digest, not here.
+    Number of entries is limited by max_entries, least recently used entries are removed first.
+    Access time of hit entries is kept in memory and written in batches, eviction runs once per evict_interval.
+    """
+    DEFAULT_MAX_ENTRIES = 10000
+    DEFAULT_ACCESS_FLUSH_SIZE = 100
+    DEFAULT_EVICT_INTERVAL = 60 * 60
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, access_flush_size=DEFAULT_ACCESS_FLUSH_SIZE,
+                 evict_interval=DEFAULT_EVICT_INTERVAL, clock=time.monotonic):
+        """
+        :param access_flush_size: max number of access times kept in memory
+        :param evict_interval: min seconds between evictions of least recently used entries
+        """
+        self.max_entries = max_entries
+        self.access_flush_size = access_flush_size
+        self.evict_interval = evict_interval
+        self._clock = clock
+        self._evicted_at = None
+        self._accessed = dict()
+        # guards access times batch and time of the last eviction
+        self._accessed_lock = threading.Lock()
+        self._stats = dict()
+        self._stats_lock = threading.Lock()
+
+    def get_conditional_headers(self, url):
+        """
+        :return: If-None-Match and If-Modified-Since headers for stored validators of url
+        :rtype: dict
+        """
+        with DBSession() as db:
+            entry = db.query(HttpCacheEntry).filter(HttpCacheEntry.url == url).first()
+            if entry is None:
+                return {}
+            headers = {}
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+            return headers
+
+    def is_not_modified(self, url, response):
+        """
+        Check if server replied 304 on conditional request of url
+
+        :type response: requests.Response
+        :rtype: bool
+        """
+        not_modified = response.status_code == 304
+        self._count(url, not_modified)
+        if not_modified:
+            with self._accessed_lock:
+                self._accessed[url] = datetime.now(pytz.utc)
+                flush = len(self._accessed) >= self.access_flush_size
+            if flush:
+                self.flush()
+        return not_modified
+
+    def store(self, url, response):
+        """
+        Store validators of successfully processed response
+
+        :type response: requests.Response
+        """
+        accessed = self._pop_accessed()
+
+        def save(db):
+            self._write_accessed(db, accessed)
+            entry = db.query(HttpCacheEntry).filter(HttpCacheEntry.url == url).first()
+            if entry is None:
+                entry = HttpCacheEntry(url=url, host=urlparse(url).netloc)
+                db.add(entry)
+            entry.etag = response.headers.get('ETag')
+            entry.last_modified = response.headers.get('Last-Modified')
+            entry.size = len(response.content)
+            entry.last_access = datetime.now(pytz.utc)
+            db.flush()
+            self._evict_if_required(db)
+        db_write(save)
+
+    def flush(self):
+        """
+        Write access times kept in memory and evict least recently used entries if evict_interval passed
+        """
+        accessed = self._pop_accessed()
+
+        def write(db):
+            self._write_accessed(db, accessed)
+            self._evict_if_required(db)
+        db_write(write)
+
+    def remove(self, url):
+        def delete(db):
+            db.query(HttpCacheEntry).filter(HttpCacheEntry.url == url).delete(synchronize_session=False)
+        db_write(delete)
+
+    def get_stats(self):
+        """
+        :return: hits, misses and hit rate per host
+        :rtype: dict
+        """
+        with self._stats_lock:
+            return {host: {'hits': hits, 'misses': misses, 'hit_rate': float(hits) / (hits + misses)}
+                    for host, (hits, misses) in six.iteritems(self._stats)}
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = dict()
+
+    def _pop_accessed(self):
+        with self._accessed_lock:
+            accessed = self._accessed
+            self._accessed = dict()
+        return accessed
+
+    @staticmethod
+    def _write_accessed(db, accessed):
+        for url, last_access in six.iteritems(accessed):
+            db.query(HttpCacheEntry).filter(HttpCacheEntry.url == url) \
+                .update({HttpCacheEntry.last_access: last_access}, synchronize_session=False)
+
+    def _evict_if_required(self, db):
+        with self._accessed_lock:
+            now = self._clock()
+            if self._evicted_at is not None and now - self._evicted_at < self.evict_interval:
+                return
+            # only one of concurrent writers evicts entries
+            self._evicted_at = now
+        if db.query(func.count(HttpCacheEntry.url)).scalar() <= self.max_entries:
+            return
+        expired = db.query(HttpCacheEntry.url) \
+            .order_by(HttpCacheEntry.last_access.desc()) \
+            .offset(self.max_entries) \
+            .subquery()
+        db.query(HttpCacheEntry) \
+            .filter(HttpCacheEntry.url.in_(expired)) \
+            .delete(synchronize_session=False)
+
+    def _count(self, url, hit):
+        host = urlparse(url).netloc
+        with self._stats_lock:
+            hits, misses = self._stats.get(host, (0, 0))
+            self._stats[host] = (hits + 1, misses) if hit else (hits, misses + 1)
+
+
+http_cache = HttpCache()
@@ -0,0 +1,213 @@
+import math
+import threading
+import time
+
+import six
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return six.text_type(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    if len(names) == 0:
+        return ''
+    return '{' + ','.join('{0}="{1}"'.format(name, _escape(value)) for name, value in zip(names, values)) + '}'
+
+
+class _Timer(object):
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Metric(object):
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        """
+        :type name: str
+        :type documentation: str
+        :param labels: label names, values of all labels have to be passed to every update
+        :type labels: tuple
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = dict()
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels.keys()) != set(self.labels):
+            raise ValueError(u"Metric {0} requires labels: {1}".format(self.name, ', '.join(self.labels)))
+        return tuple(six.text_type(labels[name]) for name in self.labels)
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+    def collect(self):
+        """
+        :return: list of (suffix, label names, label values, value)
+        :rtype: list[tuple]
+        """
+        with self._lock:
+            return [('', self.labels, key, value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = ['# HELP {0} {1}'.format(self.name, self.documentation),
+                 '# TYPE {0} {1}'.format(self.name, self.type)]
+        for suffix, names, values, value in self.collect():
+            lines.append('{0}{1}{2} {3}'.format(self.name, suffix, _format_labels(names, values),
+                                                _format_value(value)))
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError(u"Counter can only be increased")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+    DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0))
+            counts = [count + 1 if value <= bound else count for count, bound in zip(counts, self.buckets)]
+            self._values[key] = (counts, total + value)
+
+    def time(self, **labels):
+        """
+        Observe duration of with block in seconds
+        """
+        self._key(labels)
+        return _Timer(self, labels)
+
+    def collect(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        samples = []
+        for key, (counts, total) in values:
+            for bound, count in zip(self.buckets, counts):
+                samples.append(('_bucket', self.labels + ('le',), key + (_format_value(bound),), count))
+            samples.append(('_sum', self.labels, key, total))
+            samples.append(('_count', self.labels, key, counts[-1]))
+        return samples
+
+
+class MetricsRegistry(object):
+    """
+    Process wide metrics rendered in Prometheus text exposition format
+    """
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics = dict()
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labels=()):
+        """
+        :rtype: Counter
+        """
+        return self._register(Counter, name, documentation, labels)
+
+    def gauge(self, name, documentation, labels=()):
+        """
+        :rtype: Gauge
+        """
+        return self._register(Gauge, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=Histogram.DEFAULT_BUCKETS):
+        """
+        :rtype: Histogram
+        """
+        return self._register(Histogram, name, documentation, labels, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics.keys())]
+        return ''.join(metric.render() + '\n' for metric in metrics)
+
+    def _register(self, metric_class, name, documentation, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_class(name, documentation, labels, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, metric_class) or metric.labels != tuple(labels):
+                raise ValueError(u"Metric {0} already registered with different type or labels".format(name))
+            return metric
+
+
+metrics = MetricsRegistry()
+
+execute_duration = metrics.histogram('monitorrent_execute_duration_seconds', 'Duration of execute runs',
+                                     ['status'])
+topics_checked = metrics.counter('monitorrent_topics_checked_total', 'Number of checked topics', ['tracker'])
+downloads = metrics.counter('monitorrent_downloads_total', 'Number of downloaded torrents')
+failures = metrics.counter('monitorrent_failures_total', 'Number of failures reported during execute')
+http_request_duration = metrics.histogram('monitorrent_http_request_duration_seconds',
+                                          'Latency of HTTP requests to trackers', ['domain'])
+http_responses = metrics.counter('monitorrent_http_responses_total', 'HTTP responses of trackers by status code',
+                                 ['domain', 'status'])
+client_request_duration = metrics.histogram('monitorrent_client_request_duration_seconds',
+                                            'Latency of torrent client calls', ['client', 'method'])
+notifier_send_duration = metrics.histogram('monitorrent_notifier_send_duration_seconds',
+                                           'Latency of notifications send', ['notifier'])
+db_sessions = metrics.counter('monitorrent_db_sessions_total', 'Number of opened DB sessions')
+db_sessions_active = metrics.gauge('monitorrent_db_sessions_active', 'Number of DB sessions in use')
+maintenance_removed_rows = metrics.counter('monitorrent_maintenance_removed_rows_total',
+                                           'Number of rows removed by log maintenance', ['table'])
+maintenance_reclaimed_bytes = metrics.counter('monitorrent_maintenance_reclaimed_bytes_total',
+                                              'Number of bytes given back to file system by log maintenance')
+long_poll_waiters = metrics.gauge('monitorrent_long_poll_waiters', 'Number of waiting long poll requests')
+db_writer_batch_size = metrics.histogram('monitorrent_db_writer_batch_size',
+                                         'Number of write units of work committed in one transaction',
+                                         buckets=(1, 2, 5, 10, 20, 50, 100))
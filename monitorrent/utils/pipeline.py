@@ -0,0 +1,123 @@
+import sys
+import threading
+from queue import Queue
+
+_stop = object()
+
+
+class Stage(object):
+    def __init__(self, name, func, workers=1, queue_size=None):
+        """
+        :param name: stage name, used as thread name prefix
+        :param func: func(item) -> item for the next stage or None to drop item
+        :type workers: int
+        :param queue_size: max items waiting for this stage, by default twice the workers count
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue = Queue(maxsize=queue_size or workers * 2)
+        self.threads = []
+        self.processed = 0
+        self.max_queue_depth = 0
+        self._queue_depth_sum = 0
+        self._queue_depth_samples = 0
+        self._stats_lock = threading.Lock()
+
+    def put(self, item):
+        self.queue.put(item)
+        # depth is sampled every time item is queued, so it shows how many items waited for this stage
+        depth = self.queue.qsize()
+        with self._stats_lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+            self._queue_depth_sum += depth
+            self._queue_depth_samples += 1
+
+    def processed_item(self):
+        with self._stats_lock:
+            self.processed += 1
+
+    def get_stats(self):
+        """
+        :return: number of processed items, max and average depth of stage queue
+        :rtype: dict
+        """
+        with self._stats_lock:
+            samples = self._queue_depth_samples
+            return {
+                'name': self.name,
+                'workers': self.workers,
+                'processed': self.processed,
+                'queue_size': self.queue.maxsize,
+                'max_queue_depth': self.max_queue_depth,
+                'avg_queue_depth': self._queue_depth_sum / float(samples) if samples > 0 else 0.0
+            }
+
+
+class Pipeline(object):
+    """
+    Pass items through stages, every stage has own worker threads and bounded input queue.
+    When queue of the next stage is full, workers of the previous stage block, so slow stage
+    applies backpressure to all stages before it.
+    """
+
+    def __init__(self, stages, on_error=None):
+        """
+        :type stages: list[Stage]
+        :param on_error: on_error(item, exc_type, exc_value, exc_tb) called when stage func raised exception
+        """
+        self.stages = stages
+        self.on_error = on_error
+
+    def run(self, items):
+        for index, stage in enumerate(self.stages):
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            for i in range(stage.workers):
+                thread = threading.Thread(target=self._worker, args=(stage, next_stage),
+                                          name='{0}-{1}'.format(stage.name, i))
+                thread.daemon = True
+                thread.start()
+                stage.threads.append(thread)
+
+        for item in items:
+            self.stages[0].put(item)
+
+        # stop stages one by one, so all items left in queue of the next stage are processed
+        for stage in self.stages:
+            for _ in stage.threads:
+                stage.queue.put(_stop)
+            for thread in stage.threads:
+                thread.join()
+            stage.threads = []
+
+    def get_stats(self):
+        """
+        :return: stats of every stage in order
+        :rtype: list[dict]
+        """
+        return [stage.get_stats() for stage in self.stages]
+
+    # noinspection PyBroadException
+    def _worker(self, stage, next_stage):
+        while True:
+            item = stage.queue.get()
+            if item is _stop:
+                return
+            try:
+                result = stage.func(item)
+            except:
+                result = None
+                self._handle_error(item, *sys.exc_info())
+            stage.processed_item()
+            if result is not None and next_stage is not None:
+                next_stage.put(result)
+
+    # noinspection PyBroadException
+    def _handle_error(self, item, exc_type, exc_value, exc_tb):
+        if self.on_error is None:
+            return
+        try:
+            self.on_error(item, exc_type, exc_value, exc_tb)
+        except:
+            # worker should never die, otherwise pipeline will wait for it forever
+            pass
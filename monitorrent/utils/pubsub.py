@@ -0,0 +1,71 @@
+import threading
+from collections import deque
+
+
+class EventChannel(object):
+    """
+    In-process publish/subscribe channel.
+
+    Every event gets increasing id, last max_events events are kept, so subscriber can ask for events
+    after the last one it has seen and wait on condition variable until new events are published.
+    """
+    DEFAULT_MAX_EVENTS = 1000
+
+    def __init__(self, max_events=DEFAULT_MAX_EVENTS):
+        self._events = deque(maxlen=max_events)
+        self._last_id = 0
+        self._condition = threading.Condition()
+
+    @property
+    def last_id(self):
+        with self._condition:
+            return self._last_id
+
+    def publish(self, event_type, data=None):
+        """
+        :type event_type: str
+        :param data: JSON serializable event data
+        :return: id of published event
+        :rtype: int
+        """
+        with self._condition:
+            self._last_id += 1
+            self._events.append((self._last_id, event_type, data))
+            self._condition.notify_all()
+            return self._last_id
+
+    def get_events(self, after):
+        """
+        :param after: id of the last seen event
+        :return: events (id, event_type, data) published after it, oldest first
+        :rtype: list[tuple]
+        """
+        with self._condition:
+            return [e for e in self._events if e[0] > after]
+
+    def is_lost(self, after):
+        """
+        :return: True if some events after this id were already dropped from the channel
+                 or id wasn't published by this channel (ids start from 1 again after restart)
+        :rtype: bool
+        """
+        with self._condition:
+            if after > self._last_id:
+                return True
+            return len(self._events) > 0 and self._events[0][0] > after + 1
+
+    def wait(self, after, timeout):
+        """
+        Wait until event after this id is published
+
+        :param after: id of the last seen event
+        :param timeout: max seconds to wait
+        :return: events published after this id, empty list on timeout
+        :rtype: list[tuple]
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_id > after, timeout)
+            return [e for e in self._events if e[0] > after]
+
+
+execute_events = EventChannel()
@@ -0,0 +1,44 @@
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket.
+
+    Bucket is refilled with rate tokens per second up to burst tokens.
+    When there are not enough tokens, acquire reserves them in advance and blocks caller
+    until reserved tokens are refilled, so concurrent callers are served in order of arrival.
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param rate: tokens per second
+        :type rate: float
+        :param burst: max tokens which can be acquired without wait
+        :type burst: int
+        """
+        if rate <= 0:
+            raise ValueError("rate should be positive")
+        self.rate = float(rate)
+        self.burst = max(int(burst), 1)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """
+        :return: time in seconds caller was blocked
+        :rtype: float
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+
+
+class Span(object):
+    """
+    Timed phase of execute, span is started when created and ended by end or on exit from with block
+    """
+
+    def __init__(self, tracer, name, category, args):
+        """
+        :type tracer: Tracer
+        :type name: str
+        :type category: str
+        :type args: dict
+        """
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = tracer.clock()
+        self.thread = threading.current_thread()
+        self.ended = False
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def end(self, exc_value=None):
+        if self.ended:
+            return
+        self.ended = True
+        if exc_value is not None:
+            self.args['error'] = u'{0}: {1}'.format(type(exc_value).__name__, exc_value)
+        self.tracer.add(self, self.tracer.clock())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.end(exc_val)
+        return False
+
+
+class _NullSpan(object):
+    """Span returned when tracing isn't started, it records nothing"""
+
+    def set(self, **args):
+        pass
+
+    def end(self, exc_value=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+class Tracer(object):
+    """
+    Collects spans of running execute from all threads in Chrome trace event format,
+    result can be opened in chrome://tracing or Perfetto UI.
+
+    Only one trace can be collected at the same time, spans created while tracing isn't started are ignored.
+    """
+    DEFAULT_MAX_EVENTS = 100000
+
+    def __init__(self, max_events=DEFAULT_MAX_EVENTS, clock=time.perf_counter):
+        self.max_events = max_events
+        self.clock = clock
+        self._events = None
+        self._threads = None
+        self._dropped = 0
+        self._started_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_active(self):
+        return self._events is not None
+
+    def start(self):
+        with self._lock:
+            self._events = list()
+            self._threads = dict()
+            self._dropped = 0
+            self._started_at = self.clock()
+
+    def stop(self):
+        """
+        :return: collected trace in Chrome trace event format, None if tracing wasn't started
+        :rtype: dict | None
+        """
+        with self._lock:
+            if self._events is None:
+                return None
+            events, threads, dropped = self._events, self._threads, self._dropped
+            self._events = None
+            self._threads = None
+
+        pid = os.getpid()
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                    for tid, name in sorted(threads.items())]
+        return {
+            'traceEvents': metadata + events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'dropped_events': dropped}
+        }
+
+    def span(self, name, category='engine', **args):
+        """
+        :rtype: Span
+        """
+        if self._events is None:
+            return _null_span
+        return Span(self, name, category, args)
+
+    def add(self, span, end):
+        """
+        :type span: Span
+        """
+        with self._lock:
+            if self._events is None or span.start < self._started_at:
+                return
+            if len(self._events) >= self.max_events:
+                self._dropped += 1
+                return
+            tid = span.thread.ident
+            self._threads[tid] = span.thread.name
+            self._events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': int((span.start - self._started_at) * 1000000),
+                'dur': int((end - span.start) * 1000000),
+                'pid': os.getpid(),
+                'tid': tid,
+                'args': span.args
+            })
+
+
+tracer = Tracer()
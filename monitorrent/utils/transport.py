@@ -0,0 +1,259 @@
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+import six
+from requests.adapters import HTTPAdapter, DEFAULT_POOLSIZE
+from six.moves.urllib.parse import urlparse
+
+from monitorrent.utils.rate_limiter import TokenBucket
+from monitorrent.utils.tracing import tracer
+from monitorrent.utils.metrics import http_request_duration, http_responses
+from monitorrent.utils.deadline import get_current_deadline
+
+
+class _NoCookiesPolicy(DefaultCookiePolicy):
+    """Shared sessions are used by all trackers and all accounts, so they never remember cookies"""
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+
+class RateLimitedHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter which waits for rate_limiter before every sent request, including redirects.
+    Timeout of every request is limited by the remaining time of the current thread deadline.
+    """
+    def __init__(self, rate_limiter=None, get_rate_limiter=None, **kwargs):
+        """
+        :type rate_limiter: TokenBucket | None
+        :param get_rate_limiter: get_rate_limiter(host) -> TokenBucket | None, it is called on every send instead
+                                 of using rate_limiter, so changed limits apply to already mounted adapters
+        """
+        self.rate_limiter = rate_limiter
+        self.get_rate_limiter = get_rate_limiter
+        super(RateLimitedHTTPAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        domain = urlparse(request.url).hostname
+        with tracer.span('http', 'http', method=request.method, url=request.url) as span:
+            rate_limiter = self.get_rate_limiter(domain) if self.get_rate_limiter is not None else self.rate_limiter
+            if rate_limiter is not None:
+                span.set(rate_limit_wait=rate_limiter.acquire())
+            deadline = get_current_deadline()
+            if deadline is not None:
+                kwargs['timeout'] = deadline.limit_timeout(kwargs.get('timeout'))
+            status = 'error'
+            try:
+                with http_request_duration.time(domain=domain):
+                    response = super(RateLimitedHTTPAdapter, self).send(request, **kwargs)
+                status = response.status_code
+            finally:
+                http_responses.inc(domain=domain, status=status)
+            span.set(status=status)
+            return response
+
+
+class Transport(object):
+    """
+    Keep-alive HTTP connections shared by all trackers.
+
+    Every host has own HTTPAdapter with connection pool and own shared requests.Session.
+    Shared sessions doesn't store cookies, cookies have to be passed to every request explicitly.
+    Requests which rely on session cookies (like login) have to use session from create_session,
+    it has own cookie jar, but still reuses pooled connections.
+
+    Requests to every domain can be limited with token bucket rate limiter, limit of domain is applied
+    to all its subdomains as well. Requests over the limit wait for their turn instead of failing.
+    """
+
+    def __init__(self, pool_connections=DEFAULT_POOLSIZE, pool_maxsize=DEFAULT_POOLSIZE):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._adapters = dict()
+        self._mounted_adapters = set()
+        self._sessions = dict()
+        self._rate_limiters = dict()
+        self._lock = threading.Lock()
+
+    def set_rate_limit(self, domain, rate, burst=1):
+        """
+        :param domain: domain name, like rutracker.org
+        :param rate: requests per second, None to remove limit
+        :param burst: number of requests which can be sent at once
+        """
+        with self._lock:
+            domain = domain.lower()
+            if rate is None:
+                self._rate_limiters.pop(domain, None)
+            else:
+                self._rate_limiters[domain] = TokenBucket(rate, burst)
+
+    def set_rate_limits(self, rate_limits):
+        """
+        :param rate_limits: {domain: (rate, burst)}
+        :type rate_limits: dict
+        """
+        for domain, (rate, burst) in six.iteritems(rate_limits):
+            self.set_rate_limit(domain, rate, burst)
+
+    def configure(self, pool_connections=None, pool_maxsize=None):
+        """
+        Change connection pool sizes.
+        Shared sessions get new adapters and their opened connections are closed,
+        sessions passed to mount keep their adapters, they are closed with the session
+        """
+        with self._lock:
+            self.pool_connections = pool_connections or self.pool_connections
+            self.pool_maxsize = pool_maxsize or self.pool_maxsize
+            adapters = self._adapters
+            mounted_adapters = self._mounted_adapters
+            self._adapters = dict()
+            self._mounted_adapters = set()
+            for prefix, session in six.iteritems(self._sessions):
+                session.mount(prefix, self._get_adapter(prefix))
+            for adapter in adapters.values():
+                if adapter not in mounted_adapters:
+                    adapter.close()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def get_rate_limiter(self, host):
+        """
+        :return: rate limiter of host or of its parent domain, None if requests to host aren't limited
+        :rtype: TokenBucket | None
+        """
+        with self._lock:
+            return self._get_rate_limiter(host)
+
+    def get_session(self, url):
+        """
+        :return: shared session for host of url
+        :rtype: requests.Session
+        """
+        prefix = self._get_prefix(url)
+        with self._lock:
+            session = self._sessions.get(prefix)
+            if session is None:
+                session = requests.Session()
+                session.cookies.set_policy(_NoCookiesPolicy())
+                session.mount(prefix, self._get_adapter(prefix))
+                self._sessions[prefix] = session
+            return session
+
+    def create_session(self, url):
+        """
+        :return: new session with own cookie jar, which uses pooled connections for host of url
+        :rtype: requests.Session
+        """
+        return self.mount(requests.Session(), url)
+
+    def mount(self, session, url):
+        """
+        Use pooled connections for host of url in the session
+
+        :type session: requests.Session
+        :rtype: requests.Session
+        """
+        prefix = self._get_prefix(url)
+        with self._lock:
+            adapter = self._get_adapter(prefix)
+            self._mounted_adapters.add(adapter)
+            session.mount(prefix, adapter)
+        return session
+
+    def request(self, method, url, settings=None, **kwargs):
+        """
+        :param settings: object with get_requests_kwargs (like TrackerSettings),
+                         its timeout and proxies are used when they are not specified in kwargs
+        :rtype: requests.Response
+        """
+        self._apply_settings(kwargs, settings)
+        return self.get_session(url).request(method, url, **kwargs)
+
+    def get(self, url, settings=None, **kwargs):
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('GET', url, settings, **kwargs)
+
+    def post(self, url, data=None, settings=None, **kwargs):
+        return self.request('POST', url, settings, data=data, **kwargs)
+
+    def send(self, request, settings=None, **kwargs):
+        """
+        :type request: requests.PreparedRequest
+        :rtype: requests.Response
+        """
+        self._apply_settings(kwargs, settings)
+        return self.get_session(request.url).send(request, **kwargs)
+
+    def get_stats(self):
+        """
+        :return: number of requests and opened connections per host
+        :rtype: dict
+        """
+        with self._lock:
+            adapters = list(self._adapters.items())
+        stats = dict()
+        for prefix, adapter in adapters:
+            pools = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+            requests_count = 0
+            connections_count = 0
+            for pool_manager in pools:
+                for key in pool_manager.pools.keys():
+                    pool = pool_manager.pools.get(key)
+                    if pool is None:
+                        continue
+                    requests_count += pool.num_requests
+                    connections_count += pool.num_connections
+            stats[urlparse(prefix).netloc] = {
+                'requests': requests_count,
+                'connections': connections_count,
+                'reused': max(requests_count - connections_count, 0)
+            }
+        return stats
+
+    @staticmethod
+    def _apply_settings(kwargs, settings):
+        if settings is None:
+            return
+        for key, value in six.iteritems(settings.get_requests_kwargs()):
+            kwargs.setdefault(key, value)
+
+    @staticmethod
+    def _get_prefix(url):
+        parsed_url = urlparse(url)
+        return u'{0}://{1}/'.format(parsed_url.scheme, parsed_url.netloc).lower()
+
+    def _get_adapter(self, prefix):
+        adapter = self._adapters.get(prefix)
+        if adapter is None:
+            adapter = RateLimitedHTTPAdapter(get_rate_limiter=self.get_rate_limiter,
+                                             pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+            self._adapters[prefix] = adapter
+        return adapter
+
+    def _get_rate_limiter(self, host):
+        if not host:
+            return None
+        parts = host.split('.')
+        for i in range(0, len(parts)):
+            rate_limiter = self._rate_limiters.get('.'.join(parts[i:]))
+            if rate_limiter is not None:
+                return rate_limiter
+        return None
+
+    def _close(self):
+        for session in self._sessions.values():
+            session.close()
+        for adapter in self._adapters.values():
+            adapter.close()
+        self._sessions = dict()
+        self._adapters = dict()
+        self._mounted_adapters = set()
+
+
+transport = Transport()
@@ -14,7 +14,11 @@ import structlog
 from structlog.stdlib import LoggerFactory
 from cheroot import wsgi
 from monitorrent.engine import DBEngineRunner, DbLoggerWrapper, ExecuteLogManager
-from monitorrent.db import init_db_engine, create_db
+from monitorrent.engine_worker import EngineWorker, EngineRunnerClient, EngineWorkerLogManager
+from monitorrent.db import init_db_engine, create_db, enable_wal, is_wal_enabled, set_db_writer, \
+    enable_incremental_vacuum, is_network_filesystem, SQLITE_TUNED_PRAGMAS
+from monitorrent.db_writer import DbWriter
+from monitorrent.log_maintenance import LogMaintenance
 from monitorrent.plugin_managers import load_plugins, get_plugins, TrackersManager, DbClientsManager, NotifierManager
 from monitorrent.rest.challenge_logs import ChallengeLogs
 from monitorrent.rest.notifiers import NotifierCollection, Notifier, NotifierCheck, NotifierEnabled
@@ -22,7 +26,7 @@ from monitorrent.rest.settings_cloudflare_challenge_solver import SettingsCloudf
 from monitorrent.upgrade_manager import upgrade
 from monitorrent.settings_manager import SettingsManager
 from monitorrent.new_version_checker import NewVersionChecker
-from monitorrent.rest import create_api, AuthMiddleware
+from monitorrent.rest import create_api, AuthMiddleware, EngineStateNotAvailable
 from monitorrent.rest.static_file import StaticFiles
 from monitorrent.rest.login import Login, Logout
 from monitorrent.rest.topics import TopicCollection, TopicParse, Topic, TopicResetStatus, TopicPauseState
@@ -37,9 +41,14 @@ from monitorrent.rest.settings_proxy import SettingsProxyEnabled, SettingsProxy
 from monitorrent.rest.settings_new_version_checker import SettingsNewVersionChecker
 from monitorrent.rest.settings_notify_on import SettingsNotifyOn
 from monitorrent.rest.new_version import NewVersion
-from monitorrent.rest.execute import ExecuteLogCurrent, ExecuteCall
+from monitorrent.rest.execute import ExecuteLogCurrent, ExecuteCall, ExecuteCancel, ExecuteEvents
 from monitorrent.rest.execute_logs import ExecuteLogs
 from monitorrent.rest.execute_logs_details import ExecuteLogsDetails
+from monitorrent.rest.execute_logs_trace import ExecuteLogsTrace
+from monitorrent.rest.metrics import Metrics
+from monitorrent.rest.transport import TransportStats
+from monitorrent.utils.transport import transport
+from monitorrent.utils.metrics import metrics
 
 structlog.configure(
     processors=[
@@ -76,7 +85,7 @@ def add_static_route(api, files_dir, log):
 
 
 def create_app(secret_key, token, tracker_manager, clients_manager, notifier_manager, settings_manager,
-               engine_runner, log_manager, new_version_checker, log):
+               engine_runner, log_manager, new_version_checker, log, metrics_auth=True, engine_in_process=True):
     AuthMiddleware.init(secret_key, token, lambda: settings_manager.get_is_authentication_enabled())
     app = create_api()
     add_static_route(app, 'webapp', log)
@@ -88,7 +97,7 @@ def create_app(secret_key, token, tracker_manager, clients_manager, notifier_man
     app.add_route('/api/topics/{id}/reset_status', TopicResetStatus(tracker_manager))
     app.add_route('/api/topics/{id}/pause', TopicPauseState(tracker_manager))
     app.add_route('/api/topics/parse', TopicParse(tracker_manager))
-    app.add_route('/api/trackers', TrackerCollection(tracker_manager))
+    app.add_route('/api/trackers', TrackerCollection(tracker_manager, engine_in_process))
     app.add_route('/api/trackers/{tracker}', Tracker(tracker_manager))
     app.add_route('/api/trackers/{tracker}/check', TrackerCheck(tracker_manager))
     app.add_route('/api/default_client', DefaultClient(clients_manager))
@@ -106,16 +115,27 @@ def create_app(secret_key, token, tracker_manager, clients_manager, notifier_man
     app.add_route('/api/settings/logs', SettingsLogs(settings_manager))
     app.add_route('/api/settings/proxy/enabled', SettingsProxyEnabled(settings_manager))
     app.add_route('/api/settings/proxy', SettingsProxy(settings_manager))
-    app.add_route('/api/settings/execute', SettingsExecute(engine_runner))
+    app.add_route('/api/settings/execute', SettingsExecute(engine_runner, settings_manager))
     app.add_route('/api/settings/new-version-checker', SettingsNewVersionChecker(settings_manager, new_version_checker))
     app.add_route('/api/settings/cloudflare-challenge-solver', SettingsCloudflareChallengeSolver(settings_manager))
     app.add_route('/api/settings/notify-on', SettingsNotifyOn(settings_manager))
     app.add_route('/api/new-version', NewVersion(new_version_checker))
     app.add_route('/api/execute/logs', ExecuteLogs(log_manager))
     app.add_route('/api/execute/logs/{execute_id}/details', ExecuteLogsDetails(log_manager))
+    app.add_route('/api/execute/logs/{execute_id}/trace', ExecuteLogsTrace(log_manager))
     app.add_route('/api/execute/logs/current', ExecuteLogCurrent(log_manager))
+    app.add_route('/api/execute/events', ExecuteEvents(log_manager) if engine_in_process
+                  else EngineStateNotAvailable())
     app.add_route('/api/execute/call', ExecuteCall(engine_runner))
+    app.add_route('/api/execute/cancel', ExecuteCancel(engine_runner))
     app.add_route('/api/challenge-logs', ChallengeLogs(settings_manager))
+    if engine_in_process:
+        app.add_route('/api/transport', TransportStats(transport))
+        app.add_route('/metrics', Metrics(metrics, metrics_auth))
+    else:
+        # engine worker process has no HTTP server, its state isn't available in split mode
+        app.add_route('/api/transport', EngineStateNotAvailable())
+        app.add_route('/metrics', EngineStateNotAvailable())
     return app
 
 
@@ -135,6 +155,25 @@ def main():
         db_path = 'monitorrent.db'
         config = 'config.py'
         playwright_timeout = 120000
+        http_pool_maxsize = 10
+        # {domain: (requests per second, burst)}, e.g. {'rutracker.org': (1, 5)}
+        rate_limits = {}
+        # allow Prometheus to scrape /metrics without authentication
+        metrics_no_auth = False
+        # all - web server and engine in one process,
+        # web - only web server, engine commands are sent to worker process through DB,
+        #       metrics, transport stats, circuit breakers and execute events of engine aren't available (503),
+        # worker - only engine, several workers can be started, only one of them runs engine
+        role = 'all'
+        # default - SQLite defaults, tuned - WAL journal, tuned pragmas and pool of opened connections,
+        # WAL doesn't work on network file systems, so tuned falls back to default there
+        db_profile = 'default'
+        # override pragmas of tuned profile, None removes pragma, e.g. {'synchronous': 'FULL', 'mmap_size': None}
+        sqlite_pragmas = {}
+        db_pool_size = 5
+        # all writes of engine and web server are executed by one thread in group transactions,
+        # requires WAL journal (tuned DB profile or split mode), it is not started otherwise
+        db_writer = False
 
         def __init__(self, parsed_args):
             if parsed_args.config is not None and not os.path.isfile(parsed_args.config):
@@ -152,19 +191,37 @@ def main():
                     self.port = parsed_config.get('port', self.port)
                     self.db_path = parsed_config.get('db_path', self.db_path)
                     self.playwright_timeout = parsed_config.get('playwright_timeout', self.db_path)
+                    self.http_pool_maxsize = parsed_config.get('http_pool_maxsize', self.http_pool_maxsize)
+                    self.rate_limits = parsed_config.get('rate_limits', self.rate_limits)
+                    self.metrics_no_auth = parsed_config.get('metrics_no_auth', self.metrics_no_auth)
+                    self.role = parsed_config.get('role', self.role)
+                    self.db_profile = parsed_config.get('db_profile', self.db_profile)
+                    self.sqlite_pragmas = parsed_config.get('sqlite_pragmas', self.sqlite_pragmas)
+                    self.db_pool_size = parsed_config.get('db_pool_size', self.db_pool_size)
+                    self.db_writer = parsed_config.get('db_writer', self.db_writer)
                 except:
                     ex, val, tb = sys.exc_info()
                     warnings.warn('Error reading: {0}: {1} ({2}'.format(parsed_args.config, ex, val))
 
             env_debug = (os.environ.get('MONITORRENT_DEBUG', None) in ['true', 'True', '1'])
+            env_metrics_no_auth = (os.environ.get('MONITORRENT_METRICS_NO_AUTH', None) in ['true', 'True', '1'])
+            env_db_writer = (os.environ.get('MONITORRENT_DB_WRITER', None) in ['true', 'True', '1'])
 
             self.debug = parsed_args.debug or env_debug or self.debug
+            self.metrics_no_auth = parsed_args.metrics_no_auth or env_metrics_no_auth or self.metrics_no_auth
+            self.db_writer = env_db_writer or self.db_writer
+            self.role = parsed_args.role or os.environ.get('MONITORRENT_ROLE', None) or self.role
+            self.db_profile = parsed_args.db_profile or os.environ.get('MONITORRENT_DB_PROFILE', None) \
+                or self.db_profile
             self.ip = parsed_args.ip or os.environ.get('MONITORRENT_IP', None) or self.ip
             self.port = parsed_args.port or try_int(os.environ.get('MONITORRENT_PORT', None)) or self.port
             self.db_path = parsed_args.db_path or os.environ.get('MONITORRENT_DB_PATH', None) or self.db_path
             self.playwright_timeout = parsed_args.playwright_timeout \
                                       or try_int(os.environ.get('MONITORRENT_PLAYWRIGHT_TIMEOUT', None)) \
                                       or self.playwright_timeout
+            self.http_pool_maxsize = parsed_args.http_pool_maxsize \
+                                     or try_int(os.environ.get('MONITORRENT_HTTP_POOL_MAXSIZE', None)) \
+                                     or self.http_pool_maxsize
 
     parser = argparse.ArgumentParser(description='Monitorrent server')
     parser.add_argument('--debug', action='store_true',
@@ -180,9 +237,30 @@ def main():
                         help='Path to config file (default {0})'.format(Config.config))
     parser.add_argument('--playwright-timeout', type=int, dest='playwright_timeout',
                         help='Timeout for resolve Cloudflare challenge with Playwright (default {0})'.format(Config.playwright_timeout))
+    parser.add_argument('--http-pool-maxsize', type=int, dest='http_pool_maxsize',
+                        help='Max number of keep-alive connections per host (default {0})'
+                        .format(Config.http_pool_maxsize))
+    parser.add_argument('--metrics-no-auth', action='store_true',
+                        help='Allow access to /metrics without authentication.')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true', dest='enable_incremental_vacuum',
+                        help='Rebuild database once to let background maintenance give free space '
+                             'back to file system and exit, server and workers have to be stopped')
+    parser.add_argument('--reset-auth-keys', action='store_true', dest='reset_auth_keys',
+                        help='Generate new secret key of web processes in split mode and exit, '
+                             'web processes have to be restarted, all users have to login again')
+    parser.add_argument('--db-profile', type=str, dest='db_profile', choices=['tuned', 'default'],
+                        help='SQLite settings profile, tuned enables WAL journal, '
+                             'it is not used on network file systems (default {0})'.format(Config.db_profile))
+    parser.add_argument('--role', type=str, dest='role', choices=['all', 'web', 'worker'],
+                        help='Run web server, engine worker or both in this process (default {0})'
+                        .format(Config.role))
 
     parsed_args = parser.parse_args()
     config = Config(parsed_args)
+    if config.role != 'all' and is_network_filesystem(config.db_path):
+        # processes of split mode share database in WAL journal, WAL doesn't work on network file systems
+        parser.error("role '{0}' can't be used, database {1} is on network file system"
+                     .format(config.role, config.db_path))
     if config.debug:
         logging.basicConfig(level=logging.DEBUG)
     else:
@@ -191,20 +269,78 @@ def main():
     log.info("Configuration finished", config=config.__dict__)
     db_connection_string = "sqlite:///" + config.db_path
 
-    init_db_engine(db_connection_string, False)
+    if config.db_profile == 'tuned' and is_network_filesystem(config.db_path):
+        log.warning("Database is on network file system, default DB profile is used", db_path=config.db_path)
+        config.db_profile = 'default'
+    if config.db_profile == 'tuned':
+        sqlite_pragmas = dict(SQLITE_TUNED_PRAGMAS, **config.sqlite_pragmas)
+        init_db_engine(db_connection_string, False, sqlite_pragmas=sqlite_pragmas, pool_size=config.db_pool_size)
+    else:
+        init_db_engine(db_connection_string, False)
+    transport.configure(pool_maxsize=config.http_pool_maxsize)
+    transport.set_rate_limits(config.rate_limits)
     load_plugins()
     upgrade()
     create_db()
+    if parsed_args.enable_incremental_vacuum:
+        print('Rebuilding database, it can take a while')
+        reclaimed_bytes = enable_incremental_vacuum()
+        print('Incremental vacuum enabled, {0} bytes reclaimed'.format(reclaimed_bytes))
+        return
+    if parsed_args.reset_auth_keys:
+        SettingsManager().reset_shared_auth_keys()
+        print('Secret key of web processes regenerated')
+        return
+    if config.role != 'all':
+        enable_wal()
+    db_writer = None
+    if config.db_writer and not is_wal_enabled():
+        # callers which hold read transaction would block commits of writer in rollback journal
+        log.warning("DB writer requires WAL journal, use tuned DB profile, writes are executed by calling threads")
+        config.db_writer = False
+    if config.db_writer:
+        db_writer = DbWriter()
+        db_writer.start()
+        set_db_writer(db_writer)
 
-    settings_manager = SettingsManager()
+    # settings can be changed by another process, so they are reread from DB every 10 seconds
+    settings_manager = SettingsManager(cache_ttl=None if config.role == 'all' else 10)
     tracker_manager = TrackersManager(settings_manager, get_plugins('tracker'), config)
     clients_manager = DbClientsManager(settings_manager, get_plugins('client'))
     notifier_manager = NotifierManager(settings_manager, get_plugins('notifier'))
 
-    log_manager = ExecuteLogManager()
-    engine_runner_logger = DbLoggerWrapper(log_manager, settings_manager)
-    engine_runner = DBEngineRunner(engine_runner_logger, settings_manager, tracker_manager,
-                                   clients_manager, notifier_manager)
+    def create_engine_runner(log_maintenance):
+        return DBEngineRunner(DbLoggerWrapper(log_manager, settings_manager, log_maintenance), settings_manager,
+                              tracker_manager, clients_manager, notifier_manager)
+
+    def create_log_maintenance():
+        return LogMaintenance(settings_manager, log_manager)
+
+    if config.role == 'web':
+        log_manager = EngineWorkerLogManager()
+    else:
+        log_manager = ExecuteLogManager()
+
+    if config.role == 'worker':
+        # maintenance runs only in worker which owns engine lease
+        engine_worker = EngineWorker(create_engine_runner, log_manager, maintenance_factory=create_log_maintenance)
+        print('Engine worker started')
+        try:
+            engine_worker.run()
+        except KeyboardInterrupt:
+            print('Stopping engine worker')
+            engine_worker.stop()
+        if db_writer is not None:
+            db_writer.stop()
+        print('Engine worker stopped')
+        return
+
+    if config.role == 'web':
+        engine_runner = EngineRunnerClient(tracker_manager)
+    else:
+        log_maintenance = create_log_maintenance()
+        log_maintenance.start()
+        engine_runner = create_engine_runner(log_maintenance)
 
     include_prerelease = settings_manager.get_new_version_check_include_prerelease()
     new_version_checker = NewVersionChecker(notifier_manager, include_prerelease)
@@ -221,12 +357,15 @@ def main():
     if debug:
         secret_key = 'Secret!'
         token = 'monitorrent'
+    elif config.role == 'web':
+        secret_key, token = settings_manager.get_shared_auth_keys()
     else:
         secret_key = os.urandom(24)
         token = ''.join(random.choice(string.ascii_letters) for _ in range(8))
 
     app = create_app(secret_key, token, tracker_manager, clients_manager, notifier_manager, settings_manager,
-                     engine_runner, log_manager, new_version_checker, log)
+                     engine_runner, log_manager, new_version_checker, log, not config.metrics_no_auth,
+                     config.role == 'all')
     server_start_params = (config.ip, config.port)
     server = wsgi.Server(server_start_params, app)
     print('Server started on {0}:{1}'.format(*server_start_params))
@@ -234,11 +373,15 @@ def main():
     try:
         server.start()
     except KeyboardInterrupt:
-        print('Stopping engine')
-        engine_runner.stop()
+        if config.role == 'all':
+            print('Stopping engine')
+            engine_runner.stop()
+            log_maintenance.stop()
         print('Stopping new_version_checker')
         new_version_checker.stop()
         server.stop()
+        if db_writer is not None:
+            db_writer.stop()
 
     print('Server stopped')
 
@@ -3,6 +3,8 @@ from builtins import range
 from builtins import object
 import abc
 import os
+import shutil
+import tempfile
 import vcr
 import vcr.cassette
 import functools
@@ -16,6 +18,7 @@ from monitorrent.db import init_db_engine, create_db, close_db, DBSession, get_e
 from monitorrent.upgrade_manager import call_ugprades, MonitorrentOperations, MigrationContext
 from monitorrent.plugins.trackers import Topic
 from monitorrent.rest import create_api, AuthMiddleware
+from monitorrent.utils.pubsub import EventChannel
 from falcon.testing import TestBase
 from future.utils import with_metaclass
 
@@ -58,6 +61,19 @@ class DbTestCase(TestCase):
             return self.engine.dialect.has_table(c, table_name)
 
 
+class FileDbTestCase(DbTestCase):
+    """Every thread uses its own connection to database, in-memory database has only one shared connection"""
+    def setUp(self):
+        self.db_dir = tempfile.mkdtemp()
+        init_db_engine("sqlite:///" + os.path.join(self.db_dir, 'monitorrent.db'), echo=False)
+        create_db()
+        self.engine = get_engine()
+
+    def tearDown(self):
+        super(FileDbTestCase, self).tearDown()
+        shutil.rmtree(self.db_dir)
+
+
 class TimeMock(Mock):
     value = 100
     triggers = []
@@ -75,6 +91,21 @@ class TimeMock(Mock):
         self.triggers.append((trigger, func))
 
 
+class TimeMockEventChannel(EventChannel):
+    """EventChannel which waits for events by TimeMock.sleep"""
+
+    def __init__(self, time_mock):
+        super(TimeMockEventChannel, self).__init__()
+        self.time_mock = time_mock
+
+    def wait(self, after, timeout):
+        events = self.get_events(after)
+        if len(events) == 0:
+            self.time_mock.sleep(timeout)
+            events = self.get_events(after)
+        return events
+
+
 class ReadContentMixin(object):
     @staticmethod
     def read_content(file_name, mode='r', encoding=None):
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+import pytz
+from ddt import ddt, data, unpack
+from monitorrent.plugins.check_schedule import get_check_interval, get_next_check_at
+from tests import TestCase
+
+BASE_INTERVAL = 3600
+
+
+@ddt
+class CheckScheduleTest(TestCase):
+    now = datetime(2016, 5, 10, 12, 0, 0, tzinfo=pytz.utc)
+
+    def test_never_updated_topic(self):
+        self.assertEqual(BASE_INTERVAL, get_check_interval(None, self.now, BASE_INTERVAL))
+
+    @data(timedelta(hours=1),
+          timedelta(hours=23),
+          # weekly show is checked often around the same weekday
+          timedelta(days=6, hours=12),
+          timedelta(days=7, hours=12),
+          timedelta(days=14),
+          timedelta(days=28, hours=20))
+    def test_base_interval(self, age):
+        self.assertEqual(BASE_INTERVAL, get_check_interval(self.now - age, self.now, BASE_INTERVAL))
+
+    @data((timedelta(days=2), 43200),
+          (timedelta(days=3), 64800),
+          # not later then the next weekly window
+          (timedelta(days=5, hours=18), 21600),
+          (timedelta(days=9), 86400))
+    @unpack
+    def test_weekly_show_between_releases(self, age, expected):
+        self.assertEqual(expected, get_check_interval(self.now - age, self.now, BASE_INTERVAL))
+
+    @data(timedelta(days=40), timedelta(days=365), timedelta(days=3650))
+    def test_finished_series_checked_once_a_day(self, age):
+        self.assertEqual(86400, get_check_interval(self.now - age, self.now, BASE_INTERVAL))
+
+    def test_interval_is_not_less_then_base_interval(self):
+        self.assertEqual(86400, get_check_interval(self.now - timedelta(days=2), self.now, 86400))
+
+    def test_next_check_at_is_earlier_then_interval(self):
+        next_check_at = get_next_check_at(self.now, BASE_INTERVAL)
+
+        self.assertLess(next_check_at, self.now + timedelta(seconds=BASE_INTERVAL))
+        self.assertGreater(next_check_at, self.now)
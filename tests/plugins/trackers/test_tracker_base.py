@@ -1,16 +1,18 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from threading import Barrier
 import six
 import pytz
 from requests import Response
 from sqlalchemy import Column, Integer, String, ForeignKey
 from ddt import ddt, data, unpack
-from mock import patch, Mock, MagicMock, ANY
+from mock import patch, Mock, MagicMock, ANY, call
 from monitorrent.db import DBSession, Base
 from monitorrent.plugins import Topic
 from monitorrent.plugins.status import Status
 from monitorrent.plugins.trackers import TrackerPluginBase, WithCredentialsMixin, ExecuteWithHashChangeMixin, \
     TrackerPluginMixinBase, LoginResult, TrackerSettings, CloudflareChallengeSolverSettings
-from tests import DbTestCase, TestCase
+from monitorrent.utils.http_cache import http_cache
+from tests import DbTestCase, FileDbTestCase, TestCase
 
 
 class MockTrackerPlugin(ExecuteWithHashChangeMixin, TrackerPluginBase):
@@ -38,6 +40,9 @@ class CreateEngineMixin(object):
         engine_topic.__enter__ = Mock(return_value=engine_topic)
         engine_topic.__exit__ = Mock(return_value=True)
         engine_topic.start = Mock(return_value=engine_downloads)
+        # pipeline starts topic with begin and finishes it with __exit__ from another thread
+        engine_topic.begin = Mock(return_value=engine_topic)
+        engine_topic.deadline = None
 
         engine_topics = MagicMock()
         engine_topics.__enter__ = Mock(return_value=engine_topics)
@@ -52,7 +57,8 @@ class CreateEngineMixin(object):
         return engine_tracker, engine_topics, engine_topic, engine_downloads
 
 
-class ExecuteWithHashChangeMixinTest(DbTestCase, CreateEngineMixin):
+@ddt
+class ExecuteWithHashChangeMixinTest(FileDbTestCase, CreateEngineMixin):
     class ExecuteMixinMockTopic(Topic):
         __tablename__ = "mocktopic_series"
 
@@ -61,7 +67,8 @@ class ExecuteWithHashChangeMixinTest(DbTestCase, CreateEngineMixin):
         hash = Column(String, nullable=True)
 
         __mapper_args__ = {
-            'polymorphic_identity': 'mocktracker.com'
+            # tests/test_engine_execute.py maps 'mocktracker.com' to its own topic class
+            'polymorphic_identity': 'hash.mocktracker.com'
         }
 
     def setUp(self):
@@ -70,9 +77,10 @@ class ExecuteWithHashChangeMixinTest(DbTestCase, CreateEngineMixin):
         MockTrackerPlugin.topic_class = self.ExecuteMixinMockTopic
         Topic.metadata.create_all(self.engine)
 
+    @data(1, 3)
     @patch('monitorrent.plugins.trackers.Torrent', create=True)
     @patch('monitorrent.plugins.trackers.download', create=True)
-    def test_execute(self, download, torrent_mock):
+    def test_execute(self, host_concurrency, download, torrent_mock):
         def download_func(request, **kwargs):
             self.assertEqual(12, kwargs['timeout'])
             response = Response()
@@ -87,7 +95,7 @@ class ExecuteWithHashChangeMixinTest(DbTestCase, CreateEngineMixin):
 
         last_update = datetime.now(pytz.utc)
 
-        engine_tracker, _, _, engine_downloads = self.create_engine_tracker()
+        engine_tracker, engine_topics, _, engine_downloads = self.create_engine_tracker()
         engine_downloads.add_torrent.return_value = last_update
 
         download.side_effect = download_func
@@ -121,7 +129,7 @@ class ExecuteWithHashChangeMixinTest(DbTestCase, CreateEngineMixin):
             topic4_id = topic4.id
         cloudflare_challenge_solver_settings = CloudflareChallengeSolverSettings(False, 10000, False, False, 0)
         plugin = MockTrackerPlugin()
-        plugin.init(TrackerSettings(12, None, cloudflare_challenge_solver_settings))
+        plugin.init(TrackerSettings(12, None, cloudflare_challenge_solver_settings, host_concurrency))
         plugin.execute(plugin.get_topics(None), engine_tracker)
         with DBSession() as db:
             # was successfully updated
@@ -149,6 +157,14 @@ class ExecuteWithHashChangeMixinTest(DbTestCase, CreateEngineMixin):
             self.assertIsNone(topic.last_update)
             self.assertEqual(topic.status, Status.Ok)
 
+        # queue depths of pipeline stages are reported to execute log
+        stage_messages = [c[0][0] for c in engine_topics.info.call_args_list if c[0][0].startswith(u'Stage ')]
+        if host_concurrency > 1:
+            self.assertEqual(3, len(stage_messages))
+            self.assertIn(u'<b>fetch</b>: 4 topic(s) on 3 worker(s), queue depth max', stage_messages[0])
+        else:
+            self.assertEqual([], stage_messages)
+
 
 class ExecuteWithHashChangeMixinStatusTest(DbTestCase, CreateEngineMixin):
     class ExecuteMockTopic(Topic):
@@ -427,6 +443,124 @@ class ExecuteWithHashChangeMixinStatusTest(DbTestCase, CreateEngineMixin):
         engine_tracker.failed.assert_called_once()
         plugin.save_topic.assert_not_called()
 
+    @patch('monitorrent.plugins.trackers.Torrent', create=True)
+    @patch('monitorrent.plugins.trackers.download', create=True)
+    def test_execute_not_modified_should_skip_torrent(self, download, torrent_mock):
+        def download_func(request, **kwargs):
+            response = Response()
+            response._content = b"d9:"
+            if kwargs.get('headers', {}).get('If-None-Match') == '"1"':
+                response.status_code = 304
+            else:
+                response.status_code = 200
+                response.headers['ETag'] = '"1"'
+            return response, None
+
+        download.side_effect = download_func
+        torrent = torrent_mock.return_value
+        torrent.info_hash = 'NEWHASH'
+
+        engine_tracker, _, _, engine_downloads = self.create_engine_tracker()
+
+        topic1 = self.ExecuteMockTopic(display_name='Russian / English',
+                                       url='http://mocktracker2.com/1',
+                                       additional_attribute='English',
+                                       hash='OLDHASH',
+                                       status=Status.Ok)
+        cloudflare_challenge_solver_settings = CloudflareChallengeSolverSettings(False, 10000, False, False, 0)
+        plugin = self.MockTrackerPlugin()
+        plugin._prepare_request = Mock(side_effect=lambda topic: topic.url)
+        plugin.init(TrackerSettings(12, None, cloudflare_challenge_solver_settings))
+        plugin.save_topic = Mock()
+
+        plugin.execute([topic1], engine_tracker)
+        engine_downloads.add_torrent.assert_called_once()
+        torrent_mock.assert_called_once()
+
+        plugin.execute([topic1], engine_tracker)
+        self.assertEqual('"1"', download.call_args[1]['headers']['If-None-Match'])
+        engine_downloads.add_torrent.assert_called_once()
+        torrent_mock.assert_called_once()
+
+    @patch('monitorrent.plugins.trackers.Torrent', create=True)
+    @patch('monitorrent.plugins.trackers.download', create=True)
+    def test_execute_check_changes_true_and_not_modified_should_call_save_topic(self, download, torrent_mock):
+        def download_func(request, **kwargs):
+            response = Response()
+            response._content = b"d9:"
+            if kwargs.get('headers', {}).get('If-None-Match') == '"1"':
+                response.status_code = 304
+            else:
+                response.status_code = 200
+                response.headers['ETag'] = '"1"'
+            return response, None
+
+        download.side_effect = download_func
+        torrent = torrent_mock.return_value
+        torrent.info_hash = 'OLDHASH'
+
+        engine_tracker, _, _, engine_downloads = self.create_engine_tracker()
+
+        topic1 = self.ExecuteMockTopic(display_name='Russian / English',
+                                       url='http://mocktracker2.com/1',
+                                       additional_attribute='English',
+                                       hash='OLDHASH',
+                                       status=Status.Ok)
+        cloudflare_challenge_solver_settings = CloudflareChallengeSolverSettings(False, 10000, False, False, 0)
+        plugin = self.MockTrackerPlugin()
+        plugin._prepare_request = Mock(side_effect=lambda topic: topic.url)
+        plugin.check_changes = Mock(return_value=True)
+        plugin.init(TrackerSettings(12, None, cloudflare_challenge_solver_settings))
+        plugin.save_topic = Mock()
+
+        plugin.execute([topic1], engine_tracker)
+        plugin.save_topic.reset_mock()
+
+        plugin.execute([topic1], engine_tracker)
+
+        self.assertEqual('"1"', download.call_args[1]['headers']['If-None-Match'])
+        plugin.save_topic.assert_called_once_with(topic1, None, Status.Ok)
+        engine_downloads.add_torrent.assert_not_called()
+        # validators of the first response are kept
+        self.assertEqual({'If-None-Match': '"1"'}, http_cache.get_conditional_headers('http://mocktracker2.com/1'))
+
+    @patch('monitorrent.plugins.trackers.is_torrent_content', create=True)
+    @patch('monitorrent.plugins.trackers.Torrent', create=True)
+    @patch('monitorrent.plugins.trackers.download', create=True)
+    def test_execute_same_content_should_not_decode_torrent(self, download, torrent_mock, is_torrent_content):
+        def download_func(request, **kwargs):
+            response = Response()
+            response._content = b"d9:"
+            response.status_code = 200
+            return response, request[1]
+
+        download.side_effect = download_func
+        is_torrent_content.return_value = True
+        torrent = torrent_mock.return_value
+        torrent.info_hash = 'NEWHASH'
+
+        engine_tracker, _, _, engine_downloads = self.create_engine_tracker()
+
+        topic1 = self.ExecuteMockTopic(display_name='Russian / English',
+                                       url='http://mocktracker2.com/1',
+                                       additional_attribute='English',
+                                       hash='OLDHASH',
+                                       status=Status.Ok)
+        cloudflare_challenge_solver_settings = CloudflareChallengeSolverSettings(False, 10000, False, False, 0)
+        plugin = self.MockTrackerPlugin()
+        plugin.init(TrackerSettings(12, None, cloudflare_challenge_solver_settings))
+        plugin.save_topic = Mock()
+
+        plugin.execute([topic1], engine_tracker)
+        self.assertEqual('NEWHASH', topic1.hash)
+        self.assertIsNotNone(topic1.content_digest)
+        plugin.save_topic.assert_called_once_with(topic1, ANY, Status.Ok)
+
+        plugin.execute([topic1], engine_tracker)
+        is_torrent_content.assert_called_once()
+        torrent_mock.assert_called_once()
+        engine_downloads.add_torrent.assert_called_once()
+
 @ddt
 class TrackerPluginBaseTest(DbTestCase):
     class MockTopic(Topic):
@@ -746,6 +880,71 @@ class TrackerPluginBaseTest(DbTestCase):
         half_not_paused = [t for t in half_topics if not t['paused']]
         self.assertEqual(len(topics), len(half_not_paused))
 
+    def test_get_topics_due_only(self):
+        plugin = MockTrackerPlugin()
+        plugin.topic_class = self.MockTopic
+        now = datetime.now(pytz.utc)
+        next_checks = [None, now - timedelta(minutes=1), now + timedelta(hours=1)]
+        ids = []
+        with DBSession() as db:
+            for i, next_check_at in enumerate(next_checks):
+                topic = self.MockTopic(url='http://base.mocktracker.org/torrent/{0}'.format(i),
+                                       display_name='Name {0}'.format(i),
+                                       additional_attribute='Text {0}'.format(i),
+                                       next_check_at=next_check_at)
+                db.add(topic)
+                db.commit()
+                ids.append(topic.id)
+
+        self.assertEqual(3, len(plugin.get_topics(None)))
+        self.assertEqual(ids[:2], sorted([t.id for t in plugin.get_topics(None, due_only=True)]))
+        # explicitly requested topics are executed regardless to schedule
+        self.assertEqual(1, len(plugin.get_topics([ids[2]], due_only=True)))
+
+    def test_update_check_schedule(self):
+        plugin = MockTrackerPlugin()
+        plugin.topic_class = self.MockTopic
+        now = datetime.now(pytz.utc)
+        with DBSession() as db:
+            topic1 = self.MockTopic(url='http://base.mocktracker.org/torrent/1', display_name='Name 1',
+                                    additional_attribute='Text 1', last_update=now - timedelta(hours=1))
+            topic2 = self.MockTopic(url='http://base.mocktracker.org/torrent/2', display_name='Name 2',
+                                    additional_attribute='Text 2', last_update=now - timedelta(days=365))
+            db.add(topic1)
+            db.add(topic2)
+            db.commit()
+            topic1_id = topic1.id
+            topic2_id = topic2.id
+
+        plugin.update_check_schedule(plugin.get_topics(None), now, 3600)
+
+        with DBSession() as db:
+            topic1 = db.query(self.MockTopic).filter(self.MockTopic.id == topic1_id).first()
+            self.assertEqual(3600, topic1.check_interval)
+            self.assertEqual(now + timedelta(seconds=3240), topic1.next_check_at)
+
+            topic2 = db.query(self.MockTopic).filter(self.MockTopic.id == topic2_id).first()
+            self.assertEqual(86400, topic2.check_interval)
+            self.assertGreater(topic2.next_check_at, topic1.next_check_at)
+
+    def test_update_check_schedule_of_failed_topic(self):
+        plugin = MockTrackerPlugin()
+        plugin.topic_class = self.MockTopic
+        now = datetime.now(pytz.utc)
+        with DBSession() as db:
+            topic = self.MockTopic(url='http://base.mocktracker.org/torrent/1', display_name='Name 1',
+                                   additional_attribute='Text 1', last_update=now - timedelta(days=365))
+            db.add(topic)
+            db.commit()
+            topic_id = topic.id
+
+        plugin.update_check_schedule(plugin.get_topics(None), now, 3600, frozenset([topic_id]))
+
+        with DBSession() as db:
+            topic = db.query(self.MockTopic).filter(self.MockTopic.id == topic_id).first()
+            self.assertEqual(3600, topic.check_interval)
+            self.assertEqual(now + timedelta(seconds=3240), topic.next_check_at)
+
 
 class TrackerPluginMixinTest(TestCase):
     class MockTopic2(Topic):
@@ -879,3 +1078,33 @@ class WithCredentialsMixinTest(DbTestCase):
             execute_mock.assert_called_with(None, engine)
         else:
             execute_mock.assert_not_called()
+
+
+@ddt
+class TrackerPluginExecuteTopicsTest(TestCase):
+    @data(1, 3)
+    def test_execute_topics_calls_every_topic(self, host_concurrency):
+        cloudflare_challenge_solver_settings = CloudflareChallengeSolverSettings(False, 10000, False, False, 0)
+        plugin = MockTrackerPlugin()
+        plugin.init(TrackerSettings(10, None, cloudflare_challenge_solver_settings, host_concurrency))
+
+        execute_topic = Mock()
+        topics = ['topic1', 'topic2', 'topic3', 'topic4']
+        # noinspection PyProtectedMember
+        plugin._execute_topics(topics, execute_topic)
+
+        self.assertEqual(len(topics), execute_topic.call_count)
+        execute_topic.assert_has_calls([call(i, topics[i]) for i in range(len(topics))], any_order=True)
+
+    def test_execute_topics_in_parallel(self):
+        barrier = Barrier(2, timeout=5)
+        cloudflare_challenge_solver_settings = CloudflareChallengeSolverSettings(False, 10000, False, False, 0)
+        plugin = MockTrackerPlugin()
+        plugin.init(TrackerSettings(10, None, cloudflare_challenge_solver_settings, 2))
+
+        # both topics have to be checked at the same time to pass the barrier
+        execute_topic = Mock(side_effect=lambda index, topic: barrier.wait())
+        # noinspection PyProtectedMember
+        plugin._execute_topics(['topic1', 'topic2'], execute_topic)
+
+        self.assertEqual(2, execute_topic.call_count)
@@ -1,8 +1,11 @@
 # coding=utf-8
+import threading
+import time
 import pytest
 import six
 import json
 import requests_mock
+from mock import patch
 from monitorrent.plugins.trackers import TrackerSettings, CloudflareChallengeSolverSettings
 from monitorrent.plugins.trackers.lostfilm import LostFilmQuality, LostFilmTVTracker, LostFilmTVLoginFailedException
 from monitorrent.plugins.trackers.lostfilm import SpecialSeasons, LostFilmEpisode, LostFilmSeason, LostFilmShow
@@ -427,3 +430,34 @@ class TestLostFilmTracker(ReadContentMixin):
             with pytest.raises(LostFilmTVLoginFailedException) as cm:
                 self.tracker.login(u'fakelogin', u'p@$$w0rd')
             assert cm.value.code == 4
+
+
+class TestLostFilmTrackerHeaders(object):
+    def test_cloudflare_headers_updated_by_one_topic_at_time(self):
+        tracker = LostFilmTVTracker(headers={'User-Agent': 'old'}, cookies={})
+        active = []
+        max_active = []
+
+        def update_headers_and_cookies(obj, url):
+            active.append(url)
+            max_active.append(len(active))
+            time.sleep(0.01)
+            obj.headers = {'User-Agent': url}
+            obj.cookies = {'cf_clearance': url}
+            active.remove(url)
+            return obj.headers, obj.cookies
+
+        results = []
+        with patch('monitorrent.plugins.trackers.lostfilm.update_headers_and_cookies_mixin',
+                   side_effect=update_headers_and_cookies):
+            threads = [threading.Thread(target=lambda u: results.append(tracker._get_headers_and_cookies(u)),
+                                        args=('url{0}'.format(i),)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert max(max_active) == 1
+        # every request gets headers and cookies of the same update
+        assert all(headers['User-Agent'] == cookies['cf_clearance'] for headers, cookies in results)
+        assert len(results) == 4
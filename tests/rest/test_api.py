@@ -3,7 +3,7 @@ from builtins import object
 import falcon
 from enum import Enum
 from datetime import datetime
-from monitorrent.rest import MonitorrentJSONEncoder
+from monitorrent.rest import MonitorrentJSONEncoder, EngineStateNotAvailable
 from unittest import TestCase
 from ddt import ddt, data, unpack
 from monitorrent.plugins.status import Status
@@ -58,3 +58,11 @@ class JSONTranslatorTest(RestTestBase):
 
         self.assertEqual(falcon.HTTP_BAD_REQUEST, self.srmock.status)
 
+
+class EngineStateNotAvailableTest(RestTestBase):
+    def test_get(self):
+        self.api.add_route('/api/transport', EngineStateNotAvailable())
+
+        self.simulate_request('/api/transport')
+
+        self.assertEqual(falcon.HTTP_SERVICE_UNAVAILABLE, self.srmock.status)
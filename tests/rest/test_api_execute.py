@@ -3,8 +3,9 @@ import json
 from ddt import ddt, data
 from mock import MagicMock, Mock, patch, call
 from monitorrent.plugins.status import Status
-from tests import RestTestBase, TimeMock
-from monitorrent.rest.execute import ExecuteCall, ExecuteLogCurrent, ExecuteLogManager
+from tests import RestTestBase, TimeMock, TimeMockEventChannel
+from monitorrent.rest.execute import ExecuteCall, ExecuteCancel, ExecuteEvents, ExecuteLogCurrent, ExecuteLogManager
+from monitorrent.utils.pubsub import EventChannel
 
 
 class ExecuteLogCurrentTest(RestTestBase):
@@ -16,6 +17,7 @@ class ExecuteLogCurrentTest(RestTestBase):
         log_manager.is_running = Mock(return_value=False)
 
         time = TimeMock()
+        log_manager.events = TimeMockEventChannel(time)
 
         with patch("monitorrent.rest.execute.time", time):
             execute_log_current = ExecuteLogCurrent(log_manager)
@@ -36,6 +38,7 @@ class ExecuteLogCurrentTest(RestTestBase):
         log_manager.is_running = Mock(return_value=True)
 
         time = TimeMock()
+        log_manager.events = TimeMockEventChannel(time)
 
         with patch("monitorrent.rest.execute.time", time):
             execute_log_current = ExecuteLogCurrent(log_manager)
@@ -57,6 +60,7 @@ class ExecuteLogCurrentTest(RestTestBase):
         log_manager.is_running = Mock(return_value=True)
 
         time = TimeMock()
+        log_manager.events = TimeMockEventChannel(time)
 
         with patch("monitorrent.rest.execute.time", time):
             execute_log_current = ExecuteLogCurrent(log_manager)
@@ -84,6 +88,7 @@ class ExecuteLogCurrentTest(RestTestBase):
         log_manager.is_running = Mock(return_value=True)
 
         time = TimeMock()
+        log_manager.events = TimeMockEventChannel(time)
         time.call_on(115, set_result)
 
         with patch("monitorrent.rest.execute.time", time):
@@ -106,6 +111,7 @@ class ExecuteLogCurrentTest(RestTestBase):
 
         execute_log_current = ExecuteLogCurrent(log_manager)
         time = TimeMock()
+        log_manager.events = TimeMockEventChannel(time)
 
         with patch("monitorrent.rest.execute.time", time):
             self.api.add_route(self.test_route, execute_log_current)
@@ -113,6 +119,94 @@ class ExecuteLogCurrentTest(RestTestBase):
             self.assertEqual(self.srmock.status, falcon.HTTP_INTERNAL_SERVER_ERROR)
 
 
+class ExecuteEventsTest(RestTestBase):
+    def create_log_manager(self, is_running=False, execute_id=None):
+        log_manager = Mock()
+        log_manager.events = EventChannel()
+        log_manager.is_running = Mock(return_value=is_running)
+        log_manager.get_current_execute_id = Mock(return_value=execute_id)
+        return log_manager
+
+    def test_stream(self):
+        log_manager = self.create_log_manager(True, 3)
+        log_manager.events.publish('log', {'id': 1, 'message': u'Old'})
+
+        self.api.add_route(self.test_route, ExecuteEvents(log_manager))
+
+        stream = iter(self.simulate_request(self.test_route))
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertEqual(self.srmock.headers_dict['Content-Type'], 'text/event-stream')
+        self.assertEqual(next(stream), b'retry: 1000\nevent: state\ndata: {"is_running": true, "execute_id": 3}\n\n')
+
+        log_manager.events.publish('log', {'id': 2, 'message': u'\u041d\u043e\u0432\u044b\u0439'})
+        log_manager.events.publish('progress', {'execute_id': 3, 'progress': 50})
+
+        self.assertEqual(next(stream).decode('utf-8'),
+                         u'id: 2\nevent: log\ndata: {"id": 2, "message": "\u041d\u043e\u0432\u044b\u0439"}\n\n')
+        self.assertEqual(next(stream), b'id: 3\nevent: progress\ndata: {"execute_id": 3, "progress": 50}\n\n')
+        stream.close()
+
+    def test_stream_from_last_event_id(self):
+        log_manager = self.create_log_manager()
+        log_manager.events.publish('started', {'execute_id': 1})
+        log_manager.events.publish('finished', {'execute_id': 1})
+
+        self.api.add_route(self.test_route, ExecuteEvents(log_manager))
+
+        stream = iter(self.simulate_request(self.test_route, headers={'Last-Event-ID': '1'}))
+
+        self.assertEqual(next(stream), b'retry: 1000\nevent: state\ndata: {"is_running": false, "execute_id": null}\n\n')
+        self.assertEqual(next(stream), b'id: 2\nevent: finished\ndata: {"execute_id": 1}\n\n')
+        stream.close()
+
+    def test_stream_lost_events(self):
+        log_manager = self.create_log_manager()
+        log_manager.events = EventChannel(max_events=1)
+        log_manager.events.publish('started', {'execute_id': 1})
+        log_manager.events.publish('finished', {'execute_id': 1})
+
+        self.api.add_route(self.test_route, ExecuteEvents(log_manager))
+
+        stream = iter(self.simulate_request(self.test_route, headers={'Last-Event-ID': '0'}))
+
+        self.assertEqual(next(stream), b'event: reset\ndata: null\n\n')
+        stream.close()
+
+    def test_stream_after_server_restart(self):
+        log_manager = self.create_log_manager()
+        log_manager.events.publish('started', {'execute_id': 5})
+
+        self.api.add_route(self.test_route, ExecuteEvents(log_manager))
+
+        # client saw event 100 before restart, new events have smaller ids
+        stream = iter(self.simulate_request(self.test_route, headers={'Last-Event-ID': '100'}))
+
+        self.assertEqual(next(stream), b'event: reset\ndata: null\n\n')
+        self.assertEqual(next(stream), b'retry: 1000\nevent: state\ndata: {"is_running": false, "execute_id": null}\n\n')
+        self.assertEqual(next(stream), b'id: 1\nevent: started\ndata: {"execute_id": 5}\n\n')
+        stream.close()
+
+    def test_stream_heartbeat_and_close(self):
+        log_manager = self.create_log_manager()
+        log_manager.events = TimeMockEventChannel(TimeMock())
+
+        self.api.add_route(self.test_route, ExecuteEvents(log_manager))
+
+        with patch("monitorrent.rest.execute.time", log_manager.events.time_mock):
+            chunks = list(self.simulate_request(self.test_route))
+
+        self.assertEqual(len(chunks), 1 + ExecuteEvents.STREAM_DURATION // ExecuteEvents.HEARTBEAT_INTERVAL)
+        self.assertEqual(chunks[1], b': heartbeat\n\n')
+
+    def test_bad_last_event_id(self):
+        self.api.add_route(self.test_route, ExecuteEvents(self.create_log_manager()))
+
+        self.simulate_request(self.test_route, headers={'Last-Event-ID': 'abc'})
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+
+
 @ddt
 class ExecuteCallTest(RestTestBase):
     def test_execute(self):
@@ -235,3 +329,30 @@ class ExecuteCallTest(RestTestBase):
         self.simulate_request(self.test_route, query_string=query_string, method="POST")
         self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
         engine_runner.execute.assert_not_called()
+
+
+class ExecuteCancelTest(RestTestBase):
+    def test_cancel(self):
+        engine_runner = Mock()
+        engine_runner.cancel = Mock(return_value=True)
+        # noinspection PyTypeChecker
+        execute_cancel = ExecuteCancel(engine_runner)
+
+        self.api.add_route(self.test_route, execute_cancel)
+
+        self.simulate_request(self.test_route, method="POST")
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        engine_runner.cancel.assert_called_once_with()
+
+    def test_cancel_not_running(self):
+        engine_runner = Mock()
+        engine_runner.cancel = Mock(return_value=False)
+        # noinspection PyTypeChecker
+        execute_cancel = ExecuteCancel(engine_runner)
+
+        self.api.add_route(self.test_route, execute_cancel)
+
+        self.simulate_request(self.test_route, method="POST")
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_NOT_FOUND)
@@ -35,7 +35,7 @@ class ExecuteLogsTest(RestTestBase):
         count = 23
         entries = [{'i': i} for i in range(count)]
 
-        def get_log_entries(skip, take):
+        def get_log_entries(skip, take, before=None):
             return entries[skip:skip + take], count
 
         log_manager = MagicMock()
@@ -119,3 +119,21 @@ class ExecuteLogsTest(RestTestBase):
 
         self.simulate_request('/api/execute/logs', query_string='take=10&skip=-1')
         self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST, 'skip should be greater or equal to 0')
+
+        self.simulate_request('/api/execute/logs', query_string='take=10&before=0')
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST, 'before should be greater than 0')
+
+    def test_get_before(self):
+        log_manager = MagicMock()
+        log_manager.get_log_entries = MagicMock(return_value=([{'id': 4}], 5))
+
+        # noinspection PyTypeChecker
+        execute_logs = ExecuteLogs(log_manager)
+
+        self.api.add_route('/api/execute/logs', execute_logs)
+
+        body = self.simulate_request('/api/execute/logs', query_string='take=1&before=5', decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertEqual(json.loads(body)['data'], [{'id': 4}])
+        log_manager.get_log_entries.assert_called_once_with(0, 1, 5)
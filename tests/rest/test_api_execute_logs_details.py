@@ -1,7 +1,7 @@
 import json
 import falcon
 from mock import MagicMock, Mock, patch, call
-from tests import RestTestBase, TimeMock
+from tests import RestTestBase, TimeMock, TimeMockEventChannel
 from monitorrent.rest.execute_logs_details import ExecuteLogsDetails, ExecuteLogManager
 
 
@@ -45,6 +45,7 @@ class ExecuteLogDetailsTest(RestTestBase):
         log_manager.is_running = Mock(return_value=False)
 
         time = TimeMock()
+        log_manager.events = TimeMockEventChannel(time)
 
         with patch("monitorrent.rest.execute.time", time):
             execute_log_details = ExecuteLogsDetails(log_manager)
@@ -65,6 +66,7 @@ class ExecuteLogDetailsTest(RestTestBase):
         log_manager.is_running = Mock(return_value=True)
 
         time = TimeMock()
+        log_manager.events = TimeMockEventChannel(time)
 
         with patch("monitorrent.rest.execute_logs_details.time", time):
             execute_log_details = ExecuteLogsDetails(log_manager)
@@ -86,6 +88,7 @@ class ExecuteLogDetailsTest(RestTestBase):
         log_manager.is_running = Mock(return_value=True)
 
         time = TimeMock()
+        log_manager.events = TimeMockEventChannel(time)
 
         with patch("monitorrent.rest.execute_logs_details.time", time):
             execute_log_details = ExecuteLogsDetails(log_manager)
@@ -113,6 +116,7 @@ class ExecuteLogDetailsTest(RestTestBase):
         log_manager.is_running = Mock(return_value=True)
 
         time = TimeMock()
+        log_manager.events = TimeMockEventChannel(time)
         time.call_on(115, set_result)
 
         with patch("monitorrent.rest.execute_logs_details.time", time):
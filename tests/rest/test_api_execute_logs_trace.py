@@ -0,0 +1,51 @@
+import json
+import falcon
+from mock import MagicMock
+from tests import RestTestBase
+from monitorrent.rest.execute_logs_trace import ExecuteLogsTrace
+
+
+class ExecuteLogsTraceTest(RestTestBase):
+    def test_get(self):
+        trace = {'traceEvents': [{'name': 'execute', 'ph': 'X', 'ts': 0, 'dur': 10}], 'displayTimeUnit': 'ms'}
+
+        log_manager = MagicMock()
+        log_manager.get_execute_trace = MagicMock(return_value=trace)
+
+        # noinspection PyTypeChecker
+        execute_logs_trace = ExecuteLogsTrace(log_manager)
+
+        self.api.add_route('/api/execute/logs/{execute_id}/trace', execute_logs_trace)
+
+        body = self.simulate_request('/api/execute/logs/1/trace', decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertTrue('application/json' in self.srmock.headers_dict['Content-Type'])
+        self.assertTrue('execute-1.trace.json' in self.srmock.headers_dict['Content-Disposition'])
+        self.assertEqual(json.loads(body), trace)
+        log_manager.get_execute_trace.assert_called_once_with(1)
+
+    def test_not_found(self):
+        log_manager = MagicMock()
+        log_manager.get_execute_trace = MagicMock(return_value=None)
+
+        # noinspection PyTypeChecker
+        execute_logs_trace = ExecuteLogsTrace(log_manager)
+
+        self.api.add_route('/api/execute/logs/{execute_id}/trace', execute_logs_trace)
+
+        self.simulate_request('/api/execute/logs/1/trace')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_NOT_FOUND)
+
+    def test_bad_request(self):
+        log_manager = MagicMock()
+
+        # noinspection PyTypeChecker
+        execute_logs_trace = ExecuteLogsTrace(log_manager)
+
+        self.api.add_route('/api/execute/logs/{execute_id}/trace', execute_logs_trace)
+
+        self.simulate_request('/api/execute/logs/abcd/trace')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
@@ -0,0 +1,34 @@
+import falcon
+from tests import RestTestBase
+from monitorrent.rest.metrics import Metrics
+from monitorrent.utils.metrics import MetricsRegistry
+
+
+class MetricsTest(RestTestBase):
+    def setUp(self, disable_auth=False):
+        super(MetricsTest, self).setUp(disable_auth)
+        self.registry = MetricsRegistry()
+        self.registry.counter('test_total', 'Test').inc()
+
+    def test_get(self):
+        self.api.add_route('/metrics', Metrics(self.registry))
+
+        body = self.simulate_request('/metrics', headers={'Cookie': self.get_cookie()}, decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertEqual(self.srmock.headers_dict['Content-Type'], MetricsRegistry.CONTENT_TYPE)
+        self.assertEqual(body, '# HELP test_total Test\n# TYPE test_total counter\ntest_total 1\n')
+
+    def test_get_requires_auth(self):
+        self.api.add_route('/metrics', Metrics(self.registry))
+
+        self.simulate_request('/metrics')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_UNAUTHORIZED)
+
+    def test_get_without_auth(self):
+        self.api.add_route('/metrics', Metrics(self.registry, auth=False))
+
+        self.simulate_request('/metrics')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
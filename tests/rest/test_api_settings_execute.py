@@ -1,11 +1,20 @@
 from builtins import object
 import json
+import time
 import falcon
 from datetime import datetime
 from ddt import ddt, data
+from mock import Mock, MagicMock
 import pytz
+from sqlalchemy.pool import StaticPool
 from tests import RestTestBase
+from monitorrent.db import init_db_engine, create_db, close_db
+from monitorrent.engine import Engine
+from monitorrent.plugins import Topic
+from monitorrent.plugin_managers import ClientsManager, TrackersManager
 from monitorrent.rest.settings_execute import SettingsExecute
+from monitorrent.settings_manager import SettingsManager
+from monitorrent.utils.deadline import get_current_deadline
 
 
 @ddt
@@ -13,11 +22,21 @@ class SettingsExecuteTest(RestTestBase):
     class Bunch(object):
         pass
 
+    @staticmethod
+    def _create_settings_manager(trackers_concurrency=1, host_concurrency=1):
+        settings_manager = SettingsExecuteTest.Bunch()
+        settings_manager.trackers_concurrency = trackers_concurrency
+        settings_manager.host_concurrency = host_concurrency
+        settings_manager.execute_timeout = 0
+        settings_manager.topic_timeout = 0
+        settings_manager.execute_trace_enabled = False
+        return settings_manager
+
     def test_is_authentication_enabled(self):
         engine_runner = SettingsExecuteTest.Bunch()
         engine_runner.interval = 399
         engine_runner.last_execute = datetime.now(pytz.utc)
-        settings_execute_resource = SettingsExecute(engine_runner)
+        settings_execute_resource = SettingsExecute(engine_runner, self._create_settings_manager())
         self.api.add_route('/api/settings/execute', settings_execute_resource)
 
         body = self.simulate_request("/api/settings/execute", decode='utf-8')
@@ -28,14 +47,19 @@ class SettingsExecuteTest(RestTestBase):
         result = json.loads(body)
 
         self.assertEqual(result, {'interval': engine_runner.interval,
-                                  'last_execute': engine_runner.last_execute.isoformat()})
+                                  'last_execute': engine_runner.last_execute.isoformat(),
+                                  'trackers_concurrency': 1,
+                                  'host_concurrency': 1,
+                                  'execute_timeout': 0,
+                                  'topic_timeout': 0,
+                                  'trace': False})
 
     @data(1, 100, 2000, 3600, 7200)
     def test_set_interval(self, value):
         engine_runner = SettingsExecuteTest.Bunch()
         engine_runner.interval = 399
         engine_runner.last_execute = datetime.now(pytz.utc)
-        settings_execute_resource = SettingsExecute(engine_runner)
+        settings_execute_resource = SettingsExecute(engine_runner, self._create_settings_manager())
         self.api.add_route('/api/settings/execute', settings_execute_resource)
 
         request = {'interval': value}
@@ -47,7 +71,7 @@ class SettingsExecuteTest(RestTestBase):
         engine_runner = SettingsExecuteTest.Bunch()
         engine_runner.interval = 399
         engine_runner.last_execute = datetime.now(pytz.utc)
-        settings_execute_resource = SettingsExecute(engine_runner)
+        settings_execute_resource = SettingsExecute(engine_runner, self._create_settings_manager())
         self.api.add_route('/api/settings/execute', settings_execute_resource)
 
         request = {'interval': 'string'}
@@ -59,9 +83,131 @@ class SettingsExecuteTest(RestTestBase):
         engine_runner = SettingsExecuteTest.Bunch()
         engine_runner.interval = 399
         engine_runner.last_execute = datetime.now(pytz.utc)
-        settings_execute_resource = SettingsExecute(engine_runner)
+        settings_execute_resource = SettingsExecute(engine_runner, self._create_settings_manager())
         self.api.add_route(self.test_route, settings_execute_resource)
 
         self.simulate_request(self.test_route, method="PUT")
 
         self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+
+    def _create_patch_resource(self, trackers_concurrency=1, host_concurrency=1):
+        engine_runner = SettingsExecuteTest.Bunch()
+        engine_runner.interval = 399
+        engine_runner.last_execute = None
+        settings_manager = Mock()
+        settings_manager.trackers_concurrency = trackers_concurrency
+        settings_manager.host_concurrency = host_concurrency
+        settings_manager.execute_timeout = 0
+        settings_manager.topic_timeout = 0
+        settings_manager.execute_trace_enabled = False
+        self.api.add_route('/api/settings/execute', SettingsExecute(engine_runner, settings_manager))
+        return engine_runner, settings_manager
+
+    def test_get_concurrency(self):
+        self._create_patch_resource(trackers_concurrency=3, host_concurrency=4)
+
+        body = self.simulate_request("/api/settings/execute", decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        result = json.loads(body)
+        self.assertEqual(result['trackers_concurrency'], 3)
+        self.assertEqual(result['host_concurrency'], 4)
+
+    @data({'trackers_concurrency': 4},
+          {'host_concurrency': 2},
+          {'trackers_concurrency': 2, 'host_concurrency': 3, 'interval': 600},
+          {'execute_timeout': 600, 'topic_timeout': 60},
+          {'topic_timeout': 0},
+          {'trace': True})
+    def test_patch_concurrency(self, request):
+        engine_runner, settings_manager = self._create_patch_resource()
+
+        self.simulate_request("/api/settings/execute", method="PATCH", body=json.dumps(request))
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_NO_CONTENT)
+        self.assertEqual(settings_manager.trackers_concurrency, request.get('trackers_concurrency', 1))
+        self.assertEqual(settings_manager.host_concurrency, request.get('host_concurrency', 1))
+        self.assertEqual(engine_runner.interval, request.get('interval', 399))
+        self.assertEqual(settings_manager.execute_timeout, request.get('execute_timeout', 0))
+        self.assertEqual(settings_manager.topic_timeout, request.get('topic_timeout', 0))
+        self.assertEqual(settings_manager.execute_trace_enabled, request.get('trace', False))
+
+    @data({'trackers_concurrency': 0},
+          {'trackers_concurrency': -1},
+          {'trackers_concurrency': '2'},
+          {'trackers_concurrency': True},
+          {'host_concurrency': 0},
+          {'host_concurrency': 1.5},
+          {'interval': 'string'},
+          {'trace': 'true'},
+          {'execute_timeout': -1},
+          {'execute_timeout': True},
+          {'topic_timeout': -10},
+          {'topic_timeout': False},
+          {'topic_timeout': '30'},
+          {'trackers_concurrency': 2, 'host_concurrency': 0},
+          {'execute_timeout': 600, 'topic_timeout': -1})
+    def test_patch_wrong_value(self, request):
+        engine_runner, settings_manager = self._create_patch_resource()
+
+        self.simulate_request("/api/settings/execute", method="PATCH", body=json.dumps(request))
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+        self.assertEqual(settings_manager.trackers_concurrency, 1)
+        self.assertEqual(settings_manager.host_concurrency, 1)
+        self.assertEqual(settings_manager.execute_timeout, 0)
+        self.assertEqual(settings_manager.topic_timeout, 0)
+        self.assertEqual(engine_runner.interval, 399)
+
+    def test_patch_empty_request(self):
+        self._create_patch_resource()
+
+        self.simulate_request("/api/settings/execute", method="PATCH", body=json.dumps({}))
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+
+
+class SettingsExecuteTimeoutTest(RestTestBase):
+    def setUp(self):
+        super(SettingsExecuteTimeoutTest, self).setUp()
+        init_db_engine("sqlite://", echo=False, connect_args={'check_same_thread': False}, poolclass=StaticPool)
+        create_db()
+
+    def tearDown(self):
+        close_db()
+        super(SettingsExecuteTimeoutTest, self).tearDown()
+
+    def test_topic_timeout_abandons_topic(self):
+        engine_runner = Mock()
+        engine_runner.interval = 7200
+        engine_runner.last_execute = None
+        settings_manager = SettingsManager()
+        self.api.add_route('/api/settings/execute', SettingsExecute(engine_runner, settings_manager))
+
+        self.simulate_request("/api/settings/execute", method="PATCH", body=json.dumps({'topic_timeout': 1}))
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_NO_CONTENT)
+        body = self.simulate_request("/api/settings/execute", decode='utf-8')
+        self.assertEqual(1, json.loads(body)['topic_timeout'])
+
+        # noinspection PyUnusedLocal
+        def execute(topics, engine_tracker):
+            with engine_tracker.start(len(topics)) as engine_topics:
+                with engine_topics.start(0, 'Topic 1'):
+                    deadline = get_current_deadline()
+                    while True:
+                        deadline.check()
+                        time.sleep(0.05)
+
+        tracker = Mock()
+        tracker.get_topics = Mock(return_value=[Topic(id=1)])
+        tracker.execute = Mock(side_effect=execute)
+        trackers_manager = TrackersManager(settings_manager, {})
+        trackers_manager.trackers = {'test.com': tracker}
+        log = Mock()
+        engine = Engine(log, settings_manager, trackers_manager, ClientsManager({}), MagicMock())
+
+        engine.execute(None)
+
+        log.failed.assert_called_once_with(
+            u"Check for <b>Topic 1</b> was abandoned: Topic deadline of 1 seconds exceeded", None, None, None)
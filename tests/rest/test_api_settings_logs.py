@@ -10,9 +10,11 @@ from monitorrent.settings_manager import SettingsManager
 @ddt
 class SettingsLogsTest(RestTestBase):
     remove_logs_interval_property = 'monitorrent.settings_manager.SettingsManager.remove_logs_interval'
+    archive_logs_interval_property = 'monitorrent.settings_manager.SettingsManager.archive_logs_interval'
 
     @data(10, 11, 12, 13)
-    def test_is_developer_mode(self, value):
+    @patch(archive_logs_interval_property, new_callable=PropertyMock, return_value=0)
+    def test_is_developer_mode(self, value, archive_logs_interval_mock):
         with patch(self.remove_logs_interval_property, new_callable=PropertyMock) as remove_logs_interval_mock:
             remove_logs_interval_mock.return_value = value
             settings_manager = SettingsManager()
@@ -26,7 +28,7 @@ class SettingsLogsTest(RestTestBase):
 
             result = json.loads(body)
 
-            self.assertEqual(result, {'interval': value})
+            self.assertEqual(result, {'interval': value, 'archive_interval': 0})
 
             remove_logs_interval_mock.assert_called_once_with()
 
@@ -45,8 +47,36 @@ class SettingsLogsTest(RestTestBase):
 
             remove_logs_interval_mock.assert_called_once_with(value)
 
+    @patch(archive_logs_interval_property, new_callable=PropertyMock)
+    @patch(remove_logs_interval_property, new_callable=PropertyMock)
+    def test_set_archive_interval(self, remove_logs_interval_mock, archive_logs_interval_mock):
+        settings_manager = SettingsManager()
+        self.api.add_route('/api/settings/logs', SettingsLogs(settings_manager))
+
+        request = {'interval': 10, 'archive_interval': 3}
+        self.simulate_request("/api/settings/logs", method="PUT", body=json.dumps(request))
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_NO_CONTENT)
+        remove_logs_interval_mock.assert_called_once_with(10)
+        archive_logs_interval_mock.assert_called_once_with(3)
+
+    @data(-1, True, False)
+    @patch(archive_logs_interval_property, new_callable=PropertyMock)
+    @patch(remove_logs_interval_property, new_callable=PropertyMock)
+    def test_set_wrong_archive_interval(self, value, remove_logs_interval_mock, archive_logs_interval_mock):
+        settings_manager = SettingsManager()
+        self.api.add_route('/api/settings/logs', SettingsLogs(settings_manager))
+
+        request = {'interval': 10, 'archive_interval': value}
+        self.simulate_request("/api/settings/logs", method="PUT", body=json.dumps(request))
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+        remove_logs_interval_mock.assert_not_called()
+        archive_logs_interval_mock.assert_not_called()
+
     @data({'interval': 'random_text'},
           {'interval': '10'},
+          {'interval': 10, 'archive_interval': '3'},
           {'wrong_param': '10'},
           None)
     def test_bad_request(self, body):
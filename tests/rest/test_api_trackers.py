@@ -55,7 +55,16 @@ class TrackerCollectionTest(RestTestBase, TrackersManagerMixin):
         self.assertIsInstance(result, list)
         self.assertEqual(1, len(result))
 
-        self.assertEqual(result[0], {'name': 'test', 'form': WithCredentialsMixin.credentials_form})
+        self.assertEqual(result[0], {'name': 'test', 'form': WithCredentialsMixin.credentials_form,
+                                     'circuit_breaker': {'state': 'closed', 'failures': 0, 'opened_at': None}})
+
+    def test_get_all_engine_in_other_process(self):
+        self.api.add_route('/api/trackers', TrackerCollection(self.tracker_manager, engine_in_process=False))
+
+        body = self.simulate_request('/api/trackers', decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertIsNone(json.loads(body)[0]['circuit_breaker'])
 
 
 class TrackerTest(RestTestBase, TrackersManagerMixin):
@@ -0,0 +1,23 @@
+import json
+import falcon
+from mock import Mock
+from tests import RestTestBase
+from monitorrent.rest.transport import TransportStats
+from monitorrent.utils.transport import Transport
+
+
+class TransportStatsTest(RestTestBase):
+    def test_get_stats(self):
+        stats = {'rutracker.org': {'requests': 3, 'connections': 1, 'reused': 2}}
+        transport = Transport(4, 8)
+        transport.get_stats = Mock(return_value=stats)
+        self.api.add_route('/api/transport', TransportStats(transport))
+
+        body = self.simulate_request("/api/transport", decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertTrue('application/json' in self.srmock.headers_dict['Content-Type'])
+
+        result = json.loads(body)
+
+        self.assertEqual(result, {'pool_connections': 4, 'pool_maxsize': 8, 'hosts': stats})
@@ -1,6 +1,13 @@
+import os
+import threading
+import shutil
+import tempfile
+from unittest import TestCase, skipIf
 from mock import Mock
 from sqlalchemy import MetaData, Table, Column, String, Integer
-from monitorrent.db import DBSession, MigrationContext, MonitorrentOperations, UTCDateTime
+from sqlalchemy.pool import QueuePool
+from monitorrent.db import DBSession, MigrationContext, MonitorrentOperations, UTCDateTime, init_db_engine, \
+    close_db, create_db, get_engine, is_network_filesystem, is_wal_enabled, SQLITE_TUNED_PRAGMAS
 from monitorrent.upgrade_manager import call_ugprades
 from tests import DbTestCase
 
@@ -43,3 +50,109 @@ class DbTest(DbTestCase):
                                                 Column('new_column', Integer))
 
             db.rollback()
+
+
+class InitDbEngineTest(TestCase):
+    def setUp(self):
+        self.db_dir = tempfile.mkdtemp()
+        self.connection_string = 'sqlite:///' + os.path.join(self.db_dir, 'monitorrent.db')
+
+    def tearDown(self):
+        close_db()
+        shutil.rmtree(self.db_dir)
+
+    def _get_pragma(self, name):
+        with get_engine().connect() as connection:
+            return connection.execute("PRAGMA " + name).scalar()
+
+    def test_tuned_pragmas(self):
+        init_db_engine(self.connection_string, sqlite_pragmas=SQLITE_TUNED_PRAGMAS, pool_size=2)
+
+        self.assertEqual(self._get_pragma('journal_mode'), 'wal')
+        # NORMAL
+        self.assertEqual(self._get_pragma('synchronous'), 1)
+        self.assertEqual(self._get_pragma('cache_size'), SQLITE_TUNED_PRAGMAS['cache_size'])
+        self.assertEqual(self._get_pragma('busy_timeout'), SQLITE_TUNED_PRAGMAS['busy_timeout'])
+
+    def test_is_wal_enabled(self):
+        init_db_engine(self.connection_string, sqlite_pragmas=SQLITE_TUNED_PRAGMAS)
+
+        self.assertTrue(is_wal_enabled())
+
+    def test_is_wal_disabled(self):
+        init_db_engine(self.connection_string)
+
+        self.assertFalse(is_wal_enabled())
+
+    def test_disabled_pragma_is_skipped(self):
+        init_db_engine(self.connection_string, sqlite_pragmas=dict(SQLITE_TUNED_PRAGMAS, journal_mode=None))
+
+        self.assertEqual(self._get_pragma('journal_mode'), 'delete')
+        self.assertEqual(self._get_pragma('synchronous'), 1)
+
+    def test_default_pragmas(self):
+        init_db_engine(self.connection_string)
+
+        self.assertEqual(self._get_pragma('journal_mode'), 'delete')
+        # FULL
+        self.assertEqual(self._get_pragma('synchronous'), 2)
+
+    def test_pool_size(self):
+        init_db_engine(self.connection_string, pool_size=3)
+
+        pool = get_engine().pool
+        self.assertIsInstance(pool, QueuePool)
+        self.assertEqual(pool.size(), 3)
+
+    def test_pool_size_ignored_for_memory_db(self):
+        init_db_engine('sqlite://', pool_size=3)
+
+        self.assertNotIsInstance(get_engine().pool, QueuePool)
+
+    def test_pooled_connection_used_from_other_thread(self):
+        init_db_engine(self.connection_string, sqlite_pragmas=SQLITE_TUNED_PRAGMAS, pool_size=1)
+        create_db()
+        errors = []
+
+        def query():
+            try:
+                with DBSession() as db:
+                    db.execute("SELECT 1")
+            except Exception as e:
+                errors.append(e)
+
+        for _ in range(2):
+            thread = threading.Thread(target=query)
+            thread.start()
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+
+@skipIf(os.name == 'nt', 'mounted file systems are read from /proc/mounts only on Linux')
+class IsNetworkFilesystemTest(TestCase):
+    def setUp(self):
+        self.mounts_dir = tempfile.mkdtemp()
+        self.mounts_path = os.path.join(self.mounts_dir, 'mounts')
+        with open(self.mounts_path, 'w') as mounts:
+            mounts.write('/dev/sda1 / ext4 rw,relatime 0 0\n'
+                         'server:/export /mnt/nfs nfs4 rw,relatime 0 0\n'
+                         '/dev/sdb1 /mnt/nfs/local ext4 rw,relatime 0 0\n'
+                         '//server/share /mnt/my\\040share cifs rw 0 0\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.mounts_dir)
+
+    def test_local_filesystem(self):
+        self.assertFalse(is_network_filesystem('/var/lib/monitorrent.db', self.mounts_path))
+
+    def test_network_filesystem(self):
+        self.assertTrue(is_network_filesystem('/mnt/nfs/monitorrent.db', self.mounts_path))
+        self.assertTrue(is_network_filesystem('/mnt/my share/monitorrent.db', self.mounts_path))
+
+    def test_nested_local_mount_point(self):
+        self.assertFalse(is_network_filesystem('/mnt/nfs/local/monitorrent.db', self.mounts_path))
+        self.assertFalse(is_network_filesystem('/mnt/nfs2/monitorrent.db', self.mounts_path))
+
+    def test_mounts_are_not_available(self):
+        self.assertFalse(is_network_filesystem('/mnt/nfs/monitorrent.db', os.path.join(self.mounts_dir, 'none')))
@@ -0,0 +1,183 @@
+import threading
+
+from mock import patch
+
+from monitorrent.db import DBSession, db_write, set_db_writer
+from monitorrent.db_writer import DbWriter
+from monitorrent.settings_manager import SettingsManager, Settings
+from tests import DbTestCase
+
+
+class DbWriterTest(DbTestCase):
+    def setUp(self):
+        super(DbWriterTest, self).setUp()
+        self.db_writer = DbWriter()
+
+    def tearDown(self):
+        set_db_writer(None)
+        if self.db_writer.is_alive():
+            self.db_writer.stop()
+            self.db_writer.join(5)
+        super(DbWriterTest, self).tearDown()
+
+    @staticmethod
+    def _add_setting(name, value):
+        def add(db):
+            db.add(Settings(name=name, value=value))
+            return name
+        return add
+
+    @staticmethod
+    def _get_settings():
+        with DBSession() as db:
+            return {s.name: s.value for s in db.query(Settings).all()}
+
+    def test_execute(self):
+        self.db_writer.start()
+
+        self.assertEqual(self.db_writer.execute(self._add_setting('name', 'value')), 'name')
+
+        self.assertEqual(self._get_settings(), {'name': 'value'})
+        self.assertIsNot(threading.current_thread(), self.db_writer)
+
+    def test_execute_in_writer_thread(self):
+        threads = []
+
+        def add(db):
+            threads.append(threading.current_thread())
+            db.add(Settings(name='name', value='value'))
+
+        self.db_writer.start()
+        self.db_writer.execute(add)
+
+        self.assertEqual(threads, [self.db_writer])
+
+    def test_failed_unit_is_rolled_back_alone(self):
+        waiting = threading.Event()
+        release = threading.Event()
+
+        def wait(db):
+            waiting.set()
+            release.wait(5)
+
+        def failed(db):
+            db.add(Settings(name='failed', value='value'))
+            db.flush()
+            raise Exception('Some error')
+
+        self.db_writer.start()
+        # all next units are queued while writer waits
+        blocked = self.db_writer.submit(wait)
+        waiting.wait(5)
+        futures = [self.db_writer.submit(self._add_setting('name1', 'value1')),
+                   self.db_writer.submit(failed),
+                   self.db_writer.submit(self._add_setting('name2', 'value2'))]
+        with patch('monitorrent.db_writer.metrics.db_writer_batch_size') as batch_size:
+            release.set()
+            blocked.result(5)
+            self.assertEqual(futures[0].result(5), 'name1')
+            with self.assertRaises(Exception) as e:
+                futures[1].result(5)
+            self.assertEqual(futures[2].result(5), 'name2')
+
+        self.assertEqual(str(e.exception), 'Some error')
+        # 3 queued units are committed in one transaction
+        batch_size.observe.assert_called_once_with(3)
+        self.assertEqual(self._get_settings(), {'name1': 'value1', 'name2': 'value2'})
+
+    def test_nested_unit_is_executed_in_the_same_transaction(self):
+        def add(db):
+            return self.db_writer.execute(self._add_setting('nested', 'value'))
+
+        self.db_writer.start()
+
+        self.assertEqual(self.db_writer.execute(add), 'nested')
+        self.assertEqual(self._get_settings(), {'nested': 'value'})
+
+    def test_db_session_in_writer_thread_is_refused(self):
+        waiting = threading.Event()
+        release = threading.Event()
+
+        def wait(db):
+            waiting.set()
+            release.wait(5)
+
+        def nested_session(db):
+            with DBSession() as nested_db:
+                nested_db.add(Settings(name='nested', value='value'))
+
+        self.db_writer.start()
+        blocked = self.db_writer.submit(wait)
+        waiting.wait(5)
+        futures = [self.db_writer.submit(nested_session),
+                   self.db_writer.submit(self._add_setting('name', 'value'))]
+        release.set()
+        blocked.result(5)
+
+        with self.assertRaises(RuntimeError):
+            futures[0].result(5)
+        # group transaction isn't closed by nested session
+        self.assertEqual(futures[1].result(5), 'name')
+        self.assertEqual(self._get_settings(), {'name': 'value'})
+
+    def test_execute_not_started(self):
+        self.assertEqual(self.db_writer.execute(self._add_setting('name', 'value')), 'name')
+
+        self.assertEqual(self._get_settings(), {'name': 'value'})
+
+    def test_stop_writes_queued_units(self):
+        release = threading.Event()
+
+        self.db_writer.start()
+        blocked = self.db_writer.submit(lambda db: release.wait(5))
+        future = self.db_writer.submit(self._add_setting('name', 'value'))
+        self.db_writer.stop()
+        release.set()
+        self.db_writer.join(5)
+
+        self.assertTrue(blocked.result(5))
+        self.assertEqual(future.result(5), 'name')
+        self.assertFalse(self.db_writer.is_alive())
+        self.assertEqual(self._get_settings(), {'name': 'value'})
+
+    def test_submit_after_stop_is_executed_in_calling_thread(self):
+        release = threading.Event()
+        threads = []
+
+        def add(db):
+            threads.append(threading.current_thread())
+            db.add(Settings(name='name', value='value'))
+
+        self.db_writer.start()
+        blocked = self.db_writer.submit(lambda db: release.wait(5))
+        self.db_writer.stop()
+        # writer thread is still alive, but it doesn't take new units after stop
+        self.assertTrue(self.db_writer.is_alive())
+        future = self.db_writer.submit(add)
+        release.set()
+        self.db_writer.join(5)
+
+        self.assertTrue(blocked.result(5))
+        self.assertIsNone(future.result(5))
+        self.assertEqual(threads, [threading.current_thread()])
+        self.assertEqual(self._get_settings(), {'name': 'value'})
+
+    def test_db_write(self):
+        self.assertEqual(db_write(self._add_setting('name1', 'value1')), 'name1')
+
+        self.db_writer.start()
+        set_db_writer(self.db_writer)
+        with patch.object(self.db_writer, 'execute', wraps=self.db_writer.execute) as execute:
+            self.assertEqual(db_write(self._add_setting('name2', 'value2')), 'name2')
+
+        execute.assert_called_once()
+        self.assertEqual(self._get_settings(), {'name1': 'value1', 'name2': 'value2'})
+
+    def test_settings_manager_with_db_writer(self):
+        self.db_writer.start()
+        set_db_writer(self.db_writer)
+        settings_manager = SettingsManager()
+
+        settings_manager.remove_logs_interval = 20
+
+        self.assertEqual(settings_manager.remove_logs_interval, 20)
@@ -8,8 +8,11 @@ import pytz
 from monitorrent.utils.bittorrent_ex import Torrent
 from tests import TestCase, DbTestCase, DBSession
 from monitorrent.engine import Engine, Logger, EngineRunner, DBEngineRunner, DbLoggerWrapper, Execute, ExecuteLog,\
-    ExecuteLogManager, ExecuteSettings
+    ExecuteLogManager, ExecuteSettings, ExecuteTopic
 from monitorrent.plugins import Topic
+from monitorrent.utils.tracing import tracer
+from monitorrent.utils.pubsub import EventChannel
+from monitorrent.execute_log_archive import ExecuteLogArchive, ExecuteLogTraceback, ExecuteLogArchiveTraceback
 from monitorrent.plugin_managers import ClientsManager, TrackersManager, NotifierManager
 from monitorrent.plugins.trackers import TrackerSettings, CloudflareChallengeSolverSettings
 
@@ -153,6 +156,9 @@ class EngineRunnerTest(TestCase, WithEngineRunnerTest):
 
     def create_runner(self, logger=None, interval=0.1):
         self.settings_manager = Mock()
+        self.settings_manager.execute_timeout = 0
+        self.settings_manager.topic_timeout = 0
+        self.settings_manager.get_snapshot_settings.return_value = self.settings_manager
         self.clients_manager = ClientsManager({})
         self.notifier_manager = NotifierManager(self.settings_manager, {})
         self.engine_runner = EngineRunner(Logger() if logger is None else logger,
@@ -329,6 +335,13 @@ class EngineRunnerTest(TestCase, WithEngineRunnerTest):
 
         self.assertEqual(1, execute_mock.call_count)
 
+    def test_cancel_without_execute(self):
+        self.create_runner()
+        cancelled = self.engine_runner.cancel()
+        self.stop_runner()
+
+        self.assertFalse(cancelled)
+
     def test_manual_execute_with_ids(self):
         waiter = Event()
 
@@ -354,7 +367,7 @@ class EngineRunnerTest(TestCase, WithEngineRunnerTest):
 
         execute_mock.assert_called_once_with(topics, ANY)
 
-    def test_manual_execute_with_ids_ignored_while_in_execute(self):
+    def test_manual_execute_with_ids_coalesced_while_in_execute(self):
         waiter = Event()
 
         long_execute_waiter = Event()
@@ -367,7 +380,7 @@ class EngineRunnerTest(TestCase, WithEngineRunnerTest):
 
         execute_mock = Mock(side_effect=execute)
 
-        topics = [Topic()]
+        topics = [Topic(id=1), Topic(id=2), Topic(id=3)]
 
         mock_tracker = Mock()
         mock_tracker.get_topics = Mock(return_value=topics)
@@ -378,16 +391,135 @@ class EngineRunnerTest(TestCase, WithEngineRunnerTest):
         self.engine_runner.execute(None)
         waiter.wait(0.3)
         waiter.clear()
-        ids = [1, 2, 3]
-        self.engine_runner.execute(ids)
+        # topics are going to be checked by current execute
+        self.engine_runner.execute([1, 2, 3])
+        self.engine_runner.execute(None)
+        self.assertIsNone(self.engine_runner.pending)
         long_execute_waiter.set()
         waiter.wait(0.3)
-        self.assertTrue(waiter.is_set)
 
         self.stop_runner()
 
         execute_mock.assert_called_once_with(topics, ANY)
 
+    def test_manual_execute_with_ids_merged_and_executed_after_current_execute(self):
+        waiter = Event()
+        long_execute_waiter = Event()
+        executed_ids = []
+
+        # noinspection PyUnusedLocal
+        def get_topics(ids, **kwargs):
+            executed_ids.append(ids)
+            return [Topic(id=topic_id) for topic_id in ids or [1, 2, 3]]
+
+        # noinspection PyUnusedLocal
+        def execute(*args, **kwargs):
+            waiter.set()
+            long_execute_waiter.wait(1)
+
+        mock_tracker = Mock()
+        mock_tracker.get_topics = Mock(side_effect=get_topics)
+        mock_tracker.execute = Mock(side_effect=execute)
+        self.trackers_manager.trackers = {'mock.tracker': mock_tracker}
+
+        self.create_runner(interval=10)
+        self.engine_runner.execute(None)
+        self.assertTrue(waiter.wait(0.3))
+        waiter.clear()
+        self.engine_runner.execute([3, 4])
+        self.engine_runner.execute([5])
+        self.engine_runner.execute([4])
+        self.assertEqual(frozenset([4, 5]), self.engine_runner.pending.ids)
+        long_execute_waiter.set()
+        self.assertTrue(waiter.wait(0.3))
+
+        self.stop_runner()
+
+        self.assertEqual([None, [4, 5]], executed_ids)
+
+    def test_manual_full_execute_rechecks_already_checked_topics(self):
+        waiter = Event()
+        long_execute_waiter = Event()
+        executed_ids = []
+
+        # noinspection PyUnusedLocal
+        def get_topics(ids, **kwargs):
+            executed_ids.append(ids)
+            return [Topic(id=topic_id) for topic_id in ids or [1, 2, 3]]
+
+        # noinspection PyUnusedLocal
+        def execute(topics, engine_tracker):
+            with engine_tracker.start(len(topics)) as engine_topics:
+                with engine_topics.start(0, 'Topic 1'):
+                    pass
+                waiter.set()
+                long_execute_waiter.wait(1)
+
+        mock_tracker = Mock()
+        mock_tracker.get_topics = Mock(side_effect=get_topics)
+        mock_tracker.execute = Mock(side_effect=execute)
+        self.trackers_manager.trackers = {'mock.tracker': mock_tracker}
+
+        self.create_runner(interval=10)
+        self.engine_runner.execute(None)
+        self.assertTrue(waiter.wait(0.3))
+        waiter.clear()
+        self.engine_runner.execute(None)
+        self.assertEqual(frozenset([1]), self.engine_runner.pending.ids)
+        self.assertFalse(self.engine_runner.pending.scheduled)
+        long_execute_waiter.set()
+        self.assertTrue(waiter.wait(0.3))
+
+        self.stop_runner()
+
+        self.assertEqual([None, [1]], executed_ids)
+
+    def test_scheduled_execute_merged_with_manual_ids_stays_scheduled(self):
+        waiter = Event()
+        long_execute_waiter = Event()
+        executed_ids = []
+
+        # noinspection PyUnusedLocal
+        def get_topics(ids, due_only=False):
+            executed_ids.append((ids, due_only))
+            return [Topic(id=topic_id) for topic_id in ids or [1, 2]]
+
+        # noinspection PyUnusedLocal
+        def execute(*args, **kwargs):
+            waiter.set()
+            long_execute_waiter.wait(1)
+
+        mock_tracker = Mock()
+        mock_tracker.get_topics = Mock(side_effect=get_topics)
+        mock_tracker.execute = Mock(side_effect=execute)
+        self.trackers_manager.trackers = {'mock.tracker': mock_tracker}
+
+        self.create_runner(interval=10)
+        self.engine_runner.execute([7])
+        self.assertTrue(waiter.wait(0.3))
+        waiter.clear()
+        # timer fires while manual execute is running
+        self.engine_runner._request(EngineRunner.ExecuteRequest(frozenset(), True))
+        self.engine_runner.execute([3])
+        self.assertEqual(EngineRunner.ExecuteRequest(frozenset([3]), True), self.engine_runner.pending)
+        long_execute_waiter.set()
+        self.assertTrue(waiter.wait(0.3))
+
+        self.stop_runner()
+
+        self.assertEqual([([7], False), (None, True), ([3], False)], executed_ids)
+        self.assertEqual([1, 2, 3], [topic.id for topic in mock_tracker.execute.call_args[0][0]])
+
+    def test_merge_execute_requests(self):
+        scheduled = EngineRunner.ExecuteRequest(frozenset(), True)
+        manual = EngineRunner.ExecuteRequest(frozenset([1, 2]), False)
+        full = EngineRunner.ExecuteRequest(None, False)
+
+        self.assertEqual((frozenset([1, 2]), True, None), EngineRunner._merge(scheduled, manual))
+        self.assertEqual((frozenset([1, 2]), True, None), EngineRunner._merge(manual, scheduled))
+        self.assertEqual((None, False, None), EngineRunner._merge(scheduled, full))
+        self.assertEqual((None, False, None), EngineRunner._merge(full, manual))
+
     def test_manual_execute_shouldnt_reset_timeout_for_whole_execute(self):
         executed = Event()
 
@@ -445,6 +577,9 @@ class DBEngineRunnerTest(DbTestCase, WithEngineRunnerTest):
 
     def create_runner(self, logger=None):
         self.settings_manager = Mock()
+        self.settings_manager.execute_timeout = 0
+        self.settings_manager.topic_timeout = 0
+        self.settings_manager.get_snapshot_settings.return_value = self.settings_manager
         self.clients_manager = ClientsManager({})
         self.notifier_manager = NotifierManager(self.settings_manager, {})
         # noinspection PyTypeChecker
@@ -564,6 +699,54 @@ class DBEngineRunnerTest(DbTestCase, WithEngineRunnerTest):
 
         self.assertEqual(2, execute_mock.call_count)
 
+    def test_resume_interrupted_execute(self):
+        executed = Event()
+
+        # noinspection PyUnusedLocal
+        def execute(*args, **kwargs):
+            executed.set()
+
+        mock_tracker = Mock()
+        mock_tracker.get_topics = Mock(return_value=[Topic()])
+        mock_tracker.execute = Mock(side_effect=execute)
+        self.trackers_manager.trackers = {'mock.tracker': mock_tracker}
+
+        start_time = datetime.now(pytz.utc)
+        with DBSession() as db:
+            db.add(ExecuteSettings(interval=7200, last_execute=None))
+            db.add(Execute(id=1, start_time=start_time, finish_time=start_time, status='failed'))
+            db.add(ExecuteTopic(execute_id=1, topic_id=1, done=True))
+            db.add(ExecuteTopic(execute_id=1, topic_id=2, done=False))
+            db.add(ExecuteTopic(execute_id=1, topic_id=3, done=False))
+
+        logger = Logger()
+        logger.started = Mock()
+        self.create_runner(logger=logger)
+
+        self.assertTrue(executed.wait(1))
+        self.stop_runner()
+
+        mock_tracker.get_topics.assert_called_once_with([2, 3])
+        logger.started.assert_called_once_with(ANY, 1)
+        with DBSession() as db:
+            self.assertEqual(0, db.query(ExecuteTopic).count())
+            execute = db.query(Execute).filter(Execute.id == 1).first()
+            self.assertEqual(DBEngineRunner.INTERRUPTED_MESSAGE, execute.failed_message)
+
+    def test_nothing_to_resume_when_all_topics_done(self):
+        start_time = datetime.now(pytz.utc)
+        with DBSession() as db:
+            db.add(Execute(id=1, start_time=start_time, finish_time=start_time, status='failed'))
+            db.add(ExecuteTopic(execute_id=1, topic_id=1, done=True))
+
+        self.create_runner()
+        pending = self.engine_runner.pending
+        self.stop_runner()
+
+        self.assertIsNone(pending)
+        with DBSession() as db:
+            self.assertEqual(0, db.query(ExecuteTopic).count())
+
 
 class TestDbLoggerWrapper(DbTestCase):
     def test_engine_entry_finished(self):
@@ -583,6 +766,19 @@ class TestDbLoggerWrapper(DbTestCase):
         self.assertEqual(execute.status, 'finished')
         self.assertIsNone(execute.failed_message)
 
+    def test_started_collects_trace_when_enabled(self):
+        log_manager = ExecuteLogManager()
+        log_manager.started = Mock()
+        settings_manager = Mock()
+        settings_manager.execute_trace_enabled = True
+        # noinspection PyTypeChecker
+        db_logger = DbLoggerWrapper(log_manager, settings_manager)
+
+        start_time = datetime.now(pytz.utc)
+        db_logger.started(start_time)
+
+        log_manager.started.assert_called_once_with(start_time, None, True)
+
     def test_engine_entry_failed(self):
         # noinspection PyTypeChecker
         db_logger = DbLoggerWrapper(ExecuteLogManager())
@@ -888,12 +1084,33 @@ class TestDbLoggerWrapper(DbTestCase):
         # noinspection PyUnresolvedReferences
         log_manager.remove_old_entries.assert_called_once_with(10)
 
+    def test_remove_old_entries_by_log_maintenance(self):
+        settings_manager_mock = Mock()
+        settings_manager_mock.remove_logs_interval = 10
+        log_maintenance = Mock()
+
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+        log_manager.remove_old_entries = Mock()
+        # noinspection PyTypeChecker
+        db_logger = DbLoggerWrapper(log_manager, settings_manager_mock, log_maintenance)
+
+        db_logger.started(datetime.now(pytz.utc))
+        db_logger.finished(datetime.now(pytz.utc), None)
+
+        log_maintenance.wake.assert_called_once_with()
+        log_manager.remove_old_entries.assert_not_called()
+
 
 class ExecuteLogManagerTest(DbTestCase):
 
     def setUp(self):
         super(ExecuteLogManagerTest, self).setUp()
         self.notifier_manager = MagicMock()
+        # flush timer thread would outlive test and write its entries to DB of the next one
+        timer_patcher = patch('monitorrent.engine.timer')
+        self.timer_mock = timer_patcher.start()
+        self.addCleanup(timer_patcher.stop)
 
     def test_log_entries(self):
         # noinspection PyTypeChecker
@@ -918,6 +1135,65 @@ class ExecuteLogManagerTest(DbTestCase):
         execute = entries[0]
         self.assertEqual(execute['status'], 'finished')
 
+    def test_publish_events(self):
+        events = EventChannel()
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager(events=events)
+        logger = DbLoggerWrapper(log_manager)
+
+        logger.started(datetime.now(pytz.utc))
+        logger.info(u'Message 1')
+        logger.progress(50)
+        logger.progress(50)
+        logger.progress(100)
+        logger.finished(datetime.now(pytz.utc), None)
+
+        published = events.get_events(0)
+        self.assertEqual([e[1] for e in published], ['started', 'log', 'progress', 'progress', 'finished'])
+        self.assertEqual(published[0][2]['execute_id'], 1)
+        self.assertEqual(published[1][2]['message'], u'Message 1')
+        self.assertEqual(published[1][2]['id'], log_manager.get_execute_log_details(1)[0]['id'])
+        self.assertEqual([e[2]['progress'] for e in published[2:4]], [50, 100])
+        self.assertEqual(published[4][2]['status'], 'finished')
+
+    def test_log_entries_counters(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager(flush_size=2)
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.log_entry(u'Message 1', 'info')
+        log_manager.log_entry(u'Message 2', 'downloaded')
+        log_manager.log_entry(u'Message 3', 'failed')
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+        with DBSession() as db:
+            execute = db.query(Execute).first()
+            self.assertEqual(execute.log_count, 3)
+            self.assertEqual(execute.downloaded_count, 1)
+            self.assertEqual(execute.failed_count, 1)
+
+    def test_log_entries_before(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+
+        finish_time = datetime.now(pytz.utc)
+        for i in range(5):
+            # two executes finished at the same time
+            log_manager.started(finish_time + timedelta(seconds=10 * (i // 2)))
+            log_manager.log_entry(u'Download {0}'.format(i), 'downloaded')
+            log_manager.finished(finish_time + timedelta(seconds=10 * (i // 2)), None)
+
+        entries, count = log_manager.get_log_entries(0, 2)
+        self.assertEqual([e['id'] for e in entries], [5, 4])
+        self.assertEqual(count, 5)
+
+        entries, count = log_manager.get_log_entries(0, 2, before=entries[-1]['id'])
+        self.assertEqual([e['id'] for e in entries], [3, 2])
+        self.assertEqual([e['downloaded'] for e in entries], [1, 1])
+
+        entries, count = log_manager.get_log_entries(0, 2, before=entries[-1]['id'])
+        self.assertEqual([e['id'] for e in entries], [1])
+
     def test_log_entries_paging(self):
         # noinspection PyTypeChecker
         log_manager = ExecuteLogManager()
@@ -1023,6 +1299,189 @@ class ExecuteLogManagerTest(DbTestCase):
         self.assertEqual(entries[1]['level'], 'failed')
         self.assertEqual(entries[1]['message'], message3)
 
+    def _get_stored_log_count(self):
+        with DBSession() as db:
+            return db.query(ExecuteLog).count()
+
+    def test_log_entries_buffered_until_flush_size(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager(flush_size=3, flush_interval=1000)
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.log_entry(u'Message 1', 'info')
+        log_manager.log_entry(u'Downloaded 1', 'downloaded')
+
+        self.assertEqual(self._get_stored_log_count(), 0)
+        entries = log_manager.get_current_execute_log_details()
+        self.assertEqual([e['message'] for e in entries], [u'Message 1', u'Downloaded 1'])
+        entries = log_manager.get_execute_log_details(1, after=entries[0]['id'])
+        self.assertEqual([e['message'] for e in entries], [u'Downloaded 1'])
+        executes, _ = log_manager.get_log_entries(0, 10)
+        self.assertEqual(executes[0]['downloaded'], 1)
+
+        log_manager.log_entry(u'Failed 1', 'failed')
+
+        self.assertEqual(self._get_stored_log_count(), 3)
+        entries = log_manager.get_current_execute_log_details()
+        self.assertEqual([e['message'] for e in entries], [u'Message 1', u'Downloaded 1', u'Failed 1'])
+        self.assertEqual([e['id'] for e in entries], [1, 2, 3])
+
+    def test_log_entries_flushed_by_interval(self):
+        clock = Mock(return_value=100)
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager(flush_size=100, flush_interval=2, clock=clock)
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.log_entry(u'Message 1', 'info')
+        clock.return_value = 101
+        log_manager.log_entry(u'Message 2', 'info')
+
+        self.assertEqual(self._get_stored_log_count(), 0)
+
+        clock.return_value = 102
+        log_manager.log_entry(u'Message 3', 'info')
+
+        self.assertEqual(self._get_stored_log_count(), 3)
+
+    def test_flush_timer(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager(flush_size=100, flush_interval=2)
+
+        log_manager.started(datetime.now(pytz.utc))
+
+        self.timer_mock.assert_called_once_with(2, log_manager._flush_by_timer)
+        log_manager.log_entry(u'Message 1', 'info')
+        log_manager._flush_by_timer()
+
+        self.assertEqual(self._get_stored_log_count(), 1)
+
+        with patch('monitorrent.engine.db_write', side_effect=Exception('Database is locked')):
+            log_manager.log_entry(u'Message 2', 'info')
+            # timer thread isn't stopped by failed flush
+            log_manager._flush_by_timer()
+
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+        self.timer_mock.return_value.assert_called_once_with()
+        self.assertEqual(self._get_stored_log_count(), 2)
+
+    def test_buffered_entries_renumbered_after_other_writer(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager(flush_size=100, flush_interval=1000)
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.log_entry(u'Message 1', 'info')
+        log_manager.log_entry(u'Message 2', 'info')
+        with DBSession() as db:
+            # other process wrote execute log after ids were reserved
+            for _ in range(3):
+                db.add(ExecuteLog(execute_id=1, time=datetime.now(pytz.utc), message=u'Other', level='info'))
+
+        log_manager.flush()
+        log_manager.log_entry(u'Message 3', 'info')
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+        entries = log_manager.get_execute_log_details(1)
+        self.assertEqual([e['id'] for e in entries if e['message'] != u'Other'], [4, 5, 6])
+        self.assertEqual(self._get_stored_log_count(), 6)
+
+    def _get_done_topics(self):
+        with DBSession() as db:
+            return [topic_id for topic_id, in db.query(ExecuteTopic.topic_id).filter(ExecuteTopic.done)]
+
+    def test_finished_topics_written_with_log_entries(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager(flush_size=3, flush_interval=1000)
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.topics_planned([1, 2])
+        log_manager.log_entry(u'Message 1', 'info')
+        log_manager.topic_finished(1)
+
+        self.assertEqual(self._get_stored_log_count(), 0)
+        self.assertEqual(self._get_done_topics(), [])
+
+        log_manager.log_entry(u'Message 2', 'info')
+
+        self.assertEqual(self._get_stored_log_count(), 2)
+        self.assertEqual(self._get_done_topics(), [1])
+
+        log_manager.topic_finished(2)
+        log_manager.log_entry(u'Message 3', 'info')
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+        self.assertEqual(self._get_stored_log_count(), 3)
+        entries = log_manager.get_execute_log_details(1)
+        self.assertEqual([e['message'] for e in entries], [u'Message 1', u'Message 2', u'Message 3'])
+
+    def test_failed_flush_keeps_buffered_entries(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager(flush_size=100, flush_interval=1000)
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.topics_planned([1])
+        log_manager.log_entry(u'Message 1', 'info')
+        log_manager.topic_finished(1)
+
+        with patch('monitorrent.engine.db_write', side_effect=Exception('Database is locked')):
+            with self.assertRaises(Exception):
+                log_manager.flush()
+
+        entries = log_manager.get_current_execute_log_details()
+        self.assertEqual([e['message'] for e in entries], [u'Message 1'])
+
+        log_manager.flush()
+
+        self.assertEqual(self._get_stored_log_count(), 1)
+        self.assertEqual(self._get_done_topics(), [1])
+
+    def test_flushing_entries_returned_until_committed(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager(flush_size=100, flush_interval=1000)
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.log_entry(u'Message 1', 'info')
+
+        details = []
+
+        def write(func):
+            # reader is not blocked by flush and sees flushing entries before and after commit
+            details.append([e['message'] for e in log_manager.get_execute_log_details(1)])
+            with DBSession() as db:
+                func(db)
+            details.append([e['message'] for e in log_manager.get_execute_log_details(1)])
+
+        with patch('monitorrent.engine.db_write', side_effect=write):
+            log_manager.flush()
+
+        self.assertEqual(details, [[u'Message 1'], [u'Message 1']])
+
+    def test_entries_committed_after_copy_returned_once(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager(flush_size=100, flush_interval=1000)
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.log_entry(u'Message 1', 'downloaded')
+        log_manager.log_entry(u'Message 2', 'failed')
+
+        copy_buffered_entries = log_manager._copy_buffered_entries
+
+        def copy_and_flush():
+            # DB is queried without buffer lock, so flush can be committed right after entries are copied
+            buffered = copy_buffered_entries()
+            log_manager.flush()
+            return buffered
+
+        with patch.object(log_manager, '_copy_buffered_entries', side_effect=copy_and_flush):
+            entries = log_manager.get_execute_log_details(1)
+        self.assertEqual([e['message'] for e in entries], [u'Message 1', u'Message 2'])
+
+        log_manager.log_entry(u'Message 3', 'downloaded')
+        with patch.object(log_manager, '_copy_buffered_entries', side_effect=copy_and_flush):
+            executes, count = log_manager.get_log_entries(0, 10)
+        self.assertEqual(executes[0]['downloaded'], 2)
+        self.assertEqual(executes[0]['failed'], 1)
+
     def test_log_entries_details_multiple_execute(self):
         # noinspection PyTypeChecker
         log_manager = ExecuteLogManager()
@@ -1078,6 +1537,68 @@ class ExecuteLogManagerTest(DbTestCase):
         with self.assertRaises(Exception):
             log_manager.started(datetime.now(pytz.utc))
 
+    def test_topic_checkpoints(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.topics_planned([1, 2, 3])
+        log_manager.topic_finished(2)
+        log_manager.flush()
+
+        with DBSession() as db:
+            checkpoints = db.query(ExecuteTopic.topic_id, ExecuteTopic.done).order_by(ExecuteTopic.topic_id).all()
+        self.assertEqual([(1, False), (2, True), (3, False)], checkpoints)
+
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+        with DBSession() as db:
+            self.assertEqual(0, db.query(ExecuteTopic).count())
+
+    def test_execute_trace(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+
+        log_manager.started(datetime.now(pytz.utc), trace=True)
+        with tracer.span('execute'):
+            with tracer.span('download', 'tracker', url='http://tracker.com/1.torrent'):
+                pass
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+        trace = log_manager.get_execute_trace(1)
+
+        spans = [e for e in trace['traceEvents'] if e['ph'] == 'X']
+        self.assertEqual(['download', 'execute'], [s['name'] for s in spans])
+        self.assertEqual({'url': 'http://tracker.com/1.torrent'}, spans[0]['args'])
+        self.assertIsNone(log_manager.get_execute_trace(2))
+
+    def test_execute_trace_disabled_by_default(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+
+        log_manager.started(datetime.now(pytz.utc))
+        with tracer.span('execute'):
+            pass
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+        self.assertFalse(tracer.is_active)
+        self.assertIsNone(log_manager.get_execute_trace(1))
+
+    def test_started_resumed_from(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.finished(datetime.now(pytz.utc), None)
+        log_manager.started(datetime.now(pytz.utc), 1)
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+        entries, count = log_manager.get_log_entries(0, 5)
+
+        self.assertEqual(2, count)
+        self.assertEqual(1, entries[0]['resumed_from_id'])
+        self.assertIsNone(entries[1]['resumed_from_id'])
+
     def test_finished_fail(self):
         # noinspection PyTypeChecker
         log_manager = ExecuteLogManager()
@@ -1220,6 +1741,80 @@ class ExecuteLogManagerTest(DbTestCase):
         self.assertEqual(details[1]['level'], 'info')
         self.assertEqual(details[1]['message'], message11 + ' 6')
 
+    def test_remove_old_entries_chunk(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+        now = datetime.now(pytz.utc)
+
+        for days in [12, 11, 5]:
+            log_manager.started(now - timedelta(days=days))
+            for i in range(3):
+                log_manager.log_entry(u'Message {0}'.format(i), 'info')
+            log_manager.finished(now - timedelta(days=days), None)
+
+        self.assertEqual(log_manager.remove_old_entries_chunk(10, 4), (4, 0))
+        self.assertEqual(log_manager.remove_old_entries_chunk(10, 4), (2, 2))
+        self.assertEqual(log_manager.remove_old_entries_chunk(10, 4), (0, 0))
+
+        entries, count = log_manager.get_log_entries(0, 10)
+        self.assertEqual(count, 1)
+        self.assertEqual(len(log_manager.get_execute_log_details(entries[0]['id'])), 3)
+
+    def _add_failed_execute(self, log_manager, start_time, tracebacks):
+        logger = DbLoggerWrapper(log_manager)
+        logger.started(start_time)
+        logger.info(u'Begin')
+        for text in tracebacks:
+            try:
+                raise Exception(text)
+            except Exception:
+                logger.failed(u'Failed <b>topic</b>', *sys.exc_info())
+        logger.finished(start_time, None)
+
+    def test_archive_old_entries(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+        now = datetime.now(pytz.utc)
+
+        self._add_failed_execute(log_manager, now - timedelta(days=5), [u'Error 1', u'Error 1'])
+        self._add_failed_execute(log_manager, now - timedelta(days=4), [u'Error 1', u'Error 2'])
+        self._add_failed_execute(log_manager, now - timedelta(days=1), [u'Error 1'])
+        expected = [log_manager.get_execute_log_details(i) for i in [1, 2, 3]]
+
+        self.assertEqual(log_manager.archive_old_entries_chunk(3, 1), 1)
+        self.assertEqual(log_manager.archive_old_entries_chunk(3, 1), 1)
+        self.assertEqual(log_manager.archive_old_entries_chunk(3, 1), 0)
+
+        with DBSession() as db:
+            self.assertEqual(db.query(ExecuteLog).count(), 2)
+            self.assertEqual(db.query(ExecuteLogArchive).count(), 2)
+            # traceback of Error 1 is stored once for both executes
+            self.assertEqual(db.query(ExecuteLogTraceback).count(), 2)
+            self.assertEqual(db.query(ExecuteLogArchiveTraceback).count(), 3)
+
+        self.assertEqual([log_manager.get_execute_log_details(i) for i in [1, 2, 3]], expected)
+        self.assertEqual(log_manager.get_execute_log_details(1, after=expected[0][1]['id']), expected[0][2:])
+
+        entries, count = log_manager.get_log_entries(0, 10)
+        self.assertEqual([e['failed'] for e in entries], [1, 2, 2])
+
+    def test_remove_old_entries_removes_archive(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+        now = datetime.now(pytz.utc)
+
+        self._add_failed_execute(log_manager, now - timedelta(days=12), [u'Error 1'])
+        self._add_failed_execute(log_manager, now - timedelta(days=5), [u'Error 2'])
+        log_manager.archive_old_entries_chunk(3)
+
+        log_manager.remove_old_entries(10)
+
+        with DBSession() as db:
+            self.assertEqual(db.query(ExecuteLogArchive).count(), 1)
+            self.assertEqual(db.query(ExecuteLogArchiveTraceback).count(), 1)
+            self.assertEqual(db.query(ExecuteLogTraceback).count(), 1)
+        self.assertEqual(len(log_manager.get_execute_log_details(2)), 2)
+
     def test_remove_old_entries_keep_all(self):
         # noinspection PyTypeChecker
         log_manager = ExecuteLogManager()
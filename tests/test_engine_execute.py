@@ -1,5 +1,7 @@
 # coding=utf-8
 import datetime
+from threading import Barrier
+import requests
 from ddt import ddt
 from mock import Mock, MagicMock, call, ANY
 
@@ -7,6 +9,8 @@ from tests import TestCase, ReadContentMixin
 from sqlalchemy import Column, Integer, ForeignKey, String
 
 from monitorrent.utils.bittorrent_ex import Torrent
+from monitorrent.utils.circuit_breaker import circuit_breakers, CircuitBreaker
+from monitorrent.utils.deadline import Deadline, Cancelled, DeadlineExceeded, get_current_deadline
 from monitorrent.engine import Engine, EngineExecute, EngineTrackers, EngineTracker, \
     EngineTopics, EngineTopic, EngineDownloads, Logger
 from monitorrent.plugins import Topic
@@ -14,7 +18,8 @@ from monitorrent.plugins.status import Status
 from monitorrent.plugins.clients import TopicSettings
 from monitorrent.plugins.trackers import TrackerPluginBase
 from monitorrent.plugin_managers import ClientsManager, TrackersManager, NotifierManager
-from monitorrent.settings_manager import SettingsManager
+from monitorrent.settings_manager import SettingsManager, SettingsSnapshot
+from monitorrent.utils import metrics
 
 
 class MockSettingsManager(SettingsManager):
@@ -28,6 +33,9 @@ class MockSettingsManager(SettingsManager):
     def _get_settings(name, default=None):
         return MockSettingsManager._settings.get(name, default)
 
+    def _load_snapshot(self):
+        return SettingsSnapshot(dict(MockSettingsManager._settings), {}, self._clock())
+
 
 @ddt
 class EngineTest(TestCase):
@@ -87,6 +95,175 @@ class EngineExecuteTest(EngineTest):
         tracker.init.assert_not_called()
         tracker.execute.assert_not_called()
 
+    def test_execute_tracks_remaining_topics(self):
+        topics = [Topic(id=1), Topic(id=2), Topic(id=3)]
+
+        # noinspection PyUnusedLocal
+        def execute(topics, engine_tracker):
+            with engine_tracker.start(len(topics)) as engine_topics:
+                with engine_topics.start(1, 'Topic 2'):
+                    pass
+
+        tracker = Mock()
+        tracker.get_topics = Mock(return_value=topics)
+        tracker.execute = Mock(side_effect=execute)
+        self.trackers_manager.trackers = {'test.com': tracker}
+
+        self.assertIsNone(self.engine.get_remaining_ids())
+
+        self.engine.execute([1, 2, 3])
+
+        self.assertEqual([1, 2, 3], self.engine.execute_ids)
+        self.assertEqual({1, 3}, self.engine.get_remaining_ids())
+
+    def test_execute_records_topic_checkpoints(self):
+        topics = [Topic(id=1), Topic(id=2), Topic(id=3)]
+
+        # noinspection PyUnusedLocal
+        def execute(topics, engine_tracker):
+            with engine_tracker.start(len(topics)) as engine_topics:
+                with engine_topics.start(0, 'Topic 1'):
+                    pass
+                with engine_topics.start(1, 'Topic 2'):
+                    raise Exception("Some error")
+
+        tracker = Mock()
+        tracker.get_topics = Mock(return_value=topics)
+        tracker.execute = Mock(side_effect=execute)
+        self.trackers_manager.trackers = {'test.com': tracker}
+        self.log_mock.topics_planned = Mock()
+        self.log_mock.topic_finished = Mock()
+
+        self.engine.execute(None)
+
+        self.log_mock.topics_planned.assert_called_once_with([1, 2, 3])
+        self.assertEqual([call(1), call(2)], self.log_mock.topic_finished.call_args_list)
+
+    def test_execute_cancel_skips_remaining_topics(self):
+        topics = [Topic(id=1), Topic(id=2), Topic(id=3)]
+        executed = []
+
+        # noinspection PyUnusedLocal
+        def execute(topics, engine_tracker):
+            with engine_tracker.start(len(topics)) as engine_topics:
+                for i in range(0, len(topics)):
+                    with engine_topics.start(i, 'Topic {0}'.format(i + 1)):
+                        executed.append(i)
+                        self.engine.cancel()
+
+        tracker = Mock()
+        tracker.get_topics = Mock(return_value=topics)
+        tracker.execute = Mock(side_effect=execute)
+        self.trackers_manager.trackers = {'test.com': tracker}
+
+        self.engine.execute(None, base_interval=3600)
+
+        self.assertEqual([0], executed)
+        self.log_info_mock.assert_any_call(u"Execute was cancelled, skipped 2 topic(s) of <b>test.com</b>")
+        self.log_failed_mock.assert_not_called()
+        tracker.update_check_schedule.assert_called_once_with([topics[0]], ANY, 3600, frozenset())
+
+    def test_execute_reports_failed_topics_to_check_schedule(self):
+        topics = [Topic(id=1), Topic(id=2), Topic(id=3)]
+
+        # noinspection PyUnusedLocal
+        def execute(topics, engine_tracker):
+            with engine_tracker.start(len(topics)) as engine_topics:
+                with engine_topics.start(0, 'Topic 1'):
+                    pass
+                with engine_topics.start(1, 'Topic 2'):
+                    raise Exception("Some error")
+                with engine_topics.start(2, 'Topic 3') as engine_topic:
+                    engine_topic.status_changed(Status.Ok, Status.Error)
+
+        tracker = Mock()
+        tracker.get_topics = Mock(return_value=topics)
+        tracker.execute = Mock(side_effect=execute)
+        self.trackers_manager.trackers = {'test.com': tracker}
+
+        self.engine.execute(None, base_interval=3600)
+
+        tracker.update_check_schedule.assert_called_once_with(topics, ANY, 3600, frozenset([2, 3]))
+
+    def test_execute_abandons_topic_over_deadline(self):
+        MockSettingsManager._settings['monitorrent.execute.topic_timeout'] = '30'
+        topics = [Topic(id=1), Topic(id=2)]
+        executed = []
+        deadlines = []
+
+        # noinspection PyUnusedLocal
+        def execute(topics, engine_tracker):
+            with engine_tracker.start(len(topics)) as engine_topics:
+                for i in range(0, len(topics)):
+                    with engine_topics.start(i, 'Topic {0}'.format(i + 1)):
+                        executed.append(i)
+                        deadline = get_current_deadline()
+                        deadlines.append(deadline)
+                        if i == 0:
+                            raise DeadlineExceeded(deadline)
+
+        tracker = Mock()
+        tracker.get_topics = Mock(return_value=topics)
+        tracker.execute = Mock(side_effect=execute)
+        self.trackers_manager.trackers = {'test.com': tracker}
+
+        try:
+            self.engine.execute(None)
+        finally:
+            del MockSettingsManager._settings['monitorrent.execute.topic_timeout']
+
+        self.assertEqual([0, 1], executed)
+        self.assertIsNot(deadlines[0], deadlines[1])
+        self.assertIs(self.engine.deadline, deadlines[0].parent)
+        self.assertTrue(deadlines[0].remaining() <= 30)
+        self.log_failed_mock.assert_called_once_with(
+            u"Check for <b>Topic 1</b> was abandoned: Topic deadline of 30 seconds exceeded", None, None, None)
+
+    def test_execute_updates_metrics(self):
+        # noinspection PyUnusedLocal
+        def execute(topics, engine_tracker):
+            with engine_tracker.start(len(topics)) as engine_topics:
+                with engine_topics.start(0, 'Topic 1'):
+                    raise Exception("Some error")
+
+        tracker = Mock()
+        tracker.get_topics = Mock(return_value=[Topic(id=1)])
+        tracker.execute = Mock(side_effect=execute)
+        self.trackers_manager.trackers = {'metrics.com': tracker}
+        failures = metrics.failures.get() or 0
+
+        self.engine.execute(None)
+
+        self.assertEqual(1, metrics.topics_checked.get(tracker='metrics.com'))
+        self.assertEqual(failures + 1, metrics.failures.get())
+
+    def test_execute_trackers_in_parallel(self):
+        barrier = Barrier(2, timeout=5)
+
+        # noinspection PyUnusedLocal
+        def execute(topics, engine_tracker):
+            # both trackers have to be executed at the same time to pass the barrier
+            barrier.wait()
+
+        trackers = dict()
+        for name in ['test1.com', 'test2.com']:
+            tracker = Mock()
+            tracker.name = name
+            tracker.get_topics = Mock(return_value=[Topic()])
+            tracker.execute = Mock(side_effect=execute)
+            trackers[name] = tracker
+
+        self.trackers_manager.trackers = trackers
+        self.settings_manager.trackers_concurrency = 2
+        try:
+            self.engine.execute(None)
+        finally:
+            self.settings_manager.trackers_concurrency = 1
+
+        for tracker in trackers.values():
+            tracker.execute.assert_called_once_with(tracker.get_topics.return_value, ANY)
+        self.log_failed_mock.assert_not_called()
+
 
 class EngineExecute2Test(TestCase):
     def setUp(self):
@@ -262,6 +439,68 @@ class TestEngineTopics(TestCase):
         self.engine.downloaded.assert_not_called()
 
 
+
+class EngineTopicsCircuitBreakerTest(TestCase):
+    def setUp(self):
+        self.engine = Mock()
+        self.notifier_manager_execute = Mock()
+        circuit_breakers.reset()
+
+        # noinspection PyTypeChecker
+        self.engine_tracker = EngineTracker('tracker', Mock(), self.notifier_manager_execute, self.engine)
+
+    def tearDown(self):
+        circuit_breakers.reset()
+
+    def test_skip_topics_after_connection_errors(self):
+        executed = []
+        with self.engine_tracker.start(5) as engine_topics:
+            for i in range(0, 5):
+                with engine_topics.start(i, "Topic {0}".format(i)):
+                    executed.append(i)
+                    raise requests.exceptions.ConnectTimeout()
+
+        self.assertEqual([0, 1, 2], executed)
+        self.assertEqual(CircuitBreaker.OPEN, circuit_breakers.get('tracker').state)
+        self.engine.failed.assert_any_call(u"<b>tracker</b> is unavailable, skipped 2 topic(s)", None, None, None)
+
+    def test_success_resets_failures(self):
+        with self.engine_tracker.start(5) as engine_topics:
+            for i in range(0, 5):
+                with engine_topics.start(i, "Topic {0}".format(i)):
+                    if i % 2 == 0:
+                        raise requests.exceptions.ReadTimeout()
+
+        breaker = circuit_breakers.get('tracker')
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+        self.assertEqual(1, breaker.failures)
+
+    def test_other_errors_are_not_counted(self):
+        with self.engine_tracker.start(5) as engine_topics:
+            for i in range(0, 5):
+                with engine_topics.start(i, "Topic {0}".format(i)):
+                    raise Exception("Parse error")
+
+        self.assertEqual(CircuitBreaker.CLOSED, circuit_breakers.get('tracker').state)
+
+    def test_failed_and_cancelled_topics_do_not_close_breaker(self):
+        breaker = circuit_breakers.get('tracker')
+        breaker.record_failure()
+        breaker.record_failure()
+        with self.engine_tracker.start(2) as engine_topics:
+            with engine_topics.start(0, "Topic 0"):
+                raise Exception("Parse error")
+            with engine_topics.start(1, "Topic 1"):
+                raise Cancelled(Deadline(u'Execute'))
+
+        self.assertEqual(2, breaker.failures)
+        with self.engine_tracker.start(1) as engine_topics:
+            with engine_topics.start(0, "Topic 0"):
+                raise requests.exceptions.ConnectTimeout()
+
+        self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+
+
 class TestEngineTopic(TestCase):
     def setUp(self):
         self.engine = Mock()
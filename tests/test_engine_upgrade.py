@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytz
+from sqlalchemy import Column, Integer, ForeignKey, Unicode, Enum, MetaData, Table, inspect
+
+from monitorrent.db import UTCDateTime
+from monitorrent.engine import upgrade, get_current_version
+from tests import UpgradeTestCase
+
+
+def execute_log_table(m):
+    return Table('execute_log', m,
+                 Column('id', Integer, primary_key=True),
+                 Column('execute_id', ForeignKey('execute.id')),
+                 Column('time', UTCDateTime, nullable=False),
+                 Column('message', Unicode, nullable=False),
+                 Column('level', Enum('info', 'warning', 'failed', 'downloaded'), nullable=False))
+
+
+def execute_columns():
+    return [Column('id', Integer, primary_key=True),
+            Column('start_time', UTCDateTime, nullable=False),
+            Column('finish_time', UTCDateTime, nullable=False),
+            Column('status', Enum('finished', 'failed'), nullable=False),
+            Column('failed_message', Unicode, nullable=True)]
+
+
+class EngineUpgradeTest(UpgradeTestCase):
+    m0 = MetaData()
+    Execute0 = Table('execute', m0, *execute_columns())
+    ExecuteLog0 = execute_log_table(m0)
+
+    m1 = MetaData()
+    Execute1 = Table('execute', m1, *(execute_columns() +
+                                      [Column('resumed_from_id', ForeignKey('execute.id'), nullable=True)]))
+    ExecuteLog1 = execute_log_table(m1)
+
+    m2 = MetaData()
+    Execute2 = Table('execute', m2, *(execute_columns() +
+                                      [Column('resumed_from_id', ForeignKey('execute.id'), nullable=True),
+                                       Column('log_count', Integer, nullable=False, server_default='0'),
+                                       Column('downloaded_count', Integer, nullable=False, server_default='0'),
+                                       Column('failed_count', Integer, nullable=False, server_default='0')]))
+    ExecuteLog2 = execute_log_table(m2)
+
+    versions = [
+        (Execute0, ExecuteLog0),
+        (Execute1, ExecuteLog1),
+        (Execute2, ExecuteLog2),
+    ]
+
+    def upgrade_func(self, engine, operation_factory):
+        upgrade(engine, operation_factory)
+
+    def _get_current_version(self):
+        return get_current_version(self.engine)
+
+    def test_empty_db_test(self):
+        self._test_empty_db_test()
+
+    def test_updage_empty_from_version_0(self):
+        self._upgrade_from(None, 0)
+
+    def test_updage_empty_from_version_1(self):
+        self._upgrade_from(None, 1)
+
+    def test_updage_empty_from_version_2(self):
+        self._upgrade_from(None, 2)
+
+    def test_updage_filled_from_version_0(self):
+        now = datetime.now(pytz.utc)
+        executes = [
+            {'id': 1, 'start_time': now, 'finish_time': now, 'status': 'finished'},
+            {'id': 2, 'start_time': now, 'finish_time': now, 'status': 'finished'},
+        ]
+        logs = [
+            {'execute_id': 1, 'time': now, 'message': u'info', 'level': 'info'},
+            {'execute_id': 1, 'time': now, 'message': u'downloaded', 'level': 'downloaded'},
+            {'execute_id': 1, 'time': now, 'message': u'failed 1', 'level': 'failed'},
+            {'execute_id': 1, 'time': now, 'message': u'failed 2', 'level': 'failed'},
+        ]
+
+        self._upgrade_from([executes, logs], 0)
+
+        rows = list(self.engine.execute(self.Execute2.select().order_by(self.Execute2.c.id)))
+        self.assertEqual([(r.log_count, r.downloaded_count, r.failed_count) for r in rows],
+                         [(4, 1, 2), (0, 0, 0)])
+
+        indexes = {i['name'] for i in inspect(self.engine).get_indexes('execute')}
+        self.assertIn('ix_execute_finish_time', indexes)
+        indexes = {i['name'] for i in inspect(self.engine).get_indexes('execute_log')}
+        self.assertIn('ix_execute_log_execute_id', indexes)
+        self.assertIn('ix_execute_log_level', indexes)
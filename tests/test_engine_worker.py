@@ -0,0 +1,370 @@
+from datetime import datetime, timedelta
+
+import pytz
+from mock import Mock, patch
+
+from tests import DbTestCase
+from monitorrent.db import DBSession
+from monitorrent.engine import Execute, ExecuteSettings, ExecuteTopic, DBEngineRunner
+from monitorrent.engine_worker import EngineCommandQueue, EngineLeaderLock, EngineWorker, EngineWorkerLock, \
+    EngineRunnerClient, EngineWorkerLogManager
+
+
+class EngineCommandQueueTest(DbTestCase):
+    def test_pop_all_empty_queue_does_not_write(self):
+        commands = EngineCommandQueue()
+
+        with patch('monitorrent.engine_worker.db_write') as db_write:
+            self.assertEqual(commands.pop_all(), [])
+
+        db_write.assert_not_called()
+
+    def test_pop_all_in_order(self):
+        commands = EngineCommandQueue()
+        commands.put(EngineCommandQueue.EXECUTE, ids=[1, 2])
+        commands.put(EngineCommandQueue.CANCEL)
+        commands.put(EngineCommandQueue.SET_INTERVAL, interval=600)
+
+        self.assertEqual(commands.pop_all(), [(EngineCommandQueue.EXECUTE, {'ids': [1, 2]}),
+                                              (EngineCommandQueue.CANCEL, {}),
+                                              (EngineCommandQueue.SET_INTERVAL, {'interval': 600})])
+        self.assertEqual(commands.pop_all(), [])
+
+
+class EngineLeaderLockTest(DbTestCase):
+    def test_only_one_owner(self):
+        lock1 = EngineLeaderLock(u'worker1')
+        lock2 = EngineLeaderLock(u'worker2')
+
+        self.assertTrue(lock1.acquire())
+        self.assertFalse(lock2.acquire())
+        self.assertTrue(lock1.acquire(10))
+
+        state = EngineLeaderLock.get_state()
+        self.assertEqual(state['owner'], u'worker1')
+        self.assertEqual(state['execute_id'], 10)
+
+    def test_take_stale_lock(self):
+        lock1 = EngineLeaderLock(u'worker1', ttl=60)
+        lock2 = EngineLeaderLock(u'worker2', ttl=60)
+
+        self.assertTrue(lock1.acquire(10))
+        with DBSession() as db:
+            db.query(EngineWorkerLock).update({EngineWorkerLock.heartbeat:
+                                               datetime.now(pytz.utc) - timedelta(seconds=120)})
+
+        self.assertIsNone(EngineLeaderLock.get_state())
+        self.assertTrue(lock2.acquire())
+        self.assertFalse(lock1.acquire())
+        self.assertEqual(EngineLeaderLock.get_state()['owner'], u'worker2')
+        self.assertEqual(lock2.taken_over_from, u'worker1')
+
+    def test_release(self):
+        lock1 = EngineLeaderLock(u'worker1')
+        lock2 = EngineLeaderLock(u'worker2')
+
+        self.assertTrue(lock1.acquire())
+        lock2.release()
+        self.assertFalse(lock2.acquire())
+
+        lock1.release()
+        self.assertIsNone(EngineLeaderLock.get_state())
+        self.assertTrue(lock2.acquire())
+
+
+class EngineWorkerTest(DbTestCase):
+    def create_worker(self, owner=u'worker'):
+        runner = Mock()
+        runner_factory = Mock(return_value=runner)
+        log_manager = Mock()
+        log_manager.get_current_execute_id.return_value = None
+        worker = EngineWorker(runner_factory, log_manager, EngineLeaderLock(owner), poll_interval=0.01,
+                              clock=Mock(return_value=100))
+        return worker, runner_factory, runner
+
+    @staticmethod
+    def wait_renew(worker):
+        worker._clock.return_value += worker.renew_interval
+
+    def test_elected_worker_runs_commands(self):
+        worker, runner_factory, runner = self.create_worker()
+        commands = EngineCommandQueue()
+        commands.put(EngineCommandQueue.EXECUTE, ids=[1])
+        commands.put(EngineCommandQueue.SET_INTERVAL, interval=600)
+        commands.put(EngineCommandQueue.CANCEL)
+
+        worker.tick()
+        worker.tick()
+
+        runner_factory.assert_called_once_with(None)
+        runner.execute.assert_called_once_with([1])
+        runner.cancel.assert_called_once_with()
+        self.assertEqual(runner.interval, 600)
+
+    def test_not_elected_worker_keeps_commands(self):
+        worker1, runner_factory1, runner1 = self.create_worker(u'worker1')
+        worker2, runner_factory2, runner2 = self.create_worker(u'worker2')
+
+        worker1.tick()
+        EngineCommandQueue().put(EngineCommandQueue.EXECUTE, ids=None)
+        worker2.tick()
+
+        runner_factory2.assert_not_called()
+        worker1.tick()
+        runner1.execute.assert_called_once_with(None)
+
+    def test_lost_lock_stops_engine(self):
+        worker1, runner_factory1, runner1 = self.create_worker(u'worker1')
+
+        worker1.tick()
+        with DBSession() as db:
+            db.query(EngineWorkerLock).update({EngineWorkerLock.owner: u'worker2'})
+        self.wait_renew(worker1)
+        worker1.tick()
+
+        runner1.cancel.assert_called_once_with()
+        runner1.stop.assert_called_once_with()
+        # tick isn't blocked by running execute
+        runner1.join.assert_not_called()
+        self.assertIsNone(worker1.engine_runner)
+
+    def test_log_maintenance_runs_only_in_elected_worker(self):
+        worker1, runner_factory1, runner1 = self.create_worker(u'worker1')
+        worker2, runner_factory2, runner2 = self.create_worker(u'worker2')
+        worker1.maintenance_factory = Mock()
+        worker2.maintenance_factory = Mock()
+        log_maintenance = worker1.maintenance_factory.return_value
+
+        worker1.tick()
+        worker2.tick()
+
+        worker2.maintenance_factory.assert_not_called()
+        log_maintenance.start.assert_called_once_with()
+        runner_factory1.assert_called_once_with(log_maintenance)
+
+        with DBSession() as db:
+            db.query(EngineWorkerLock).update({EngineWorkerLock.owner: u'worker2'})
+        self.wait_renew(worker1)
+        worker1.tick()
+
+        log_maintenance.stop.assert_called_once_with()
+        self.assertIsNone(worker1.log_maintenance)
+
+    def test_renew_error_keeps_valid_lease(self):
+        worker, runner_factory, runner = self.create_worker()
+        worker._clock = Mock(return_value=100)
+
+        worker.tick()
+        with patch.object(worker.leader_lock, 'acquire', side_effect=Exception('database is locked')):
+            worker._clock.return_value = 100 + EngineLeaderLock.DEFAULT_TTL - 1
+            worker.tick()
+
+        runner.stop.assert_not_called()
+        self.assertIs(worker.engine_runner, runner)
+
+        # lease is renewed on next tick
+        worker.tick()
+        self.assertEqual(EngineLeaderLock.get_state()['owner'], u'worker')
+        runner_factory.assert_called_once_with(None)
+
+    def test_renew_error_after_lease_expired_stops_engine(self):
+        worker, runner_factory, runner = self.create_worker()
+        worker._clock = Mock(return_value=100)
+
+        worker.tick()
+        with patch.object(worker.leader_lock, 'acquire', side_effect=Exception('database is locked')):
+            worker._clock.return_value = 100 + EngineLeaderLock.DEFAULT_TTL
+            worker.tick()
+
+        runner.cancel.assert_called_once_with()
+        runner.stop.assert_called_once_with()
+        runner.join.assert_not_called()
+        self.assertIsNone(worker.engine_runner)
+
+    def test_new_engine_waits_for_stopping_one(self):
+        worker, runner_factory, runner = self.create_worker()
+
+        worker.tick()
+        self.wait_renew(worker)
+        with patch.object(worker.leader_lock, 'acquire', return_value=False):
+            worker.tick()
+        runner.is_alive.return_value = True
+        self.wait_renew(worker)
+        worker.tick()
+
+        runner_factory.assert_called_once_with(None)
+        self.assertIsNone(worker.engine_runner)
+
+        runner.is_alive.return_value = False
+        worker.tick()
+
+        self.assertEqual(runner_factory.call_count, 2)
+        self.assertIs(worker.engine_runner, runner)
+
+    def _take_over_running_execute(self):
+        old_lock = EngineLeaderLock(u'old_worker')
+        old_lock.acquire(1)
+        with DBSession() as db:
+            now = datetime.now(pytz.utc)
+            db.add(Execute(id=1, start_time=now, finish_time=now, status='finished'))
+            db.add(ExecuteTopic(execute_id=1, topic_id=10))
+            db.query(EngineWorkerLock).update({EngineWorkerLock.heartbeat: now - timedelta(seconds=120)})
+
+    def test_taken_over_lease_waits_for_previous_execute(self):
+        worker, runner_factory, runner = self.create_worker()
+        worker._clock = Mock(return_value=100)
+        self._take_over_running_execute()
+
+        worker.tick()
+        worker._clock.return_value = 100 + EngineLeaderLock.DEFAULT_TTL - 1
+        worker.tick()
+
+        self.assertEqual(EngineLeaderLock.get_state()['owner'], u'worker')
+        runner_factory.assert_not_called()
+
+        with DBSession() as db:
+            db.query(ExecuteTopic).delete()
+        worker.tick()
+
+        runner_factory.assert_called_once_with(None)
+        self.assertIs(worker.engine_runner, runner)
+
+    def test_taken_over_lease_waits_for_previous_execute_until_ttl(self):
+        worker, runner_factory, runner = self.create_worker()
+        worker._clock = Mock(return_value=100)
+        self._take_over_running_execute()
+
+        worker.tick()
+        runner_factory.assert_not_called()
+
+        # previous worker is dead, its execute is resumed as interrupted
+        worker._clock.return_value = 100 + EngineLeaderLock.DEFAULT_TTL
+        worker.tick()
+
+        runner_factory.assert_called_once_with(None)
+        self.assertIsNone(worker.leader_lock.taken_over_from)
+
+    def test_lease_is_renewed_every_third_of_ttl(self):
+        worker, runner_factory, runner = self.create_worker()
+        EngineCommandQueue().put(EngineCommandQueue.EXECUTE, ids=[1])
+
+        with patch.object(worker.leader_lock, 'acquire', wraps=worker.leader_lock.acquire) as acquire:
+            worker.tick()
+            worker._clock.return_value += EngineLeaderLock.DEFAULT_TTL / 3.0 - 1
+            worker.tick()
+            self.assertEqual(1, acquire.call_count)
+            runner.execute.assert_called_once_with([1])
+
+            worker._clock.return_value += 1
+            worker.tick()
+            self.assertEqual(2, acquire.call_count)
+
+    def test_lease_is_renewed_when_execute_changes(self):
+        worker, runner_factory, runner = self.create_worker()
+
+        worker.tick()
+        worker.log_manager.get_current_execute_id.return_value = 5
+        worker.tick()
+
+        self.assertEqual(EngineLeaderLock.get_state()['execute_id'], 5)
+
+    def test_not_elected_worker_retries_after_renew_interval(self):
+        worker1, runner_factory1, runner1 = self.create_worker(u'worker1')
+        worker2, runner_factory2, runner2 = self.create_worker(u'worker2')
+        worker1.tick()
+
+        with patch.object(worker2.leader_lock, 'acquire', return_value=False) as acquire:
+            worker2.tick()
+            worker2.tick()
+            self.assertEqual(1, acquire.call_count)
+            self.wait_renew(worker2)
+            worker2.tick()
+            self.assertEqual(2, acquire.call_count)
+
+    def test_heartbeat_publishes_execute_id(self):
+        worker, runner_factory, runner = self.create_worker()
+        worker.log_manager.get_current_execute_id.return_value = 5
+
+        worker.tick()
+
+        self.assertEqual(EngineLeaderLock.get_state()['execute_id'], 5)
+
+    def test_run_releases_lock(self):
+        worker, runner_factory, runner = self.create_worker()
+        worker.runner_factory = Mock(side_effect=lambda log_maintenance: worker.stop() or runner)
+
+        worker.run()
+
+        runner.stop.assert_called_once_with()
+        self.assertIsNone(EngineLeaderLock.get_state())
+
+
+class EngineRunnerClientTest(DbTestCase):
+    def test_interval(self):
+        client = EngineRunnerClient(Mock())
+
+        self.assertEqual(client.interval, DBEngineRunner.DEFAULT_INTERVAL)
+        self.assertIsNone(client.last_execute)
+
+        client.interval = 600
+
+        self.assertEqual(client.interval, 600)
+        self.assertEqual(EngineCommandQueue().pop_all(), [(EngineCommandQueue.SET_INTERVAL, {'interval': 600})])
+
+    def test_last_execute(self):
+        last_execute = datetime(2017, 1, 1, 10, 0, tzinfo=pytz.utc)
+        with DBSession() as db:
+            db.add(ExecuteSettings(interval=300, last_execute=last_execute))
+
+        client = EngineRunnerClient(Mock())
+
+        self.assertEqual(client.last_execute, last_execute)
+
+    def test_execute(self):
+        client = EngineRunnerClient(Mock())
+
+        client.execute([1, 2])
+
+        self.assertEqual(EngineCommandQueue().pop_all(), [(EngineCommandQueue.EXECUTE, {'ids': [1, 2]})])
+
+    def test_cancel(self):
+        client = EngineRunnerClient(Mock())
+
+        self.assertFalse(client.cancel())
+        EngineLeaderLock(u'worker').acquire(None)
+        self.assertFalse(client.cancel())
+        EngineLeaderLock(u'worker').acquire(3)
+        self.assertTrue(client.cancel())
+
+        self.assertEqual(EngineCommandQueue().pop_all(), [(EngineCommandQueue.CANCEL, {})])
+
+
+class EngineWorkerLogManagerTest(DbTestCase):
+    def test_is_running(self):
+        clock = Mock(return_value=100)
+        log_manager = EngineWorkerLogManager(clock=clock)
+
+        self.assertFalse(log_manager.is_running())
+
+        EngineLeaderLock(u'worker').acquire(3)
+        clock.return_value += EngineWorkerLogManager.EXECUTE_ID_TTL
+
+        self.assertTrue(log_manager.is_running())
+        self.assertTrue(log_manager.is_running(3))
+        self.assertFalse(log_manager.is_running(4))
+        self.assertEqual(log_manager.get_current_execute_id(), 3)
+
+    def test_execute_id_is_cached(self):
+        clock = Mock(return_value=100)
+        log_manager = EngineWorkerLogManager(clock=clock)
+
+        with patch.object(EngineLeaderLock, 'get_state', return_value={'execute_id': 3}) as get_state:
+            self.assertTrue(log_manager.is_running(3))
+            self.assertEqual(log_manager.get_current_execute_id(), 3)
+            self.assertEqual(1, get_state.call_count)
+
+            get_state.return_value = None
+            clock.return_value += EngineWorkerLogManager.EXECUTE_ID_TTL
+
+            self.assertFalse(log_manager.is_running())
+            self.assertEqual(2, get_state.call_count)
@@ -0,0 +1,28 @@
+from datetime import datetime
+from unittest import TestCase
+
+import pytz
+
+from monitorrent.execute_log_archive import split_traceback, pack_log_entries, unpack_log_entries
+
+
+class ExecuteLogArchiveTest(TestCase):
+    def test_split_traceback(self):
+        self.assertEqual(split_traceback(u'Message'), (u'Message', None))
+        self.assertEqual(split_traceback(u'Failed<br/><pre>Traceback</pre>'), (u'Failed', u'Traceback'))
+        self.assertEqual(split_traceback(u'Failed<br/><pre>Traceback'), (u'Failed<br/><pre>Traceback', None))
+
+    def test_pack_unpack(self):
+        time = datetime(2017, 3, 1, 10, 20, 30, 123456, tzinfo=pytz.utc)
+        entries = [
+            {'id': 1, 'execute_id': 7, 'time': time, 'message': u'Сообщение', 'level': 'info'},
+            {'id': 2, 'execute_id': 7, 'time': time, 'message': u'Failed 1<br/><pre>Traceback</pre>',
+             'level': 'failed'},
+            {'id': 3, 'execute_id': 7, 'time': time, 'message': u'Failed 2<br/><pre>Traceback</pre>',
+             'level': 'failed'},
+        ]
+
+        data, tracebacks = pack_log_entries(entries)
+
+        self.assertEqual(list(tracebacks.values()), [u'Traceback'])
+        self.assertEqual(unpack_log_entries(7, data, tracebacks), entries)
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+import pytz
+from mock import Mock, patch
+
+from tests import DbTestCase
+from monitorrent.engine import ExecuteLogManager
+from monitorrent.log_maintenance import LogMaintenance
+from monitorrent.db import compact_db, enable_incremental_vacuum, get_engine
+
+
+class LogMaintenanceTest(DbTestCase):
+    def setUp(self):
+        super(LogMaintenanceTest, self).setUp()
+        self.settings_manager = Mock()
+        self.settings_manager.remove_logs_interval = 10
+        self.settings_manager.archive_logs_interval = 0
+        self.log_manager = ExecuteLogManager()
+
+    def add_execute(self, days, logs_count):
+        start_time = datetime.now(pytz.utc) - timedelta(days=days)
+        self.log_manager.started(start_time)
+        for i in range(logs_count):
+            self.log_manager.log_entry(u'Message {0}'.format(i), 'info')
+        self.log_manager.finished(start_time, None)
+
+    def test_execute_removes_in_chunks(self):
+        self.add_execute(20, 5)
+        self.add_execute(15, 5)
+        self.add_execute(1, 2)
+        self.log_manager.remove_old_entries_chunk = Mock(wraps=self.log_manager.remove_old_entries_chunk)
+
+        maintenance = LogMaintenance(self.settings_manager, self.log_manager, chunk_size=3, pause=0)
+
+        result = maintenance.execute()
+
+        self.assertEqual(result['removed_logs'], 10)
+        self.assertEqual(result['removed_executes'], 2)
+        self.assertGreaterEqual(result['reclaimed_bytes'], 0)
+        self.assertEqual(maintenance.last_result, result)
+        # 4 chunks of logs, 1 chunk of executes and one empty chunk
+        self.assertEqual(self.log_manager.remove_old_entries_chunk.call_count, 5)
+        self.log_manager.remove_old_entries_chunk.assert_called_with(10, 3)
+
+        entries, count = self.log_manager.get_log_entries(0, 10)
+        self.assertEqual(count, 1)
+
+    def test_execute_archives(self):
+        self.add_execute(20, 5)
+        self.add_execute(5, 5)
+        self.add_execute(1, 2)
+        self.settings_manager.archive_logs_interval = 3
+
+        maintenance = LogMaintenance(self.settings_manager, self.log_manager, pause=0)
+
+        result = maintenance.execute()
+
+        self.assertEqual(result['removed_executes'], 1)
+        self.assertEqual(result['archived_executes'], 1)
+        self.assertEqual(len(self.log_manager.get_execute_log_details(2)), 5)
+
+    def test_execute_compacts_only_with_free_pages(self):
+        maintenance = LogMaintenance(self.settings_manager, self.log_manager, pause=0)
+
+        with patch('monitorrent.log_maintenance.get_db_free_pages', return_value=0), \
+                patch('monitorrent.log_maintenance.compact_db') as compact_db_mock:
+            maintenance.execute()
+        compact_db_mock.assert_not_called()
+
+        with patch('monitorrent.log_maintenance.get_db_free_pages', return_value=10), \
+                patch('monitorrent.log_maintenance.compact_db', return_value=40960) as compact_db_mock:
+            result = maintenance.execute()
+        compact_db_mock.assert_called_once_with()
+        self.assertEqual(result['reclaimed_bytes'], 40960)
+
+    def test_execute_does_not_compact_while_engine_executes(self):
+        maintenance = LogMaintenance(self.settings_manager, self.log_manager, pause=0)
+        self.log_manager.started(datetime.now(pytz.utc))
+
+        with patch('monitorrent.log_maintenance.get_db_free_pages', return_value=10), \
+                patch('monitorrent.log_maintenance.compact_db') as compact_db_mock:
+            result = maintenance.execute()
+        self.log_manager.finished(datetime.now(pytz.utc), None)
+
+        compact_db_mock.assert_not_called()
+        self.assertEqual(result['reclaimed_bytes'], 0)
+
+    def test_execute_stopped(self):
+        self.add_execute(20, 5)
+
+        maintenance = LogMaintenance(self.settings_manager, self.log_manager, chunk_size=1, pause=0)
+        maintenance.stop()
+
+        result = maintenance.execute()
+
+        self.assertEqual(result['removed_logs'], 0)
+
+    def test_wake_and_stop(self):
+        self.add_execute(20, 5)
+
+        maintenance = LogMaintenance(self.settings_manager, self.log_manager, interval=100, pause=0)
+        maintenance.execute = Mock(side_effect=lambda: maintenance.stop())
+        maintenance.start()
+        maintenance.wake()
+        maintenance.join(5)
+
+        self.assertFalse(maintenance.is_alive())
+        maintenance.execute.assert_called_once_with()
+
+    def _get_auto_vacuum(self):
+        with get_engine().connect() as connection:
+            return connection.execute("PRAGMA auto_vacuum").scalar()
+
+    def test_compact_db_does_not_switch_auto_vacuum(self):
+        self.add_execute(20, 500)
+        self.log_manager.remove_old_entries(10)
+
+        self.assertEqual(compact_db(), 0)
+        # NONE
+        self.assertEqual(self._get_auto_vacuum(), 0)
+
+    def test_compact_db(self):
+        self.add_execute(20, 500)
+        self.log_manager.remove_old_entries(10)
+
+        self.assertGreater(enable_incremental_vacuum(), 0)
+        # INCREMENTAL
+        self.assertEqual(self._get_auto_vacuum(), 2)
+        # database is already compacted
+        self.assertEqual(compact_db(), 0)
+
+        self.add_execute(20, 500)
+        self.log_manager.remove_old_entries(10)
+
+        self.assertGreater(compact_db(), 0)
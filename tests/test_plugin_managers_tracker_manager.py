@@ -3,7 +3,7 @@ from collections import OrderedDict
 
 from ddt import ddt, data
 from mock import Mock, MagicMock, patch
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, event
 from monitorrent.db import DBSession, row2dict
 from monitorrent.plugins.trackers import Topic, CloudflareChallengeSolverSettings
 from monitorrent.plugins.status import Status
@@ -429,6 +429,87 @@ class TrackersManagerDbPartTest(DbTestCase):
             }],
             topics)
 
+    def _add_topics(self, count):
+        with DBSession() as db:
+            for i in range(count):
+                # topics of both trackers are mixed, so order by id is checked too
+                topic_class, topic_type = (Tracker1Topic, TRACKER1_PLUGIN_NAME) if i % 2 else \
+                    (Tracker2Topic, TRACKER2_PLUGIN_NAME)
+                db.add(topic_class(display_name='Name {0}'.format(i), url='https://tracker.tracker/{0}'.format(i),
+                                   type=topic_type, some_addition_field=i))
+
+    def test_get_watching_topics_query_count(self):
+        self._add_topics(20)
+        topics = []
+
+        def get_watching_topics():
+            topics.extend(self.trackers_manager.get_watching_topics())
+
+        statements = self._get_statements(get_watching_topics)
+
+        self.assertEqual(21, len(topics))
+        self.assertEqual(sorted(t['id'] for t in topics), [t['id'] for t in topics])
+        self.assertEqual(10, len([t for t in topics if 'thumbnail_url' in t]))
+        # topic types and one query per tracker
+        self.assertEqual(3, len([s for s in statements if s.lstrip().upper().startswith('SELECT')]))
+
+    def test_get_watching_topics_prepare_topic(self):
+        self._add_topics(4)
+        self.tracker2.prepare_topic = Mock()
+
+        topics = self.trackers_manager.get_watching_topics()
+
+        self.assertEqual(5, len(topics))
+        self.assertEqual(2, self.tracker2.prepare_topic.call_count)
+        self.assertTrue(all(isinstance(c[0][0], Tracker2Topic) for c in self.tracker2.prepare_topic.call_args_list))
+
+    def test_get_watching_topics_prepare_topics(self):
+        self._add_topics(4)
+
+        def prepare_topics(topics):
+            for topic in topics:
+                topic.url = topic.url.replace('https://', 'http://')
+
+        self.tracker2.prepare_topic = Mock()
+        self.tracker2.prepare_topics = Mock(side_effect=prepare_topics)
+
+        topics = self.trackers_manager.get_watching_topics()
+
+        self.tracker2.prepare_topics.assert_called_once()
+        self.tracker2.prepare_topic.assert_not_called()
+        self.assertEqual(['http://tracker.tracker/0', 'http://tracker.tracker/2'],
+                         [t['url'] for t in topics if t['tracker'] == TRACKER2_PLUGIN_NAME])
+
+    def _get_statements(self, func, *args):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            func(*args)
+        finally:
+            event.remove(self.engine, 'before_cursor_execute', before_cursor_execute)
+        return [s for s in statements if s != 'BEGIN']
+
+    def test_base_topic_operations_touch_only_topics_table(self):
+        statements = self._get_statements(self.trackers_manager.reset_topic_status, self.tracker1_id1)
+        statements += self._get_statements(self.trackers_manager.set_topic_paused, self.tracker1_id1, True)
+        statements += self._get_statements(self.trackers_manager.get_status_topics_ids, [Status.Ok])
+
+        self.assertEqual(3, len(statements))
+        self.assertTrue(all('tracker1_topics' not in s for s in statements))
+
+    def test_remove_topic_removes_tracker_topic(self):
+        statements = self._get_statements(self.trackers_manager.remove_topic, self.tracker1_id1)
+
+        # subclass table is used only to delete its row
+        self.assertEqual(['DELETE FROM tracker1_topics'],
+                         [s.split(' WHERE')[0] for s in statements if 'tracker1_topics' in s])
+        with DBSession() as db:
+            self.assertEqual(0, db.query(Tracker1Topic).count())
+
     def test_get_tracker_topics(self):
         topics = self.trackers_manager.get_tracker_topics(TRACKER1_PLUGIN_NAME)
 
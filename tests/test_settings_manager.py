@@ -1,6 +1,8 @@
 from ddt import ddt, data
+from mock import Mock, patch
 from tests import DbTestCase
-from monitorrent.settings_manager import SettingsManager
+from monitorrent.db import DBSession
+from monitorrent.settings_manager import SettingsManager, Settings
 
 
 @ddt
@@ -53,6 +55,26 @@ class SettingsManagerTest(DbTestCase):
 
         self.assertEqual(value, self.settings_manager.get_is_developer_mode())
 
+    def test_execute_and_topic_timeouts_are_disabled_by_default(self):
+        self.assertEqual(0, self.settings_manager.execute_timeout)
+        self.assertEqual(0, self.settings_manager.topic_timeout)
+
+    def test_set_execute_and_topic_timeouts(self):
+        self.settings_manager.execute_timeout = 3600
+        self.settings_manager.topic_timeout = 300
+
+        self.assertEqual(3600, self.settings_manager.execute_timeout)
+        self.assertEqual(300, self.settings_manager.topic_timeout)
+
+    def test_execute_trace_is_disabled_by_default(self):
+        self.assertFalse(self.settings_manager.execute_trace_enabled)
+
+    @data(True, False)
+    def test_set_execute_trace_enabled(self, value):
+        self.settings_manager.execute_trace_enabled = value
+
+        self.assertEqual(value, self.settings_manager.execute_trace_enabled)
+
     def test_get_default_requests_timeout(self):
         self.assertEqual(10, self.settings_manager.requests_timeout)
 
@@ -77,8 +99,7 @@ class SettingsManagerTest(DbTestCase):
         plugin_settings = self.settings_manager.tracker_settings
         self.assertEqual(10, plugin_settings.requests_timeout)
 
-        plugin_settings.requests_timeout = 20
-        self.settings_manager.tracker_settings = plugin_settings
+        self.settings_manager.tracker_settings = plugin_settings._replace(requests_timeout=20)
 
         self.assertEqual(20, self.settings_manager.tracker_settings.requests_timeout)
 
@@ -86,11 +107,49 @@ class SettingsManagerTest(DbTestCase):
         plugin_settings = self.settings_manager.tracker_settings
         self.assertEqual(10, plugin_settings.requests_timeout)
 
-        plugin_settings.requests_timeout = 20.3
-        self.settings_manager.tracker_settings = plugin_settings
+        self.settings_manager.tracker_settings = plugin_settings._replace(requests_timeout=20.3)
 
         self.assertEqual(20.3, self.settings_manager.tracker_settings.requests_timeout)
 
+    def test_tracker_settings_are_immutable(self):
+        self.settings_manager.set_proxy('http', 'http://1.1.1.1')
+        self.settings_manager.set_is_proxy_enabled(True)
+        tracker_settings = self.settings_manager.tracker_settings
+
+        with self.assertRaises(AttributeError):
+            tracker_settings.requests_timeout = 20
+        with self.assertRaises(TypeError):
+            tracker_settings.proxies['https'] = 'http://2.2.2.2'
+        tracker_settings.get_requests_kwargs()['proxies']['https'] = 'http://2.2.2.2'
+        self.assertEqual({'http': 'http://1.1.1.1'}, tracker_settings.proxies)
+
+    def test_snapshot_settings_are_not_changed(self):
+        self.settings_manager.requests_timeout = 20
+        settings = self.settings_manager.get_snapshot_settings()
+
+        self.settings_manager.requests_timeout = 30
+        self.settings_manager.host_concurrency = 4
+
+        self.assertEqual(20, settings.requests_timeout)
+        self.assertEqual(1, settings.host_concurrency)
+        self.assertEqual(20, settings.tracker_settings.requests_timeout)
+        self.assertEqual(1, settings.tracker_settings.host_concurrency)
+        self.assertEqual(30, self.settings_manager.tracker_settings.requests_timeout)
+        with self.assertRaises(AttributeError):
+            settings.requests_timeout = 40
+
+    def test_get_default_concurrency(self):
+        self.assertEqual(1, self.settings_manager.trackers_concurrency)
+        self.assertEqual(1, self.settings_manager.host_concurrency)
+        self.assertEqual(1, self.settings_manager.tracker_settings.host_concurrency)
+
+    def test_set_host_concurrency(self):
+        self.settings_manager.trackers_concurrency = 3
+        self.settings_manager.host_concurrency = 4
+
+        self.assertEqual(3, self.settings_manager.trackers_concurrency)
+        self.assertEqual(4, self.settings_manager.tracker_settings.host_concurrency)
+
     def test_get_remove_logs_interval(self):
         self.assertEqual(10, self.settings_manager.remove_logs_interval)
 
@@ -101,6 +160,13 @@ class SettingsManagerTest(DbTestCase):
 
         self.assertEqual(20, self.settings_manager.remove_logs_interval)
 
+    def test_set_archive_logs_interval(self):
+        self.assertEqual(0, self.settings_manager.archive_logs_interval)
+
+        self.settings_manager.archive_logs_interval = 3
+
+        self.assertEqual(3, self.settings_manager.archive_logs_interval)
+
     def test_get_is_proxy_enabled(self):
         self.assertFalse(self.settings_manager.get_is_proxy_enabled())
 
@@ -218,3 +284,110 @@ class SettingsManagerTest(DbTestCase):
     def test_get_existing_external_notifications_levels_success(self):
         self.assertEqual(self.settings_manager.get_existing_external_notifications_levels(),
                          ['DOWNLOAD', 'ERROR', 'STATUS_CHANGED'])
+
+    def test_get_shared_auth_keys(self):
+        secret_key, token = self.settings_manager.get_shared_auth_keys()
+
+        self.assertEqual(len(secret_key), 48)
+        self.assertEqual(len(token), 8)
+        self.assertEqual(self.settings_manager.get_shared_auth_keys(), (secret_key, token))
+
+    def test_get_shared_auth_keys_keeps_keys_of_other_process(self):
+        other_settings_manager = SettingsManager()
+        # snapshot without keys is loaded before other process generated them
+        self.assertEqual(self.settings_manager.remove_logs_interval, 10)
+        secret_key, token = other_settings_manager.get_shared_auth_keys()
+
+        self.assertEqual(self.settings_manager.get_shared_auth_keys(), (secret_key, token))
+
+    def test_reset_shared_auth_keys(self):
+        secret_key, token = self.settings_manager.get_shared_auth_keys()
+
+        new_secret_key, new_token = self.settings_manager.reset_shared_auth_keys()
+
+        self.assertNotEqual(new_secret_key, secret_key)
+        self.assertEqual(len(new_token), 8)
+        self.assertEqual(self.settings_manager.get_shared_auth_keys(), (new_secret_key, new_token))
+
+
+class SettingsManagerCacheTest(DbTestCase):
+    def setUp(self):
+        super(SettingsManagerCacheTest, self).setUp()
+        self.clock = Mock(return_value=0)
+        self.settings_manager = SettingsManager(clock=self.clock)
+
+    @staticmethod
+    def _update_in_db(name, value):
+        with DBSession() as db:
+            db.add(Settings(name=name, value=value))
+
+    def test_settings_are_loaded_once(self):
+        with patch('monitorrent.settings_manager.DBSession', wraps=DBSession) as db_session:
+            tracker_settings = self.settings_manager.tracker_settings
+            self.assertEqual(self.settings_manager.requests_timeout, 10)
+            self.assertFalse(self.settings_manager.get_is_proxy_enabled())
+            self.assertIs(self.settings_manager.tracker_settings, tracker_settings)
+
+        self.assertEqual(db_session.call_count, 1)
+
+    def test_write_invalidates_snapshot(self):
+        tracker_settings = self.settings_manager.tracker_settings
+
+        self.settings_manager.requests_timeout = 20
+
+        self.assertEqual(self.settings_manager.requests_timeout, 20)
+        self.assertIsNot(self.settings_manager.tracker_settings, tracker_settings)
+        self.assertEqual(self.settings_manager.tracker_settings.requests_timeout, 20)
+
+    def test_set_proxy_invalidates_snapshot(self):
+        self.settings_manager.set_is_proxy_enabled(True)
+        self.assertEqual(self.settings_manager.tracker_settings.proxies, {})
+
+        self.settings_manager.set_proxy('http', 'http://1.1.1.1')
+
+        self.assertEqual(self.settings_manager.tracker_settings.proxies, {'http': 'http://1.1.1.1'})
+
+    def test_snapshot_is_read_only(self):
+        self.settings_manager.set_proxy('http', 'http://1.1.1.1')
+        snapshot = self.settings_manager.get_snapshot()
+
+        with self.assertRaises(TypeError):
+            snapshot.values['monitorrent.password'] = 'password'
+        with self.assertRaises(TypeError):
+            snapshot.proxies['https'] = 'http://1.1.1.1'
+
+        self.settings_manager.get_proxies()['https'] = 'http://1.1.1.1'
+        self.assertEqual(self.settings_manager.get_proxies(), {'http': 'http://1.1.1.1'})
+
+    def test_changes_of_other_process_are_not_visible_without_ttl(self):
+        self.assertEqual(self.settings_manager.remove_logs_interval, 10)
+
+        self._update_in_db('monitorrent.remove_logs_interval', '20')
+        self.clock.return_value = 3600
+
+        self.assertEqual(self.settings_manager.remove_logs_interval, 10)
+
+    def test_cache_ttl(self):
+        self.settings_manager.cache_ttl = 10
+        self.assertEqual(self.settings_manager.remove_logs_interval, 10)
+
+        self._update_in_db('monitorrent.remove_logs_interval', '20')
+        self.clock.return_value = 9
+        self.assertEqual(self.settings_manager.remove_logs_interval, 10)
+
+        self.clock.return_value = 10
+        self.assertEqual(self.settings_manager.remove_logs_interval, 20)
+
+    def test_snapshot_loaded_during_write_is_not_kept(self):
+        load_snapshot = self.settings_manager._load_snapshot
+
+        def load_and_write():
+            snapshot = load_snapshot()
+            # write of another thread is finished before loaded snapshot is stored
+            self.settings_manager.invalidate()
+            return snapshot
+
+        with patch.object(self.settings_manager, '_load_snapshot', side_effect=load_and_write):
+            self.settings_manager.get_snapshot()
+
+        self.assertIsNone(self.settings_manager._snapshot)
@@ -44,11 +44,38 @@ class TopicUpgradeTest(UpgradeTestCase):
                    Column('status', EnumType(Status, by_name=True), nullable=False, server_default=Status.Ok.__str__()),
                    Column('paused', Boolean, nullable=False, server_default='0'),
                    Column('download_dir', String, nullable=True, server_default=None))
+    m4 = MetaData()
+    Topic4 = Table("topics", m4,
+                   Column('id', Integer, primary_key=True),
+                   Column('display_name', String, unique=True, nullable=False),
+                   Column('url', String, nullable=False, unique=True),
+                   Column('last_update', UTCDateTime, nullable=True),
+                   Column('type', String),
+                   Column('status', EnumType(Status, by_name=True), nullable=False, server_default=Status.Ok.__str__()),
+                   Column('paused', Boolean, nullable=False, server_default='0'),
+                   Column('download_dir', String, nullable=True, server_default=None),
+                   Column('check_interval', Integer, nullable=True),
+                   Column('next_check_at', UTCDateTime, nullable=True))
+    m5 = MetaData()
+    Topic5 = Table("topics", m5,
+                   Column('id', Integer, primary_key=True),
+                   Column('display_name', String, unique=True, nullable=False),
+                   Column('url', String, nullable=False, unique=True),
+                   Column('last_update', UTCDateTime, nullable=True),
+                   Column('type', String),
+                   Column('status', EnumType(Status, by_name=True), nullable=False, server_default=Status.Ok.__str__()),
+                   Column('paused', Boolean, nullable=False, server_default='0'),
+                   Column('download_dir', String, nullable=True, server_default=None),
+                   Column('check_interval', Integer, nullable=True),
+                   Column('next_check_at', UTCDateTime, nullable=True),
+                   Column('content_digest', String, nullable=True))
     versions = [
         (Topic0, ),
         (Topic1, ),
         (Topic2, ),
-        (Topic3, )
+        (Topic3, ),
+        (Topic4, ),
+        (Topic5, )
     ]
 
     def upgrade_func(self, engine, operation_factory):
@@ -72,6 +99,12 @@ class TopicUpgradeTest(UpgradeTestCase):
     def test_updage_empty_from_version_3(self):
         self._upgrade_from(None, 3)
 
+    def test_updage_empty_from_version_4(self):
+        self._upgrade_from(None, 4)
+
+    def test_updage_empty_from_version_5(self):
+        self._upgrade_from(None, 5)
+
     def test_updage_filled_from_version_0(self):
         topic1 = {'url': 'http://1', 'display_name': '1'}
         topic2 = {'url': 'http://2', 'display_name': '2'}
@@ -92,6 +125,9 @@ class TopicUpgradeTest(UpgradeTestCase):
                 self.assertEqual(topic.status, Status.Ok)
                 self.assertEqual(topic.paused, False)
                 self.assertIsNone(topic.download_dir)
+                self.assertIsNone(topic.check_interval)
+                self.assertIsNone(topic.next_check_at)
+                self.assertIsNone(topic.content_digest)
         finally:
             db.close()
 
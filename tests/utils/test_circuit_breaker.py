@@ -0,0 +1,97 @@
+from monitorrent.utils.circuit_breaker import CircuitBreaker, CircuitBreakerOpen, CircuitBreakerRegistry
+from tests import TestCase
+
+
+class CircuitBreakerTest(TestCase):
+    def setUp(self):
+        super(CircuitBreakerTest, self).setUp()
+        self.now = 0
+        self.breaker = CircuitBreaker('tracker.com', failure_threshold=2, reset_timeout=60, clock=lambda: self.now)
+
+    def open_breaker(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+    def test_open_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow_request())
+
+        self.breaker.record_failure()
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+        self.assertFalse(self.breaker.allow_request())
+        with self.assertRaises(CircuitBreakerOpen):
+            self.breaker.check()
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+
+    def test_probe_after_reset_timeout(self):
+        self.open_breaker()
+
+        self.now = 59
+        self.assertFalse(self.breaker.allow_request())
+
+        self.now = 60
+        # only one probe request is allowed
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+        self.assertEqual(CircuitBreaker.HALF_OPEN, self.breaker.state)
+
+        self.breaker.record_success()
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_ignored_probe_allows_next_probe(self):
+        self.open_breaker()
+        self.now = 60
+        self.assertTrue(self.breaker.allow_request())
+
+        self.breaker.record_ignored()
+
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_ignored_call_keeps_closed_breaker(self):
+        self.breaker.record_failure()
+        self.breaker.record_ignored()
+        self.breaker.record_failure()
+
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+
+    def test_failed_probe_opens_again(self):
+        self.open_breaker()
+        self.now = 60
+        self.assertTrue(self.breaker.allow_request())
+
+        self.breaker.record_failure()
+
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+        self.now = 119
+        self.assertFalse(self.breaker.allow_request())
+        self.now = 120
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_get_state(self):
+        self.assertEqual({'state': 'closed', 'failures': 0, 'opened_at': None}, self.breaker.get_state())
+
+        self.open_breaker()
+
+        state = self.breaker.get_state()
+        self.assertEqual('open', state['state'])
+        self.assertEqual(2, state['failures'])
+        self.assertIsNotNone(state['opened_at'])
+
+
+class CircuitBreakerRegistryTest(TestCase):
+    def test_get(self):
+        registry = CircuitBreakerRegistry(failure_threshold=5)
+
+        breaker = registry.get('tracker.com')
+
+        self.assertIs(breaker, registry.get('tracker.com'))
+        self.assertIsNot(breaker, registry.get('other.com'))
+        self.assertEqual(5, breaker.failure_threshold)
@@ -0,0 +1,91 @@
+from ddt import ddt, data, unpack
+from monitorrent.utils.deadline import Deadline, DeadlineExceeded, Cancelled, deadline_scope, get_current_deadline
+from tests import TestCase
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def clock(self):
+        return self.now
+
+
+@ddt
+class DeadlineTest(TestCase):
+    def setUp(self):
+        super(DeadlineTest, self).setUp()
+        self.clock = FakeClock()
+
+    def create_deadline(self, name, timeout, parent=None):
+        return Deadline(name, timeout, parent, clock=self.clock.clock)
+
+    def test_unlimited(self):
+        deadline = self.create_deadline(u'Execute', 0)
+
+        self.clock.now += 100000
+        deadline.check()
+
+        self.assertIsNone(deadline.remaining())
+        self.assertEqual(10, deadline.limit_timeout(10))
+
+    def test_expired(self):
+        deadline = self.create_deadline(u'Topic', 10)
+
+        self.clock.now += 4
+        self.assertEqual(6, deadline.remaining())
+        deadline.check()
+
+        self.clock.now += 6
+        with self.assertRaises(DeadlineExceeded) as cm:
+            deadline.check()
+        self.assertEqual(u'Topic deadline of 10 seconds exceeded', str(cm.exception))
+
+    def test_parent_expired(self):
+        parent = self.create_deadline(u'Execute', 5)
+        deadline = self.create_deadline(u'Topic', 10, parent)
+
+        self.assertEqual(5, deadline.remaining())
+
+        self.clock.now += 5
+        with self.assertRaises(DeadlineExceeded) as cm:
+            deadline.check()
+        self.assertIs(parent, cm.exception.deadline)
+
+    def test_parent_cancelled(self):
+        parent = self.create_deadline(u'Execute', None)
+        deadline = self.create_deadline(u'Topic', 10, parent)
+
+        parent.cancel()
+
+        self.assertTrue(deadline.is_cancelled())
+        with self.assertRaises(Cancelled) as cm:
+            deadline.check()
+        self.assertEqual(u'Execute was cancelled', str(cm.exception))
+
+    @data((None, 4), (10, 4), (2, 2), ((3, 10), (3, 4)), ((None, 2), (4, 2)))
+    @unpack
+    def test_limit_timeout(self, timeout, expected):
+        deadline = self.create_deadline(u'Topic', 10)
+        self.clock.now += 6
+
+        self.assertEqual(expected, deadline.limit_timeout(timeout))
+
+    def test_limit_timeout_expired(self):
+        deadline = self.create_deadline(u'Topic', 10)
+        self.clock.now += 10
+
+        with self.assertRaises(DeadlineExceeded):
+            deadline.limit_timeout(10)
+
+    def test_scope(self):
+        execute_deadline = self.create_deadline(u'Execute', 100)
+        topic_deadline = self.create_deadline(u'Topic', 10, execute_deadline)
+
+        self.assertIsNone(get_current_deadline())
+        with deadline_scope(execute_deadline):
+            with deadline_scope(topic_deadline) as deadline:
+                self.assertIs(topic_deadline, deadline)
+                self.assertIs(topic_deadline, get_current_deadline())
+            self.assertIs(execute_deadline, get_current_deadline())
+        self.assertIsNone(get_current_deadline())
@@ -0,0 +1,111 @@
+from datetime import datetime
+import pytz
+from mock import Mock
+from requests import Response
+from monitorrent.db import DBSession
+from monitorrent.utils.http_cache import HttpCache, HttpCacheEntry
+from tests import DbTestCase
+
+
+class HttpCacheTest(DbTestCase):
+    url = 'http://tracker.com/download/1'
+
+    def setUp(self):
+        super(HttpCacheTest, self).setUp()
+        self.cache = HttpCache()
+
+    @staticmethod
+    def create_response(content, status_code=200, headers=None):
+        response = Response()
+        response.status_code = status_code
+        response._content = content
+        response.headers.update(headers or {})
+        return response
+
+    def test_empty_cache(self):
+        self.assertEqual({}, self.cache.get_conditional_headers(self.url))
+        self.assertFalse(self.cache.is_not_modified(self.url, self.create_response(b'd9:')))
+
+    def test_conditional_headers(self):
+        headers = {'ETag': '"1234"', 'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+        self.cache.store(self.url, self.create_response(b'd9:', headers=headers))
+
+        self.assertEqual({'If-None-Match': '"1234"', 'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'},
+                         self.cache.get_conditional_headers(self.url))
+
+    def test_not_modified(self):
+        self.cache.store(self.url, self.create_response(b'd9:'))
+
+        self.assertTrue(self.cache.is_not_modified(self.url, self.create_response(b'', 304)))
+        # unchanged body is detected by topic content digest
+        self.assertFalse(self.cache.is_not_modified(self.url, self.create_response(b'd9:')))
+        self.assertFalse(self.cache.is_not_modified(self.url, self.create_response(b'd10:')))
+
+        self.assertEqual({'tracker.com': {'hits': 1, 'misses': 2, 'hit_rate': 1.0 / 3}}, self.cache.get_stats())
+
+    def _get_cached_urls(self):
+        with DBSession() as db:
+            return sorted(url for url, in db.query(HttpCacheEntry.url))
+
+    def _get_last_access(self, url):
+        with DBSession() as db:
+            return db.query(HttpCacheEntry.last_access).filter(HttpCacheEntry.url == url).scalar()
+
+    def test_evict_least_recently_used(self):
+        clock = Mock(return_value=0)
+        # noinspection PyTypeChecker
+        self.cache = HttpCache(max_entries=2, evict_interval=100, clock=clock)
+        urls = ['http://tracker.com/download/{0}'.format(i) for i in range(3)]
+        self.cache.store(urls[0], self.create_response(b'0'))
+        self.cache.store(urls[1], self.create_response(b'1'))
+        # access first url, so second one becomes least recently used
+        self.assertTrue(self.cache.is_not_modified(urls[0], self.create_response(b'', 304)))
+        self.cache.store(urls[2], self.create_response(b'2'))
+
+        # eviction is not required until evict_interval passed
+        self.assertEqual(urls, self._get_cached_urls())
+
+        clock.return_value = 100
+        self.cache.flush()
+
+        self.assertEqual([urls[0], urls[2]], self._get_cached_urls())
+
+    def test_evict_interval_is_checked_under_lock(self):
+        locked = []
+
+        def clock():
+            locked.append(self.cache._accessed_lock.locked())
+            return 0
+
+        # noinspection PyTypeChecker
+        self.cache = HttpCache(evict_interval=100, clock=clock)
+        self.cache.flush()
+        self.cache.flush()
+
+        self.assertEqual([True, True], locked)
+        self.assertEqual(0, self.cache._evicted_at)
+
+    def test_last_access_written_in_batches(self):
+        # noinspection PyTypeChecker
+        self.cache = HttpCache(access_flush_size=2)
+        urls = ['http://tracker.com/download/{0}'.format(i) for i in range(2)]
+        old_access = datetime(2015, 10, 21, tzinfo=pytz.utc)
+        for url in urls:
+            self.cache.store(url, self.create_response(b'd9:'))
+        with DBSession() as db:
+            db.query(HttpCacheEntry).update({HttpCacheEntry.last_access: old_access})
+
+        self.assertTrue(self.cache.is_not_modified(urls[0], self.create_response(b'', 304)))
+
+        self.assertEqual(old_access, self._get_last_access(urls[0]))
+
+        self.assertTrue(self.cache.is_not_modified(urls[1], self.create_response(b'', 304)))
+
+        self.assertGreater(self._get_last_access(urls[0]), old_access)
+        self.assertGreater(self._get_last_access(urls[1]), old_access)
+
+    def test_remove(self):
+        self.cache.store(self.url, self.create_response(b'd9:'))
+        self.cache.remove(self.url)
+
+        self.assertEqual({}, self.cache.get_conditional_headers(self.url))
@@ -0,0 +1,81 @@
+from monitorrent.utils.metrics import MetricsRegistry
+from tests import TestCase
+
+
+class MetricsRegistryTest(TestCase):
+    def setUp(self):
+        super(MetricsRegistryTest, self).setUp()
+        self.registry = MetricsRegistry()
+
+    def test_counter(self):
+        counter = self.registry.counter('test_requests_total', 'Requests', ['domain', 'status'])
+        counter.inc(domain='tracker.com', status=200)
+        counter.inc(2, domain='tracker.com', status=200)
+        counter.inc(domain='tracker.com', status='error')
+
+        self.assertEqual(3, counter.get(domain='tracker.com', status=200))
+        self.assertEqual('# HELP test_requests_total Requests\n'
+                         '# TYPE test_requests_total counter\n'
+                         'test_requests_total{domain="tracker.com",status="200"} 3\n'
+                         'test_requests_total{domain="tracker.com",status="error"} 1\n',
+                         self.registry.render())
+
+    def test_counter_can_not_be_decreased(self):
+        counter = self.registry.counter('test_total', 'Test')
+
+        with self.assertRaises(ValueError):
+            counter.inc(-1)
+
+    def test_wrong_labels(self):
+        counter = self.registry.counter('test_total', 'Test', ['tracker'])
+
+        with self.assertRaises(ValueError):
+            counter.inc(client='qbittorrent')
+
+    def test_gauge(self):
+        gauge = self.registry.gauge('test_active', 'Active')
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+
+        self.assertEqual('# HELP test_active Active\n'
+                         '# TYPE test_active gauge\n'
+                         'test_active 1\n',
+                         self.registry.render())
+
+    def test_histogram(self):
+        histogram = self.registry.histogram('test_duration_seconds', 'Duration', ['client'], buckets=[0.1, 1])
+        histogram.observe(0.05, client='deluge')
+        histogram.observe(0.5, client='deluge')
+        histogram.observe(2, client='deluge')
+
+        self.assertEqual('# HELP test_duration_seconds Duration\n'
+                         '# TYPE test_duration_seconds histogram\n'
+                         'test_duration_seconds_bucket{client="deluge",le="0.1"} 1\n'
+                         'test_duration_seconds_bucket{client="deluge",le="1"} 2\n'
+                         'test_duration_seconds_bucket{client="deluge",le="+Inf"} 3\n'
+                         'test_duration_seconds_sum{client="deluge"} 2.55\n'
+                         'test_duration_seconds_count{client="deluge"} 3\n',
+                         self.registry.render())
+
+    def test_histogram_time(self):
+        histogram = self.registry.histogram('test_duration_seconds', 'Duration')
+
+        with histogram.time():
+            pass
+
+        counts, total = histogram.get()
+        self.assertEqual(1, counts[-1])
+
+    def test_register_returns_existing(self):
+        counter = self.registry.counter('test_total', 'Test')
+
+        self.assertIs(counter, self.registry.counter('test_total', 'Test'))
+        with self.assertRaises(ValueError):
+            self.registry.gauge('test_total', 'Test')
+
+    def test_escape_label_value(self):
+        counter = self.registry.counter('test_total', 'Test', ['name'])
+        counter.inc(name='a "b"\\')
+
+        self.assertIn('test_total{name="a \\"b\\"\\\\"} 1', self.registry.render())
@@ -0,0 +1,80 @@
+import threading
+from mock import Mock
+from tests import TestCase
+from monitorrent.utils.pipeline import Pipeline, Stage
+
+
+class PipelineTest(TestCase):
+    def test_items_pass_all_stages(self):
+        result = []
+        lock = threading.Lock()
+
+        def collect(item):
+            with lock:
+                result.append(item)
+
+        pipeline = Pipeline([Stage('double', lambda i: i * 2, workers=3),
+                             Stage('increment', lambda i: i + 1),
+                             Stage('collect', collect)])
+        pipeline.run(range(0, 20))
+
+        self.assertEqual(sorted(i * 2 + 1 for i in range(0, 20)), sorted(result))
+
+    def test_none_result_drops_item(self):
+        last_stage = Mock()
+
+        pipeline = Pipeline([Stage('filter', lambda i: i if i % 2 == 0 else None, workers=2),
+                             Stage('last', last_stage)])
+        pipeline.run(range(0, 10))
+
+        self.assertEqual(5, last_stage.call_count)
+
+    def test_errors_are_reported_and_pipeline_continues(self):
+        def fail_on_odd(item):
+            if item % 2 == 1:
+                raise Exception('odd')
+            return item
+
+        on_error = Mock()
+        last_stage = Mock()
+
+        pipeline = Pipeline([Stage('fail', fail_on_odd, workers=2),
+                             Stage('last', last_stage)], on_error)
+        pipeline.run(range(0, 10))
+
+        self.assertEqual(5, last_stage.call_count)
+        self.assertEqual(5, on_error.call_count)
+        self.assertEqual(sorted(range(1, 10, 2)), sorted(c[0][0] for c in on_error.call_args_list))
+
+    def test_bounded_queue(self):
+        stage = Stage('stage', lambda i: i, workers=2)
+
+        self.assertEqual(4, stage.queue.maxsize)
+        self.assertEqual(1, Stage('stage', lambda i: i, queue_size=1).queue.maxsize)
+
+    def test_stats(self):
+        release = threading.Event()
+
+        def wait(item):
+            release.wait(5)
+            return item
+
+        pipeline = Pipeline([Stage('first', lambda i: i if i % 2 == 0 else None),
+                             Stage('slow', wait, queue_size=10)])
+        thread = threading.Thread(target=pipeline.run, args=(range(0, 10),))
+        thread.start()
+        # all even items are queued for the slow stage, while it waits for the first one
+        while pipeline.stages[0].get_stats()['processed'] < 10:
+            release.wait(0.01)
+        release.set()
+        thread.join(5)
+
+        first, slow = pipeline.get_stats()
+
+        self.assertEqual({'name': 'first', 'workers': 1, 'processed': 10, 'queue_size': 2},
+                         {k: first[k] for k in ('name', 'workers', 'processed', 'queue_size')})
+        self.assertTrue(first['max_queue_depth'] <= 2)
+        self.assertEqual({'name': 'slow', 'workers': 1, 'processed': 5, 'queue_size': 10},
+                         {k: slow[k] for k in ('name', 'workers', 'processed', 'queue_size')})
+        self.assertIn(slow['max_queue_depth'], (4, 5))
+        self.assertTrue(0 < slow['avg_queue_depth'] <= slow['max_queue_depth'])
@@ -0,0 +1,68 @@
+import threading
+from unittest import TestCase
+
+from monitorrent.utils.pubsub import EventChannel
+
+
+class EventChannelTest(TestCase):
+    def test_publish(self):
+        channel = EventChannel()
+
+        self.assertEqual(channel.last_id, 0)
+        self.assertEqual(channel.publish('log', {'message': u'1'}), 1)
+        self.assertEqual(channel.publish('progress', 10), 2)
+
+        self.assertEqual(channel.last_id, 2)
+        self.assertEqual(channel.get_events(0), [(1, 'log', {'message': u'1'}), (2, 'progress', 10)])
+        self.assertEqual(channel.get_events(1), [(2, 'progress', 10)])
+        self.assertEqual(channel.get_events(2), [])
+
+    def test_max_events(self):
+        channel = EventChannel(max_events=2)
+
+        for i in range(3):
+            channel.publish('progress', i)
+
+        self.assertEqual(channel.get_events(0), [(2, 'progress', 1), (3, 'progress', 2)])
+        self.assertTrue(channel.is_lost(0))
+        self.assertFalse(channel.is_lost(1))
+        self.assertFalse(channel.is_lost(3))
+
+    def test_is_lost_after_restart(self):
+        channel = EventChannel()
+
+        self.assertTrue(channel.is_lost(10))
+        channel.publish('progress', 1)
+
+        self.assertFalse(channel.is_lost(0))
+        self.assertFalse(channel.is_lost(1))
+        self.assertTrue(channel.is_lost(2))
+
+    def test_wait_timeout(self):
+        channel = EventChannel()
+
+        self.assertEqual(channel.wait(0, 0.01), [])
+
+    def test_wait_returns_published(self):
+        channel = EventChannel()
+        channel.publish('progress', 1)
+
+        self.assertEqual(channel.wait(0, 0.01), [(1, 'progress', 1)])
+
+    def test_wait_woken_by_publish(self):
+        channel = EventChannel()
+        waiting = threading.Event()
+        result = []
+
+        def wait():
+            waiting.set()
+            result.extend(channel.wait(0, 10))
+
+        thread = threading.Thread(target=wait)
+        thread.start()
+        waiting.wait(1)
+        channel.publish('log', u'message')
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(result, [(1, 'log', u'message')])
@@ -0,0 +1,57 @@
+from ddt import ddt, data
+from monitorrent.utils.rate_limiter import TokenBucket
+from tests import TestCase
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@ddt
+class TokenBucketTest(TestCase):
+    def setUp(self):
+        super(TokenBucketTest, self).setUp()
+        self.clock = FakeClock()
+
+    def create_bucket(self, rate, burst):
+        return TokenBucket(rate, burst, clock=self.clock.clock, sleep=self.clock.sleep)
+
+    def test_burst_without_wait(self):
+        bucket = self.create_bucket(2, 3)
+
+        waits = [bucket.acquire() for _ in range(3)]
+
+        self.assertEqual([0, 0, 0], waits)
+        self.assertEqual([], self.clock.sleeps)
+
+    def test_wait_over_burst(self):
+        bucket = self.create_bucket(2, 1)
+
+        waits = [bucket.acquire() for _ in range(3)]
+
+        self.assertEqual([0, 0.5, 0.5], waits)
+
+    def test_refill(self):
+        bucket = self.create_bucket(1, 2)
+        bucket.acquire()
+        bucket.acquire()
+
+        self.clock.now += 10
+        # bucket never has more tokens then burst
+        waits = [bucket.acquire() for _ in range(3)]
+
+        self.assertEqual([0, 0, 1.0], waits)
+
+    @data(0, -1)
+    def test_invalid_rate(self, rate):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate)
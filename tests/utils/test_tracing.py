@@ -0,0 +1,98 @@
+import threading
+from monitorrent.utils.tracing import Tracer
+from tests import TestCase
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 10.0
+
+    def clock(self):
+        return self.now
+
+
+class TracerTest(TestCase):
+    def setUp(self):
+        super(TracerTest, self).setUp()
+        self.clock = FakeClock()
+        self.tracer = Tracer(clock=self.clock.clock)
+
+    def get_spans(self, trace):
+        return [e for e in trace['traceEvents'] if e['ph'] == 'X']
+
+    def test_not_started(self):
+        with self.tracer.span('execute') as span:
+            span.set(value=1)
+
+        self.assertFalse(self.tracer.is_active)
+        self.assertIsNone(self.tracer.stop())
+
+    def test_spans(self):
+        self.tracer.start()
+        self.clock.now += 1
+        with self.tracer.span('execute', ids=[1, 2]):
+            self.clock.now += 0.5
+            with self.tracer.span('download', 'tracker') as span:
+                self.clock.now += 0.25
+                span.set(status=200)
+        trace = self.tracer.stop()
+
+        self.assertFalse(self.tracer.is_active)
+        spans = self.get_spans(trace)
+        self.assertEqual(2, len(spans))
+
+        download, execute = spans
+        self.assertEqual('download', download['name'])
+        self.assertEqual('tracker', download['cat'])
+        self.assertEqual(1500000, download['ts'])
+        self.assertEqual(250000, download['dur'])
+        self.assertEqual({'status': 200}, download['args'])
+
+        self.assertEqual('execute', execute['name'])
+        self.assertEqual('engine', execute['cat'])
+        self.assertEqual(1000000, execute['ts'])
+        self.assertEqual(750000, execute['dur'])
+        self.assertEqual({'ids': [1, 2]}, execute['args'])
+
+        thread = threading.current_thread()
+        metadata = [e for e in trace['traceEvents'] if e['ph'] == 'M']
+        self.assertEqual([{'name': 'thread_name', 'ph': 'M', 'pid': download['pid'], 'tid': thread.ident,
+                           'args': {'name': thread.name}}], metadata)
+
+    def test_span_error(self):
+        self.tracer.start()
+        with self.assertRaises(ValueError):
+            with self.tracer.span('login'):
+                raise ValueError('Wrong password')
+        trace = self.tracer.stop()
+
+        spans = self.get_spans(trace)
+        self.assertEqual({'error': 'ValueError: Wrong password'}, spans[0]['args'])
+
+    def test_span_ended_once(self):
+        self.tracer.start()
+        span = self.tracer.span('topic')
+        span.end()
+        span.end()
+        trace = self.tracer.stop()
+
+        self.assertEqual(1, len(self.get_spans(trace)))
+
+    def test_span_started_before_trace_ignored(self):
+        span = self.tracer.span('topic')
+        self.tracer.start()
+        span.end()
+        trace = self.tracer.stop()
+
+        self.assertEqual(0, len(self.get_spans(trace)))
+
+    def test_max_events(self):
+        self.tracer = Tracer(max_events=2, clock=self.clock.clock)
+        self.tracer.start()
+        for i in range(0, 5):
+            with self.tracer.span('http'):
+                pass
+        trace = self.tracer.stop()
+
+        self.assertEqual(2, len(self.get_spans(trace)))
+        self.assertEqual({'dropped_events': 3}, trace['otherData'])
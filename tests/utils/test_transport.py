@@ -0,0 +1,161 @@
+import requests_mock
+from mock import Mock, patch
+from monitorrent.utils.transport import Transport, RateLimitedHTTPAdapter
+from monitorrent.utils.deadline import Deadline, DeadlineExceeded, deadline_scope
+from tests import TestCase
+
+
+class TransportTest(TestCase):
+    def setUp(self):
+        super(TransportTest, self).setUp()
+        self.transport = Transport()
+
+    def tearDown(self):
+        self.transport.close()
+        super(TransportTest, self).tearDown()
+
+    def test_session_per_host(self):
+        session1 = self.transport.get_session('https://rutracker.org/forum/viewtopic.php?t=1')
+        session2 = self.transport.get_session('https://rutracker.org/forum/viewtopic.php?t=2')
+        session3 = self.transport.get_session('https://kinozal.tv/details.php?id=1')
+
+        self.assertIs(session1, session2)
+        self.assertIsNot(session1, session3)
+
+    def test_create_session_reuse_adapter(self):
+        url = 'https://rutracker.org/forum/login.php'
+        session = self.transport.create_session(url)
+
+        self.assertIsNot(session, self.transport.get_session(url))
+        self.assertIs(session.get_adapter(url), self.transport.get_session(url).get_adapter(url))
+
+    @requests_mock.Mocker()
+    def test_shared_session_does_not_store_cookies(self, mocker):
+        url = 'https://rutracker.org/forum/login.php'
+        mocker.get(url, text='ok', cookies={'bb_session': 'secret'})
+
+        response = self.transport.get(url)
+
+        self.assertEqual('secret', response.cookies.get('bb_session'))
+        self.assertEqual(0, len(self.transport.get_session(url).cookies))
+
+    @requests_mock.Mocker()
+    def test_apply_settings(self, mocker):
+        url = 'https://rutracker.org/forum/viewtopic.php?t=1'
+        mocker.get(url, text='ok')
+        settings = Mock()
+        settings.get_requests_kwargs.return_value = {'timeout': 12, 'proxies': None}
+
+        self.transport.get(url, settings=settings)
+        self.transport.get(url, settings=settings, timeout=30)
+
+        self.assertEqual(12, mocker.request_history[0].timeout)
+        self.assertEqual(30, mocker.request_history[1].timeout)
+
+    def test_configure_recreate_adapters(self):
+        url = 'https://rutracker.org/forum/viewtopic.php?t=1'
+        adapter = self.transport.get_session(url).get_adapter(url)
+
+        self.transport.configure(pool_maxsize=20)
+
+        new_adapter = self.transport.get_session(url).get_adapter(url)
+        self.assertIsNot(adapter, new_adapter)
+        self.assertEqual(20, new_adapter._pool_maxsize)
+
+    def test_configure_keeps_shared_session_and_mounted_adapters(self):
+        url = 'https://rutracker.org/forum/login.php'
+        shared_session = self.transport.get_session(url)
+        shared_adapter = shared_session.get_adapter(url)
+        session = self.transport.create_session(url)
+        mounted_adapter = session.get_adapter(url)
+        other_url = 'https://kinozal.tv/details.php?id=1'
+        other_adapter = self.transport.get_session(other_url).get_adapter(other_url)
+
+        with patch.object(mounted_adapter, 'close') as mounted_close, \
+                patch.object(other_adapter, 'close') as other_close:
+            self.transport.configure(pool_maxsize=20)
+
+        mounted_close.assert_not_called()
+        other_close.assert_called_once_with()
+        self.assertIs(shared_adapter, mounted_adapter)
+        self.assertIs(shared_session, self.transport.get_session(url))
+        self.assertIsNot(mounted_adapter, shared_session.get_adapter(url))
+        self.assertIs(mounted_adapter, session.get_adapter(url))
+
+    def test_get_stats(self):
+        url = 'https://rutracker.org/forum/viewtopic.php?t=1'
+        pool = Mock(num_requests=3, num_connections=1)
+        adapter = self.transport.get_session(url).get_adapter(url)
+        adapter.poolmanager.pools['key'] = pool
+
+        self.assertEqual({'rutracker.org': {'requests': 3, 'connections': 1, 'reused': 2}},
+                         self.transport.get_stats())
+
+    def test_rate_limit_by_domain(self):
+        self.transport.set_rate_limit('rutracker.org', 1, 5)
+        rutracker_rate_limiter = self.transport.get_rate_limiter('rutracker.org')
+
+        self.assertIsNotNone(rutracker_rate_limiter)
+        self.assertIs(rutracker_rate_limiter, self.transport.get_rate_limiter('www.rutracker.org'))
+        self.assertIsNone(self.transport.get_rate_limiter('kinozal.tv'))
+
+        self.transport.set_rate_limit('kinozal.tv', 2)
+        self.assertIsNotNone(self.transport.get_rate_limiter('kinozal.tv'))
+
+        self.transport.set_rate_limit('rutracker.org', None)
+        self.assertIsNone(self.transport.get_rate_limiter('rutracker.org'))
+
+    @patch('requests.adapters.HTTPAdapter.send')
+    @patch('monitorrent.utils.transport.TokenBucket')
+    def test_changed_rate_limit_applies_to_mounted_adapters(self, token_bucket, send):
+        url = 'https://rutracker.org/forum/viewtopic.php?t=1'
+        shared_adapter = self.transport.get_session(url).get_adapter(url)
+        session = self.transport.create_session(url)
+        self.transport.configure(pool_maxsize=20)
+        adapters = [shared_adapter, session.get_adapter(url), self.transport.get_session(url).get_adapter(url)]
+
+        for adapter in adapters:
+            adapter.send(Mock(url=url))
+        token_bucket.return_value.acquire.assert_not_called()
+
+        self.transport.set_rate_limit('rutracker.org', 1)
+        for adapter in adapters:
+            adapter.send(Mock(url=url))
+
+        token_bucket.assert_called_once_with(1, 1)
+        self.assertEqual(3, token_bucket.return_value.acquire.call_count)
+
+    @patch('requests.adapters.HTTPAdapter.send')
+    def test_rate_limited_adapter_acquire_before_send(self, send):
+        url = 'https://rutracker.org/forum/viewtopic.php?t=1'
+        rate_limiter = Mock()
+        adapter = RateLimitedHTTPAdapter(rate_limiter)
+
+        adapter.send(Mock(url=url))
+
+        rate_limiter.acquire.assert_called_once_with()
+        send.assert_called_once()
+
+    @patch('requests.adapters.HTTPAdapter.send')
+    def test_timeout_limited_by_deadline(self, send):
+        url = 'https://rutracker.org/forum/viewtopic.php?t=1'
+        adapter = RateLimitedHTTPAdapter()
+        deadline = Mock()
+        deadline.limit_timeout = Mock(return_value=3)
+
+        with deadline_scope(deadline):
+            adapter.send(Mock(url=url), timeout=10)
+
+        deadline.limit_timeout.assert_called_once_with(10)
+        self.assertEqual(3, send.call_args[1]['timeout'])
+
+    @patch('requests.adapters.HTTPAdapter.send')
+    def test_expired_deadline_prevents_send(self, send):
+        url = 'https://rutracker.org/forum/viewtopic.php?t=1'
+        adapter = RateLimitedHTTPAdapter()
+
+        with deadline_scope(Deadline(u'Topic', 10, clock=Mock(side_effect=[0, 10]))):
+            with self.assertRaises(DeadlineExceeded):
+                adapter.send(Mock(url=url), timeout=10)
+
+        send.assert_not_called()